@@ -1,22 +1,250 @@
+"""
+Trang quản trị cho các bảng lớn (chấm công, đơn nghỉ, bảng lương: hàng triệu dòng).
+
+- Danh sách JOIN sẵn nhân viên (list_select_related): không truy vấn theo dòng.
+- Chọn nhân viên bằng ô autocomplete (tìm qua chỉ mục FTS của search.py),
+  không render <select> chứa mọi nhân viên.
+- Đếm: bảng không lọc dùng số dòng ước lượng; có lọc thì đếm tối đa
+  GIOI_HAN_DEM dòng. Không chạy thêm COUNT(*) toàn bảng.
+- Date hierarchy: các mốc năm/tháng/ngày được dò bằng vài truy vấn EXISTS
+  trên index thay vì SELECT DISTINCT quét cả bảng.
+- Bộ lọc và cột sắp xếp chỉ dùng các cột có index.
+"""
+from datetime import date, timedelta
+
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Exists, Max, Min, QuerySet
+from django.utils.functional import cached_property
+
+from .models import NhanVien, PhongBan, ChucVu, ChamCong, DonXinNghi, UserAccount, Payslip, NgayLe, TacVu
+from .search import KetQuaTimKiem
+
+# Bảng lớn hơn chừng này dòng thì chỉ hiện số ước lượng / số đếm có giới hạn
+GIOI_HAN_DEM = 100_000
+# Số kết quả tìm kiếm nhân viên (xếp theo độ liên quan) tối đa trong admin
+SO_KET_QUA_TIM_KIEM = 1000
+# Dò mốc date hierarchy bằng EXISTS khi số mốc cần dò không quá chừng này
+SO_MOC_DO_TOI_DA = 400
+
+
+def uoc_luong_so_dong(model, using):
+    """Số dòng ước lượng của bảng (thống kê của DB, O(1)); None nếu không có."""
+    connection = connections[using]
+    bang = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [bang])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] > 0 else None
+            if connection.vendor == 'sqlite':
+                # sqlite_stat1 có sau ANALYZE: số đầu tiên của `stat` là số dòng
+                try:
+                    cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [bang])
+                    row = cursor.fetchone()
+                except DatabaseError:
+                    row = None
+                if row:
+                    return int(row[0].split()[0])
+                # Chưa ANALYZE: MAX(rowid) là tra cứu O(log n), chỉ lệch số dòng đã xóa
+                cursor.execute(f'SELECT MAX(rowid) FROM {connection.ops.quote_name(bang)}')
+                return cursor.fetchone()[0] or 0
+    except DatabaseError:
+        return None
+    return None
+
+
+class UocLuongPaginator(Paginator):
+    """Paginator không COUNT(*) cả bảng lớn (xem docstring module)."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            uoc_luong = uoc_luong_so_dong(queryset.model, queryset.db)
+            if uoc_luong is not None and uoc_luong > GIOI_HAN_DEM:
+                return uoc_luong
+        # COUNT trên subquery có LIMIT: dừng sau GIOI_HAN_DEM dòng
+        return queryset.values('pk')[:GIOI_HAN_DEM].count()
+
+
+class DoMocNgayQuerySet(QuerySet):
+    """QuerySet có dates() dò từng mốc bằng EXISTS (dùng cho date hierarchy)."""
+
+    def dates(self, field_name, kind, order='ASC'):
+        if kind not in ('year', 'month', 'day') or self.query.is_sliced:
+            return super().dates(field_name, kind, order)
+        # MIN và MAX tách riêng: mỗi câu là một lần tra index
+        dau = self.aggregate(gia_tri=Min(field_name))['gia_tri']
+        cuoi = self.aggregate(gia_tri=Max(field_name))['gia_tri']
+        if dau is None:
+            return []
+        moc = _cac_moc(dau, cuoi, kind)
+        if len(moc) > SO_MOC_DO_TOI_DA:
+            return super().dates(field_name, kind, order)
+        # Một câu SELECT EXISTS(...), EXISTS(...), ... : mỗi EXISTS là một lần tra index
+        co_moc = {
+            f'moc_{i}': Exists(self.filter(**{f'{field_name}__gte': bat_dau, f'{field_name}__lt': ket_thuc}))
+            for i, (bat_dau, ket_thuc) in enumerate(moc)
+        }
+        co_du_lieu = self.model._default_manager.using(self.db).annotate(**co_moc).values_list(*co_moc)[0]
+        ket_qua = [bat_dau for (bat_dau, _), co in zip(moc, co_du_lieu) if co]
+        return ket_qua if order == 'ASC' else ket_qua[::-1]
+
+
+def _cac_moc(dau, cuoi, kind):
+    """[(đầu mốc, đầu mốc kế tiếp)] theo năm/tháng/ngày phủ [dau, cuoi]."""
+    moc = []
+    if kind == 'year':
+        for nam in range(dau.year, cuoi.year + 1):
+            moc.append((date(nam, 1, 1), date(nam + 1, 1, 1)))
+    elif kind == 'month':
+        nam, thang = dau.year, dau.month
+        while (nam, thang) <= (cuoi.year, cuoi.month) and len(moc) <= SO_MOC_DO_TOI_DA:
+            nam_sau, thang_sau = (nam + 1, 1) if thang == 12 else (nam, thang + 1)
+            moc.append((date(nam, thang, 1), date(nam_sau, thang_sau, 1)))
+            nam, thang = nam_sau, thang_sau
+    else:
+        ngay = dau
+        while ngay <= cuoi and len(moc) <= SO_MOC_DO_TOI_DA:
+            moc.append((ngay, ngay + timedelta(days=1)))
+            ngay += timedelta(days=1)
+    return moc
+
+
+class BangLonAdmin(admin.ModelAdmin):
+    """ModelAdmin cho bảng hàng triệu dòng."""
+    paginator = UocLuongPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if not self.date_hierarchy:
+            return queryset
+        return DoMocNgayQuerySet(model=queryset.model, query=queryset.query, using=queryset._db)
 
-from .models import NhanVien, PhongBan, ChucVu, ChamCong, DonXinNghi,UserAccount,Payslip
 
 class NhanVienInline(admin.StackedInline):
     model = NhanVien
     can_delete = False
     verbose_name_plural = 'Hồ sơ nhân viên'
-class PayslipAdmin(admin.ModelAdmin):
-   
+
+
+@admin.register(NhanVien)
+class NhanVienAdmin(admin.ModelAdmin):
+    list_display = ('ma_nhan_vien', 'ho_ten', 'phong_ban', 'chuc_vu', 'ngay_vao_lam')
+    list_select_related = ('phong_ban', 'chuc_vu')
+    list_filter = ('phong_ban', 'chuc_vu')
+    # Bắt buộc cho autocomplete; việc tìm thực tế đi qua chỉ mục FTS
+    search_fields = ('ma_nhan_vien', 'ho_ten')
+    autocomplete_fields = ('user',)
+    ordering = ('ma_nhan_vien',)
+    paginator = UocLuongPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        ids = KetQuaTimKiem(search_term)[:SO_KET_QUA_TIM_KIEM]
+        return queryset.filter(id__in=ids), False
+
+
+@admin.register(ChamCong)
+class ChamCongAdmin(BangLonAdmin):
+    list_display = ('nhan_vien', 'ngay', 'gio_vao', 'gio_ra')
+    list_select_related = ('nhan_vien',)
+    autocomplete_fields = ('nhan_vien',)
+    date_hierarchy = 'ngay'
+    # Lọc qua nhân viên: nhanvien.phong_ban_id rồi index (nhan_vien, ngay)
+    list_filter = ('nhan_vien__phong_ban',)
+    # Index chamcong_ngay_id_idx
+    ordering = ('-ngay', '-id')
+    sortable_by = ('ngay',)
+
+
+@admin.register(DonXinNghi)
+class DonXinNghiAdmin(BangLonAdmin):
+    list_display = ('nhan_vien', 'ngay_bat_dau', 'ngay_ket_thuc', 'trang_thai')
+    list_select_related = ('nhan_vien',)
+    autocomplete_fields = ('nhan_vien',)
+    date_hierarchy = 'ngay_bat_dau'
+    # Index donxinnghi_trang_thai_idx / donxinnghi_bat_dau_idx
+    list_filter = ('trang_thai',)
+    ordering = ('-ngay_bat_dau', '-id')
+    sortable_by = ('ngay_bat_dau', 'trang_thai')
+
+
+class ThangFilter(admin.SimpleListFilter):
+    title = 'Tháng'
+    parameter_name = 'thang'
+
+    def lookups(self, request, model_admin):
+        return [(str(thang), str(thang)) for thang in range(1, 13)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(thang=self.value())
+        return queryset
+
+
+class NamFilter(admin.SimpleListFilter):
+    """Các năm từ MIN(nam) tới MAX(nam) (hai lần tra index, không SELECT DISTINCT)."""
+    title = 'Năm'
+    parameter_name = 'nam'
+
+    def lookups(self, request, model_admin):
+        queryset = model_admin.model.objects.all()
+        dau = queryset.aggregate(gia_tri=Min('nam'))['gia_tri']
+        cuoi = queryset.aggregate(gia_tri=Max('nam'))['gia_tri']
+        if dau is None:
+            return []
+        return [(str(nam), str(nam)) for nam in range(cuoi, dau - 1, -1)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(nam=self.value())
+        return queryset
+
+
+@admin.register(Payslip)
+class PayslipAdmin(BangLonAdmin):
     readonly_fields = ('luong_thuc_nhan',)
-    
-   
-    list_display = ('nhan_vien', 'thang', 'nam', 'luong_co_ban', 'phu_cap', 'khau_tru', 'luong_thuc_nhan')
+    list_display = ('nhan_vien', 'thang', 'nam', 'luong_co_ban', 'phu_cap', 'khau_tru', 'tien_lam_them',
+                    'luong_thuc_nhan', 'can_tinh_lai')
+    list_select_related = ('nhan_vien',)
+    autocomplete_fields = ('nhan_vien',)
+    # Index payslip_nam_thang_idx; can_tinh_lai có index riêng (payslip_can_tinh_lai_idx)
+    list_filter = (NamFilter, ThangFilter, 'can_tinh_lai')
+    sortable_by = ('nam', 'thang')
+
+
+@admin.register(UserAccount)
+class UserAccountAdmin(admin.ModelAdmin):
+    list_display = ('user', 'employee', 'role')
+    list_select_related = ('user', 'employee')
+    autocomplete_fields = ('user', 'employee')
+    list_filter = ('role',)
+    search_fields = ('user__username',)
+    ordering = ('-id',)
+    paginator = UocLuongPaginator
+    show_full_result_count = False
+
+
+@admin.register(TacVu)
+class TacVuAdmin(admin.ModelAdmin):
+    list_display = ('id', 'loai', 'trang_thai', 'tien_do', 'so_lan_thu', 'nguoi_tao', 'tao_luc', 'ket_thuc_luc')
+    list_select_related = ('nguoi_tao',)
+    list_filter = ('trang_thai', 'loai')
+    raw_id_fields = ('nguoi_tao',)
+    readonly_fields = ('worker', 'bat_dau_luc', 'ket_thuc_luc', 'cap_nhat_luc')
+
 
 class UserAdmin(BaseUserAdmin):
-    
+
     inlines = [NhanVienInline]
 
 admin.site.unregister(User)
@@ -25,7 +253,4 @@ admin.site.register(User, UserAdmin)
 
 admin.site.register(PhongBan)
 admin.site.register(ChucVu)
-admin.site.register(ChamCong)
-admin.site.register(DonXinNghi)
-admin.site.register(UserAccount)
-admin.site.register(Payslip, PayslipAdmin)
\ No newline at end of file
+admin.site.register(NgayLe)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class NhanVienConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'nhan_vien'
+
+    def ready(self):
+        # Đăng ký các signal đồng bộ bảng dẫn xuất
+        from . import signals  # noqa: F401
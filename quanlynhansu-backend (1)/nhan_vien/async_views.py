@@ -0,0 +1,115 @@
+# Trong nhan_vien/async_views.py
+"""
+Check-in / check-out bất đồng bộ (ASGI) cho giờ cao điểm chấm công.
+
+- Không đi qua pipeline DRF (serializer, permission class...): nhân viên
+  được xác định từ claim nhan_vien_id trong JWT, không truy vấn DB. Bước
+  kiểm tra role_version đọc Django cache (FileBasedCache: đọc file) nên
+  chạy trong thread pool, không chặn event loop.
+- Mỗi lần chấm là MỘT câu lệnh ghi trên khóa (nhan_vien, ngay) bằng async ORM:
+    * check-in:  INSERT ... ON CONFLICT DO NOTHING (giữ giờ vào sớm nhất),
+      rồi đọc lại giờ vào đã lưu để trả về
+    * check-out: UPDATE gio_ra (lần check-out sau ghi đè lần trước)
+- Chạy dưới ASGI server (vd. `uvicorn quanlynhansu.asgi:application --workers 4`),
+  vài worker xử lý được đợt cao điểm thay vì cần thread pool lớn.
+- Lần chấm làm thay đổi dữ liệu tính lại dòng tổng hợp tháng của đúng một
+  khóa (nhan_vien, nam, thang) ngay trong request (attendance.cap_nhat_tong_hop,
+  qua sync_to_async): không có hàng đợi trong bộ nhớ nên chạy được cả dưới
+  WSGI (`runserver`) và không mất gì khi worker khởi động lại. Bước này và
+  async ORM đều chạy trên thread thread-sensitive, MỘT thread mỗi worker:
+  tăng thông lượng đợt 8:00 bằng số worker. Check-in lặp lại (đã có giờ vào)
+  không tính lại tổng hợp.
+"""
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import exceptions
+
+from .attendance import cap_nhat_tong_hop
+from .authentication import xac_thuc_token
+from .models import ChamCong
+
+
+def _loi(detail, status):
+    return JsonResponse({'detail': detail}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+async def _nhan_vien_hien_tai(request):
+    """(nhan_vien_id, None) hoặc (None, response lỗi)."""
+    try:
+        # Không dùng DB: không cần thread riêng của ORM (thread-sensitive)
+        user = await sync_to_async(xac_thuc_token, thread_sensitive=False)(request)
+    except exceptions.APIException as exc:
+        return None, JsonResponse(
+            exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail},
+            status=exc.status_code, json_dumps_params={'ensure_ascii': False},
+        )
+    if user.nhan_vien_id is None:
+        return None, _loi('Tài khoản chưa gắn với hồ sơ nhân viên.', 403)
+    return user.nhan_vien_id, None
+
+
+def _bay_gio():
+    bay_gio = timezone.localtime()
+    return bay_gio.date(), bay_gio.time().replace(microsecond=0, tzinfo=None)
+
+
+async def _cap_nhat_tong_hop(nhan_vien_id, ngay):
+    # Ghi bằng bulk/update không phát signal: tự cập nhật bảng tổng hợp tháng
+    await sync_to_async(cap_nhat_tong_hop)({(nhan_vien_id, ngay.year, ngay.month)})
+
+
+@csrf_exempt
+@require_POST
+async def check_in(request):
+    """
+    POST /api/chamcong/check-in/ — ghi giờ vào hôm nay (nếu chưa có).
+    Trả về giờ vào đã lưu (thoi_diem) và da_check_in: True nếu hôm nay đã
+    check-in từ trước (giờ vào giữ nguyên).
+    """
+    nhan_vien_id, loi = await _nhan_vien_hien_tai(request)
+    if loi:
+        return loi
+    ngay, gio = _bay_gio()
+    await ChamCong.objects.abulk_create(
+        [ChamCong(nhan_vien_id=nhan_vien_id, ngay=ngay, gio_vao=gio)],
+        ignore_conflicts=True,
+    )
+    gio_vao = await ChamCong.objects.filter(nhan_vien_id=nhan_vien_id, ngay=ngay).values_list(
+        'gio_vao', flat=True
+    ).aget()
+    # Khác giờ vừa ghi => dòng đã có từ trước (trùng đúng giây thì coi như vừa tạo)
+    da_check_in = gio_vao != gio
+    if not da_check_in:
+        await _cap_nhat_tong_hop(nhan_vien_id, ngay)
+    return JsonResponse({
+        'nhan_vien': nhan_vien_id, 'ngay': ngay.isoformat(), 'thoi_diem': gio_vao.isoformat(),
+        'da_check_in': da_check_in,
+    })
+
+
+@csrf_exempt
+@require_POST
+async def check_out(request):
+    """
+    POST /api/chamcong/check-out/ — ghi giờ ra cho ngày hôm nay; nếu hôm nay
+    chưa check-in thì đóng ca qua đêm của hôm qua (nếu còn mở).
+    """
+    nhan_vien_id, loi = await _nhan_vien_hien_tai(request)
+    if loi:
+        return loi
+    ngay, gio = _bay_gio()
+    so_dong = await ChamCong.objects.filter(nhan_vien_id=nhan_vien_id, ngay=ngay).aupdate(gio_ra=gio)
+    if not so_dong:
+        ngay -= timedelta(days=1)
+        so_dong = await ChamCong.objects.filter(
+            nhan_vien_id=nhan_vien_id, ngay=ngay, gio_ra__isnull=True
+        ).aupdate(gio_ra=gio)
+    if not so_dong:
+        return _loi('Chưa check-in hôm nay.', 409)
+    await _cap_nhat_tong_hop(nhan_vien_id, ngay)
+    return JsonResponse({'nhan_vien': nhan_vien_id, 'ngay': ngay.isoformat(), 'thoi_diem': gio.isoformat()})
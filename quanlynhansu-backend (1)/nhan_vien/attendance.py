@@ -0,0 +1,313 @@
+# Trong nhan_vien/attendance.py
+"""
+Tổng hợp chấm công theo tháng (bảng ChamCongThang).
+
+- Các chỉ số (số ngày công, tổng giờ, thiếu giờ ra, đi muộn) được tính
+  bằng annotate/aggregate phía database, không lặp trong Python.
+- Khi một ChamCong được tạo/sửa/xóa, chỉ dòng tổng hợp (nhan_vien, nam, thang)
+  bị ảnh hưởng được tính lại — một truy vấn trên index (nhan_vien, ngay).
+  Signal gom khóa của cả transaction và tính lại một lần khi commit
+  (signals._tinh_lai_khi_commit), nên xóa hàng loạt không tính theo từng dòng.
+- Đường ghi hàng loạt (bulk_create/bulk_update) không phát signal nên phải
+  gọi cap_nhat_tong_hop() với các khóa đã chạm tới.
+- cap_nhat_tong_hop() cũng đánh dấu các bảng lương của những khóa đó là cần
+  tính lại và đổi phiên bản cache của ChamCong (dashboard), nên mọi đường
+  ghi chấm công đều kéo theo dirty tracking.
+- rebuild_tong_hop() dựng lại toàn bộ (hoặc một tháng) cho việc backfill.
+
+Giờ làm / đi muộn / làm thêm (OT) của từng dòng là biểu thức SQL (annotate),
+cộng dồn theo tháng vào cùng bảng tổng hợp:
+- Thiếu giờ ra: 0 giờ làm, 0 giờ OT (chỉ được đếm ở so_lan_thieu_gio_ra).
+- Ca qua đêm (giờ ra < giờ vào): cộng 24 giờ, tính vào ngày của giờ vào.
+- Phần ca làm trùng giờ nghỉ trưa (GIO_NGHI_TRUA) không tính là giờ làm.
+- Ngày làm việc: OT là phần vượt SO_GIO_LAM_CHUAN_MOT_NGAY. Ngày nghỉ tuần
+  (trừ ngày làm bù) và ngày lễ: mọi giờ làm đều là OT.
+- Giờ OT quy đổi = giờ OT x hệ số (HE_SO_LAM_THEM, %) theo loại ngày — bảng
+  lương trả tiền OT theo số giờ này.
+- Ngày lễ/làm bù lấy từ lịch làm việc (workdays). Sửa NgayLe của tháng đã
+  tổng hợp thì cần rebuild_attendance_rollup cho tháng đó.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, Func, IntegerField, Max, Min, Q, Sum, Value, When
+from django.db.models.functions import (
+    ExtractHour, ExtractMinute, ExtractMonth, ExtractSecond, ExtractYear, Greatest, Least
+)
+
+from .caching import lam_moi_phien_ban
+from .models import ChamCong, ChamCongThang
+from .payroll import danh_dau_can_tinh_lai
+from .workdays import ngay_le_va_lam_bu
+
+CHUNK_SIZE = 1000
+GIAY_MOT_NGAY = 24 * 3600
+
+
+class SoGiay(Func):
+    """
+    Số giây từ 00:00 của một TimeField. Trên SQLite, Extract* gọi ngược hàm
+    Python cho từng dòng; unixepoch() (SQLite >= 3.38) tính ngay trong C.
+    """
+    arity = 1
+    output_field = IntegerField()
+    # unixepoch('HH:MM:SS') tính từ 2000-01-01 00:00:00
+    GOC_SQLITE = 946684800
+
+    def as_sql(self, compiler, connection, **extra_context):
+        field = self.get_source_expressions()[0]
+        bieu_thuc = ExtractHour(field) * Value(3600) + ExtractMinute(field) * Value(60) + ExtractSecond(field)
+        return compiler.compile(bieu_thuc.resolve_expression(compiler.query))
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        if connection.Database.sqlite_version_info < (3, 38):
+            return self.as_sql(compiler, connection, **extra_context)
+        return super().as_sql(
+            compiler, connection, template=f'(unixepoch(%(expressions)s) - {self.GOC_SQLITE})', **extra_context
+        )
+
+
+def so_giay(field):
+    """Biểu thức SQL: số giây từ 00:00 của một TimeField."""
+    return SoGiay(field)
+
+
+def _giay_cua(gio):
+    return gio.hour * 3600 + gio.minute * 60 + gio.second
+
+
+def giay_nghi_trua(vao, ra):
+    """
+    Biểu thức SQL: số giây của [vao, ra] trùng giờ nghỉ trưa (GIO_NGHI_TRUA).
+    `ra` có thể vượt 24 giờ (ca qua đêm) nên xét cả giờ nghỉ của ngày hôm sau.
+    """
+    if not settings.GIO_NGHI_TRUA:
+        return Value(0)
+    bat_dau, ket_thuc = (_giay_cua(gio) for gio in settings.GIO_NGHI_TRUA)
+    trung = [
+        Greatest(Least(ra, Value(ket_thuc + lech)) - Greatest(vao, Value(bat_dau + lech)), Value(0))
+        for lech in (0, GIAY_MOT_NGAY)
+    ]
+    return trung[0] + trung[1]
+
+
+def giay_lam_viec():
+    """
+    Biểu thức SQL: số giây làm việc của một dòng ChamCong.
+    - Thiếu giờ ra: 0 (được đếm riêng ở so_lan_thieu_gio_ra).
+    - Ca qua đêm (giờ ra < giờ vào): cộng thêm 24 giờ.
+    - Trừ phần trùng giờ nghỉ trưa.
+    """
+    vao = so_giay('gio_vao')
+    ra = Case(
+        When(gio_ra__lt=F('gio_vao'), then=so_giay('gio_ra') + Value(GIAY_MOT_NGAY)),
+        default=so_giay('gio_ra'),
+        output_field=IntegerField(),
+    )
+    return Case(
+        When(gio_ra__isnull=True, then=Value(0)),
+        default=ra - vao - giay_nghi_trua(vao, ra),
+        output_field=IntegerField(),
+    )
+
+
+def phut_di_muon():
+    """Biểu thức SQL: số phút vào muộn so với GIO_BAT_DAU_LAM (0 nếu đúng giờ)."""
+    bat_dau = settings.GIO_BAT_DAU_LAM
+    giay_bat_dau = _giay_cua(bat_dau)
+    return Case(
+        When(gio_vao__gt=bat_dau, then=(so_giay('gio_vao') - Value(giay_bat_dau)) / Value(60)),
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+
+
+def la_ngay_nghi(ngay_le=(), ngay_lam_bu=()):
+    """
+    Điều kiện: ngày của dòng là ngày lễ, hoặc ngày nghỉ tuần không phải ngày
+    làm bù. `ngay_le`/`ngay_lam_bu` lấy từ workdays.ngay_le_va_lam_bu().
+    """
+    # weekday() của Python: 0=Thứ 2..6=Chủ Nhật; lookup week_day: 1=Chủ Nhật..7=Thứ 7
+    nghi_tuan = [(thu + 1) % 7 + 1 for thu in settings.NGAY_NGHI_HANG_TUAN]
+    dieu_kien = Q(ngay__week_day__in=nghi_tuan)
+    if ngay_lam_bu:
+        dieu_kien &= ~Q(ngay__in=ngay_lam_bu)
+    if ngay_le:
+        dieu_kien |= Q(ngay__in=ngay_le)
+    return dieu_kien
+
+
+def he_so_lam_them(ngay_le=(), ngay_lam_bu=()):
+    """Biểu thức SQL: hệ số lương OT (%) theo loại ngày của dòng."""
+    he_so = settings.HE_SO_LAM_THEM
+    cac_truong_hop = []
+    if ngay_le:
+        cac_truong_hop.append(When(ngay__in=ngay_le, then=Value(he_so['ngay_le'])))
+    cac_truong_hop.append(When(la_ngay_nghi(ngay_lam_bu=ngay_lam_bu), then=Value(he_so['ngay_nghi'])))
+    return Case(*cac_truong_hop, default=Value(he_so['ngay_thuong']), output_field=IntegerField())
+
+
+def giay_lam_them(ngay_le=(), ngay_lam_bu=()):
+    """
+    Biểu thức SQL: số giây làm thêm của một dòng. Ngày nghỉ/lễ: toàn bộ giờ
+    làm; ngày làm việc: phần vượt SO_GIO_LAM_CHUAN_MOT_NGAY.
+    """
+    chuan = settings.SO_GIO_LAM_CHUAN_MOT_NGAY * 3600
+    return Case(
+        When(la_ngay_nghi(ngay_le, ngay_lam_bu), then=giay_lam_viec()),
+        default=Greatest(giay_lam_viec() - Value(chuan), Value(0)),
+        output_field=IntegerField(),
+    )
+
+
+def chi_so_dong(ngay_le=(), ngay_lam_bu=()):
+    """Các annotate theo từng dòng ChamCong (dùng cho API giờ làm)."""
+    return {
+        'giay_lam': giay_lam_viec(),
+        'giay_lam_them': giay_lam_them(ngay_le, ngay_lam_bu),
+        'he_so_lam_them': he_so_lam_them(ngay_le, ngay_lam_bu),
+        'phut_di_muon': phut_di_muon(),
+    }
+
+
+def chi_so_thang(ngay_le=(), ngay_lam_bu=()):
+    """
+    Các aggregate dùng cho một nhóm (nhan_vien, nam, thang). Giây OT được
+    cộng riêng theo loại ngày (Sum có filter) để mỗi dòng chỉ tính giờ làm
+    thêm một lần; nhân hệ số làm ở Python (_tao_dong_tong_hop).
+    """
+    chuan = settings.SO_GIO_LAM_CHUAN_MOT_NGAY * 3600
+    ngay_nghi = la_ngay_nghi(ngay_le, ngay_lam_bu)
+    co_gio_ra = Q(gio_ra__isnull=False)
+    chi_so = {
+        'so_ngay_cong': Count('id'),
+        'tong_giay': Sum(giay_lam_viec()),
+        'so_lan_thieu_gio_ra': Count('id', filter=Q(gio_ra__isnull=True)),
+        'so_lan_di_muon': Count('id', filter=Q(gio_vao__gt=settings.GIO_BAT_DAU_LAM)),
+        'tong_phut_di_muon': Sum(phut_di_muon(), filter=Q(gio_vao__gt=settings.GIO_BAT_DAU_LAM)),
+        'giay_lam_them_ngay_thuong': Sum(
+            Greatest(giay_lam_viec() - Value(chuan), Value(0)), filter=~ngay_nghi & co_gio_ra
+        ),
+    }
+    if ngay_le:
+        le = Q(ngay__in=ngay_le)
+        chi_so['giay_lam_them_ngay_nghi'] = Sum(giay_lam_viec(), filter=ngay_nghi & ~le & co_gio_ra)
+        chi_so['giay_lam_them_ngay_le'] = Sum(giay_lam_viec(), filter=le & co_gio_ra)
+    else:
+        chi_so['giay_lam_them_ngay_nghi'] = Sum(giay_lam_viec(), filter=ngay_nghi & co_gio_ra)
+    return chi_so
+
+
+def doi_ra_gio(so_giay_, he_so=1):
+    """Số giây (chia thêm `he_so`) -> số giờ Decimal, 2 chữ số thập phân."""
+    return (Decimal(so_giay_ or 0) / Decimal(3600 * he_so)).quantize(Decimal('0.01'))
+
+
+def _tao_dong_tong_hop(row):
+    he_so = settings.HE_SO_LAM_THEM
+    lam_them = {loai: row.get(f'giay_lam_them_{loai}') or 0 for loai in he_so}
+    return ChamCongThang(
+        nhan_vien_id=row['nhan_vien_id'],
+        nam=row['nam'],
+        thang=row['thang'],
+        so_ngay_cong=row['so_ngay_cong'],
+        tong_gio=doi_ra_gio(row['tong_giay']),
+        so_lan_thieu_gio_ra=row['so_lan_thieu_gio_ra'],
+        so_lan_di_muon=row['so_lan_di_muon'],
+        phut_di_muon=row['tong_phut_di_muon'] or 0,
+        gio_lam_them=doi_ra_gio(sum(lam_them.values())),
+        # giây x hệ số %, chia 100 khi đổi ra giờ
+        gio_lam_them_quy_doi=doi_ra_gio(sum(lam_them[loai] * he_so[loai] for loai in he_so), he_so=100),
+    )
+
+
+def _ghi_tong_hop(rows):
+    ChamCongThang.objects.bulk_create(
+        rows,
+        batch_size=CHUNK_SIZE,
+        update_conflicts=True,
+        unique_fields=['nhan_vien', 'nam', 'thang'],
+        update_fields=[
+            'so_ngay_cong', 'tong_gio', 'so_lan_thieu_gio_ra', 'so_lan_di_muon',
+            'phut_di_muon', 'gio_lam_them', 'gio_lam_them_quy_doi', 'cap_nhat_luc',
+        ],
+    )
+
+
+def _tong_hop_theo_thang(queryset, ngay_le=(), ngay_lam_bu=()):
+    """GROUP BY (nhan_vien, nam, thang) trên queryset ChamCong."""
+    return (
+        queryset.order_by()
+        .annotate(nam=ExtractYear('ngay'), thang=ExtractMonth('ngay'))
+        .values('nhan_vien_id', 'nam', 'thang')
+        .annotate(**chi_so_thang(ngay_le, ngay_lam_bu))
+    )
+
+
+def khoang_thang(nam, thang):
+    return date(nam, thang, 1), date(nam, thang, calendar.monthrange(nam, thang)[1])
+
+
+def cap_nhat_tong_hop(keys):
+    """
+    Tính lại các dòng tổng hợp cho tập khóa (nhan_vien_id, nam, thang).
+    Mỗi tháng một truy vấn GROUP BY (theo chunk nhân viên).
+    """
+    theo_thang = defaultdict(set)
+    for nhan_vien_id, nam, thang in keys:
+        theo_thang[(nam, thang)].add(nhan_vien_id)
+
+    with transaction.atomic():
+        for (nam, thang), nhan_vien_ids in theo_thang.items():
+            nhan_vien_ids = sorted(nhan_vien_ids)
+            ngay_le, ngay_lam_bu = ngay_le_va_lam_bu(*khoang_thang(nam, thang))
+            for start in range(0, len(nhan_vien_ids), CHUNK_SIZE):
+                chunk = nhan_vien_ids[start:start + CHUNK_SIZE]
+                rows = list(_tong_hop_theo_thang(
+                    ChamCong.objects.filter(nhan_vien_id__in=chunk, ngay__range=khoang_thang(nam, thang)),
+                    ngay_le, ngay_lam_bu,
+                ))
+                _ghi_tong_hop([_tao_dong_tong_hop(row) for row in rows])
+                # Nhân viên không còn dòng chấm công nào trong tháng
+                con_lai = {row['nhan_vien_id'] for row in rows}
+                trong = [nv for nv in chunk if nv not in con_lai]
+                if trong:
+                    ChamCongThang.objects.filter(nam=nam, thang=thang, nhan_vien_id__in=trong).delete()
+        danh_dau_can_tinh_lai(keys)
+    lam_moi_phien_ban(ChamCong)
+
+
+def rebuild_tong_hop(nam=None, thang=None):
+    """
+    Dựng lại bảng tổng hợp từ dữ liệu chấm công gốc (backfill).
+    Trả về số dòng tổng hợp đã ghi.
+    """
+    queryset = ChamCong.objects.all()
+    cu = ChamCongThang.objects.all()
+    if nam is not None and thang is not None:
+        queryset = queryset.filter(ngay__range=khoang_thang(nam, thang))
+        cu = cu.filter(nam=nam, thang=thang)
+    elif nam is not None:
+        queryset = queryset.filter(ngay__range=(date(nam, 1, 1), date(nam, 12, 31)))
+        cu = cu.filter(nam=nam)
+
+    khoang = queryset.aggregate(tu=Min('ngay'), den=Max('ngay'))
+    ngay_le, ngay_lam_bu = ngay_le_va_lam_bu(khoang['tu'], khoang['den']) if khoang['tu'] else ((), ())
+
+    so_dong = 0
+    with transaction.atomic():
+        cu.delete()
+        batch = []
+        for row in _tong_hop_theo_thang(queryset, ngay_le, ngay_lam_bu).iterator(chunk_size=CHUNK_SIZE):
+            batch.append(_tao_dong_tong_hop(row))
+            if len(batch) >= CHUNK_SIZE:
+                _ghi_tong_hop(batch)
+                so_dong += len(batch)
+                batch = []
+        _ghi_tong_hop(batch)
+        so_dong += len(batch)
+    return so_dong
@@ -0,0 +1,115 @@
+# Trong nhan_vien/authentication.py
+"""
+Xác thực JWT không truy vấn DB.
+
+- Khi đăng nhập / refresh, vai trò (role), id hồ sơ NhanVien và role_version
+  được nhúng vào token dưới dạng claim.
+- Mỗi request chỉ cần giải mã token: không tải User, không tra UserAccount.
+- Khi UserAccount.role thay đổi, role_version tăng và được ghi vào cache.
+  Access token mang role_version cũ sẽ bị từ chối (401) để client refresh và
+  nhận claim mới.
+"""
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer, TokenRefreshSerializer
+)
+from rest_framework_simplejwt.settings import api_settings
+
+ROLE_MAC_DINH = 'Employee'
+ROLE_VERSION_CACHE_KEY = 'role_version:{user_id}'
+# Giữ mốc phiên bản lâu hơn vòng đời refresh token
+ROLE_VERSION_CACHE_TIMEOUT = 60 * 60 * 24 * 2
+
+
+def danh_dau_role_version(user_id, role_version):
+    """Ghi role_version mới nhất của user vào cache (gọi từ UserAccount.save)."""
+    cache.set(ROLE_VERSION_CACHE_KEY.format(user_id=user_id), role_version, ROLE_VERSION_CACHE_TIMEOUT)
+
+
+def doc_claim_vai_tro(user_id):
+    """Đọc role, nhan_vien_id, role_version của user từ DB (chỉ khi cấp token)."""
+    from .models import NhanVien, UserAccount
+
+    try:
+        user_account = UserAccount.objects.get(user_id=user_id)
+        role, role_version = user_account.role, user_account.role_version
+    except UserAccount.DoesNotExist:
+        role, role_version = ROLE_MAC_DINH, 0
+    nhan_vien_id = NhanVien.objects.filter(user_id=user_id).values_list('id', flat=True).first()
+    return {'role': role, 'nhan_vien_id': nhan_vien_id, 'role_version': role_version}
+
+
+def gan_claim_vai_tro(token, user_id):
+    for claim, value in doc_claim_vai_tro(user_id).items():
+        token[claim] = value
+    return token
+
+
+class HRTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Cấp cặp token kèm claim vai trò."""
+
+    @classmethod
+    def get_token(cls, user):
+        return gan_claim_vai_tro(super().get_token(user), user.pk)
+
+
+class HRTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh: đọc lại vai trò từ DB (một lần mỗi vòng đời access token) để
+    access token mới luôn mang claim hiện hành.
+    """
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = self.token_class(attrs['refresh'])
+        access = gan_claim_vai_tro(refresh.access_token, refresh.payload.get(api_settings.USER_ID_CLAIM))
+        data['access'] = str(access)
+        return data
+
+
+class HRTokenUser(TokenUser):
+    """TokenUser có thêm các claim vai trò."""
+
+    @property
+    def role(self):
+        return self.token.get('role', ROLE_MAC_DINH)
+
+    @property
+    def nhan_vien_id(self):
+        return self.token.get('nhan_vien_id')
+
+    @property
+    def role_version(self):
+        return self.token.get('role_version', 0)
+
+
+class HRJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Xác thực bằng access token mà không tải User từ DB.
+    Từ chối token có role_version cũ hơn phiên bản trong cache.
+    """
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        version_moi = cache.get(ROLE_VERSION_CACHE_KEY.format(user_id=user.id))
+        if version_moi is not None and user.role_version < version_moi:
+            raise InvalidToken(_("Vai trò của tài khoản đã thay đổi. Vui lòng làm mới token."))
+        return user
+
+
+def xac_thuc_token(request):
+    """
+    Xác thực access token của một HttpRequest thường (view async không đi qua
+    DRF). Trả về HRTokenUser, không truy vấn DB.
+    Lỗi: NotAuthenticated / InvalidToken / AuthenticationFailed (đều có
+    .detail và .status_code như exception của DRF).
+    """
+    ket_qua = HRJWTAuthentication().authenticate(request)
+    if ket_qua is None:
+        raise NotAuthenticated()
+    return ket_qua[0]
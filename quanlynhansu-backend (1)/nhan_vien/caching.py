@@ -0,0 +1,142 @@
+# Trong nhan_vien/caching.py
+"""
+Cache cho các bảng tra cứu ít thay đổi (PhongBan, ChucVu, ...).
+
+- Mỗi model đăng ký có một "phiên bản" lưu trong Django cache. Signal
+  post_save/post_delete đổi phiên bản => mọi dữ liệu cache cũ tự hết hiệu lực.
+  Phiên bản chỉ đổi khi transaction commit: đổi sớm hơn thì một GET đồng thời
+  (đọc replica, chưa thấy dữ liệu mới) sẽ cache dữ liệu cũ dưới phiên bản mới.
+- Danh sách đã serialize được cache theo (phiên bản, query string).
+- Response mang ETag mạnh dựa trên phiên bản; client gửi If-None-Match khớp
+  sẽ nhận 304 Not Modified, không chạm DB và không có body.
+
+Dùng cho model khác: gọi theo_doi_thay_doi(Model) trong signals.py và thêm
+CachedListMixin vào ViewSet.
+"""
+import hashlib
+import threading
+import uuid
+import weakref
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework import status
+from rest_framework.response import Response
+
+VERSION_KEY = 'lookup_version:{label}'
+DATA_KEY = 'lookup_data:{label}:{version}:{query}'
+# Dữ liệu cache tự hết hạn sau 1 ngày kể cả khi không có thay đổi
+DATA_TIMEOUT = 60 * 60 * 24
+
+# Callback on_commit đang chờ, theo (loại, alias, savepoint) — xem callback_khi_commit()
+_cho_commit = threading.local()
+
+
+def _label(model):
+    return model._meta.label_lower
+
+
+def phien_ban(model):
+    """Phiên bản hiện tại của dữ liệu model (tạo mới nếu cache chưa có)."""
+    key = VERSION_KEY.format(label=_label(model))
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        # add(): nếu tiến trình khác vừa đặt phiên bản thì dùng phiên bản đó
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+class _DoiPhienBanKhiCommit:
+    """Callback on_commit: đổi phiên bản một lần cho mọi model gom được."""
+
+    def __init__(self):
+        self.labels = set()
+        self.da_chay = False
+
+    def __call__(self):
+        self.da_chay = True
+        for label in self.labels:
+            cache.set(VERSION_KEY.format(label=label), uuid.uuid4().hex, timeout=None)
+
+
+def callback_khi_commit(loai, using=None):
+    """
+    Callback on_commit kiểu `loai` (có thuộc tính da_chay) đang chờ của
+    savepoint hiện tại trên `using`; chưa có thì tạo và đăng ký bằng
+    transaction.on_commit. Chỉ gọi trong atomic block. Các lần gọi trong cùng
+    savepoint dùng chung một callback: rollback savepoint bỏ đúng phần của nó.
+
+    Chỉ giữ weakref tới callback: Django bỏ callback khi rollback nên nó bị thu
+    hồi và không bị dùng lại ở transaction sau (tên savepoint được dùng lại).
+    """
+    connection = transaction.get_connection(using)
+    dang_cho = getattr(_cho_commit, 'callbacks', None)
+    if dang_cho is None:
+        dang_cho = _cho_commit.callbacks = weakref.WeakValueDictionary()
+    khoa = (loai, connection.alias, tuple(connection.savepoint_ids))
+    callback = dang_cho.get(khoa)
+    if callback is None or callback.da_chay:
+        callback = dang_cho[khoa] = loai()
+        transaction.on_commit(callback, using=using)
+    return callback
+
+
+def lam_moi_phien_ban(model, using=None):
+    """
+    Đổi phiên bản của `model` khi transaction hiện tại (trên `using`) commit;
+    ngoài transaction thì đổi ngay. Nhiều lần gọi trong cùng một transaction
+    chỉ đổi một lần.
+    """
+    if transaction.get_connection(using).in_atomic_block:
+        callback_khi_commit(_DoiPhienBanKhiCommit, using).labels.add(_label(model))
+        return
+    callback = _DoiPhienBanKhiCommit()
+    callback.labels.add(_label(model))
+    callback()
+
+
+def _on_change(sender, using=None, **kwargs):
+    lam_moi_phien_ban(sender, using=using)
+
+
+def theo_doi_thay_doi(model):
+    """Đổi phiên bản cache của `model` mỗi khi có bản ghi được lưu/xóa."""
+    uid = f'lookup_cache:{_label(model)}'
+    post_save.connect(_on_change, sender=model, dispatch_uid=uid + ':save')
+    post_delete.connect(_on_change, sender=model, dispatch_uid=uid + ':delete')
+
+
+def _etag_khop(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(','))
+
+
+class CachedListMixin:
+    """
+    Mixin cho ViewSet: action `list` được phục vụ từ cache và hỗ trợ
+    conditional GET bằng ETag.
+    """
+
+    def list(self, request, *args, **kwargs):
+        model = self.get_queryset().model
+        version = phien_ban(model)
+        query = request.META.get('QUERY_STRING', '')
+        query_hash = hashlib.sha1(query.encode()).hexdigest()[:16]
+        etag = f'"{_label(model)}-{version}-{query_hash}"'
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+
+        if _etag_khop(request.headers.get('If-None-Match'), etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        key = DATA_KEY.format(label=_label(model), version=version, query=query_hash)
+        data = cache.get(key)
+        if data is None:
+            data = super().list(request, *args, **kwargs).data
+            cache.set(key, data, DATA_TIMEOUT)
+        return Response(data, headers=headers)
@@ -0,0 +1,132 @@
+# Trong nhan_vien/dashboard.py
+"""
+Số liệu tổng quan cho trang chủ (GET /api/dashboard/), thay cho việc
+frontend tải toàn bộ danh sách nhân viên, đơn nghỉ... chỉ để đếm.
+
+- Mỗi nhóm số liệu là MỘT truy vấn GROUP BY / aggregate (7 truy vấn tất cả),
+  không nạp dòng dữ liệu nào lên Python.
+- Kết quả được cache DASHBOARD_CACHE_TIMEOUT giây, khóa theo ngày và theo
+  phiên bản cache (caching.phien_ban) của các bảng nguồn: mọi lần ghi qua
+  signal hoặc qua đường ghi hàng loạt (đã tự đổi phiên bản) làm cache cũ
+  hết hiệu lực ngay; TTL chỉ là lưới an toàn.
+"""
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.utils import timezone
+
+from .caching import phien_ban
+from .models import ChamCong, ChamCongThang, ChucVu, DonXinNghi, NhanVien, Payslip, PhongBan
+from .workdays import la_ngay_lam_viec, so_ngay_cong_chuan
+
+DATA_KEY = 'dashboard:{ngay}:{phien_ban}'
+# Bảng nguồn: đổi phiên bản của bất kỳ bảng nào => tính lại
+MODEL_NGUON = (NhanVien, PhongBan, ChucVu, ChamCong, DonXinNghi, Payslip)
+
+
+def _tien(value):
+    return str(Decimal(value or 0).quantize(Decimal('0.01')))
+
+
+def _theo_nhom(queryset, ten_truong):
+    """[{id, ten, so_nhan_vien}] cho mọi phòng ban / chức vụ, kể cả nhóm chưa có ai."""
+    return [
+        {'id': pk, ten_truong: ten, 'so_nhan_vien': so_nhan_vien}
+        for pk, ten, so_nhan_vien in
+        queryset.annotate(so_nhan_vien=Count('nhanvien')).order_by(ten_truong)
+        .values_list('id', ten_truong, 'so_nhan_vien')
+    ]
+
+
+def _nhan_su():
+    tong = NhanVien.objects.aggregate(
+        so_nhan_vien=Count('id'),
+        chua_co_phong_ban=Count('id', filter=Q(phong_ban__isnull=True)),
+        chua_co_chuc_vu=Count('id', filter=Q(chuc_vu__isnull=True)),
+    )
+    return {
+        **tong,
+        'theo_phong_ban': _theo_nhom(PhongBan.objects.all(), 'ten_phong_ban'),
+        'theo_chuc_vu': _theo_nhom(ChucVu.objects.all(), 'ten_chuc_vu'),
+    }
+
+
+def _cham_cong(hom_nay, so_nhan_vien):
+    tong = ChamCong.objects.filter(ngay=hom_nay).aggregate(
+        da_cham_cong=Count('id'),
+        di_muon=Count('id', filter=Q(gio_vao__gt=settings.GIO_BAT_DAU_LAM)),
+        chua_check_out=Count('id', filter=Q(gio_ra__isnull=True)),
+    )
+    ty_le = round(tong['da_cham_cong'] * 100 / so_nhan_vien, 2) if so_nhan_vien else 0
+    return {'ngay': hom_nay, 'la_ngay_lam_viec': la_ngay_lam_viec(hom_nay), **tong, 'ty_le': ty_le}
+
+
+def _nghi_phep(hom_nay):
+    return DonXinNghi.objects.aggregate(
+        cho_duyet=Count('id', filter=Q(trang_thai='pending')),
+        dang_nghi=Count('nhan_vien', distinct=True, filter=Q(
+            trang_thai='approved', ngay_bat_dau__lte=hom_nay, ngay_ket_thuc__gte=hom_nay,
+        )),
+    )
+
+
+def _bang_luong(hom_nay):
+    """
+    Lương tháng hiện tại: tổng các bảng lương đã chạy (nếu có) và số tạm tính
+    tới hôm nay từ bảng tổng hợp chấm công (lương theo công + tiền làm thêm,
+    chưa gồm phụ cấp/khấu trừ).
+    """
+    nam, thang = hom_nay.year, hom_nay.month
+    da_chay = Payslip.objects.filter(nam=nam, thang=thang).aggregate(
+        so_bang_luong=Count('id'), tong_thuc_nhan=Sum('luong_thuc_nhan'),
+    )
+    tien = DecimalField(max_digits=20, decimal_places=2)
+    luong = F('nhan_vien__chuc_vu__luong_co_ban')
+    tam_tinh = ChamCongThang.objects.filter(nam=nam, thang=thang).aggregate(
+        ngay_cong=Sum(ExpressionWrapper(luong * F('so_ngay_cong'), output_field=tien)),
+        gio_lam_them=Sum(ExpressionWrapper(luong * F('gio_lam_them_quy_doi'), output_field=tien)),
+    )
+    cong_chuan = so_ngay_cong_chuan(nam, thang)
+    luong_tam_tinh = Decimal(0)
+    if cong_chuan:
+        # Cùng công thức với payroll.tinh_luong / tinh_tien_lam_them, cộng gộp
+        luong_tam_tinh = (
+            Decimal(tam_tinh['ngay_cong'] or 0) / cong_chuan
+            + Decimal(tam_tinh['gio_lam_them'] or 0) / (cong_chuan * settings.SO_GIO_LAM_CHUAN_MOT_NGAY)
+        )
+    return {
+        'thang': thang,
+        'nam': nam,
+        'so_bang_luong': da_chay['so_bang_luong'],
+        'tong_thuc_nhan': _tien(da_chay['tong_thuc_nhan']),
+        'tam_tinh_den_hom_nay': _tien(luong_tam_tinh),
+    }
+
+
+def tinh_dashboard(hom_nay=None):
+    """Tính toàn bộ số liệu (không cache)."""
+    hom_nay = hom_nay or timezone.localdate()
+    nhan_su = _nhan_su()
+    return {
+        'nhan_su': nhan_su,
+        'cham_cong_hom_nay': _cham_cong(hom_nay, nhan_su['so_nhan_vien']),
+        'nghi_phep': _nghi_phep(hom_nay),
+        'bang_luong': _bang_luong(hom_nay),
+    }
+
+
+def lay_dashboard(hom_nay=None):
+    """Số liệu dashboard, đọc từ cache nếu các bảng nguồn chưa đổi."""
+    hom_nay = hom_nay or timezone.localdate()
+    version = hashlib.sha1(
+        '|'.join(phien_ban(model) for model in MODEL_NGUON).encode()
+    ).hexdigest()[:16]
+    key = DATA_KEY.format(ngay=hom_nay.isoformat(), phien_ban=version)
+    data = cache.get(key)
+    if data is None:
+        data = tinh_dashboard(hom_nay)
+        cache.set(key, data, settings.DASHBOARD_CACHE_TIMEOUT)
+    return data
@@ -0,0 +1,79 @@
+# Trong nhan_vien/db_router.py
+"""
+Định tuyến đọc/ghi giữa hai kết nối SQLite (xem DATABASES trong settings):
+
+- Mọi thao tác ghi đi vào 'default'.
+- Thao tác đọc trong request an toàn (GET/HEAD/OPTIONS) đi vào 'replica'
+  (kết nối chỉ đọc tới cùng file, chế độ WAL): báo cáo đọc lâu không chặn
+  chấm công ghi vào, và ngược lại.
+- Các trường hợp còn lại (request ghi, management command, đang trong
+  transaction của 'default') đọc từ 'default' để luôn thấy dữ liệu vừa ghi.
+- Response dạng luồng (xuất CSV/XLSX) đọc dữ liệu sau khi middleware đã
+  trả về, nên phải chốt kết nối trước bằng queryset.using(queryset.db)
+  (xem export.du_lieu_xuat).
+- Khi 'replica' là test mirror của 'default' (cùng NAME) thì đọc thẳng từ
+  'default': database test chạy trong transaction chưa commit.
+"""
+import contextvars
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db import connections
+
+REPLICA = 'replica'
+PHUONG_THUC_AN_TOAN = ('GET', 'HEAD', 'OPTIONS')
+
+_doc_tu_replica = contextvars.ContextVar('doc_tu_replica', default=False)
+
+
+def _replica_kha_dung():
+    if REPLICA not in connections.settings:
+        return False
+    return connections[REPLICA].settings_dict['NAME'] != connections['default'].settings_dict['NAME']
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            _doc_tu_replica.get()
+            and not connections['default'].in_atomic_block
+            and _replica_kha_dung()
+        ):
+            return REPLICA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Hai kết nối trỏ tới cùng một database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
+
+
+class ReadReplicaMiddleware:
+    """Đánh dấu request an toàn để router đọc từ 'replica' (hỗ trợ cả sync và async)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _doc_tu_replica.set(request.method in PHUONG_THUC_AN_TOAN)
+        try:
+            return self.get_response(request)
+        finally:
+            _doc_tu_replica.reset(token)
+
+    async def __acall__(self, request):
+        token = _doc_tu_replica.set(request.method in PHUONG_THUC_AN_TOAN)
+        try:
+            return await self.get_response(request)
+        finally:
+            _doc_tu_replica.reset(token)
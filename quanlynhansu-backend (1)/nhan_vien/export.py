@@ -0,0 +1,250 @@
+# Trong nhan_vien/export.py
+"""
+Xuất dữ liệu dạng luồng (streaming) ra CSV / XLSX.
+
+Các hàm ở đây nhận một iterator các tuple (thường là
+`queryset.values_list(...).iterator(chunk_size=...)`) và sinh ra từng khối
+bytes cho StreamingHttpResponse: bộ nhớ không tăng theo số dòng và byte đầu
+tiên được gửi ngay lập tức.
+
+XLSX được ghi trực tiếp bằng zipfile ở chế độ không seek được
+(không cần thư viện ngoài), sheet chỉ dùng inline string.
+
+Cùng các khối đó cũng được ghi ra file (ghi_tep) cho tác vụ xuất chạy nền.
+"""
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime, time
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.response import Response
+
+CHUNK_SIZE = 2000
+# Số dòng gom lại trước khi đẩy một khối ra socket
+ROWS_PER_FLUSH = 500
+
+CSV_CONTENT_TYPE = 'text/csv; charset=utf-8'
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# (tiêu đề cột, trường values_list) của các file xuất
+COT_CHAM_CONG = (
+    ('ID', 'id'), ('Mã NV', 'nhan_vien__ma_nhan_vien'), ('Họ tên', 'nhan_vien__ho_ten'),
+    ('Phòng ban', 'nhan_vien__phong_ban__ten_phong_ban'), ('Chức vụ', 'nhan_vien__chuc_vu__ten_chuc_vu'),
+    ('Ngày', 'ngay'), ('Giờ vào', 'gio_vao'), ('Giờ ra', 'gio_ra'),
+)
+COT_BANG_LUONG = (
+    ('ID', 'id'), ('Mã NV', 'nhan_vien__ma_nhan_vien'), ('Họ tên', 'nhan_vien__ho_ten'),
+    ('Phòng ban', 'nhan_vien__phong_ban__ten_phong_ban'), ('Chức vụ', 'nhan_vien__chuc_vu__ten_chuc_vu'),
+    ('Tháng', 'thang'), ('Năm', 'nam'), ('Lương cơ bản', 'luong_co_ban'), ('Phụ cấp', 'phu_cap'),
+    ('Khấu trừ', 'khau_tru'), ('Tiền làm thêm', 'tien_lam_them'), ('Lương thực nhận', 'luong_thuc_nhan'),
+)
+
+
+def du_lieu_xuat(queryset, cot):
+    """(header, iterator các dòng) của `queryset` theo định nghĩa cột `cot`."""
+    header = [tieu_de for tieu_de, _ in cot]
+    # Chốt kết nối ngay bây giờ: StreamingHttpResponse chỉ đọc dữ liệu sau khi
+    # ReadReplicaMiddleware đã trả về (lúc đó router không còn chọn 'replica')
+    queryset = queryset.using(queryset.db)
+    rows = queryset.values_list(*(truong for _, truong in cot)).iterator(chunk_size=CHUNK_SIZE)
+    return header, rows
+
+
+class CSVExportRenderer(BaseRenderer):
+    """
+    Renderer chỉ để DRF chấp nhận ?format=csv (response thực tế là
+    StreamingHttpResponse nên renderer không được gọi; lỗi thì
+    LoiJSONMixin chuyển sang JSON).
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class XLSXExportRenderer(BaseRenderer):
+    media_type = XLSX_CONTENT_TYPE
+    format = 'xlsx'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+class LoiJSONMixin:
+    """
+    Mixin cho ViewSet có action xuất file: response lỗi của action đó
+    (400/403/404...) vẫn được render bằng JSON, không qua renderer CSV/XLSX.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, Response) and isinstance(
+            response.accepted_renderer, (CSVExportRenderer, XLSXExportRenderer)
+        ):
+            response.accepted_renderer = JSONRenderer()
+            response.accepted_media_type = JSONRenderer.media_type
+        return response
+
+
+def _gia_tri_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return value
+
+
+# ===============================================
+# CSV
+# ===============================================
+
+class _Echo:
+    """Pseudo-buffer: csv.writer ghi vào, ta lấy lại ngay giá trị vừa ghi."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(_Echo())
+    # BOM để Excel đọc đúng tiếng Việt (UTF-8)
+    yield '\ufeff' + writer.writerow(header)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([_gia_tri_text(v) for v in row]))
+        if len(buffer) >= ROWS_PER_FLUSH:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+# ===============================================
+# XLSX
+# ===============================================
+
+# Ký tự điều khiển không hợp lệ trong XML 1.0
+_KY_TU_CAM = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{ten_sheet}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+
+
+class _ZipStream(io.RawIOBase):
+    """File-like không seek được: zipfile ghi vào, generator lấy ra từng khối."""
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def lay_ra(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _o_xlsx(value):
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    text = _KY_TU_CAM.sub('', str(_gia_tri_text(value)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _dong_xlsx(row):
+    return '<row>' + ''.join(_o_xlsx(v) for v in row) + '</row>'
+
+
+def stream_xlsx(header, rows, ten_sheet='Sheet1'):
+    output = _ZipStream()
+    with zipfile.ZipFile(output, mode='w', compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        zf.writestr('_rels/.rels', _ROOT_RELS)
+        zf.writestr('xl/workbook.xml', _WORKBOOK.format(ten_sheet=escape(ten_sheet[:31])))
+        zf.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield output.lay_ra()
+
+        with zf.open('xl/worksheets/sheet1.xml', mode='w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _dong_xlsx(header)
+            ).encode())
+            buffer = []
+            for row in rows:
+                buffer.append(_dong_xlsx(row))
+                if len(buffer) >= ROWS_PER_FLUSH:
+                    sheet.write(''.join(buffer).encode())
+                    buffer = []
+                    yield output.lay_ra()
+            sheet.write((''.join(buffer) + '</sheetData></worksheet>').encode())
+        yield output.lay_ra()
+    yield output.lay_ra()
+
+
+def ghi_tep(header, rows, dinh_dang, tep):
+    """Ghi CSV/XLSX vào file nhị phân `tep` đang mở (cùng định dạng với bản streaming)."""
+    if dinh_dang == 'xlsx':
+        for khoi in stream_xlsx(header, rows):
+            tep.write(khoi)
+    else:
+        for khoi in stream_csv(header, rows):
+            tep.write(khoi.encode('utf-8'))
+
+
+def streaming_export_response(header, rows, ten_file, dinh_dang):
+    """StreamingHttpResponse cho CSV hoặc XLSX."""
+    if dinh_dang == 'xlsx':
+        response = StreamingHttpResponse(stream_xlsx(header, rows), content_type=XLSX_CONTENT_TYPE)
+    else:
+        dinh_dang = 'csv'
+        response = StreamingHttpResponse(stream_csv(header, rows), content_type=CSV_CONTENT_TYPE)
+    response['Content-Disposition'] = f'attachment; filename="{ten_file}.{dinh_dang}"'
+    # Không cho proxy gom cả response lại rồi mới gửi
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,233 @@
+# Trong nhan_vien/fieldsets.py
+"""
+Chọn trường (sparse fieldsets) và mở rộng quan hệ theo yêu cầu cho các API đọc:
+
+    GET /api/chamcong/?fields=id,ngay,gio_vao
+    GET /api/donxinnghi/?fields=id,trang_thai&expand=nhan_vien
+
+- ?fields=a,b,c: chỉ trả về các trường này (tên trường cấp ngoài cùng).
+- ?expand=x: thay khóa ngoại `x` (mặc định là id) bằng object tóm tắt,
+  khai báo trong Meta.expandable_fields của serializer. Trường được mở rộng
+  luôn có trong kết quả, kể cả khi không liệt kê trong ?fields=.
+- Truy vấn co lại theo các trường được chọn: `.only()` đúng các cột cần
+  và chỉ `select_related` những quan hệ thực sự được hiển thị.
+- Danh sách không phân trang mà mọi trường được chọn đều là cột đơn (số,
+  chuỗi, ngày, id khóa ngoại...) được dựng thẳng từ `.values_list()`,
+  không khởi tạo model (phần tốn nhất khi trả vài cột của 100k dòng).
+- Chỉ các action trong ACTION_DOC nhận hai tham số này; action khác
+  (ghi, thống kê...) trả 400 thay vì lặng lẽ bỏ qua.
+- Không có hai tham số này thì API giữ nguyên định dạng và truy vấn cũ.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .profiling import do_serializer
+
+PARAM_FIELDS = 'fields'
+PARAM_EXPAND = 'expand'
+# Chỉ các action đọc dùng serializer mặc định mới nhận ?fields= / ?expand=
+ACTION_DOC = ('list', 'retrieve', 'search')
+
+
+def _doc_danh_sach(request, param):
+    value = request.query_params.get(param)
+    if value is None:
+        return None
+    return tuple(dict.fromkeys(ten.strip() for ten in value.split(',') if ten.strip()))
+
+
+class FieldsetSerializerMixin:
+    """
+    Mixin cho ModelSerializer: nhận thêm `fields` (tên trường được giữ) và
+    `expand` (tên quan hệ được mở rộng). Khai báo trong Meta:
+    - expandable_fields = {'ten': SerializerClass}
+    - field_sources = {'ten': ('cot', ...)} cho SerializerMethodField, để
+      biết cột nào cần nạp khi co truy vấn.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._chon_truong = kwargs.pop('fields', None)
+        self._mo_rong = kwargs.pop('expand', None) or ()
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+        for ten in self._mo_rong:
+            fields[ten] = expandable[ten](read_only=True)
+        if self._chon_truong is not None:
+            giu = set(self._chon_truong) | set(self._mo_rong)
+            fields = {ten: field for ten, field in fields.items() if ten in giu}
+        return fields
+
+
+def ke_hoach_truy_van(serializer, model):
+    """
+    (cột cho .only(), quan hệ cho .select_related()) đủ để render `serializer`
+    trên `model`; None nếu có trường không suy ra được (giữ truy vấn gốc).
+    """
+    cot, quan_he = [], set()
+    nguon_phu = getattr(getattr(serializer, 'Meta', None), 'field_sources', {})
+    for ten, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*':
+            if ten not in nguon_phu:
+                return None
+            cot.extend(nguon_phu[ten])
+            continue
+        attrs = field.source_attrs
+        try:
+            model_field = model._meta.get_field(attrs[0])
+        except FieldDoesNotExist:
+            return None
+        if not model_field.is_relation:
+            if len(attrs) > 1:
+                return None
+            cot.append(attrs[0])
+            continue
+        if not model_field.concrete or not (model_field.many_to_one or model_field.one_to_one):
+            return None
+        goc = attrs[0]
+        cot.append(goc)
+        if len(attrs) == 1 and isinstance(field, serializers.PrimaryKeyRelatedField):
+            # Chỉ cần cột khóa ngoại, không JOIN
+            continue
+        quan_he.add(goc)
+        if len(attrs) == 2:
+            cot.append(f'{goc}__{attrs[1]}')
+        elif len(attrs) == 1 and isinstance(field, serializers.BaseSerializer):
+            con = ke_hoach_truy_van(field, model_field.related_model)
+            if con is not None:
+                cot.extend(f'{goc}__{c}' for c in con[0])
+                quan_he.update(f'{goc}__{r}' for r in con[1])
+        elif len(attrs) > 2:
+            return None
+        # Còn lại (StringRelatedField...): nạp cả dòng quan hệ
+    return cot, quan_he
+
+
+def _cot_don(serializer, model):
+    """
+    [(tên trường, cột, hàm định dạng)] nếu mọi trường của `serializer` đọc
+    thẳng được từ một cột của `model`; None nếu không.
+    """
+    ket_qua = []
+    for ten, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if (field.source == '*' or len(field.source_attrs) != 1
+                or isinstance(field, (serializers.BaseSerializer, serializers.FileField))):
+            return None
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+        if not model_field.is_relation:
+            ket_qua.append((ten, model_field.attname, field.to_representation))
+        elif model_field.many_to_one and isinstance(field, serializers.PrimaryKeyRelatedField):
+            # Giá trị cột khóa ngoại chính là id mà PrimaryKeyRelatedField trả về
+            ket_qua.append((ten, model_field.attname, None))
+        else:
+            return None
+    return ket_qua
+
+
+def du_lieu_tu_cot(queryset, cot):
+    """Danh sách dict từ values_list, cùng định dạng với serializer."""
+    ten = [c[0] for c in cot]
+    dinh_dang = [c[2] for c in cot]
+    data = []
+    append = data.append
+    for row in queryset.values_list(*(c[1] for c in cot)):
+        append({
+            k: (v if f is None or v is None else f(v))
+            for k, f, v in zip(ten, dinh_dang, row)
+        })
+    return data
+
+
+class FieldsetViewMixin:
+    """
+    Mixin cho ViewSet: đọc ?fields= / ?expand= (chỉ các action trong
+    ACTION_DOC), kiểm tra tên trường, truyền xuống serializer và co queryset
+    tương ứng.
+    """
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Kiểm tra sớm (sau xác thực): cả action không gọi get_serializer
+        self.chon_truong()
+
+    def chon_truong(self):
+        """(fields, expand) của request; (None, ()) nếu không dùng."""
+        if hasattr(self, '_chon_truong'):
+            return self._chon_truong
+        fields = _doc_danh_sach(self.request, PARAM_FIELDS)
+        expand = _doc_danh_sach(self.request, PARAM_EXPAND) or ()
+        if (fields is not None or expand) and self.action not in ACTION_DOC:
+            raise ValidationError({PARAM_FIELDS if fields is not None else PARAM_EXPAND: [
+                f'Action "{self.action}" không hỗ trợ ?{PARAM_FIELDS}= / ?{PARAM_EXPAND}=.'
+            ]})
+        if fields is not None or expand:
+            serializer_class = self.get_serializer_class()
+            expandable = getattr(serializer_class.Meta, 'expandable_fields', {})
+            sai = [ten for ten in expand if ten not in expandable]
+            if sai:
+                raise ValidationError({PARAM_EXPAND: [
+                    f'Không mở rộng được: {", ".join(sai)}. Hợp lệ: {", ".join(expandable) or "(không có)"}.'
+                ]})
+            if fields is not None:
+                hop_le = [ten for ten, field in serializer_class().fields.items() if not field.write_only]
+                sai = [ten for ten in fields if ten not in hop_le and ten not in expandable]
+                if sai:
+                    raise ValidationError({PARAM_FIELDS: [
+                        f'Trường không hợp lệ: {", ".join(sai)}. Hợp lệ: {", ".join(hop_le)}.'
+                    ]})
+        self._chon_truong = (fields, expand)
+        return self._chon_truong
+
+    def dung_chon_truong(self):
+        fields, expand = self.chon_truong()
+        return fields is not None or bool(expand)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.dung_chon_truong():
+            fields, expand = self.chon_truong()
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        if self.dung_chon_truong() and self.paginator is None:
+            queryset = self.filter_queryset(self.get_queryset())
+            cot = _cot_don(self.get_serializer(), queryset.model)
+            if cot is not None:
+                with do_serializer():
+                    data = du_lieu_tu_cot(queryset, cot)
+                return Response(data)
+        return super().list(request, *args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        # Co truy vấn ở đây (không ở get_queryset) vì nhiều ViewSet tự viết
+        # lại get_queryset; list và get_object đều đi qua filter_queryset.
+        return self.co_truy_van(super().filter_queryset(queryset))
+
+    def co_truy_van(self, queryset):
+        """`queryset` chỉ nạp các cột/quan hệ mà các trường được chọn cần."""
+        if not self.dung_chon_truong():
+            return queryset
+        ke_hoach = ke_hoach_truy_van(self.get_serializer(), queryset.model)
+        if ke_hoach is None:
+            return queryset
+        cot, quan_he = ke_hoach
+        # Cột dùng để sắp xếp/phân trang keyset phải được nạp
+        cot_sap_xep = [
+            ten.lstrip('-') for ten in queryset.query.order_by if isinstance(ten, str) and '__' not in ten
+        ]
+        queryset = queryset.select_related(None)
+        if quan_he:
+            queryset = queryset.select_related(*quan_he)
+        return queryset.only(queryset.model._meta.pk.name, *cot, *cot_sap_xep)
@@ -0,0 +1,201 @@
+# Trong nhan_vien/ingest.py
+"""
+Nhập lượt chấm công theo lô từ máy chấm công.
+
+Mỗi lượt chấm (punch) có dạng:
+    {"ma_nhan_vien": "NV001", "thoi_diem": "2025-09-01T08:01:00", "loai": "in" | "out"}
+
+Quy trình (không phụ thuộc số lượt chấm):
+1. Kiểm tra định dạng từng dòng; tra mã nhân viên bằng MỘT truy vấn.
+2. Ghép lượt vào/ra theo (nhan_vien, ngay): giờ vào sớm nhất, giờ ra muộn nhất.
+3. Đọc các dòng ChamCong đã có của những khóa đó (và của ngày hôm trước),
+   gộp, rồi ghi bằng bulk_create / bulk_update trong một transaction.
+   Lượt ra sớm hơn giờ vào của ngày đó (hoặc ngày không có giờ vào) đóng ca
+   qua đêm còn mở của hôm trước, giống check-out (async_views.check_out).
+4. Lưu kết quả theo idempotency key: gửi lại cùng lô sẽ trả kết quả cũ.
+"""
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .attendance import cap_nhat_tong_hop
+from .models import NhanVien, ChamCong, ChamCongBatch
+
+LOAI_HOP_LE = ('in', 'out')
+CHUNK_SIZE = 2000
+
+
+def _doc_thoi_diem(value):
+    """ISO 8601 -> datetime theo giờ địa phương (TIME_ZONE)."""
+    thoi_diem = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if timezone.is_aware(thoi_diem):
+        thoi_diem = timezone.localtime(thoi_diem).replace(tzinfo=None)
+    return thoi_diem
+
+
+def kiem_tra_punches(rows):
+    """
+    Trả về (punches, loi):
+    - punches: list (nhan_vien_id, ngay, gio, loai) hợp lệ
+    - loi: list {'dong': số dòng (từ 1), 'loi': mô tả}
+    """
+    loi = []
+    tam = []
+    for dong, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            loi.append({'dong': dong, 'loi': 'Mỗi dòng phải là một object.'})
+            continue
+        if '_loi' in row:
+            loi.append({'dong': dong, 'loi': row['_loi']})
+            continue
+        ma = str(row.get('ma_nhan_vien') or '').strip()
+        loai = str(row.get('loai') or '').strip().lower()
+        if not ma:
+            loi.append({'dong': dong, 'loi': 'Thiếu ma_nhan_vien.'})
+            continue
+        if loai not in LOAI_HOP_LE:
+            loi.append({'dong': dong, 'loi': "loai phải là 'in' hoặc 'out'."})
+            continue
+        try:
+            thoi_diem = _doc_thoi_diem(row.get('thoi_diem'))
+        except (TypeError, ValueError):
+            loi.append({'dong': dong, 'loi': 'thoi_diem không hợp lệ (ISO 8601).'})
+            continue
+        tam.append((dong, ma, thoi_diem, loai))
+
+    # Tra toàn bộ mã nhân viên trong một truy vấn
+    ma_to_id = dict(
+        NhanVien.objects.filter(ma_nhan_vien__in={ma for _, ma, _, _ in tam})
+        .values_list('ma_nhan_vien', 'id')
+    )
+    punches = []
+    for dong, ma, thoi_diem, loai in tam:
+        nhan_vien_id = ma_to_id.get(ma)
+        if nhan_vien_id is None:
+            loi.append({'dong': dong, 'loi': f'Không tìm thấy nhân viên {ma}.'})
+            continue
+        punches.append((nhan_vien_id, thoi_diem.date(), thoi_diem.time().replace(microsecond=0), loai))
+    loi.sort(key=lambda item: item['dong'])
+    return punches, loi
+
+
+def ghep_vao_ra(punches):
+    """
+    Gộp lượt chấm theo (nhan_vien_id, ngay) -> [gio_vao sớm nhất, [các giờ ra]].
+    Giờ ra được giữ nguyên danh sách: lượt ra nào thuộc ca qua đêm của hôm
+    trước chỉ biết được khi đã có giờ vào đã lưu (xem ghi_cham_cong).
+    """
+    ngay_cong = {}
+    for nhan_vien_id, ngay, gio, loai in punches:
+        cap = ngay_cong.setdefault((nhan_vien_id, ngay), [None, []])
+        if loai == 'in':
+            cap[0] = gio if cap[0] is None else min(cap[0], gio)
+        else:
+            cap[1].append(gio)
+    return ngay_cong
+
+
+def _doc_dong_da_co(keys):
+    """Các ChamCong đã có của những khóa (nhan_vien_id, ngay), theo chunk."""
+    keys = list(keys)
+    da_co = {}
+    for start in range(0, len(keys), CHUNK_SIZE):
+        chunk = keys[start:start + CHUNK_SIZE]
+        qs = ChamCong.objects.filter(
+            nhan_vien_id__in={nv for nv, _ in chunk},
+            ngay__range=(min(ngay for _, ngay in chunk), max(ngay for _, ngay in chunk)),
+        )
+        wanted = set(chunk)
+        for row in qs:
+            key = (row.nhan_vien_id, row.ngay)
+            if key in wanted:
+                da_co[key] = row
+    return da_co
+
+
+def ghi_cham_cong(ngay_cong):
+    """
+    Gộp với dữ liệu đã có rồi ghi bằng bulk_create/bulk_update.
+    Trả về (so_tao_moi, so_cap_nhat, loi) — loi là các lượt ra không gắn
+    được vào ca nào (không có giờ vào trong ngày, hôm trước không còn ca mở).
+    """
+    # Sắp xếp khóa để các chunk liền nhau theo nhân viên/ngày
+    keys = sorted(ngay_cong)
+    hom_truoc = {(nv, ngay - timedelta(days=1)) for nv, ngay in keys}
+    da_co = _doc_dong_da_co(sorted(set(keys) | hom_truoc))
+    # Ca sau khi gộp: khóa -> [gio_vao, gio_ra]
+    ca = {key: [row.gio_vao, row.gio_ra] for key, row in da_co.items()}
+    ra_qua_dem = {}
+    for key in keys:
+        gio_vao, cac_gio_ra = ngay_cong[key]
+        vao, ra = ca.get(key, (None, None))
+        vao = min((g for g in (vao, gio_vao) if g is not None), default=None)
+        trong_ngay = [g for g in cac_gio_ra if vao is not None and g >= vao]
+        qua_dem = [g for g in cac_gio_ra if vao is None or g < vao]
+        ca[key] = [vao, max((g for g in (ra, *trong_ngay) if g is not None), default=None)]
+        if qua_dem:
+            ra_qua_dem[key] = max(qua_dem)
+
+    loi = []
+    for (nhan_vien_id, ngay), gio_ra in sorted(ra_qua_dem.items()):
+        # Như check-out: đóng ca còn mở của hôm trước
+        truoc = ca.get((nhan_vien_id, ngay - timedelta(days=1)))
+        if truoc is not None and truoc[0] is not None and truoc[1] is None:
+            truoc[1] = gio_ra
+            continue
+        loi.append({'nhan_vien': nhan_vien_id, 'ngay': ngay.isoformat(), 'loi': 'Có giờ ra nhưng không có giờ vào.'})
+
+    tao_moi, cap_nhat = [], []
+    for key in sorted(ca):
+        gio_vao, gio_ra = ca[key]
+        row = da_co.get(key)
+        if row is None:
+            if gio_vao is not None:
+                tao_moi.append(ChamCong(nhan_vien_id=key[0], ngay=key[1], gio_vao=gio_vao, gio_ra=gio_ra))
+        elif (gio_vao, gio_ra) != (row.gio_vao, row.gio_ra):
+            row.gio_vao, row.gio_ra = gio_vao, gio_ra
+            cap_nhat.append(row)
+
+    ChamCong.objects.bulk_create(tao_moi, batch_size=CHUNK_SIZE)
+    ChamCong.objects.bulk_update(cap_nhat, ['gio_vao', 'gio_ra'], batch_size=CHUNK_SIZE)
+    # bulk_create/bulk_update không phát signal: tự cập nhật bảng tổng hợp
+    cap_nhat_tong_hop({
+        (row.nhan_vien_id, row.ngay.year, row.ngay.month) for row in (*tao_moi, *cap_nhat)
+    })
+    return len(tao_moi), len(cap_nhat), loi
+
+
+def nhap_lo_cham_cong(idempotency_key, rows):
+    """
+    Nhập một lô lượt chấm. Trả về (ket_qua, da_xu_ly_truoc):
+    - ket_qua: dict thống kê + lỗi theo dòng
+    - da_xu_ly_truoc: True nếu lô này đã được nhập trước đó (không ghi lại)
+    """
+    batch = ChamCongBatch.objects.filter(idempotency_key=idempotency_key).first()
+    if batch is not None:
+        return batch.ket_qua, True
+
+    punches, loi = kiem_tra_punches(rows)
+    ngay_cong = ghep_vao_ra(punches)
+    try:
+        with transaction.atomic():
+            # Ghi khóa trước: lô gửi đồng thời với cùng khóa sẽ lỗi ở đây
+            batch = ChamCongBatch.objects.create(idempotency_key=idempotency_key, so_punch=len(rows))
+            so_tao_moi, so_cap_nhat, loi_ghep = ghi_cham_cong(ngay_cong)
+            ket_qua = {
+                'so_punch': len(rows),
+                'hop_le': len(punches),
+                'tao_moi': so_tao_moi,
+                'cap_nhat': so_cap_nhat,
+                'loi': loi + loi_ghep,
+            }
+            batch.ket_qua = ket_qua
+            batch.save(update_fields=['ket_qua'])
+    except IntegrityError:
+        # Một request khác vừa nhập cùng lô: trả lại kết quả của nó
+        batch = ChamCongBatch.objects.filter(idempotency_key=idempotency_key).first()
+        if batch is None:
+            raise
+        return batch.ket_qua, True
+    return ket_qua, False
@@ -0,0 +1,340 @@
+# Trong nhan_vien/jobs.py
+"""
+Hàng đợi tác vụ nền lưu trong DB (bảng TacVu), không cần broker ngoài.
+
+- API tạo TacVu ở trạng thái 'pending' rồi trả về ngay (202); worker
+  `manage.py run_jobs` (một hay nhiều tiến trình, mỗi tiến trình một thread
+  pool) lấy và chạy.
+- Lấy tác vụ: chọn vài ứng viên rồi UPDATE có điều kiện
+  (trang_thai='pending' -> 'running'). Chỉ một worker đổi được dòng, nên
+  chạy nhiều worker cùng lúc không bao giờ chạy trùng một tác vụ.
+- Tiến độ: handler gọi bao_cao(phan_tram, thong_diep). Mỗi lần ghi (tối đa
+  KHOANG_BAO_CAO giây một lần) cũng là nhịp tim của worker và là lúc kiểm tra
+  yêu cầu hủy.
+- Hủy: tác vụ đang chờ bị hủy ngay; đang chạy thì được đánh dấu yeu_cau_huy
+  và dừng ở lần bao_cao kế tiếp (tính lương dừng giữa hai phòng ban, các
+  phòng ban đã xong giữ checkpoint).
+- Lỗi: chạy lại sau TAC_VU_CHO_THU_LAI x 2^(lần thử - 1) giây, tối đa
+  so_lan_thu_toi_da lần; LoiKhongThuLai thì dừng luôn. Tác vụ 'running' mà
+  nhịp tim cũ hơn TAC_VU_HET_HAN (worker bị tắt ngang) được đưa lại hàng đợi,
+  trừ khi đã có yêu cầu hủy (khi đó chuyển thẳng sang 'cancelled').
+- Kết quả: dict JSON (ket_qua) và/hoặc một tệp (tep_ket_qua, lưu bằng
+  default_storage) tải về qua API.
+- Worker đang sống ghi nhịp tim vào Django cache (mỗi vòng lặp và mỗi lần
+  bao_cao). API từ chối tạo tác vụ (503) khi không có worker nào sống trong
+  TAC_VU_WORKER_HET_HAN giây, thay vì để tác vụ 'pending' mãi.
+"""
+import logging
+import os
+import socket
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .export import COT_BANG_LUONG, COT_CHAM_CONG, du_lieu_xuat, ghi_tep
+from .models import ChamCong, Payslip, PayrollCheckpoint, TacVu
+from .onboarding import nhap_nhan_vien
+from .payroll import chay_tinh_luong_song_song, danh_sach_shard, ma_shard, tinh_lai_bang_luong
+
+logger = logging.getLogger(__name__)
+
+KHOANG_BAO_CAO = 1.0
+# Số ứng viên xét mỗi lần lấy tác vụ (worker khác có thể vừa lấy mất ứng viên đầu)
+SO_UNG_VIEN = 5
+# Báo tiến độ xuất file sau mỗi chừng này dòng
+BUOC_BAO_CAO_XUAT = 5000
+# Tham số chứa dữ liệu nhạy cảm: bị xóa khi tác vụ kết thúc, ẩn khỏi API
+THAM_SO_NHAY_CAM = {'nhap_nhan_vien': ('rows',)}
+TRANG_THAI_KET_THUC = ('succeeded', 'failed', 'cancelled')
+NHIP_TIM_WORKER_KEY = 'tac_vu:nhip_tim_worker'
+
+
+class TacVuBiHuy(Exception):
+    pass
+
+
+class LoiKhongThuLai(Exception):
+    """Lỗi chắc chắn lặp lại nếu chạy lại (dữ liệu/tham số sai): không thử lại."""
+
+
+def tham_so_cong_khai(loai, tham_so):
+    """Tham số có thể trả qua API: dữ liệu nhạy cảm được thay bằng số phần tử."""
+    an = THAM_SO_NHAY_CAM.get(loai, ())
+    return {
+        key: (f'<{len(value)} dòng>' if key in an and isinstance(value, list) else value)
+        for key, value in tham_so.items()
+    }
+
+
+def danh_dau_worker_song():
+    """Nhịp tim của worker (run_jobs): thời điểm gần nhất một worker còn chạy."""
+    cache.set(NHIP_TIM_WORKER_KEY, time.time(), settings.TAC_VU_WORKER_HET_HAN)
+
+
+def co_worker_song():
+    """Có worker run_jobs nào báo nhịp tim trong TAC_VU_WORKER_HET_HAN giây gần đây không."""
+    lan_cuoi = cache.get(NHIP_TIM_WORKER_KEY)
+    return lan_cuoi is not None and time.time() - lan_cuoi < settings.TAC_VU_WORKER_HET_HAN
+
+
+def tao_tac_vu(loai, tham_so, nguoi_tao_id=None):
+    return TacVu.objects.create(
+        loai=loai, tham_so=tham_so, nguoi_tao_id=nguoi_tao_id,
+        so_lan_thu_toi_da=settings.TAC_VU_SO_LAN_THU_TOI_DA,
+    )
+
+
+def huy_tac_vu(tac_vu):
+    """
+    Hủy `tac_vu`: đang chờ -> 'cancelled' ngay; đang chạy -> đặt yeu_cau_huy.
+    Trả về False nếu tác vụ đã kết thúc.
+    """
+    bay_gio = timezone.now()
+    if TacVu.objects.filter(pk=tac_vu.pk, trang_thai='pending').update(
+        trang_thai='cancelled', ket_thuc_luc=bay_gio, thong_diep='Đã hủy trước khi chạy.',
+    ):
+        _xoa_tham_so_nhay_cam(tac_vu.pk, tac_vu.loai)
+        return True
+    return bool(TacVu.objects.filter(pk=tac_vu.pk, trang_thai='running').update(yeu_cau_huy=True))
+
+
+def thu_lai_tac_vu(tac_vu):
+    """Đưa tác vụ lỗi/đã hủy trở lại hàng đợi (đếm lại số lần thử). False nếu không được."""
+    if THAM_SO_NHAY_CAM.get(tac_vu.loai):
+        # Dữ liệu đầu vào đã bị xóa khi kết thúc: phải tạo tác vụ mới
+        return False
+    return bool(TacVu.objects.filter(pk=tac_vu.pk, trang_thai__in=('failed', 'cancelled')).update(
+        trang_thai='pending', so_lan_thu=0, yeu_cau_huy=False, loi='', tien_do=0, thong_diep='',
+        chay_sau=timezone.now(), bat_dau_luc=None, ket_thuc_luc=None,
+    ))
+
+
+def _thu_hoi_tac_vu_treo(bay_gio):
+    """
+    Tác vụ 'running' mất nhịp tim: đã có yêu cầu hủy thì 'cancelled', còn
+    lượt thì thử lại, không thì 'failed'.
+    """
+    treo = Q(trang_thai='running', cap_nhat_luc__lt=bay_gio - timedelta(seconds=settings.TAC_VU_HET_HAN))
+    loi = 'Worker ngừng giữa chừng (mất nhịp tim).'
+    for pk, loai in TacVu.objects.filter(treo, yeu_cau_huy=True).values_list('id', 'loai'):
+        if TacVu.objects.filter(treo, pk=pk).update(
+            trang_thai='cancelled', ket_thuc_luc=bay_gio, loi=loi, thong_diep='Đã hủy.',
+        ):
+            _xoa_tham_so_nhay_cam(pk, loai)
+    TacVu.objects.filter(treo, so_lan_thu__lt=F('so_lan_thu_toi_da')).update(
+        trang_thai='pending', chay_sau=bay_gio, loi=loi,
+    )
+    TacVu.objects.filter(treo).update(trang_thai='failed', ket_thuc_luc=bay_gio, loi=loi)
+
+
+def nhan_tac_vu(worker):
+    """Lấy một tác vụ đến hạn cho `worker` (đã chuyển sang 'running'), hoặc None."""
+    bay_gio = timezone.now()
+    _thu_hoi_tac_vu_treo(bay_gio)
+    ung_vien = list(
+        TacVu.objects.filter(trang_thai='pending', chay_sau__lte=bay_gio)
+        .order_by('chay_sau', 'id').values_list('id', flat=True)[:SO_UNG_VIEN]
+    )
+    for pk in ung_vien:
+        if TacVu.objects.filter(pk=pk, trang_thai='pending').update(
+            trang_thai='running', worker=worker, bat_dau_luc=bay_gio, cap_nhat_luc=bay_gio,
+            so_lan_thu=F('so_lan_thu') + 1, thong_diep='',
+        ):
+            return TacVu.objects.get(pk=pk)
+    return None
+
+
+class BaoCaoTienDo:
+    """bao_cao(phan_tram, thong_diep): ghi tiến độ + nhịp tim, ném TacVuBiHuy nếu bị hủy."""
+
+    def __init__(self, tac_vu):
+        self.tac_vu = tac_vu
+        self._lan_cuoi = float('-inf')
+
+    def __call__(self, phan_tram, thong_diep=''):
+        bay_gio = time.monotonic()
+        if bay_gio - self._lan_cuoi < KHOANG_BAO_CAO:
+            return
+        self._lan_cuoi = bay_gio
+        danh_dau_worker_song()
+        qs = TacVu.objects.filter(pk=self.tac_vu.pk)
+        qs.update(tien_do=max(0, min(int(phan_tram), 100)), thong_diep=thong_diep[:255], cap_nhat_luc=timezone.now())
+        if qs.filter(yeu_cau_huy=True).exists():
+            raise TacVuBiHuy
+
+
+def _xoa_tham_so_nhay_cam(pk, loai):
+    an = THAM_SO_NHAY_CAM.get(loai)
+    if not an:
+        return
+    tac_vu = TacVu.objects.get(pk=pk)
+    TacVu.objects.filter(pk=pk).update(tham_so=tham_so_cong_khai(loai, tac_vu.tham_so))
+
+
+def _ket_thuc(tac_vu, **fields):
+    """Ghi trạng thái cuối, chỉ khi tác vụ vẫn là của lần chạy này."""
+    TacVu.objects.filter(pk=tac_vu.pk, trang_thai='running', worker=tac_vu.worker).update(**fields)
+    if fields.get('trang_thai') in TRANG_THAI_KET_THUC:
+        _xoa_tham_so_nhay_cam(tac_vu.pk, tac_vu.loai)
+
+
+def thuc_thi(tac_vu):
+    """Chạy một tác vụ đã nhận (trạng thái 'running') tới khi kết thúc hoặc chờ thử lại."""
+    bao_cao = BaoCaoTienDo(tac_vu)
+    try:
+        ket_qua = XU_LY[tac_vu.loai](tac_vu, bao_cao)
+    except TacVuBiHuy:
+        _ket_thuc(tac_vu, trang_thai='cancelled', ket_thuc_luc=timezone.now(), thong_diep='Đã hủy.')
+    except Exception as exc:
+        logger.exception('Tác vụ #%s (%s) lỗi ở lần chạy %s', tac_vu.pk, tac_vu.loai, tac_vu.so_lan_thu)
+        loi = f'{type(exc).__name__}: {exc}'
+        bay_gio = timezone.now()
+        if isinstance(exc, LoiKhongThuLai) or tac_vu.so_lan_thu >= tac_vu.so_lan_thu_toi_da:
+            _ket_thuc(tac_vu, trang_thai='failed', ket_thuc_luc=bay_gio, loi=loi)
+        else:
+            cho = settings.TAC_VU_CHO_THU_LAI * 2 ** (tac_vu.so_lan_thu - 1)
+            _ket_thuc(tac_vu, trang_thai='pending', chay_sau=bay_gio + timedelta(seconds=cho), loi=loi)
+    else:
+        _ket_thuc(
+            tac_vu, trang_thai='succeeded', ket_thuc_luc=timezone.now(), tien_do=100, ket_qua=ket_qua,
+            tep_ket_qua=tac_vu.tep_ket_qua.name or '', thong_diep='Hoàn thành.',
+        )
+
+
+def chay_cac_tac_vu_dang_cho(worker, dung=None):
+    """Chạy lần lượt các tác vụ đến hạn cho tới khi hàng đợi trống. Trả về số tác vụ đã chạy."""
+    so_tac_vu = 0
+    while dung is None or not dung.is_set():
+        tac_vu = nhan_tac_vu(worker)
+        if tac_vu is None:
+            break
+        thuc_thi(tac_vu)
+        so_tac_vu += 1
+    return so_tac_vu
+
+
+# ===============================================
+# Handler theo loại: (tac_vu, bao_cao) -> dict kết quả
+# ===============================================
+
+def _luu_tep(tac_vu, ten_file, ghi):
+    """Gọi ghi(tep) trên một file tạm rồi lưu vào tac_vu.tep_ket_qua (default_storage)."""
+    with tempfile.TemporaryFile() as tep:
+        ghi(tep)
+        tep.seek(0)
+        tac_vu.tep_ket_qua.save(ten_file, File(tep), save=False)
+
+
+def _tinh_luong(tac_vu, bao_cao):
+    thang, nam = tac_vu.tham_so['thang'], tac_vu.tham_so['nam']
+    # Chỉ xóa checkpoint ở lần chạy đầu: lần thử lại tiếp tục từ các phòng ban đã xong
+    if tac_vu.tham_so.get('khoi_dong_lai') and tac_vu.so_lan_thu == 1:
+        PayrollCheckpoint.objects.filter(thang=thang, nam=nam).delete()
+    tong = len(danh_sach_shard(thang, nam))
+    if not tong:
+        # Không để tác vụ "thành công" mà không tính gì
+        raise LoiKhongThuLai(
+            f'Không còn phòng ban nào cần tính cho tháng {thang}/{nam} (chưa có nhân viên, hoặc mọi phòng ban '
+            'đã có checkpoint của một lần chạy khác). Tạo tác vụ với khoi_dong_lai=true để tính lại cả tháng.'
+        )
+    bao_cao(0, f'{tong} phòng ban cần tính.')
+    so_phong_ban = so_bang_luong = 0
+    bo_qua = []
+    for phong_ban_id, ket_qua in chay_tinh_luong_song_song(thang, nam, workers=tac_vu.tham_so.get('workers', 1)):
+        so_phong_ban += 1
+        so_bang_luong += ket_qua.so_bang_luong
+        bo_qua.extend({'ho_ten': ho_ten, 'ly_do': ly_do} for ho_ten, ly_do in ket_qua.bo_qua)
+        bao_cao(so_phong_ban * 100 // max(tong, 1), f'Xong {ma_shard(phong_ban_id)} ({so_phong_ban}/{tong}).')
+    return {'thang': thang, 'nam': nam, 'so_phong_ban': so_phong_ban, 'so_bang_luong': so_bang_luong,
+            'bo_qua': bo_qua}
+
+
+def _tinh_lai_luong(tac_vu, bao_cao):
+    ket_qua = tinh_lai_bang_luong(
+        tac_vu.tham_so.get('thang'), tac_vu.tham_so.get('nam'),
+        tien_do=lambda xong, tong: bao_cao(xong * 100 // max(tong, 1), f'{xong}/{tong} bảng lương.'),
+    )
+    if ket_qua['thay_doi']:
+        # Danh sách thay đổi có thể rất dài: để trong tệp CSV thay vì trong JSON
+        cot = ('payslip', 'ma_nhan_vien', 'thang', 'nam', 'luong_co_ban_cu', 'luong_co_ban_moi',
+               'tien_lam_them_cu', 'tien_lam_them_moi', 'luong_thuc_nhan_cu', 'luong_thuc_nhan_moi', 'chenh_lech')
+        rows = ([item[key] for key in cot] for item in ket_qua['thay_doi'])
+        _luu_tep(tac_vu, f'tinh_lai_luong_{tac_vu.pk}.csv', lambda tep: ghi_tep(cot, rows, 'csv', tep))
+    return {
+        'so_bang_luong': ket_qua['so_bang_luong'],
+        'so_thay_doi': ket_qua['so_thay_doi'],
+        'tong_chenh_lech': ket_qua['tong_chenh_lech'],
+        'bo_qua': ket_qua['bo_qua'],
+    }
+
+
+def _dem_dong(rows, tong, bao_cao):
+    for i, row in enumerate(rows, start=1):
+        if i % BUOC_BAO_CAO_XUAT == 0:
+            bao_cao(i * 100 // max(tong, 1), f'{i}/{tong} dòng.')
+        yield row
+
+
+def _xuat(tac_vu, bao_cao, queryset, cot, ten):
+    dinh_dang = tac_vu.tham_so.get('dinh_dang', 'csv')
+    tong = queryset.count()
+    header, rows = du_lieu_xuat(queryset, cot)
+    _luu_tep(
+        tac_vu, f'{ten}_{tac_vu.pk}.{dinh_dang}',
+        lambda tep: ghi_tep(header, _dem_dong(rows, tong, bao_cao), dinh_dang, tep),
+    )
+    return {'so_dong': tong, 'dinh_dang': dinh_dang}
+
+
+def _xuat_bang_luong(tac_vu, bao_cao):
+    queryset = Payslip.objects.order_by('-nam', '-thang', 'nhan_vien_id')
+    for key in ('nam', 'thang'):
+        if tac_vu.tham_so.get(key):
+            queryset = queryset.filter(**{key: tac_vu.tham_so[key]})
+    return _xuat(tac_vu, bao_cao, queryset, COT_BANG_LUONG, 'bang_luong')
+
+
+def _xuat_cham_cong(tac_vu, bao_cao):
+    queryset = ChamCong.objects.order_by('-ngay', '-id')
+    for key, lookup in (('nhan_vien', 'nhan_vien_id'), ('phong_ban', 'nhan_vien__phong_ban_id'),
+                        ('tu_ngay', 'ngay__gte'), ('den_ngay', 'ngay__lte')):
+        if tac_vu.tham_so.get(key):
+            queryset = queryset.filter(**{lookup: tac_vu.tham_so[key]})
+    return _xuat(tac_vu, bao_cao, queryset, COT_CHAM_CONG, 'cham_cong')
+
+
+def _nhap_nhan_vien(tac_vu, bao_cao):
+    rows = tac_vu.tham_so.get('rows')
+    if not isinstance(rows, list):
+        raise LoiKhongThuLai('Dữ liệu nhập không còn (tác vụ đã kết thúc trước đó).')
+    ket_qua = nhap_nhan_vien(
+        rows, vai_tro_cho_phep=tuple(tac_vu.tham_so['vai_tro_cho_phep']),
+        workers=tac_vu.tham_so.get('workers') or None,
+        tien_do=lambda xong, tong: bao_cao(xong * 100 // max(tong, 1), f'{xong}/{tong} dòng hợp lệ.'),
+    )
+    if ket_qua['loi']:
+        cot = ('dong', 'loi')
+        rows_loi = ([item['dong'], item['loi']] for item in ket_qua['loi'])
+        _luu_tep(tac_vu, f'nhap_nhan_vien_loi_{tac_vu.pk}.csv', lambda tep: ghi_tep(cot, rows_loi, 'csv', tep))
+    # Danh sách nhân viên đã tạo có thể rất dài: chỉ giữ số lượng + lỗi (10 lỗi đầu)
+    return {'so_dong': ket_qua['so_dong'], 'tao_moi': ket_qua['tao_moi'], 'so_loi': len(ket_qua['loi']),
+            'loi': ket_qua['loi'][:10]}
+
+
+XU_LY = {
+    'tinh_luong': _tinh_luong,
+    'tinh_lai_luong': _tinh_lai_luong,
+    'xuat_bang_luong': _xuat_bang_luong,
+    'xuat_cham_cong': _xuat_cham_cong,
+    'nhap_nhan_vien': _nhap_nhan_vien,
+}
+
+
+def ten_worker(so_thu_tu=0):
+    return f'{socket.gethostname()}:{os.getpid()}:{so_thu_tu}'
@@ -0,0 +1,242 @@
+# Trong nhan_vien/leave.py
+"""
+Nghiệp vụ nghỉ phép dựa trên khoảng ngày của DonXinNghi.
+
+- Chống trùng lịch: một nhân viên không được có hai đơn (chờ duyệt hoặc đã
+  duyệt) giao nhau. Kiểm tra bằng một truy vấn khoảng trên index
+  (nhan_vien, ngay_bat_dau, ngay_ket_thuc).
+- Số dư phép năm: số ngày đã nghỉ/đang chờ duyệt trong năm so với
+  SO_NGAY_PHEP_NAM. Chỉ tính ngày làm việc theo lịch chung (workdays: bỏ
+  Chủ Nhật và ngày lễ, giống công chuẩn của bảng lương); đơn vắt qua năm chỉ
+  tính phần nằm trong năm.
+- Duyệt/từ chối (một hoặc nhiều đơn): một câu UPDATE có điều kiện
+  `WHERE trang_thai = 'pending'` trong transaction ghi, nên hai người duyệt
+  cùng lúc không thể cùng xử lý một đơn.
+- Lịch vắng mặt theo phòng ban/ngày: MỘT truy vấn lấy các đơn giao với
+  khoảng cần xem (index (ngay_ket_thuc, ngay_bat_dau)), sắp theo ngày bắt
+  đầu, rồi quét (sweep) từng ngày với một heap các đơn đang mở — mỗi đơn
+  được thêm/bớt đúng một lần thay vì quét lại mọi đơn cho từng ngày.
+"""
+import heapq
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from .caching import lam_moi_phien_ban
+from .models import DonXinNghi, NhanVien
+from .workdays import so_ngay_lam_viec
+
+# Trạng thái "giữ chỗ" lịch: đơn bị từ chối không chặn đơn khác
+TRANG_THAI_CHIEM_CHO = ('pending', 'approved')
+
+
+def don_trung_lich(nhan_vien_id, tu_ngay, den_ngay, bo_qua_id=None):
+    """Các đơn chiếm chỗ của nhân viên giao với khoảng [tu_ngay, den_ngay]."""
+    queryset = DonXinNghi.objects.filter(
+        nhan_vien_id=nhan_vien_id,
+        ngay_bat_dau__lte=den_ngay,
+        ngay_ket_thuc__gte=tu_ngay,
+        trang_thai__in=TRANG_THAI_CHIEM_CHO,
+    )
+    if bo_qua_id is not None:
+        queryset = queryset.exclude(pk=bo_qua_id)
+    return queryset
+
+
+def kiem_tra_trung_lich(nhan_vien_id, tu_ngay, den_ngay, bo_qua_id=None):
+    """Báo lỗi (400) nếu khoảng nghỉ giao với một đơn chờ duyệt/đã duyệt khác của nhân viên."""
+    trung = list(
+        don_trung_lich(nhan_vien_id, tu_ngay, den_ngay, bo_qua_id)
+        .order_by('ngay_bat_dau')
+        .values('id', 'ngay_bat_dau', 'ngay_ket_thuc', 'trang_thai')[:5]
+    )
+    if trung:
+        raise ValidationError({
+            'ngay_bat_dau': [
+                'Khoảng nghỉ bị trùng với đơn khác: ' + ', '.join(
+                    f'#{don["id"]} ({don["ngay_bat_dau"]} - {don["ngay_ket_thuc"]}, {don["trang_thai"]})'
+                    for don in trung
+                )
+            ]
+        })
+
+
+# Kết quả xử lý từng đơn khi duyệt/từ chối
+DA_AP_DUNG = 'applied'
+DA_XU_LY_TRUOC = 'already_processed'
+KHONG_CO_QUYEN = 'forbidden'
+KHONG_TON_TAI = 'not_found'
+# Giới hạn số đơn trong một lần duyệt hàng loạt
+SO_DON_TOI_DA_MOI_LAN = 1000
+
+
+def _phan_loai(nhan_vien_id, trang_thai, nguoi_duyet_id):
+    """Kết quả dự kiến khi xử lý một đơn đang ở `trang_thai`."""
+    if nguoi_duyet_id is not None and nhan_vien_id == nguoi_duyet_id:
+        return KHONG_CO_QUYEN
+    if trang_thai != 'pending':
+        return DA_XU_LY_TRUOC
+    return DA_AP_DUNG
+
+
+def _cap_nhat_don_cho_duyet(ids, trang_thai_moi):
+    """UPDATE có điều kiện: chỉ đơn còn 'pending' mới đổi trạng thái. Trả về số dòng đổi."""
+    so_dong = DonXinNghi.objects.filter(id__in=ids, trang_thai='pending').update(trang_thai=trang_thai_moi)
+    if so_dong:
+        # update() không phát signal
+        lam_moi_phien_ban(DonXinNghi)
+    return so_dong
+
+
+def xu_ly_mot_don(don, trang_thai_moi, nguoi_duyet_id=None):
+    """
+    Duyệt/từ chối một đơn đã được nạp (vd. bằng get_object). Một câu UPDATE
+    có điều kiện: nếu người khác vừa xử lý đơn trước đó thì không dòng nào
+    bị đổi và kết quả là DA_XU_LY_TRUOC. Cập nhật luôn `don.trang_thai`.
+    """
+    ket_qua = _phan_loai(don.nhan_vien_id, don.trang_thai, nguoi_duyet_id)
+    if ket_qua == DA_AP_DUNG:
+        if not _cap_nhat_don_cho_duyet([don.pk], trang_thai_moi):
+            return DA_XU_LY_TRUOC
+        don.trang_thai = trang_thai_moi
+    return ket_qua
+
+
+def xu_ly_don(ids, trang_thai_moi, nguoi_duyet_id=None):
+    """
+    Duyệt ('approved') hoặc từ chối ('rejected') các đơn `ids`.
+    Trả về dict {id: DA_AP_DUNG | DA_XU_LY_TRUOC | KHONG_CO_QUYEN | KHONG_TON_TAI}.
+
+    - Người duyệt không được tự xử lý đơn của chính mình (KHONG_CO_QUYEN).
+    - Đọc trạng thái rồi UPDATE có điều kiện trong cùng transaction: với
+      SQLite, BEGIN IMMEDIATE giữ khóa ghi từ đầu; database khác khóa dòng
+      bằng SELECT ... FOR UPDATE. Tổng cộng hai truy vấn, bất kể số đơn.
+    """
+    ids = list(dict.fromkeys(ids))
+    with transaction.atomic():
+        hien_tai = {
+            pk: (nhan_vien_id, trang_thai)
+            for pk, nhan_vien_id, trang_thai in DonXinNghi.objects.select_for_update()
+            .filter(id__in=ids).values_list('id', 'nhan_vien_id', 'trang_thai')
+        }
+        ket_qua = {
+            pk: _phan_loai(*hien_tai[pk], nguoi_duyet_id) if pk in hien_tai else KHONG_TON_TAI
+            for pk in ids
+        }
+        ap_dung = [pk for pk, kq in ket_qua.items() if kq == DA_AP_DUNG]
+        if ap_dung:
+            _cap_nhat_don_cho_duyet(ap_dung, trang_thai_moi)
+    return ket_qua
+
+
+def so_du_phep(nam, nhan_vien_qs=None):
+    """
+    Số dư phép năm của từng nhân viên (hai truy vấn cho mọi nhân viên).
+    Trả về list dict: nhan_vien, ma_nhan_vien, ho_ten, nam, duoc_huong,
+    da_nghi (đã duyệt), cho_duyet, con_lai (= duoc_huong - da_nghi).
+    """
+    dau_nam, cuoi_nam = date(nam, 1, 1), date(nam, 12, 31)
+    if nhan_vien_qs is None:
+        nhan_vien_qs = NhanVien.objects.all()
+
+    don = DonXinNghi.objects.filter(
+        nhan_vien__in=nhan_vien_qs.values('id'),
+        ngay_bat_dau__lte=cuoi_nam,
+        ngay_ket_thuc__gte=dau_nam,
+        trang_thai__in=TRANG_THAI_CHIEM_CHO,
+    ).values_list('nhan_vien_id', 'ngay_bat_dau', 'ngay_ket_thuc', 'trang_thai')
+
+    da_nghi, cho_duyet = Counter(), Counter()
+    for nhan_vien_id, bat_dau, ket_thuc, trang_thai in don:
+        so_ngay = so_ngay_lam_viec(max(bat_dau, dau_nam), min(ket_thuc, cuoi_nam))
+        (da_nghi if trang_thai == 'approved' else cho_duyet)[nhan_vien_id] += so_ngay
+
+    duoc_huong = settings.SO_NGAY_PHEP_NAM
+    return [
+        {
+            'nhan_vien': nhan_vien_id,
+            'ma_nhan_vien': ma,
+            'ho_ten': ho_ten,
+            'nam': nam,
+            'duoc_huong': duoc_huong,
+            'da_nghi': da_nghi[nhan_vien_id],
+            'cho_duyet': cho_duyet[nhan_vien_id],
+            'con_lai': duoc_huong - da_nghi[nhan_vien_id],
+        }
+        for nhan_vien_id, ma, ho_ten in nhan_vien_qs.order_by('ma_nhan_vien').values_list('id', 'ma_nhan_vien', 'ho_ten')
+    ]
+
+
+def lich_vang_mat(tu_ngay, den_ngay, phong_ban_id=None, trang_thai=('approved',)):
+    """
+    Ai vắng mặt ngày nào, theo phòng ban, trong [tu_ngay, den_ngay].
+
+    Trả về:
+    {
+      'tu_ngay', 'den_ngay', 'trang_thai',
+      'phong_ban': [{'phong_ban': id | None, 'ten_phong_ban', 'ngay': {'YYYY-MM-DD': [nhan_vien_id, ...]}}],
+      'nhan_vien': {nhan_vien_id: {'ma_nhan_vien', 'ho_ten'}},
+    }
+    Chỉ liệt kê ngày có người vắng; tên nhân viên nằm ở bảng tra cứu
+    `nhan_vien` để không lặp lại trong từng ngày.
+    """
+    queryset = DonXinNghi.objects.filter(
+        ngay_bat_dau__lte=den_ngay,
+        ngay_ket_thuc__gte=tu_ngay,
+        trang_thai__in=trang_thai,
+    )
+    if phong_ban_id is not None:
+        queryset = queryset.filter(nhan_vien__phong_ban_id=phong_ban_id)
+    don = queryset.order_by('ngay_bat_dau').values_list(
+        'nhan_vien_id', 'nhan_vien__phong_ban_id', 'ngay_bat_dau', 'ngay_ket_thuc',
+        'nhan_vien__ma_nhan_vien', 'nhan_vien__ho_ten', 'nhan_vien__phong_ban__ten_phong_ban',
+    )
+
+    nhan_vien, ten_phong_ban = {}, {}
+    khoang = []
+    for nhan_vien_id, phong_ban, bat_dau, ket_thuc, ma, ho_ten, ten_pb in don:
+        nhan_vien[nhan_vien_id] = {'ma_nhan_vien': ma, 'ho_ten': ho_ten}
+        ten_phong_ban[phong_ban] = ten_pb
+        khoang.append((max(bat_dau, tu_ngay), min(ket_thuc, den_ngay), phong_ban, nhan_vien_id))
+    # Đã sắp theo ngày bắt đầu trong SQL; max(bat_dau, tu_ngay) không làm đổi thứ tự
+
+    # Đếm theo (phòng ban, nhân viên): dữ liệu cũ có thể có hai đơn chồng nhau
+    dang_nghi = defaultdict(Counter)
+    dang_mo = []  # heap (ngày kết thúc, thứ tự đơn, phòng ban, nhân viên)
+    lich = defaultdict(dict)
+    i, ngay = 0, tu_ngay
+    while ngay <= den_ngay and (i < len(khoang) or dang_mo):
+        while i < len(khoang) and khoang[i][0] <= ngay:
+            _, ket_thuc, phong_ban, nhan_vien_id = khoang[i]
+            heapq.heappush(dang_mo, (ket_thuc, i, phong_ban, nhan_vien_id))
+            dang_nghi[phong_ban][nhan_vien_id] += 1
+            i += 1
+        while dang_mo and dang_mo[0][0] < ngay:
+            _, _, phong_ban, nhan_vien_id = heapq.heappop(dang_mo)
+            dang_nghi[phong_ban][nhan_vien_id] -= 1
+            if not dang_nghi[phong_ban][nhan_vien_id]:
+                del dang_nghi[phong_ban][nhan_vien_id]
+        if dang_mo:
+            khoa_ngay = ngay.isoformat()
+            for phong_ban, dem in dang_nghi.items():
+                if dem:
+                    lich[phong_ban][khoa_ngay] = sorted(dem)
+        elif i < len(khoang):
+            # Không ai đang nghỉ: nhảy thẳng tới đơn kế tiếp
+            ngay = khoang[i][0]
+            continue
+        ngay += timedelta(days=1)
+
+    return {
+        'tu_ngay': tu_ngay.isoformat(),
+        'den_ngay': den_ngay.isoformat(),
+        'trang_thai': list(trang_thai),
+        'phong_ban': [
+            {'phong_ban': phong_ban, 'ten_phong_ban': ten_phong_ban[phong_ban], 'ngay': lich[phong_ban]}
+            for phong_ban in sorted(lich, key=lambda pb: (pb is None, pb or 0))
+        ],
+        'nhan_vien': nhan_vien,
+    }
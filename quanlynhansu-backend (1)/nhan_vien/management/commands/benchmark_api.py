@@ -0,0 +1,168 @@
+import json
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.urls import reverse
+
+from nhan_vien.urls import router
+
+
+def phan_vi(gia_tri_da_sap_xep, p):
+    """Phân vị theo nearest-rank (p trong khoảng 0..100)."""
+    if not gia_tri_da_sap_xep:
+        return None
+    hang = max(1, math.ceil(p / 100 * len(gia_tri_da_sap_xep)))
+    return gia_tri_da_sap_xep[hang - 1]
+
+
+def _model_cua(viewset):
+    queryset = getattr(viewset, 'queryset', None)
+    if queryset is not None:
+        return queryset.model
+    return viewset.serializer_class.Meta.model
+
+
+class DemTruyVan:
+    """
+    execute_wrapper đếm truy vấn. Gắn vào mọi alias trong `connections`:
+    request GET chạy trên 'replica' (db_router), không phải 'default'.
+    """
+
+    def __init__(self):
+        self.so_truy_van = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.so_truy_van += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Đo tải các endpoint API ngay trong tiến trình (django.test.Client, nhiều luồng): '
+        'mọi route của router trong nhan_vien/urls.py (list + detail) và /api/token/. '
+        'In ra JSON gồm p50/p95/p99, throughput và số truy vấn mỗi request để so sánh giữa các phiên bản.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='seed_sd000001', help='Tài khoản đăng nhập (mặc định: Admin của seed_hr).')
+        parser.add_argument('--password', default='matkhau123')
+        parser.add_argument('--requests', type=int, default=50, help='Số request mỗi endpoint.')
+        parser.add_argument(
+            '--token-requests', type=int, default=10,
+            help='Số request cho /api/token/ (băm mật khẩu rất chậm nên tách riêng).'
+        )
+        parser.add_argument('--concurrency', type=int, default=4, help='Số luồng gửi request đồng thời.')
+        parser.add_argument(
+            '--endpoint', action='append', default=[],
+            help='Chỉ đo endpoint có tên này (vd: nhanvien-list, token). Có thể lặp lại.'
+        )
+        parser.add_argument('--output', help='Ghi JSON ra file thay vì stdout.')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests và --concurrency phải >= 1')
+
+        dang_nhap = {'username': options['username'], 'password': options['password']}
+        # Chỉ dùng để đăng nhập; mỗi luồng có Client riêng.
+        # SERVER_NAME=localhost: nằm trong ALLOWED_HOSTS mặc định khi DEBUG
+        res = Client(SERVER_NAME='localhost').post('/api/token/', dang_nhap, content_type='application/json')
+        if res.status_code != 200:
+            raise CommandError(
+                f'Đăng nhập thất bại ({res.status_code}). Chạy `manage.py seed_hr` '
+                'hoặc truyền --username/--password.'
+            )
+        headers = {'Authorization': f'Bearer {res.json()["access"]}'}
+
+        endpoints = [('token', 'post', '/api/token/', dang_nhap, {}, options['token_requests'])]
+        for prefix, viewset, basename in router.registry:
+            endpoints.append((f'{basename}-list', 'get', reverse(f'{basename}-list'), None, headers, options['requests']))
+            pk = _model_cua(viewset).objects.order_by('pk').values_list('pk', flat=True).first()
+            if pk is not None:
+                endpoints.append((
+                    f'{basename}-detail', 'get', reverse(f'{basename}-detail', args=[pk]),
+                    None, headers, options['requests']
+                ))
+        if options['endpoint']:
+            endpoints = [e for e in endpoints if e[0] in options['endpoint']]
+            if not endpoints:
+                raise CommandError('Không có endpoint nào khớp --endpoint.')
+
+        ket_qua = {}
+        for ten, method, url, body, headers, so_request in endpoints:
+            self.stderr.write(f'Đo {ten} ({method.upper()} {url}, {so_request} request)...')
+            ket_qua[ten] = self._do_endpoint(method, url, body, headers, so_request, options['concurrency'])
+
+        bao_cao = json.dumps({
+            'thoi_diem': datetime.now().isoformat(timespec='seconds'),
+            'cau_hinh': {
+                'requests': options['requests'],
+                'token_requests': options['token_requests'],
+                'concurrency': options['concurrency'],
+                'database': str(connection.settings_dict['NAME']),
+            },
+            'endpoints': ket_qua,
+        }, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(bao_cao + '\n')
+            self.stderr.write(self.style.SUCCESS(f'Đã ghi kết quả vào {options["output"]}'))
+        else:
+            self.stdout.write(bao_cao)
+
+    def _do_endpoint(self, method, url, body, headers, so_request, concurrency):
+        mau = []  # (thời gian ms, status, số truy vấn)
+        khoa = threading.Lock()
+        phan_chia = [so_request // concurrency + (1 if i < so_request % concurrency else 0) for i in range(concurrency)]
+
+        def chay(so_lan):
+            client = Client(SERVER_NAME='localhost', raise_request_exception=False, headers=headers)
+            gui = getattr(client, method)
+            ket_qua_luong = []
+            dem = DemTruyVan()
+            try:
+                with ExitStack() as stack:
+                    for alias in connections:
+                        stack.enter_context(connections[alias].execute_wrapper(dem))
+                    for _ in range(so_lan):
+                        truoc = dem.so_truy_van
+                        bat_dau = time.perf_counter()
+                        if body is None:
+                            res = gui(url)
+                        else:
+                            res = gui(url, body, content_type='application/json')
+                        thoi_gian = (time.perf_counter() - bat_dau) * 1000
+                        ket_qua_luong.append((thoi_gian, res.status_code, dem.so_truy_van - truoc))
+            finally:
+                # Mỗi luồng có kết nối DB riêng
+                connections.close_all()
+            with khoa:
+                mau.extend(ket_qua_luong)
+
+        bat_dau = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for future in [executor.submit(chay, n) for n in phan_chia if n]:
+                future.result()
+        tong_thoi_gian = time.perf_counter() - bat_dau
+
+        thoi_gian = sorted(t for t, _, _ in mau)
+        truy_van = [q for _, _, q in mau]
+        return {
+            'url': url,
+            'requests': len(mau),
+            'loi': sum(1 for _, status, _ in mau if status >= 400),
+            'status': sorted({status for _, status, _ in mau}),
+            'p50_ms': round(phan_vi(thoi_gian, 50), 2),
+            'p95_ms': round(phan_vi(thoi_gian, 95), 2),
+            'p99_ms': round(phan_vi(thoi_gian, 99), 2),
+            'trung_binh_ms': round(sum(thoi_gian) / len(thoi_gian), 2),
+            'throughput_rps': round(len(mau) / tong_thoi_gian, 1),
+            'truy_van_moi_request': round(sum(truy_van) / len(truy_van), 2),
+            'truy_van_toi_da': max(truy_van),
+        }
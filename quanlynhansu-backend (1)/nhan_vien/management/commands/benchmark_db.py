@@ -0,0 +1,150 @@
+import copy
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from nhan_vien.attendance import _tong_hop_theo_thang, khoang_thang
+from nhan_vien.management.commands.benchmark_api import phan_vi
+from nhan_vien.models import ChamCong
+
+
+class Command(BaseCommand):
+    help = (
+        'Đo thông lượng đọc/ghi đồng thời trên SQLite: luồng ghi cập nhật chấm công '
+        '(transaction ngắn) song song với luồng đọc chạy báo cáo tổng hợp tháng. '
+        'So sánh cấu hình cũ (journal mặc định, một loại kết nối) với cấu hình hiện tại '
+        '(WAL + pragma + kết nối chỉ đọc). Chạy trên bản sao của database, không sửa dữ liệu thật.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10, help='Thời gian chạy mỗi cấu hình (giây).')
+        parser.add_argument('--writers', type=int, default=4, help='Số luồng ghi.')
+        parser.add_argument('--readers', type=int, default=4, help='Số luồng đọc.')
+
+    def handle(self, *args, **options):
+        if options['writers'] < 1 or options['readers'] < 1:
+            raise CommandError('--writers và --readers phải >= 1')
+        self.cham_cong_ids = list(ChamCong.objects.using('default').values_list('id', flat=True)[:100_000])
+        self.cac_thang = list(
+            ChamCong.objects.using('default').dates('ngay', 'month').values_list('ngay', flat=True)
+        )
+        if not self.cham_cong_ids:
+            raise CommandError('Chưa có dữ liệu chấm công. Chạy `manage.py seed_hr` trước.')
+
+        goc = connections['default'].settings_dict
+        cau_hinh_cu = {'OPTIONS': {}, 'CONN_MAX_AGE': 0}
+        cau_hinh_ghi = {'OPTIONS': goc['OPTIONS'], 'CONN_MAX_AGE': goc['CONN_MAX_AGE']}
+        replica = connections.settings.get('replica', goc)
+        cau_hinh_doc = {'OPTIONS': replica['OPTIONS'], 'CONN_MAX_AGE': replica['CONN_MAX_AGE'], 'chi_doc': True}
+
+        with tempfile.TemporaryDirectory() as thu_muc:
+            ket_qua = {}
+            for ten, journal, ghi, doc in (
+                ('truoc', 'DELETE', cau_hinh_cu, cau_hinh_cu),
+                ('sau', 'WAL', cau_hinh_ghi, cau_hinh_doc),
+            ):
+                file_db = Path(thu_muc) / f'{ten}.sqlite3'
+                self._sao_chep(goc['NAME'], file_db, journal)
+                alias_ghi = self._dang_ky(f'bench_{ten}_ghi', file_db, ghi)
+                alias_doc = self._dang_ky(f'bench_{ten}_doc', file_db, doc)
+                self.stdout.write(f'Đo cấu hình "{ten}" (journal_mode={journal})...')
+                ket_qua[ten] = self._chay(alias_ghi, alias_doc, options)
+
+        for ten, kq in ket_qua.items():
+            self.stdout.write(
+                f'{ten:>5}: ghi {kq["ghi_moi_giay"]:,.0f}/s (p95 {kq["ghi_p95_ms"]:.1f} ms, lỗi khóa {kq["ghi_loi"]}) | '
+                f'đọc {kq["doc_moi_giay"]:,.1f}/s (p95 {kq["doc_p95_ms"]:.1f} ms, lỗi {kq["doc_loi"]})'
+            )
+        truoc, sau = ket_qua['truoc'], ket_qua['sau']
+        if truoc['ghi_moi_giay'] and truoc['doc_moi_giay']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Ghi x{sau["ghi_moi_giay"] / truoc["ghi_moi_giay"]:.1f}, '
+                f'đọc x{sau["doc_moi_giay"] / truoc["doc_moi_giay"]:.1f}'
+            ))
+
+    def _sao_chep(self, nguon, dich, journal):
+        """Sao chép nhất quán bằng backup API rồi đặt chế độ journal."""
+        src = sqlite3.connect(str(nguon))
+        dst = sqlite3.connect(str(dich))
+        try:
+            src.backup(dst)
+            dst.execute(f'PRAGMA journal_mode={journal}')
+        finally:
+            src.close()
+            dst.close()
+
+    def _dang_ky(self, alias, file_db, cau_hinh):
+        settings_dict = copy.deepcopy(connections.settings['default'])
+        settings_dict['NAME'] = (
+            file_db.as_uri() + '?mode=ro' if cau_hinh.get('chi_doc') else str(file_db)
+        )
+        settings_dict['OPTIONS'] = dict(cau_hinh['OPTIONS'])
+        settings_dict['CONN_MAX_AGE'] = cau_hinh['CONN_MAX_AGE']
+        connections.settings[alias] = settings_dict
+        return alias
+
+    def _chay(self, alias_ghi, alias_doc, options):
+        het_gio = time.perf_counter() + options['seconds']
+        khoa = threading.Lock()
+        mau = {'ghi': [], 'doc': [], 'ghi_loi': 0, 'doc_loi': 0}
+
+        def ghi(seed):
+            rng = random.Random(seed)
+            thoi_gian, loi = [], 0
+            while time.perf_counter() < het_gio:
+                bat_dau = time.perf_counter()
+                try:
+                    with transaction.atomic(using=alias_ghi):
+                        ChamCong.objects.using(alias_ghi).filter(
+                            pk=rng.choice(self.cham_cong_ids)
+                        ).update(gio_ra=f'{rng.randint(16, 19):02d}:{rng.randint(0, 59):02d}')
+                    thoi_gian.append((time.perf_counter() - bat_dau) * 1000)
+                except OperationalError:
+                    loi += 1
+            connections[alias_ghi].close()
+            with khoa:
+                mau['ghi'].extend(thoi_gian)
+                mau['ghi_loi'] += loi
+
+        def doc(seed):
+            rng = random.Random(seed)
+            thoi_gian, loi = [], 0
+            while time.perf_counter() < het_gio:
+                thang = rng.choice(self.cac_thang)
+                bat_dau = time.perf_counter()
+                try:
+                    list(_tong_hop_theo_thang(
+                        ChamCong.objects.using(alias_doc).filter(ngay__range=khoang_thang(thang.year, thang.month))
+                    ))
+                    thoi_gian.append((time.perf_counter() - bat_dau) * 1000)
+                except OperationalError:
+                    loi += 1
+            connections[alias_doc].close()
+            with khoa:
+                mau['doc'].extend(thoi_gian)
+                mau['doc_loi'] += loi
+
+        luong = [threading.Thread(target=ghi, args=(i,)) for i in range(options['writers'])]
+        luong += [threading.Thread(target=doc, args=(100 + i,)) for i in range(options['readers'])]
+        bat_dau = time.perf_counter()
+        for t in luong:
+            t.start()
+        for t in luong:
+            t.join()
+        tong = time.perf_counter() - bat_dau
+
+        ghi_ms, doc_ms = sorted(mau['ghi']), sorted(mau['doc'])
+        return {
+            'ghi_moi_giay': len(ghi_ms) / tong,
+            'ghi_p95_ms': phan_vi(ghi_ms, 95) or 0,
+            'ghi_loi': mau['ghi_loi'],
+            'doc_moi_giay': len(doc_ms) / tong,
+            'doc_p95_ms': phan_vi(doc_ms, 95) or 0,
+            'doc_loi': mau['doc_loi'],
+        }
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from nhan_vien.models import NhanVien, Payslip
+from nhan_vien.serializers import (
+    NhanVienSerializer, PayslipSerializer, nhan_vien_list_data, payslip_list_data
+)
+
+# (queryset, serializer DRF, đường đọc nhanh) — queryset giống action list của ViewSet
+DOI_TUONG = {
+    'nhanvien': (
+        lambda: NhanVien.objects.all().select_related('user', 'phong_ban', 'chuc_vu'),
+        NhanVienSerializer, nhan_vien_list_data,
+    ),
+    'payslip': (
+        lambda: Payslip.objects.all().select_related('nhan_vien').order_by('-nam', '-thang'),
+        PayslipSerializer, payslip_list_data,
+    ),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'So sánh tốc độ serialize danh sách (dòng/giây) giữa serializer DRF '
+        'và đường đọc nhanh từ .values(), đồng thời kiểm tra JSON giống hệt nhau.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', choices=[*DOI_TUONG, 'all'], default='all',
+            help='Danh sách cần đo (mặc định: tất cả).'
+        )
+        parser.add_argument('--repeat', type=int, default=3, help='Số lần đo, lấy lần nhanh nhất.')
+        parser.add_argument('--limit', type=int, help='Chỉ lấy N dòng đầu.')
+
+    def _do(self, ham, repeat):
+        tot_nhat, ket_qua = None, None
+        for _ in range(repeat):
+            bat_dau = time.perf_counter()
+            ket_qua = JSONRenderer().render(ham())
+            thoi_gian = time.perf_counter() - bat_dau
+            tot_nhat = thoi_gian if tot_nhat is None else min(tot_nhat, thoi_gian)
+        return tot_nhat, ket_qua
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat phải >= 1')
+        ten_list = list(DOI_TUONG) if options['model'] == 'all' else [options['model']]
+
+        for ten in ten_list:
+            lay_queryset, serializer_class, doc_nhanh = DOI_TUONG[ten]
+            queryset = lay_queryset()
+            if options['limit']:
+                queryset = queryset[:options['limit']]
+            so_dong = queryset.count()
+            if so_dong == 0:
+                self.stdout.write(f'{ten}: không có dữ liệu, bỏ qua.')
+                continue
+
+            # Mỗi lần đo dùng queryset mới để không dùng lại cache kết quả
+            t_drf, json_drf = self._do(lambda: serializer_class(queryset.all(), many=True).data, options['repeat'])
+            t_nhanh, json_nhanh = self._do(lambda: doc_nhanh(queryset.all()), options['repeat'])
+            if json_drf != json_nhanh:
+                raise CommandError(f'{ten}: JSON của đường đọc nhanh KHÁC serializer DRF!')
+
+            self.stdout.write(
+                f'{ten}: {so_dong} dòng | '
+                f'DRF {so_dong / t_drf:,.0f} dòng/s ({t_drf * 1000:.1f} ms) | '
+                f'nhanh {so_dong / t_nhanh:,.0f} dòng/s ({t_nhanh * 1000:.1f} ms) | '
+                f'x{t_drf / t_nhanh:.1f}'
+            )
+        self.stdout.write(self.style.SUCCESS('JSON giống hệt nhau ở mọi danh sách đã đo.'))
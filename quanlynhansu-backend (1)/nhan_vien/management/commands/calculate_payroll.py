@@ -1,103 +1,84 @@
-from django.core.management.base import BaseCommand, CommandError
-from django.db import transaction
-from nhan_vien.models import NhanVien, ChamCong, Payslip, Position # Thêm Position
+import time
 from datetime import date, timedelta
-from decimal import Decimal
-import calendar # Thư viện để lấy số ngày trong tháng
-
-class Command(BaseCommand):
-    help = 'Tính và tạo bảng lương cho tháng trước dựa trên dữ liệu chấm công.'
 
-    def handle(self, *args, **options):
-        current_date = date.today()
-        # Tính lương cho tháng TRƯỚC
-        first_day_of_current_month = current_date.replace(day=1)
-        last_day_of_previous_month = first_day_of_current_month - timedelta(days=1)
-        target_month = last_day_of_previous_month.month
-        target_year = last_day_of_previous_month.year
-
-        # Xác định số ngày làm việc chuẩn trong tháng (ví dụ: trừ Chủ Nhật)
-        num_days_in_month = calendar.monthrange(target_year, target_month)[1]
-        standard_working_days = 0
-        for day in range(1, num_days_in_month + 1):
-            try:
-                current_day = date(target_year, target_month, day)
-                # weekday() trả về 0=Thứ 2, ..., 6=Chủ Nhật
-                if current_day.weekday() != 6: # Bỏ qua Chủ Nhật
-                    standard_working_days += 1
-            except ValueError:
-                pass # Ngày không hợp lệ (hiếm khi xảy ra)
-        
-        if standard_working_days == 0:
-             self.stderr.write(self.style.ERROR(f'Không thể xác định ngày công chuẩn cho tháng {target_month}/{target_year}.'))
-             return
+from django.core.management.base import BaseCommand, CommandError
 
+from nhan_vien.payroll import (
+    chay_tinh_luong_song_song, so_ngay_cong_chuan, ma_shard, CHUNK_SIZE
+)
 
-        self.stdout.write(self.style.SUCCESS(f'Bắt đầu tính lương tháng {target_month}/{target_year} (Công chuẩn: {standard_working_days} ngày)...'))
 
-        employees = NhanVien.objects.filter(status='Hoạt động') # Chỉ tính cho nhân viên còn hoạt động
+class Command(BaseCommand):
+    help = (
+        'Tính và tạo bảng lương dựa trên dữ liệu chấm công '
+        '(mặc định: tháng trước). Chia shard theo phòng ban, có thể chạy song song '
+        'và tiếp tục từ checkpoint nếu lần chạy trước bị gián đoạn.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=int, help='Tháng cần tính (1-12).')
+        parser.add_argument('--year', type=int, help='Năm cần tính.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Số tiến trình song song (mỗi tiến trình xử lý một phòng ban).'
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help='Bỏ qua checkpoint của lần chạy bị gián đoạn và tính lại từ đầu.'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Số bảng lương mỗi lần bulk upsert.'
+        )
 
-        for employee in employees:
-            # Lấy lương cơ bản từ Chức Vụ của nhân viên
-            try:
-                position = employee.chuc_vu
-                if not position:
-                     self.stderr.write(self.style.WARNING(f'  - Bỏ qua {employee.ho_ten}: Chưa có chức vụ.'))
-                     continue
-                luong_co_ban_thang = position.base_salary
-            except Position.DoesNotExist:
-                 self.stderr.write(self.style.WARNING(f'  - Bỏ qua {employee.ho_ten}: Chưa có chức vụ.'))
-                 continue
-            except AttributeError:
-                 self.stderr.write(self.style.WARNING(f'  - Bỏ qua {employee.ho_ten}: Model ChucVu chưa có trường base_salary.'))
-                 continue
+    def handle(self, *args, **options):
+        # Mặc định tính lương cho tháng TRƯỚC
+        first_day_of_current_month = date.today().replace(day=1)
+        last_day_of_previous_month = first_day_of_current_month - timedelta(days=1)
+        target_month = options['month'] or last_day_of_previous_month.month
+        target_year = options['year'] or last_day_of_previous_month.year
 
+        if not 1 <= target_month <= 12:
+            raise CommandError(f'Tháng không hợp lệ: {target_month}')
+        if options['workers'] < 1:
+            raise CommandError('--workers phải >= 1')
 
-            # --- TÍNH TOÁN DỰA TRÊN CHẤM CÔNG ---
-            attendances = ChamCong.objects.filter(
-                nhan_vien=employee,
-                ngay__year=target_year,
-                ngay__month=target_month
+        standard_working_days = so_ngay_cong_chuan(target_year, target_month)
+        if standard_working_days == 0:
+            self.stderr.write(self.style.ERROR(f'Không thể xác định ngày công chuẩn cho tháng {target_month}/{target_year}.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Bắt đầu tính lương tháng {target_month}/{target_year} '
+            f'(Công chuẩn: {standard_working_days} ngày, {options["workers"]} worker)...'
+        ))
+
+        bat_dau = time.perf_counter()
+        tong_bang_luong = 0
+        so_shard = 0
+        for phong_ban_id, ket_qua in chay_tinh_luong_song_song(
+            target_month, target_year,
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            khoi_dong_lai=options['restart'],
+        ):
+            so_shard += 1
+            tong_bang_luong += ket_qua.so_bang_luong
+            for ho_ten, ly_do in ket_qua.bo_qua:
+                self.stderr.write(self.style.WARNING(f'  - Bỏ qua {ho_ten}: {ly_do}'))
+            self.stdout.write(
+                f'  - {ma_shard(phong_ban_id)}: {ket_qua.so_bang_luong} bảng lương '
+                f'(Đọc: {ket_qua.thoi_gian_doc:.3f}s | Tính: {ket_qua.thoi_gian_tinh:.3f}s | '
+                f'Ghi: {ket_qua.thoi_gian_ghi:.3f}s)'
             )
-            actual_working_days = attendances.count() # Số ngày có chấm công
-
-            # Tính lương thực tế dựa trên tỉ lệ ngày công
-            if standard_working_days > 0:
-                salary_based_on_attendance = (luong_co_ban_thang / Decimal(standard_working_days)) * Decimal(actual_working_days)
-            else:
-                salary_based_on_attendance = Decimal(0)
-
-            # (Các phần tính thưởng, phụ cấp, OT, thuế cần thêm logic ở đây)
-            phu_cap = Decimal('1000000') # Ví dụ
-            khau_tru = Decimal('1050000') # Ví dụ BHXH
-            bonus = Decimal('0') # Ví dụ
-            ot_amount = Decimal('0') # Cần tính từ bảng Overtime nếu có
-            tax = Decimal('0') # Cần tính thuế TNCN
-
-            luong_thuc_nhan_tinh_toan = salary_based_on_attendance + bonus + phu_cap + ot_amount - khau_tru - tax
-
-            # Làm tròn đến 2 chữ số thập phân (hoặc theo quy định công ty)
-            luong_thuc_nhan_tinh_toan = luong_thuc_nhan_tinh_toan.quantize(Decimal("0.01"))
-
-            # --- LƯU BẢNG LƯƠNG ---
-            try:
-                with transaction.atomic():
-                    payslip, created = Payslip.objects.update_or_create(
-                        nhan_vien=employee,
-                        thang=target_month,
-                        nam=target_year,
-                        defaults={
-                            'luong_co_ban': luong_co_ban_thang, # Lương cơ bản theo chức vụ
-                            'phu_cap': phu_cap,
-                            'khau_tru': khau_tru,
-                            'luong_thuc_nhan': luong_thuc_nhan_tinh_toan
-                            # Cập nhật các trường khác
-                        }
-                    )
-                    status_msg = "Đã tạo" if created else "Đã cập nhật"
-                    self.stdout.write(f'  - {status_msg} bảng lương cho: {employee.ho_ten} ({actual_working_days}/{standard_working_days} ngày công)')
+        tong_thoi_gian = time.perf_counter() - bat_dau
 
-            except Exception as e:
-                self.stderr.write(self.style.ERROR(f'  - Lỗi khi lưu lương cho {employee.ho_ten}: {e}'))
+        if so_shard == 0:
+            self.stdout.write(self.style.WARNING('Không có nhân viên nào để tính lương.'))
+            return
 
-        self.stdout.write(self.style.SUCCESS('Hoàn thành!'))
\ No newline at end of file
+        dong_moi_giay = tong_bang_luong / tong_thoi_gian if tong_thoi_gian > 0 else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Hoàn thành! {so_shard} phòng ban, {tong_bang_luong} bảng lương trong '
+            f'{tong_thoi_gian:.3f}s ({dong_moi_giay:,.0f} dòng/giây).'
+        ))
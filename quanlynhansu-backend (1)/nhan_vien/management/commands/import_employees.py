@@ -0,0 +1,67 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nhan_vien.onboarding import CHUNK_SIZE, nhap_nhan_vien, so_worker_mac_dinh
+from nhan_vien.parsers import CSVParser, NDJSONParser
+
+DINH_DANG = ('csv', 'json', 'ndjson')
+
+
+class Command(BaseCommand):
+    help = (
+        'Nhập nhân viên hàng loạt từ file CSV / JSON / NDJSON (cùng định dạng với '
+        'POST /api/nhanvien/bulk-import/). Mật khẩu được băm song song trên nhiều tiến trình; '
+        'mỗi chunk được ghi bằng bulk_create trong một transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='Đường dẫn file dữ liệu.')
+        parser.add_argument('--format', choices=DINH_DANG, help='Mặc định: đoán theo phần mở rộng của file.')
+        parser.add_argument('--workers', type=int, default=so_worker_mac_dinh(),
+                            help='Số tiến trình băm mật khẩu (mặc định: số CPU).')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Số nhân viên mỗi transaction.')
+        parser.add_argument('--report', help='Ghi báo cáo (JSON) ra file này.')
+
+    def handle(self, *args, **options):
+        duong_dan = Path(options['file'])
+        if not duong_dan.is_file():
+            raise CommandError(f'Không tìm thấy file {duong_dan}.')
+        dinh_dang = options['format'] or duong_dan.suffix.lstrip('.').lower()
+        if dinh_dang not in DINH_DANG:
+            raise CommandError('Không đoán được định dạng, hãy dùng --format csv|json|ndjson.')
+        if options['workers'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('--workers và --chunk-size phải >= 1')
+
+        with open(duong_dan, 'rb') as f:
+            if dinh_dang == 'csv':
+                rows = CSVParser().parse(f, parser_context={'encoding': 'utf-8-sig'})
+            elif dinh_dang == 'ndjson':
+                rows = NDJSONParser().parse(f, parser_context={'encoding': 'utf-8'})
+            else:
+                try:
+                    rows = json.load(f)
+                except ValueError as exc:
+                    raise CommandError(f'JSON không hợp lệ: {exc}')
+        if not isinstance(rows, list):
+            raise CommandError('File JSON phải là một mảng các nhân viên.')
+
+        self.stdout.write(f'Nhập {len(rows)} dòng với {options["workers"]} worker...')
+        bat_dau = time.perf_counter()
+        ket_qua = nhap_nhan_vien(rows, workers=options['workers'], chunk_size=options['chunk_size'])
+        thoi_gian = time.perf_counter() - bat_dau
+
+        for loi in ket_qua['loi'][:20]:
+            self.stderr.write(self.style.WARNING(f'  - Dòng {loi["dong"]}: {loi["loi"]}'))
+        if len(ket_qua['loi']) > 20:
+            self.stderr.write(self.style.WARNING(f'  ... và {len(ket_qua["loi"]) - 20} lỗi khác.'))
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as f:
+                json.dump(ket_qua, f, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Đã ghi báo cáo vào {options["report"]}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Hoàn thành! Tạo {ket_qua["tao_moi"]}/{ket_qua["so_dong"]} nhân viên, '
+            f'{len(ket_qua["loi"])} dòng lỗi trong {thoi_gian:.1f}s.'
+        ))
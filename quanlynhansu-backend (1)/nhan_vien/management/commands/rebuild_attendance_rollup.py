@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nhan_vien.attendance import rebuild_tong_hop
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại bảng tổng hợp chấm công theo tháng (ChamCongThang) từ dữ liệu chấm công gốc.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help='Chỉ dựng lại năm này.')
+        parser.add_argument('--month', type=int, help='Chỉ dựng lại tháng này (cần --year).')
+
+    def handle(self, *args, **options):
+        nam, thang = options['year'], options['month']
+        if thang is not None and nam is None:
+            raise CommandError('--month cần đi kèm --year.')
+        if thang is not None and not 1 <= thang <= 12:
+            raise CommandError(f'Tháng không hợp lệ: {thang}')
+
+        pham_vi = f'{thang}/{nam}' if thang else (str(nam) if nam else 'toàn bộ dữ liệu')
+        self.stdout.write(self.style.SUCCESS(f'Bắt đầu dựng lại tổng hợp chấm công ({pham_vi})...'))
+        bat_dau = time.perf_counter()
+        so_dong = rebuild_tong_hop(nam=nam, thang=thang)
+        self.stdout.write(self.style.SUCCESS(
+            f'Hoàn thành! {so_dong} dòng tổng hợp trong {time.perf_counter() - bat_dau:.3f}s.'
+        ))
@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from nhan_vien.search import rebuild_chi_muc
+
+
+class Command(BaseCommand):
+    help = (
+        'Dựng lại chỉ mục tìm kiếm nhân viên (FTS5) từ bảng NhanVien. '
+        'Dùng sau khi nhập dữ liệu hàng loạt không qua signal.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Bắt đầu dựng lại chỉ mục tìm kiếm nhân viên...'))
+        bat_dau = time.perf_counter()
+        so_dong = rebuild_chi_muc()
+        self.stdout.write(self.style.SUCCESS(
+            f'Hoàn thành! {so_dong} nhân viên trong {time.perf_counter() - bat_dau:.3f}s.'
+        ))
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from nhan_vien.payroll import tinh_lai_bang_luong
+
+
+class Command(BaseCommand):
+    help = (
+        'Chỉ tính lại các bảng lương đã bị đánh dấu "cần tính lại" (do chấm công '
+        'hoặc chức vụ thay đổi sau khi tính), và báo cáo các thay đổi.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month', type=int, help='Chỉ tính lại tháng này (1-12).')
+        parser.add_argument('--year', type=int, help='Chỉ tính lại năm này.')
+
+    def handle(self, *args, **options):
+        if options['month'] is not None and not 1 <= options['month'] <= 12:
+            raise CommandError(f'Tháng không hợp lệ: {options["month"]}')
+
+        bat_dau = time.perf_counter()
+        ket_qua = tinh_lai_bang_luong(thang=options['month'], nam=options['year'])
+        tong_thoi_gian = time.perf_counter() - bat_dau
+
+        if ket_qua['so_bang_luong'] == 0:
+            self.stdout.write(self.style.SUCCESS('Không có bảng lương nào cần tính lại.'))
+            return
+        for item in ket_qua['thay_doi']:
+            self.stdout.write(
+                f'  - {item["ma_nhan_vien"]} {item["thang"]}/{item["nam"]}: '
+                f'{item["luong_thuc_nhan_cu"]:,} -> {item["luong_thuc_nhan_moi"]:,} ({item["chenh_lech"]:+,})'
+            )
+        for item in ket_qua['bo_qua']:
+            self.stderr.write(self.style.WARNING(
+                f'  - Bỏ qua {item["ma_nhan_vien"]} {item["thang"]}/{item["nam"]}: {item["ly_do"]}'
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'Hoàn thành! Tính lại {ket_qua["so_bang_luong"]} bảng lương, {ket_qua["so_thay_doi"]} thay đổi '
+            f'(tổng chênh lệch {ket_qua["tong_chenh_lech"]:+,}) trong {tong_thoi_gian:.3f}s.'
+        ))
@@ -0,0 +1,61 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from nhan_vien.jobs import chay_cac_tac_vu_dang_cho, danh_dau_worker_song, ten_worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Worker chạy các tác vụ nền (bảng TacVu): tính lương, xuất file, nhập nhân viên... '
+        'Có thể chạy nhiều worker cùng lúc; mỗi tác vụ chỉ được một worker nhận.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help='Số thread chạy tác vụ song song.')
+        parser.add_argument('--once', action='store_true', help='Chạy hết hàng đợi hiện tại rồi thoát.')
+        parser.add_argument('--poll', type=float, default=2.0, help='Số giây chờ khi hàng đợi trống.')
+
+    def handle(self, *args, **options):
+        if options['threads'] < 1:
+            raise CommandError('--threads phải >= 1')
+        dung = threading.Event()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda *_: dung.set())
+
+        def vong_lap(so_thu_tu):
+            worker = ten_worker(so_thu_tu)
+            try:
+                while not dung.is_set():
+                    close_old_connections()
+                    if not options['once']:
+                        # --once thoát ngay sau đó: không báo cho API là có worker
+                        danh_dau_worker_song()
+                    so_tac_vu = chay_cac_tac_vu_dang_cho(worker, dung)
+                    if so_tac_vu:
+                        self.stdout.write(f'[{worker}] Đã chạy {so_tac_vu} tác vụ.')
+                    if options['once']:
+                        break
+                    dung.wait(options['poll'])
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=vong_lap, args=(i,), daemon=True)
+            for i in range(options['threads'])
+        ]
+        self.stdout.write(f'Worker tác vụ nền: {len(threads)} thread. Ctrl+C để dừng.')
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            dung.set()
+            self.stdout.write('Đang dừng: chờ các tác vụ đang chạy kết thúc...')
+            for thread in threads:
+                thread.join()
+        self.stdout.write(self.style.SUCCESS('Worker đã dừng.'))
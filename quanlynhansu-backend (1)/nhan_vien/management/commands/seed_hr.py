@@ -0,0 +1,256 @@
+import random
+import time
+from datetime import date, timedelta, time as gio_trong_ngay
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from nhan_vien.attendance import rebuild_tong_hop
+from nhan_vien.caching import lam_moi_phien_ban
+from nhan_vien.models import (
+    PhongBan, ChucVu, NhanVien, UserAccount, ChamCong, DonXinNghi, Payslip
+)
+from nhan_vien.payroll import PHU_CAP_MAC_DINH, KHAU_TRU_MAC_DINH
+from nhan_vien.search import rebuild_chi_muc
+from nhan_vien.workdays import la_ngay_lam_viec
+
+HO = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Vũ', 'Võ', 'Đặng', 'Bùi', 'Đỗ']
+TEN_DEM = ['Văn', 'Thị', 'Hữu', 'Minh', 'Thanh', 'Ngọc', 'Đức', 'Thu', 'Quốc', 'Gia']
+TEN = ['An', 'Bình', 'Cường', 'Dũng', 'Giang', 'Hà', 'Hải', 'Hạnh', 'Hùng', 'Lan',
+       'Linh', 'Long', 'Mai', 'Nam', 'Nga', 'Phong', 'Quân', 'Sơn', 'Thảo', 'Trang', 'Tuấn', 'Yến']
+LY_DO = ['Việc gia đình', 'Nghỉ ốm', 'Nghỉ phép năm', 'Đi khám bệnh', 'Việc cá nhân']
+
+
+class Command(BaseCommand):
+    help = (
+        'Sinh dữ liệu giả lập (phòng ban, chức vụ, nhân viên, chấm công, đơn xin nghỉ, '
+        'bảng lương) bằng bulk insert để thử tải. Mọi tài khoản dùng chung một mật khẩu '
+        '(băm một lần). Tài khoản đầu tiên có vai trò Admin.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--nhan-vien', type=int, default=1000, help='Số nhân viên.')
+        parser.add_argument('--cham-cong', type=int, default=100_000, help='Tổng số dòng chấm công.')
+        parser.add_argument('--don-xin-nghi', type=int, default=5000, help='Số đơn xin nghỉ.')
+        parser.add_argument('--nam-luong', type=int, default=1, help='Số năm bảng lương (tính lùi từ tháng trước).')
+        parser.add_argument('--phong-ban', type=int, default=20, help='Số phòng ban.')
+        parser.add_argument('--chuc-vu', type=int, default=10, help='Số chức vụ.')
+        parser.add_argument(
+            '--prefix', default='SD',
+            help='Tiền tố mã nhân viên / tên tài khoản (tối đa 4 ký tự), để phân biệt với dữ liệu thật.'
+        )
+        parser.add_argument('--password', default='matkhau123', help='Mật khẩu chung cho mọi tài khoản.')
+        parser.add_argument('--seed', type=int, default=42, help='Seed cho bộ sinh ngẫu nhiên.')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Số bản ghi mỗi lần bulk_create.')
+
+    def handle(self, *args, **options):
+        self.prefix = options['prefix'].upper()
+        if not 1 <= len(self.prefix) <= 4:
+            raise CommandError('--prefix phải có từ 1 đến 4 ký tự (mã nhân viên tối đa 10 ký tự).')
+        if options['nhan_vien'] < 1 or options['nhan_vien'] > 999_999:
+            raise CommandError('--nhan-vien phải trong khoảng 1..999999.')
+        if NhanVien.objects.filter(ma_nhan_vien__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Đã có nhân viên với tiền tố {self.prefix}. Dùng --prefix khác hoặc xóa dữ liệu cũ trước.'
+            )
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        bat_dau = time.perf_counter()
+
+        phong_ban_ids, chuc_vu = self._tao_danh_muc(options['phong_ban'], options['chuc_vu'])
+        self.stdout.write(f'  Danh mục: {len(phong_ban_ids)} phòng ban, {len(chuc_vu)} chức vụ')
+        nhan_vien = self._buoc('Nhân viên', self._tao_nhan_vien,
+                               options['nhan_vien'], options['password'], phong_ban_ids, chuc_vu)
+        nhan_vien_ids = [nv_id for nv_id, _ in nhan_vien]
+        self._buoc('Chấm công', self._tao_cham_cong, nhan_vien_ids, options['cham_cong'])
+        self._buoc('Đơn xin nghỉ', self._tao_don_xin_nghi, nhan_vien_ids, options['don_xin_nghi'])
+        self._buoc('Bảng lương', self._tao_bang_luong, nhan_vien, options['nam_luong'])
+        self._buoc('Tổng hợp chấm công', rebuild_tong_hop)
+        self._buoc('Chỉ mục tìm kiếm', rebuild_chi_muc)
+
+        # bulk_create không phát signal: tự làm mới cache danh mục
+        lam_moi_phien_ban(PhongBan)
+        lam_moi_phien_ban(ChucVu)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Hoàn thành trong {time.perf_counter() - bat_dau:.1f}s. '
+            f'Đăng nhập Admin: seed_{self.prefix.lower()}000001 / {options["password"]}'
+        ))
+
+    def _buoc(self, ten, ham, *args):
+        bat_dau = time.perf_counter()
+        ket_qua = ham(*args)
+        thoi_gian = time.perf_counter() - bat_dau
+        so_dong = ket_qua if isinstance(ket_qua, int) else len(ket_qua)
+        self.stdout.write(
+            f'  {ten}: {so_dong:,} dòng trong {thoi_gian:.2f}s'
+            f' ({so_dong / thoi_gian if thoi_gian else 0:,.0f} dòng/s)'
+        )
+        return ket_qua
+
+    def _bulk(self, model, objs):
+        """bulk_create theo từng lô, mỗi lô một transaction."""
+        tong = 0
+        batch = []
+        for obj in objs:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                with transaction.atomic():
+                    model.objects.bulk_create(batch, batch_size=self.batch_size)
+                tong += len(batch)
+                batch = []
+        if batch:
+            with transaction.atomic():
+                model.objects.bulk_create(batch, batch_size=self.batch_size)
+        return tong + len(batch)
+
+    # ===============================================
+    # Các bước sinh dữ liệu
+    # ===============================================
+
+    def _tao_danh_muc(self, so_phong_ban, so_chuc_vu):
+        """Trả về (list id phòng ban, list (id, lương cơ bản) chức vụ)."""
+        ten_pb = [f'{self.prefix} Phòng {i}' for i in range(1, so_phong_ban + 1)]
+        ten_cv = [f'{self.prefix} Chức vụ {i}' for i in range(1, so_chuc_vu + 1)]
+        with transaction.atomic():
+            PhongBan.objects.bulk_create(
+                [PhongBan(ten_phong_ban=ten) for ten in ten_pb], ignore_conflicts=True
+            )
+            ChucVu.objects.bulk_create(
+                [ChucVu(ten_chuc_vu=ten, luong_co_ban=Decimal(8_000_000 + i * 2_000_000))
+                 for i, ten in enumerate(ten_cv)],
+                ignore_conflicts=True,
+            )
+        phong_ban_ids = list(PhongBan.objects.filter(ten_phong_ban__in=ten_pb).values_list('id', flat=True))
+        chuc_vu = list(ChucVu.objects.filter(ten_chuc_vu__in=ten_cv).values_list('id', 'luong_co_ban'))
+        return phong_ban_ids, chuc_vu
+
+    def _tao_nhan_vien(self, so_luong, password, phong_ban_ids, chuc_vu):
+        """Trả về list (nhan_vien_id, lương cơ bản theo chức vụ)."""
+        rng = self.rng
+        # Băm một lần cho mọi tài khoản (PBKDF2 rất chậm)
+        mat_khau = make_password(password)
+        hom_nay = date.today()
+        ket_qua = []
+        for start in range(0, so_luong, self.batch_size):
+            so_thu_tu = range(start + 1, min(start + self.batch_size, so_luong) + 1)
+            with transaction.atomic():
+                users = User.objects.bulk_create([
+                    User(username=f'seed_{self.prefix.lower()}{i:06d}', password=mat_khau)
+                    for i in so_thu_tu
+                ])
+                ds_nhan_vien, luong = [], []
+                for i, user in zip(so_thu_tu, users):
+                    cv_id, luong_co_ban = rng.choice(chuc_vu) if chuc_vu else (None, Decimal(0))
+                    ds_nhan_vien.append(NhanVien(
+                        user_id=user.pk,
+                        ma_nhan_vien=f'{self.prefix}{i:06d}',
+                        ho_ten=f'{rng.choice(HO)} {rng.choice(TEN_DEM)} {rng.choice(TEN)}',
+                        ngay_sinh=hom_nay - timedelta(days=rng.randint(22 * 365, 60 * 365)),
+                        ngay_vao_lam=hom_nay - timedelta(days=rng.randint(30, 15 * 365)),
+                        phong_ban_id=rng.choice(phong_ban_ids) if phong_ban_ids else None,
+                        chuc_vu_id=cv_id,
+                    ))
+                    luong.append(luong_co_ban)
+                NhanVien.objects.bulk_create(ds_nhan_vien)
+                UserAccount.objects.bulk_create([
+                    UserAccount(user_id=nv.user_id, employee_id=nv.pk, role=self._vai_tro(i))
+                    for i, nv in zip(so_thu_tu, ds_nhan_vien)
+                ])
+            ket_qua.extend((nv.pk, l) for nv, l in zip(ds_nhan_vien, luong))
+        return ket_qua
+
+    @staticmethod
+    def _vai_tro(so_thu_tu):
+        if so_thu_tu == 1:
+            return 'Admin'
+        if so_thu_tu % 200 == 0:
+            return 'HR'
+        if so_thu_tu % 50 == 0:
+            return 'Manager'
+        return 'Employee'
+
+    def _ngay_lam_viec_lui(self):
+        """Các ngày làm việc (theo lịch làm việc chung) tính lùi từ hôm qua."""
+        ngay = date.today() - timedelta(days=1)
+        while True:
+            if la_ngay_lam_viec(ngay):
+                yield ngay
+            ngay -= timedelta(days=1)
+
+    def _tao_cham_cong(self, nhan_vien_ids, tong):
+        """Mỗi ngày làm việc một dòng cho mỗi nhân viên, lùi dần tới khi đủ `tong` dòng."""
+        rng = self.rng
+
+        def sinh():
+            con_lai = tong
+            for ngay in self._ngay_lam_viec_lui():
+                for nhan_vien_id in nhan_vien_ids:
+                    if con_lai <= 0:
+                        return
+                    con_lai -= 1
+                    phut_vao = 7 * 60 + 30 + rng.randint(0, 60)
+                    # ~2% quên chấm giờ ra
+                    phut_ra = None if rng.random() < 0.02 else phut_vao + 8 * 60 + rng.randint(0, 120)
+                    yield ChamCong(
+                        nhan_vien_id=nhan_vien_id, ngay=ngay,
+                        gio_vao=_gio(phut_vao),
+                        gio_ra=_gio(phut_ra) if phut_ra is not None else None,
+                    )
+
+        return self._bulk(ChamCong, sinh())
+
+    def _tao_don_xin_nghi(self, nhan_vien_ids, tong):
+        """
+        Đơn của cùng một nhân viên không chồng lấn nhau (quy tắc của leave):
+        mỗi nhân viên sinh lùi dần từ 60 ngày tới, đơn sau kết thúc trước
+        ngày bắt đầu của đơn trước.
+        """
+        rng = self.rng
+        hom_nay = date.today()
+        # nhan_vien_id -> ngày bắt đầu của đơn sớm nhất đã sinh
+        moc = {}
+
+        def sinh():
+            for _ in range(tong):
+                nhan_vien_id = rng.choice(nhan_vien_ids)
+                ket_thuc = moc.get(nhan_vien_id, hom_nay + timedelta(days=61)) - timedelta(days=rng.randint(1, 120))
+                bat_dau = ket_thuc - timedelta(days=rng.randint(0, 4))
+                moc[nhan_vien_id] = bat_dau
+                yield DonXinNghi(
+                    nhan_vien_id=nhan_vien_id,
+                    ngay_bat_dau=bat_dau,
+                    ngay_ket_thuc=ket_thuc,
+                    ly_do=rng.choice(LY_DO),
+                    trang_thai=rng.choices(['pending', 'approved', 'rejected'], weights=[2, 7, 1])[0],
+                )
+
+        return self._bulk(DonXinNghi, sinh())
+
+    def _tao_bang_luong(self, nhan_vien, so_nam):
+        thang_truoc = date.today().replace(day=1) - timedelta(days=1)
+        ky_luong = []
+        nam, thang = thang_truoc.year, thang_truoc.month
+        for _ in range(so_nam * 12):
+            ky_luong.append((nam, thang))
+            nam, thang = (nam, thang - 1) if thang > 1 else (nam - 1, 12)
+
+        def sinh():
+            for nam, thang in ky_luong:
+                for nhan_vien_id, luong_co_ban in nhan_vien:
+                    # bulk_create không gọi save(): tự tính lương thực nhận
+                    yield Payslip(
+                        nhan_vien_id=nhan_vien_id, thang=thang, nam=nam,
+                        luong_co_ban=luong_co_ban, phu_cap=PHU_CAP_MAC_DINH, khau_tru=KHAU_TRU_MAC_DINH,
+                        luong_thuc_nhan=luong_co_ban + PHU_CAP_MAC_DINH - KHAU_TRU_MAC_DINH,
+                    )
+
+        return self._bulk(Payslip, sinh())
+
+
+def _gio(phut):
+    return gio_trong_ngay(phut // 60, phut % 60)
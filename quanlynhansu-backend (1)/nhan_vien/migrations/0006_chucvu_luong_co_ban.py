@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0005_alter_useraccount_employee_alter_useraccount_role_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chucvu',
+            name='luong_co_ban',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Lương cơ bản'),
+        ),
+    ]
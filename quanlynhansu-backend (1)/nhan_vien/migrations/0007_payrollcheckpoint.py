@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0006_chucvu_luong_co_ban'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('thang', models.PositiveIntegerField(verbose_name='Tháng')),
+                ('nam', models.PositiveIntegerField(verbose_name='Năm')),
+                ('shard', models.CharField(max_length=30, verbose_name='Shard')),
+                ('so_bang_luong', models.PositiveIntegerField(default=0, verbose_name='Số bảng lương')),
+                ('hoan_thanh_luc', models.DateTimeField(auto_now_add=True, verbose_name='Hoàn thành lúc')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint tính lương',
+                'verbose_name_plural': 'Checkpoint tính lương',
+                'unique_together': {('thang', 'nam', 'shard')},
+            },
+        ),
+    ]
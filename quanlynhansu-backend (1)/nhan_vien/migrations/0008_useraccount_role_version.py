@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0007_payrollcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='useraccount',
+            name='role_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Phiên bản vai trò'),
+        ),
+    ]
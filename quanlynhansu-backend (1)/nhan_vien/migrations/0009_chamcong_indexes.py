@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0008_useraccount_role_version'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chamcong',
+            index=models.Index(fields=['nhan_vien', 'ngay'], name='chamcong_nhanvien_ngay_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chamcong',
+            index=models.Index(fields=['ngay', 'id'], name='chamcong_ngay_id_idx'),
+        ),
+    ]
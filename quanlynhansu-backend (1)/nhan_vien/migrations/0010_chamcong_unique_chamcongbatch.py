@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0009_chamcong_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChamCongBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=100, unique=True, verbose_name='Khóa idempotency')),
+                ('so_punch', models.PositiveIntegerField(default=0, verbose_name='Số lượt chấm')),
+                ('ket_qua', models.JSONField(default=dict, verbose_name='Kết quả')),
+                ('tao_luc', models.DateTimeField(auto_now_add=True, verbose_name='Tạo lúc')),
+            ],
+            options={
+                'verbose_name': 'Lô chấm công',
+                'verbose_name_plural': 'Lô chấm công',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='chamcong',
+            name='chamcong_nhanvien_ngay_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='chamcong',
+            constraint=models.UniqueConstraint(fields=('nhan_vien', 'ngay'), name='chamcong_nhanvien_ngay_uniq'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0010_chamcong_unique_chamcongbatch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChamCongThang',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nam', models.PositiveIntegerField(verbose_name='Năm')),
+                ('thang', models.PositiveIntegerField(verbose_name='Tháng')),
+                ('so_ngay_cong', models.PositiveIntegerField(default=0, verbose_name='Số ngày công')),
+                ('tong_gio', models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='Tổng giờ làm')),
+                ('so_lan_thieu_gio_ra', models.PositiveIntegerField(default=0, verbose_name='Số lần thiếu giờ ra')),
+                ('so_lan_di_muon', models.PositiveIntegerField(default=0, verbose_name='Số lần đi muộn')),
+                ('cap_nhat_luc', models.DateTimeField(auto_now=True, verbose_name='Cập nhật lúc')),
+                ('nhan_vien', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='nhan_vien.nhanvien', verbose_name='Nhân viên')),
+            ],
+            options={
+                'verbose_name': 'Tổng hợp chấm công tháng',
+                'verbose_name_plural': 'Tổng hợp chấm công tháng',
+                'indexes': [models.Index(fields=['nam', 'thang'], name='chamcongthang_nam_thang_idx')],
+                'unique_together': {('nhan_vien', 'nam', 'thang')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0011_chamcongthang'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donxinnghi',
+            index=models.Index(fields=['nhan_vien', 'ngay_bat_dau', 'ngay_ket_thuc'], name='donxinnghi_nv_khoang_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donxinnghi',
+            index=models.Index(fields=['ngay_ket_thuc', 'ngay_bat_dau'], name='donxinnghi_khoang_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Chỉ mục tìm kiếm toàn văn cho nhân viên (SQLite FTS5), xem nhan_vien/search.py
+
+from django.db import migrations
+
+
+def tao_chi_muc(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    from nhan_vien.search import BANG_FTS, bo_dau
+
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {BANG_FTS} USING fts5('
+        "ma_nhan_vien, ho_ten, phong_ban, chuc_vu, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '1 2 3')"
+    )
+    NhanVien = apps.get_model('nhan_vien', 'NhanVien')
+    rows = NhanVien.objects.using(connection.alias).values_list(
+        'id', 'ma_nhan_vien', 'ho_ten', 'phong_ban__ten_phong_ban', 'chuc_vu__ten_chuc_vu'
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {BANG_FTS} (rowid, ma_nhan_vien, ho_ten, phong_ban, chuc_vu) VALUES (%s, %s, %s, %s, %s)',
+            [(pk, *(bo_dau(v) for v in values)) for pk, *values in rows.iterator()],
+        )
+
+
+def xoa_chi_muc(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from nhan_vien.search import BANG_FTS
+
+    schema_editor.execute(f'DROP TABLE IF EXISTS {BANG_FTS}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0012_donxinnghi_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(tao_chi_muc, xoa_chi_muc),
+    ]
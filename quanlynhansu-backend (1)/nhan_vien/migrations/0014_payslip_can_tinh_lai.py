@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0013_nhanvien_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payslip',
+            name='can_tinh_lai',
+            field=models.BooleanField(default=False, verbose_name='Cần tính lại'),
+        ),
+        migrations.AddIndex(
+            model_name='payslip',
+            index=models.Index(condition=models.Q(('can_tinh_lai', True)), fields=['nam', 'thang'], name='payslip_can_tinh_lai_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0014_payslip_can_tinh_lai'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NgayLe',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ngay', models.DateField(unique=True, verbose_name='Ngày')),
+                ('ten', models.CharField(max_length=100, verbose_name='Tên')),
+                ('la_ngay_lam', models.BooleanField(default=False, verbose_name='Là ngày làm bù')),
+            ],
+            options={
+                'verbose_name': 'Ngày lễ / ngày làm bù',
+                'verbose_name_plural': 'Ngày lễ / ngày làm bù',
+                'ordering': ['ngay'],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0015_ngayle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chamcongthang',
+            name='gio_lam_them',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='Giờ làm thêm'),
+        ),
+        migrations.AddField(
+            model_name='chamcongthang',
+            name='gio_lam_them_quy_doi',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=7, verbose_name='Giờ làm thêm quy đổi'),
+        ),
+        migrations.AddField(
+            model_name='chamcongthang',
+            name='phut_di_muon',
+            field=models.PositiveIntegerField(default=0, verbose_name='Tổng số phút đi muộn'),
+        ),
+        migrations.AddField(
+            model_name='payslip',
+            name='tien_lam_them',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=15, verbose_name='Tiền làm thêm giờ'),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:27
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0016_lam_them'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TacVu',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loai', models.CharField(choices=[('tinh_luong', 'Tính lương tháng'), ('tinh_lai_luong', 'Tính lại bảng lương'), ('xuat_bang_luong', 'Xuất bảng lương'), ('xuat_cham_cong', 'Xuất chấm công'), ('nhap_nhan_vien', 'Nhập nhân viên')], max_length=30, verbose_name='Loại')),
+                ('tham_so', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Tham số')),
+                ('trang_thai', models.CharField(choices=[('pending', 'Đang chờ'), ('running', 'Đang chạy'), ('succeeded', 'Hoàn thành'), ('failed', 'Lỗi'), ('cancelled', 'Đã hủy')], default='pending', max_length=10, verbose_name='Trạng thái')),
+                ('tien_do', models.PositiveSmallIntegerField(default=0, verbose_name='Tiến độ (%)')),
+                ('thong_diep', models.CharField(blank=True, max_length=255, verbose_name='Thông điệp')),
+                ('ket_qua', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Kết quả')),
+                ('tep_ket_qua', models.FileField(blank=True, upload_to='tac_vu/%Y/%m/', verbose_name='Tệp kết quả')),
+                ('loi', models.TextField(blank=True, verbose_name='Lỗi')),
+                ('so_lan_thu', models.PositiveSmallIntegerField(default=0, verbose_name='Số lần đã chạy')),
+                ('so_lan_thu_toi_da', models.PositiveSmallIntegerField(default=3, verbose_name='Số lần chạy tối đa')),
+                ('yeu_cau_huy', models.BooleanField(default=False, verbose_name='Yêu cầu hủy')),
+                ('worker', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('tao_luc', models.DateTimeField(auto_now_add=True, verbose_name='Tạo lúc')),
+                ('chay_sau', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Chạy sau')),
+                ('bat_dau_luc', models.DateTimeField(blank=True, null=True, verbose_name='Bắt đầu lúc')),
+                ('ket_thuc_luc', models.DateTimeField(blank=True, null=True, verbose_name='Kết thúc lúc')),
+                ('cap_nhat_luc', models.DateTimeField(blank=True, null=True, verbose_name='Cập nhật lúc')),
+                ('nguoi_tao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Người tạo')),
+            ],
+            options={
+                'verbose_name': 'Tác vụ nền',
+                'verbose_name_plural': 'Tác vụ nền',
+                'indexes': [models.Index(fields=['trang_thai', 'chay_sau', 'id'], name='tacvu_hang_doi_idx')],
+            },
+        ),
+    ]
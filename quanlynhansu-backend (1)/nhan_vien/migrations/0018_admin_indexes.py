@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0017_tacvu'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donxinnghi',
+            index=models.Index(fields=['ngay_bat_dau'], name='donxinnghi_bat_dau_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donxinnghi',
+            index=models.Index(fields=['trang_thai', 'ngay_bat_dau'], name='donxinnghi_trang_thai_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payslip',
+            index=models.Index(fields=['nam', 'thang'], name='payslip_nam_thang_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='useraccount',
+            index=models.Index(fields=['role'], name='useraccount_role_idx'),
+        ),
+    ]
@@ -0,0 +1,124 @@
+# Điền bảng tổng hợp chấm công (0011) và các cột giờ làm thêm (0016) từ
+# ChamCong sẵn có.
+#
+# Migration chỉ dùng model lịch sử và cấu hình chấm công chốt tại thời điểm
+# viết (bên dưới), không import nhan_vien.attendance hay settings: code và cấu
+# hình đó còn thay đổi. Nếu đã đổi cấu hình chấm công (giờ bắt đầu, nghỉ trưa,
+# hệ số OT, ngày lễ cố định), chạy thêm `python manage.py rebuild_attendance_rollup`.
+
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Max, Min
+
+CHUNK_SIZE = 1000
+GIAY_MOT_NGAY = 24 * 3600
+GIAY_BAT_DAU_LAM = 8 * 3600
+GIAY_LAM_CHUAN_MOT_NGAY = 8 * 3600
+NGHI_TRUA = (12 * 3600, 13 * 3600)
+HE_SO_LAM_THEM = {'ngay_thuong': 150, 'ngay_nghi': 200, 'ngay_le': 300}
+# date.weekday(): 6 = Chủ Nhật
+NGAY_NGHI_HANG_TUAN = (6,)
+NGAY_LE_CO_DINH = ((1, 1), (4, 30), (5, 1), (9, 2))
+
+
+def _giay(gio):
+    return gio.hour * 3600 + gio.minute * 60 + gio.second
+
+
+def _giay_lam_viec(gio_vao, gio_ra):
+    if gio_ra is None:
+        return 0
+    vao, ra = _giay(gio_vao), _giay(gio_ra)
+    if ra < vao:
+        ra += GIAY_MOT_NGAY
+    nghi = sum(
+        max(min(ra, NGHI_TRUA[1] + lech) - max(vao, NGHI_TRUA[0] + lech), 0)
+        for lech in (0, GIAY_MOT_NGAY)
+    )
+    return ra - vao - nghi
+
+
+def _loai_ngay(ngay, ngay_le_va_lam_bu):
+    la_ngay_lam = ngay_le_va_lam_bu.get(ngay)
+    if la_ngay_lam is False:
+        return 'ngay_le'
+    if ngay.weekday() in NGAY_NGHI_HANG_TUAN and not la_ngay_lam:
+        return 'ngay_nghi'
+    return 'ngay_thuong'
+
+
+def _doi_ra_gio(so_giay, he_so=1):
+    return (Decimal(so_giay) / Decimal(3600 * he_so)).quantize(Decimal('0.01'))
+
+
+def dien_tong_hop(apps, schema_editor):
+    db = schema_editor.connection.alias
+    ChamCong = apps.get_model('nhan_vien', 'ChamCong')
+    ChamCongThang = apps.get_model('nhan_vien', 'ChamCongThang')
+    NgayLe = apps.get_model('nhan_vien', 'NgayLe')
+
+    khoang = ChamCong.objects.using(db).aggregate(tu=Min('ngay'), den=Max('ngay'))
+    if khoang['tu'] is None:
+        return
+    # Ngày -> là ngày làm (True: làm bù, False: nghỉ lễ)
+    ngay_le_va_lam_bu = {
+        date(nam, thang, ngay): False
+        for nam in range(khoang['tu'].year, khoang['den'].year + 1)
+        for thang, ngay in NGAY_LE_CO_DINH
+    }
+    ngay_le_va_lam_bu.update(NgayLe.objects.using(db).values_list('ngay', 'la_ngay_lam'))
+
+    tong_hop = defaultdict(lambda: {
+        'so_ngay_cong': 0, 'tong_giay': 0, 'so_lan_thieu_gio_ra': 0, 'so_lan_di_muon': 0,
+        'phut_di_muon': 0, 'lam_them': dict.fromkeys(HE_SO_LAM_THEM, 0),
+    })
+    dong = ChamCong.objects.using(db).order_by().values_list('nhan_vien_id', 'ngay', 'gio_vao', 'gio_ra')
+    for nhan_vien_id, ngay, gio_vao, gio_ra in dong.iterator(chunk_size=CHUNK_SIZE):
+        muc = tong_hop[(nhan_vien_id, ngay.year, ngay.month)]
+        giay_lam = _giay_lam_viec(gio_vao, gio_ra)
+        muc['so_ngay_cong'] += 1
+        muc['tong_giay'] += giay_lam
+        muc['so_lan_thieu_gio_ra'] += gio_ra is None
+        if _giay(gio_vao) > GIAY_BAT_DAU_LAM:
+            muc['so_lan_di_muon'] += 1
+            muc['phut_di_muon'] += (_giay(gio_vao) - GIAY_BAT_DAU_LAM) // 60
+        loai = _loai_ngay(ngay, ngay_le_va_lam_bu)
+        if loai == 'ngay_thuong':
+            giay_lam = max(giay_lam - GIAY_LAM_CHUAN_MOT_NGAY, 0)
+        muc['lam_them'][loai] += giay_lam
+
+    # Dựng lại toàn bộ: dòng nào đã có (ghi sau 0011) cũng được tính lại đủ cột
+    ChamCongThang.objects.using(db).all().delete()
+    ChamCongThang.objects.using(db).bulk_create(
+        [
+            ChamCongThang(
+                nhan_vien_id=nhan_vien_id, nam=nam, thang=thang,
+                so_ngay_cong=muc['so_ngay_cong'],
+                tong_gio=_doi_ra_gio(muc['tong_giay']),
+                so_lan_thieu_gio_ra=muc['so_lan_thieu_gio_ra'],
+                so_lan_di_muon=muc['so_lan_di_muon'],
+                phut_di_muon=muc['phut_di_muon'],
+                gio_lam_them=_doi_ra_gio(sum(muc['lam_them'].values())),
+                gio_lam_them_quy_doi=_doi_ra_gio(
+                    sum(muc['lam_them'][loai] * he_so for loai, he_so in HE_SO_LAM_THEM.items()), he_so=100
+                ),
+            )
+            for (nhan_vien_id, nam, thang), muc in tong_hop.items()
+        ],
+        batch_size=CHUNK_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nhan_vien', '0018_admin_indexes'),
+    ]
+
+    operations = [
+        # Quay lại: bảng tổng hợp vẫn giữ dữ liệu, rebuild_attendance_rollup dựng lại được
+        migrations.RunPython(dien_tong_hop, migrations.RunPython.noop),
+    ]
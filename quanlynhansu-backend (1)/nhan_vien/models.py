@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.conf import settings # Import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
 
 # Model cho Phòng Ban
 class PhongBan(models.Model):
@@ -16,6 +18,7 @@ class PhongBan(models.Model):
 # Model cho Chức Vụ
 class ChucVu(models.Model):
     ten_chuc_vu = models.CharField(max_length=100, unique=True, verbose_name="Tên chức vụ")
+    luong_co_ban = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Lương cơ bản")
 
     class Meta:
         verbose_name = "Chức Vụ"
@@ -51,6 +54,16 @@ class ChamCong(models.Model):
     class Meta:
         verbose_name = "Chấm Công"
         verbose_name_plural = "Chấm Công"
+        constraints = [
+            # Mỗi nhân viên một dòng chấm công mỗi ngày (giờ vào/ra được ghép
+            # vào cùng một dòng). Index của ràng buộc này cũng phục vụ việc lọc
+            # theo nhân viên + khoảng ngày và đếm công theo tháng.
+            models.UniqueConstraint(fields=['nhan_vien', 'ngay'], name='chamcong_nhanvien_ngay_uniq'),
+        ]
+        indexes = [
+            # Phân trang keyset theo (ngay, id) và lọc theo khoảng ngày
+            models.Index(fields=['ngay', 'id'], name='chamcong_ngay_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nhan_vien.ho_ten} - {self.ngay}"
@@ -71,6 +84,15 @@ class DonXinNghi(models.Model):
     class Meta:
         verbose_name = "Đơn Xin Nghỉ"
         verbose_name_plural = "Đơn Xin Nghỉ"
+        indexes = [
+            # Kiểm tra trùng lịch của một nhân viên (nhan_vien_id = ? AND khoảng ngày)
+            models.Index(fields=['nhan_vien', 'ngay_bat_dau', 'ngay_ket_thuc'], name='donxinnghi_nv_khoang_idx'),
+            # Lịch vắng mặt: các đơn có ngay_ket_thuc >= đầu khoảng cần xem
+            models.Index(fields=['ngay_ket_thuc', 'ngay_bat_dau'], name='donxinnghi_khoang_idx'),
+            # Danh sách mới nhất trước (API, admin date hierarchy) và lọc theo trạng thái
+            models.Index(fields=['ngay_bat_dau'], name='donxinnghi_bat_dau_idx'),
+            models.Index(fields=['trang_thai', 'ngay_bat_dau'], name='donxinnghi_trang_thai_idx'),
+        ]
 
     def __str__(self):
         return f"Đơn của {self.nhan_vien.ho_ten} từ {self.ngay_bat_dau}"
@@ -85,6 +107,34 @@ class UserAccount(models.Model):
         blank=True                  
     ) 
     role = models.CharField(max_length=20, choices=[('Admin', 'Admin'), ('HR', 'HR'), ('Manager', 'Manager'), ('Employee', 'Employee')], default='Employee', verbose_name="Vai trò")
+    # Tăng mỗi khi role thay đổi; được nhúng vào JWT để phát hiện claim cũ
+    role_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Phiên bản vai trò")
+
+    class Meta:
+        indexes = [
+            # Bộ lọc theo vai trò trong admin
+            models.Index(fields=['role'], name='useraccount_role_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Ghi nhớ role lúc đọc từ DB để save() biết role có đổi hay không
+        instance._role_ban_dau = instance.__dict__.get('role')
+        return instance
+
+    def save(self, *args, **kwargs):
+        role_da_doi = self.pk is not None and getattr(self, '_role_ban_dau', self.role) != self.role
+        if role_da_doi:
+            self.role_version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'role_version'}
+        super().save(*args, **kwargs)
+        self._role_ban_dau = self.role
+        if role_da_doi:
+            # Import tại chỗ để tránh vòng lặp import (authentication -> models)
+            from .authentication import danh_dau_role_version
+            danh_dau_role_version(self.user_id, self.role_version)
 
     def __str__(self):
         return f"{self.user.username} - {self.role}"
@@ -99,41 +149,168 @@ class Payslip(models.Model):
     luong_co_ban = models.DecimalField(max_digits=15, decimal_places=2, verbose_name="Lương cơ bản")
     phu_cap = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Phụ cấp")
     khau_tru = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Khấu trừ")
-    # Bạn có thể thêm các trường khác như: thuong, tien_ot, thue_tncn...
+    # Bạn có thể thêm các trường khác như: thuong, thue_tncn...
+    tien_lam_them = models.DecimalField(max_digits=15, decimal_places=2, default=0, verbose_name="Tiền làm thêm giờ")
     luong_thuc_nhan = models.DecimalField(max_digits=15, decimal_places=2, verbose_name="Lương thực nhận")
+    # Dữ liệu gốc (chấm công, chức vụ) đã đổi sau khi tính: chờ recalculate_payroll
+    can_tinh_lai = models.BooleanField(default=False, verbose_name="Cần tính lại")
 
     class Meta:
         verbose_name = "Bảng Lương"
         verbose_name_plural = "Bảng Lương"
         # Đảm bảo mỗi nhân viên chỉ có 1 bảng lương/tháng
         unique_together = ('nhan_vien', 'thang', 'nam')
+        indexes = [
+            # Bảng lương theo kỳ (tổng hợp, xuất file, bộ lọc admin)
+            models.Index(fields=['nam', 'thang'], name='payslip_nam_thang_idx'),
+            # Chỉ chứa các bảng lương cần tính lại (thường rất ít)
+            models.Index(
+                fields=['nam', 'thang'], condition=models.Q(can_tinh_lai=True),
+                name='payslip_can_tinh_lai_idx',
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Tự động tính lương thực nhận khi lưu từng bản ghi, cùng công thức với
+        # engine (theo ngày công; bảng lương nhập tay chưa có chấm công thì theo
+        # công thức gốc); engine ghi hàng loạt bằng bulk_create nên tự tính.
+        # Import tại chỗ để tránh vòng lặp import (payroll -> models)
+        from .payroll import tinh_luong_bang_luong
+
+        self.luong_thuc_nhan = tinh_luong_bang_luong(self)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"Bảng lương {self.thang}/{self.nam} - {self.nhan_vien.ho_ten}"
 
-# ... (các model khác giữ nguyên) ...
 
-# === Model Bảng Lương ===
-class Payslip(models.Model):
-    # ... (các trường của bạn như nhan_vien, thang, nam, luong_co_ban, phu_cap, khau_tru) ...
-    # Ví dụ:
-    nhan_vien = models.ForeignKey(NhanVien, on_delete=models.CASCADE)
-    thang = models.IntegerField()
-    nam = models.IntegerField()
-    luong_co_ban = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    phu_cap = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    khau_tru = models.DecimalField(max_digits=10, decimal_places=2, default=0)
-    
-    # Trường này sẽ được tự động tính:
-    luong_thuc_nhan = models.DecimalField(max_digits=10, decimal_places=2, blank=True) # Thêm blank=True
-
-    # ⭐️ THÊM PHƯƠNG THỨC NÀY VÀO:
-    def save(self, *args, **kwargs):
-        # Tự động tính toán lương thực nhận
-        self.luong_thuc_nhan = self.luong_co_ban + self.phu_cap - self.khau_tru
-        
-        # Gọi phương thức save() gốc để lưu vào database
-        super(Payslip, self).save(*args, **kwargs) 
+# === Checkpoint cho việc tính lương theo phòng ban (shard) ===
+class PayrollCheckpoint(models.Model):
+    thang = models.PositiveIntegerField(verbose_name="Tháng")
+    nam = models.PositiveIntegerField(verbose_name="Năm")
+    # Mã shard: 'pb-<id phòng ban>' hoặc 'pb-none' cho nhân viên chưa có phòng ban
+    shard = models.CharField(max_length=30, verbose_name="Shard")
+    so_bang_luong = models.PositiveIntegerField(default=0, verbose_name="Số bảng lương")
+    hoan_thanh_luc = models.DateTimeField(auto_now_add=True, verbose_name="Hoàn thành lúc")
+
+    class Meta:
+        verbose_name = "Checkpoint tính lương"
+        verbose_name_plural = "Checkpoint tính lương"
+        unique_together = ('thang', 'nam', 'shard')
+
+    def __str__(self):
+        return f"{self.shard} - {self.thang}/{self.nam}"
+
+
+# === Lô chấm công từ máy chấm công (idempotency) ===
+class ChamCongBatch(models.Model):
+    idempotency_key = models.CharField(max_length=100, unique=True, verbose_name="Khóa idempotency")
+    so_punch = models.PositiveIntegerField(default=0, verbose_name="Số lượt chấm")
+    ket_qua = models.JSONField(default=dict, verbose_name="Kết quả")
+    tao_luc = models.DateTimeField(auto_now_add=True, verbose_name="Tạo lúc")
+
+    class Meta:
+        verbose_name = "Lô chấm công"
+        verbose_name_plural = "Lô chấm công"
+
+    def __str__(self):
+        return f"{self.idempotency_key} ({self.so_punch} lượt)"
+
+
+# === Bảng tổng hợp chấm công theo tháng (duy trì tăng dần) ===
+class ChamCongThang(models.Model):
+    nhan_vien = models.ForeignKey(NhanVien, on_delete=models.CASCADE, verbose_name="Nhân viên")
+    nam = models.PositiveIntegerField(verbose_name="Năm")
+    thang = models.PositiveIntegerField(verbose_name="Tháng")
+    so_ngay_cong = models.PositiveIntegerField(default=0, verbose_name="Số ngày công")
+    tong_gio = models.DecimalField(max_digits=7, decimal_places=2, default=0, verbose_name="Tổng giờ làm")
+    so_lan_thieu_gio_ra = models.PositiveIntegerField(default=0, verbose_name="Số lần thiếu giờ ra")
+    so_lan_di_muon = models.PositiveIntegerField(default=0, verbose_name="Số lần đi muộn")
+    phut_di_muon = models.PositiveIntegerField(default=0, verbose_name="Tổng số phút đi muộn")
+    gio_lam_them = models.DecimalField(max_digits=7, decimal_places=2, default=0, verbose_name="Giờ làm thêm")
+    # Giờ làm thêm nhân hệ số theo loại ngày (150% / 200% / 300%)
+    gio_lam_them_quy_doi = models.DecimalField(
+        max_digits=7, decimal_places=2, default=0, verbose_name="Giờ làm thêm quy đổi"
+    )
+    cap_nhat_luc = models.DateTimeField(auto_now=True, verbose_name="Cập nhật lúc")
+
+    class Meta:
+        verbose_name = "Tổng hợp chấm công tháng"
+        verbose_name_plural = "Tổng hợp chấm công tháng"
+        unique_together = ('nhan_vien', 'nam', 'thang')
+        indexes = [
+            models.Index(fields=['nam', 'thang'], name='chamcongthang_nam_thang_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nhan_vien_id} - {self.thang}/{self.nam}: {self.so_ngay_cong} ngày"
+
+
+class NgayLe(models.Model):
+    """
+    Ngoại lệ của lịch làm việc công ty: ngày nghỉ lễ (Tết âm lịch, Giỗ Tổ,
+    nghỉ bù...) hoặc ngày làm bù. Ngày lễ dương lịch cố định nằm trong
+    settings.NGAY_LE_CO_DINH; dòng trong bảng này được ưu tiên hơn.
+    """
+    ngay = models.DateField(unique=True, verbose_name="Ngày")
+    ten = models.CharField(max_length=100, verbose_name="Tên")
+    la_ngay_lam = models.BooleanField(default=False, verbose_name="Là ngày làm bù")
+
+    class Meta:
+        verbose_name = "Ngày lễ / ngày làm bù"
+        verbose_name_plural = "Ngày lễ / ngày làm bù"
+        ordering = ['ngay']
+
+    def __str__(self):
+        return f"{self.ngay} - {self.ten}"
+
+
+# === Hàng đợi tác vụ nền (nhan_vien.jobs, worker: manage.py run_jobs) ===
+class TacVu(models.Model):
+    LOAI_CHOICES = [
+        ('tinh_luong', 'Tính lương tháng'),
+        ('tinh_lai_luong', 'Tính lại bảng lương'),
+        ('xuat_bang_luong', 'Xuất bảng lương'),
+        ('xuat_cham_cong', 'Xuất chấm công'),
+        ('nhap_nhan_vien', 'Nhập nhân viên'),
+    ]
+    TRANG_THAI_CHOICES = [
+        ('pending', 'Đang chờ'),
+        ('running', 'Đang chạy'),
+        ('succeeded', 'Hoàn thành'),
+        ('failed', 'Lỗi'),
+        ('cancelled', 'Đã hủy'),
+    ]
+    loai = models.CharField(max_length=30, choices=LOAI_CHOICES, verbose_name="Loại")
+    tham_so = models.JSONField(default=dict, encoder=DjangoJSONEncoder, verbose_name="Tham số")
+    trang_thai = models.CharField(max_length=10, choices=TRANG_THAI_CHOICES, default='pending', verbose_name="Trạng thái")
+    tien_do = models.PositiveSmallIntegerField(default=0, verbose_name="Tiến độ (%)")
+    thong_diep = models.CharField(max_length=255, blank=True, verbose_name="Thông điệp")
+    ket_qua = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder, verbose_name="Kết quả")
+    tep_ket_qua = models.FileField(upload_to='tac_vu/%Y/%m/', blank=True, verbose_name="Tệp kết quả")
+    loi = models.TextField(blank=True, verbose_name="Lỗi")
+    so_lan_thu = models.PositiveSmallIntegerField(default=0, verbose_name="Số lần đã chạy")
+    so_lan_thu_toi_da = models.PositiveSmallIntegerField(default=3, verbose_name="Số lần chạy tối đa")
+    yeu_cau_huy = models.BooleanField(default=False, verbose_name="Yêu cầu hủy")
+    nguoi_tao = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Người tạo"
+    )
+    worker = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    tao_luc = models.DateTimeField(auto_now_add=True, verbose_name="Tạo lúc")
+    # Chưa chạy trước thời điểm này (chờ giữa các lần thử lại)
+    chay_sau = models.DateTimeField(default=timezone.now, verbose_name="Chạy sau")
+    bat_dau_luc = models.DateTimeField(null=True, blank=True, verbose_name="Bắt đầu lúc")
+    ket_thuc_luc = models.DateTimeField(null=True, blank=True, verbose_name="Kết thúc lúc")
+    # Nhịp tim của worker: tác vụ 'running' quá lâu không cập nhật bị coi là treo
+    cap_nhat_luc = models.DateTimeField(null=True, blank=True, verbose_name="Cập nhật lúc")
+
+    class Meta:
+        verbose_name = "Tác vụ nền"
+        verbose_name_plural = "Tác vụ nền"
+        indexes = [
+            # Worker lấy tác vụ: trang_thai = 'pending' AND chay_sau <= now ORDER BY chay_sau, id
+            models.Index(fields=['trang_thai', 'chay_sau', 'id'], name='tacvu_hang_doi_idx'),
+        ]
 
     def __str__(self):
-        return f"Phiếu lương {self.nhan_vien.ho_ten} - {self.thang}/{self.nam}"
\ No newline at end of file
+        return f"#{self.pk} {self.get_loai_display()} ({self.trang_thai})"
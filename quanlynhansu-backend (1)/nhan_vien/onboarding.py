@@ -0,0 +1,246 @@
+# Trong nhan_vien/onboarding.py
+"""
+Nhập nhân viên hàng loạt (tiếp nhận cả một công ty/đợt tuyển dụng).
+
+Mỗi dòng (CSV, JSON hoặc NDJSON) dùng cùng tên trường với NhanVienSerializer:
+    ma_nhan_vien, ho_ten, ngay_sinh, ngay_vao_lam, new_username, password,
+    phong_ban_id, chuc_vu_id (tùy chọn), role (tùy chọn, mặc định Employee)
+
+Quy trình, theo từng chunk:
+1. Kiểm tra định dạng từng dòng, trùng lặp trong chính file; tra phòng ban,
+   chức vụ một lần cho cả lô.
+2. Tra trùng username / ma_nhan_vien với dữ liệu đã có: mỗi loại MỘT truy
+   vấn cho cả chunk.
+3. Băm mật khẩu (PBKDF2, rất chậm) trên một process pool — ngoài transaction.
+4. bulk_create User, NhanVien, UserAccount (+ chỉ mục tìm kiếm) trong một
+   transaction mỗi chunk. Nếu nơi khác vừa tạo trùng username/mã giữa bước 2
+   và 4 (IntegrityError), chunk được lọc trùng lại và ghi lại một lần.
+Dòng lỗi không chặn cả lô: kết quả trả về kèm lỗi theo số dòng (từ 1).
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+
+from .caching import lam_moi_phien_ban
+from .models import ChucVu, NhanVien, PhongBan, UserAccount
+from .search import dong_bo_chi_muc
+
+CHUNK_SIZE = 500
+VAI_TRO_HOP_LE = tuple(value for value, _ in UserAccount._meta.get_field('role').choices)
+# Dưới ngưỡng này băm ngay trong tiến trình (khởi động pool tốn hơn)
+SO_MAT_KHAU_TOI_THIEU_DE_DUNG_POOL = 8
+
+
+def so_worker_mac_dinh():
+    return os.cpu_count() or 1
+
+
+def _doc_ngay(value):
+    return date.fromisoformat(str(value).strip())
+
+
+def _doc_id(value):
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def kiem_tra_dong(rows, vai_tro_cho_phep=VAI_TRO_HOP_LE):
+    """
+    Trả về (hop_le, loi):
+    - hop_le: list (dong, dict đã chuẩn hóa)
+    - loi: list {'dong': số dòng, 'loi': mô tả}
+    """
+    hop_le, loi = [], []
+    username_da_gap, ma_da_gap = set(), set()
+    for dong, row in enumerate(rows, start=1):
+        if not isinstance(row, dict):
+            loi.append({'dong': dong, 'loi': 'Mỗi dòng phải là một object.'})
+            continue
+        if '_loi' in row:
+            loi.append({'dong': dong, 'loi': row['_loi']})
+            continue
+        ma = str(row.get('ma_nhan_vien') or '').strip()
+        ho_ten = str(row.get('ho_ten') or '').strip()
+        username = str(row.get('new_username') or '').strip()
+        password = str(row.get('password') or '')
+        role = str(row.get('role') or 'Employee').strip()
+
+        thieu = [ten for ten, gia_tri in (
+            ('ma_nhan_vien', ma), ('ho_ten', ho_ten), ('new_username', username), ('password', password),
+        ) if not gia_tri]
+        if thieu:
+            loi.append({'dong': dong, 'loi': f'Thiếu {", ".join(thieu)}.'})
+            continue
+        if len(ma) > 10 or len(ho_ten) > 100 or len(username) > 150:
+            loi.append({'dong': dong, 'loi': 'ma_nhan_vien (10), ho_ten (100) hoặc new_username (150) quá dài.'})
+            continue
+        if role not in vai_tro_cho_phep:
+            loi.append({'dong': dong, 'loi': f'role phải là một trong: {", ".join(vai_tro_cho_phep)}.'})
+            continue
+        try:
+            ngay_sinh = _doc_ngay(row.get('ngay_sinh'))
+            ngay_vao_lam = _doc_ngay(row.get('ngay_vao_lam'))
+        except (TypeError, ValueError):
+            loi.append({'dong': dong, 'loi': 'ngay_sinh / ngay_vao_lam không hợp lệ (YYYY-MM-DD).'})
+            continue
+        try:
+            phong_ban_id = _doc_id(row.get('phong_ban_id'))
+            chuc_vu_id = _doc_id(row.get('chuc_vu_id'))
+        except (TypeError, ValueError):
+            loi.append({'dong': dong, 'loi': 'phong_ban_id / chuc_vu_id phải là số nguyên.'})
+            continue
+        if username in username_da_gap or ma in ma_da_gap:
+            loi.append({'dong': dong, 'loi': 'Trùng new_username hoặc ma_nhan_vien với một dòng phía trên.'})
+            continue
+        username_da_gap.add(username)
+        ma_da_gap.add(ma)
+        hop_le.append((dong, {
+            'ma_nhan_vien': ma, 'ho_ten': ho_ten, 'username': username, 'password': password,
+            'role': role, 'ngay_sinh': ngay_sinh, 'ngay_vao_lam': ngay_vao_lam,
+            'phong_ban_id': phong_ban_id, 'chuc_vu_id': chuc_vu_id,
+        }))
+
+    # Phòng ban / chức vụ: một truy vấn mỗi bảng cho cả lô
+    phong_ban_ids = set(PhongBan.objects.filter(
+        id__in={r['phong_ban_id'] for _, r in hop_le if r['phong_ban_id'] is not None}
+    ).values_list('id', flat=True))
+    chuc_vu_ids = set(ChucVu.objects.filter(
+        id__in={r['chuc_vu_id'] for _, r in hop_le if r['chuc_vu_id'] is not None}
+    ).values_list('id', flat=True))
+    con_lai = []
+    for dong, r in hop_le:
+        if r['phong_ban_id'] is not None and r['phong_ban_id'] not in phong_ban_ids:
+            loi.append({'dong': dong, 'loi': f'Không tìm thấy phòng ban {r["phong_ban_id"]}.'})
+        elif r['chuc_vu_id'] is not None and r['chuc_vu_id'] not in chuc_vu_ids:
+            loi.append({'dong': dong, 'loi': f'Không tìm thấy chức vụ {r["chuc_vu_id"]}.'})
+        else:
+            con_lai.append((dong, r))
+    return con_lai, loi
+
+
+def loc_trung_du_lieu_cu(chunk):
+    """
+    Bỏ các dòng trùng username / ma_nhan_vien đã có trong DB (một truy vấn
+    mỗi loại cho cả chunk). Trả về (con_lai, loi).
+    """
+    username_da_co = set(User.objects.filter(
+        username__in=[r['username'] for _, r in chunk]
+    ).values_list('username', flat=True))
+    ma_da_co = set(NhanVien.objects.filter(
+        ma_nhan_vien__in=[r['ma_nhan_vien'] for _, r in chunk]
+    ).values_list('ma_nhan_vien', flat=True))
+    con_lai, loi = [], []
+    for dong, r in chunk:
+        if r['username'] in username_da_co:
+            loi.append({'dong': dong, 'loi': f'Tên tài khoản {r["username"]} đã được sử dụng.'})
+        elif r['ma_nhan_vien'] in ma_da_co:
+            loi.append({'dong': dong, 'loi': f'Mã nhân viên {r["ma_nhan_vien"]} đã tồn tại.'})
+        else:
+            con_lai.append((dong, r))
+    return con_lai, loi
+
+
+def ghi_chunk(chunk, mat_khau):
+    """
+    Ghi User, NhanVien, UserAccount của một chunk bằng bulk_create trong
+    một transaction. Trả về list id nhân viên đã tạo.
+    """
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=r['username'], password=hash_) for (_, r), hash_ in zip(chunk, mat_khau)
+        ])
+        ds_nhan_vien = NhanVien.objects.bulk_create([
+            NhanVien(
+                user_id=user.pk, ma_nhan_vien=r['ma_nhan_vien'], ho_ten=r['ho_ten'],
+                ngay_sinh=r['ngay_sinh'], ngay_vao_lam=r['ngay_vao_lam'],
+                phong_ban_id=r['phong_ban_id'], chuc_vu_id=r['chuc_vu_id'],
+            )
+            for (_, r), user in zip(chunk, users)
+        ])
+        UserAccount.objects.bulk_create([
+            UserAccount(user_id=nv.user_id, employee_id=nv.pk, role=r['role'])
+            for (_, r), nv in zip(chunk, ds_nhan_vien)
+        ])
+        ids = [nv.pk for nv in ds_nhan_vien]
+        # bulk_create không phát signal: tự thêm vào chỉ mục tìm kiếm
+        dong_bo_chi_muc(NhanVien.objects.filter(id__in=ids), xoa_cu=False)
+    lam_moi_phien_ban(NhanVien)
+    return ids
+
+
+def _ghi_chunk_loai_trung(chunk, mat_khau, loi):
+    """
+    ghi_chunk; nếu IntegrityError (một request khác vừa tạo cùng username/mã
+    giữa lúc kiểm tra và lúc ghi) thì lọc trùng lại rồi ghi các dòng còn lại
+    một lần nữa. Trả về (các dòng đã ghi, id nhân viên); lỗi thêm vào `loi`.
+    """
+    try:
+        return chunk, ghi_chunk(chunk, mat_khau)
+    except IntegrityError:
+        pass
+    hash_theo_dong = {dong: hash_ for (dong, _), hash_ in zip(chunk, mat_khau)}
+    chunk, loi_trung = loc_trung_du_lieu_cu(chunk)
+    loi.extend(loi_trung)
+    if not chunk:
+        return [], []
+    try:
+        return chunk, ghi_chunk(chunk, [hash_theo_dong[dong] for dong, _ in chunk])
+    except IntegrityError:
+        loi.extend(
+            {'dong': dong, 'loi': 'Xung đột khi ghi (username/mã vừa được tạo ở nơi khác). Hãy nhập lại dòng này.'}
+            for dong, _ in chunk
+        )
+        return [], []
+
+
+def nhap_nhan_vien(rows, workers=None, chunk_size=CHUNK_SIZE, vai_tro_cho_phep=VAI_TRO_HOP_LE, tien_do=None):
+    """
+    Nhập danh sách nhân viên. Trả về dict:
+    {'so_dong', 'tao_moi', 'nhan_vien': [{'dong', 'id', 'ma_nhan_vien'}], 'loi': [{'dong', 'loi'}]}
+    `tien_do(da_xu_ly, tong)` (tùy chọn) được gọi sau mỗi chunk.
+    """
+    workers = workers or so_worker_mac_dinh()
+    hop_le, loi = kiem_tra_dong(rows, vai_tro_cho_phep)
+    da_tao = []
+
+    pool = None
+    if workers > 1 and len(hop_le) >= SO_MAT_KHAU_TOI_THIEU_DE_DUNG_POOL:
+        # 'spawn': tiến trình con không kế thừa kết nối DB / transaction đang mở
+        # của tiến trình cha (có thể đang ở giữa một request). Initializer và
+        # hàm băm đều nằm ngoài app này để tiến trình con không phải import
+        # model trước khi django.setup() chạy xong.
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    try:
+        for start in range(0, len(hop_le), chunk_size):
+            if tien_do is not None:
+                tien_do(start, len(hop_le))
+            chunk, loi_trung = loc_trung_du_lieu_cu(hop_le[start:start + chunk_size])
+            loi.extend(loi_trung)
+            if not chunk:
+                continue
+            mat_khau = [r['password'] for _, r in chunk]
+            if pool is not None:
+                mat_khau = list(pool.map(make_password, mat_khau, chunksize=max(1, len(mat_khau) // (workers * 4))))
+            else:
+                mat_khau = [make_password(p) for p in mat_khau]
+            chunk, ids = _ghi_chunk_loai_trung(chunk, mat_khau, loi)
+            da_tao.extend(
+                {'dong': dong, 'id': pk, 'ma_nhan_vien': r['ma_nhan_vien']}
+                for (dong, r), pk in zip(chunk, ids)
+            )
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    loi.sort(key=lambda item: item['dong'])
+    return {'so_dong': len(rows), 'tao_moi': len(da_tao), 'nhan_vien': da_tao, 'loi': loi}
@@ -0,0 +1,130 @@
+# Trong nhan_vien/pagination.py
+"""
+Phân trang keyset (cursor) cho các bảng lớn.
+
+Khác với phân trang OFFSET, mỗi trang được lấy bằng điều kiện
+    (ngay, id) < (ngay_cuoi, id_cuoi)
+trên index, nên trang thứ 1 hay trang thứ 100.000 đều tốn như nhau.
+"""
+import base64
+from datetime import date
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Phân trang theo khóa (ngay, id) giảm dần.
+
+    Query params:
+    - cursor: chuỗi mờ (opaque) lấy từ `next`/`previous` của trang trước.
+    - page_size: số dòng mỗi trang (mặc định 50, tối đa 500).
+
+    Response: {"next": url|null, "previous": url|null, "results": [...]}
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = 50
+    max_page_size = 500
+    # Trường ngày dùng làm khóa chính của thứ tự; id phá thế hòa
+    date_field = 'ngay'
+    invalid_cursor_message = 'Cursor không hợp lệ.'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # --- Mã hóa / giải mã cursor: "<huong>|<yyyy-mm-dd>|<id>" ---
+
+    def encode_cursor(self, huong, ngay, pk):
+        raw = f'{huong}|{ngay.isoformat()}|{pk}'.encode()
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, base64.urlsafe_b64encode(raw).decode())
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            huong, ngay, pk = base64.urlsafe_b64decode(encoded.encode()).decode().split('|')
+            if huong not in ('n', 'p'):
+                raise ValueError
+            return huong, date.fromisoformat(ngay), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        d = self.date_field
+
+        if cursor is None or cursor[0] == 'n':
+            # Đi tiếp (cũ hơn): (ngay, id) < cursor, sắp xếp giảm dần
+            if cursor is not None:
+                _, ngay, pk = cursor
+                queryset = queryset.filter(Q(**{f'{d}__lt': ngay}) | Q(**{d: ngay, 'id__lt': pk}))
+            rows = list(queryset.order_by(f'-{d}', '-id')[:page_size + 1])
+            co_trang_sau = len(rows) > page_size
+            rows = rows[:page_size]
+            co_trang_truoc = cursor is not None
+        else:
+            # Quay lại (mới hơn): (ngay, id) > cursor, lấy tăng dần rồi đảo
+            _, ngay, pk = cursor
+            queryset = queryset.filter(Q(**{f'{d}__gt': ngay}) | Q(**{d: ngay, 'id__gt': pk}))
+            rows = list(queryset.order_by(d, 'id')[:page_size + 1])
+            co_trang_truoc = len(rows) > page_size
+            rows = rows[:page_size][::-1]
+            co_trang_sau = True
+
+        self.next_url = None
+        self.previous_url = None
+        if rows and co_trang_sau:
+            last = rows[-1]
+            self.next_url = self.encode_cursor('n', getattr(last, d), last.pk)
+        if rows and co_trang_truoc:
+            first = rows[0]
+            self.previous_url = self.encode_cursor('p', getattr(first, d), first.pk)
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.next_url,
+            'previous': self.previous_url,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SearchPagination(PageNumberPagination):
+    """
+    Phân trang kết quả tìm kiếm (đã xếp theo độ liên quan): ?page=&page_size=
+    Response: {"count", "next", "previous", "results"}
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class TacVuPagination(PageNumberPagination):
+    """Danh sách tác vụ nền (mới nhất trước): ?page=&page_size="""
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,54 @@
+# Trong nhan_vien/parsers.py
+"""
+Parser cho dữ liệu nhập theo lô (NDJSON, CSV).
+
+Cả hai parser trả về list các dict, mỗi dòng một dict. Dòng không đọc được
+trở thành {'_loi': '...'} để tầng xử lý báo lỗi theo số dòng thay vì từ chối
+cả lô.
+"""
+import csv
+import io
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def _doc_text(stream, parser_context):
+    encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+    try:
+        return stream.read().decode(encoding)
+    except UnicodeDecodeError as exc:
+        raise ParseError(f'Dữ liệu không đúng mã hóa {encoding}: {exc}')
+
+
+class NDJSONParser(BaseParser):
+    """Mỗi dòng là một object JSON."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        rows = []
+        for line in _doc_text(stream, parser_context).splitlines():
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = {'_loi': 'JSON không hợp lệ.'}
+            if not isinstance(row, dict):
+                row = {'_loi': 'Mỗi dòng phải là một object JSON.'}
+            rows.append(row)
+        return rows
+
+
+class CSVParser(BaseParser):
+    """CSV có dòng tiêu đề (tên cột = tên trường)."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        reader = csv.DictReader(io.StringIO(_doc_text(stream, parser_context)))
+        return [
+            {key.strip(): (value or '').strip() for key, value in row.items() if key}
+            for row in reader
+        ]
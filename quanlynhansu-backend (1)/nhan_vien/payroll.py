@@ -0,0 +1,414 @@
+# Trong nhan_vien/payroll.py
+"""
+Engine tính lương theo lô (set-based).
+
+Thay vì mỗi nhân viên một truy vấn COUNT và một transaction update_or_create,
+engine:
+1. Đọc số ngày công và giờ làm thêm quy đổi của TẤT CẢ nhân viên từ bảng
+   tổng hợp ChamCongThang (một truy vấn, tối đa một dòng mỗi nhân viên; giờ
+   làm thêm đã được tính phía DB khi tổng hợp, xem attendance).
+2. Tính toàn bộ bảng lương trong bộ nhớ.
+3. Ghi bằng bulk upsert theo khóa duy nhất ('nhan_vien', 'thang', 'nam'),
+   chia thành từng chunk.
+
+Với số lượng nhân viên lớn, công việc được chia shard theo PhongBan và chạy
+trên một process pool. Mỗi shard ghi PayrollCheckpoint trong cùng transaction
+với bảng lương, nên một lần chạy bị gián đoạn sẽ tiếp tục từ shard còn thiếu.
+
+Tính lại từng phần: khi chấm công hoặc chức vụ thay đổi, các Payslip bị ảnh
+hưởng được đánh dấu `can_tinh_lai` (danh_dau_can_tinh_lai*), và
+tinh_lai_bang_luong() chỉ tính lại đúng các bảng lương đó.
+"""
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+
+from .caching import lam_moi_phien_ban
+from .models import NhanVien, ChamCongThang, Payslip, PayrollCheckpoint
+# Công chuẩn lấy từ lịch làm việc chung (trừ Chủ Nhật và ngày lễ)
+from .workdays import so_ngay_cong_chuan
+
+# Các khoản mặc định (trước đây hard-code trong calculate_payroll)
+PHU_CAP_MAC_DINH = Decimal('1000000')
+KHAU_TRU_MAC_DINH = Decimal('1050000')  # Ví dụ BHXH
+
+CHUNK_SIZE = 1000
+
+
+@dataclass
+class KetQuaTinhLuong:
+    """Thống kê của một lần chạy engine tính lương."""
+    thang: int
+    nam: int
+    cong_chuan: int
+    so_bang_luong: int = 0
+    bo_qua: list = field(default_factory=list)  # [(ho_ten, ly_do), ...]
+    thoi_gian_doc: float = 0.0
+    thoi_gian_tinh: float = 0.0
+    thoi_gian_ghi: float = 0.0
+
+    @property
+    def tong_thoi_gian(self):
+        return self.thoi_gian_doc + self.thoi_gian_tinh + self.thoi_gian_ghi
+
+    @property
+    def dong_moi_giay(self):
+        if self.tong_thoi_gian <= 0:
+            return 0.0
+        return self.so_bang_luong / self.tong_thoi_gian
+
+
+def doc_tong_hop_thang(thang, nam, nhan_vien_qs=None):
+    """
+    Số ngày công và giờ làm thêm quy đổi của mỗi nhân viên trong tháng, đọc
+    từ bảng tổng hợp ChamCongThang (tối đa một dòng mỗi nhân viên).
+    Trả về dict {nhan_vien_id: (so_ngay_cong, gio_lam_them_quy_doi)}.
+    """
+    qs = ChamCongThang.objects.filter(nam=nam, thang=thang)
+    if nhan_vien_qs is not None:
+        qs = qs.filter(nhan_vien__in=nhan_vien_qs.values('id'))
+    return {
+        nhan_vien_id: (so_ngay, gio_quy_doi)
+        for nhan_vien_id, so_ngay, gio_quy_doi in
+        qs.values_list('nhan_vien_id', 'so_ngay_cong', 'gio_lam_them_quy_doi')
+    }
+
+
+def tinh_tien_lam_them(luong_co_ban, cong_chuan, gio_quy_doi):
+    """
+    Tiền làm thêm = đơn giá một giờ (lương cơ bản / công chuẩn / số giờ chuẩn
+    một ngày) x giờ làm thêm đã nhân hệ số. Làm tròn 2 chữ số thập phân.
+    """
+    if cong_chuan <= 0 or not gio_quy_doi:
+        return Decimal('0.00')
+    don_gia = luong_co_ban / (Decimal(cong_chuan) * settings.SO_GIO_LAM_CHUAN_MOT_NGAY)
+    return (don_gia * Decimal(gio_quy_doi)).quantize(Decimal('0.01'))
+
+
+def tinh_luong(luong_co_ban, cong_chuan, cong_thuc_te,
+               phu_cap=PHU_CAP_MAC_DINH, khau_tru=KHAU_TRU_MAC_DINH, tien_lam_them=Decimal('0')):
+    """Lương thực nhận theo tỉ lệ ngày công (+ tiền làm thêm), làm tròn 2 chữ số thập phân."""
+    if cong_chuan > 0:
+        luong_theo_cong = (luong_co_ban / Decimal(cong_chuan)) * Decimal(cong_thuc_te)
+    else:
+        luong_theo_cong = Decimal(0)
+    # (Các phần thưởng, thuế TNCN cần thêm logic ở đây)
+    bonus = Decimal('0')
+    ot_amount = tien_lam_them
+    tax = Decimal('0')
+    luong_thuc_nhan = luong_theo_cong + bonus + phu_cap + ot_amount - khau_tru - tax
+    return luong_thuc_nhan.quantize(Decimal('0.01'))
+
+
+def tinh_luong_bang_luong(payslip):
+    """
+    Lương thực nhận của MỘT Payslip theo đúng công thức của engine (tỉ lệ ngày
+    công từ ChamCongThang), giữ lương cơ bản / phụ cấp / khấu trừ / tiền làm
+    thêm đang có trên bảng lương. Dùng cho Payslip.save() (API, admin).
+    Tháng chưa có dòng tổng hợp chấm công (bảng lương nhập tay): không có gì
+    để tính tỉ lệ, giữ công thức gốc thay vì trả lương theo 0 ngày công.
+    """
+    so_ngay = ChamCongThang.objects.filter(
+        nhan_vien_id=payslip.nhan_vien_id, nam=payslip.nam, thang=payslip.thang
+    ).values_list('so_ngay_cong', flat=True).first()
+    if so_ngay is None:
+        return payslip.luong_co_ban + payslip.phu_cap + payslip.tien_lam_them - payslip.khau_tru
+    return tinh_luong(
+        Decimal(payslip.luong_co_ban), so_ngay_cong_chuan(payslip.nam, payslip.thang), so_ngay,
+        phu_cap=Decimal(payslip.phu_cap), khau_tru=Decimal(payslip.khau_tru),
+        tien_lam_them=Decimal(payslip.tien_lam_them),
+    )
+
+
+def ghi_bang_luong(payslips, chunk_size=CHUNK_SIZE, checkpoint=None):
+    """
+    Bulk upsert các Payslip theo khóa duy nhất ('nhan_vien', 'thang', 'nam').
+    Mỗi chunk là một câu INSERT ... ON CONFLICT DO UPDATE.
+
+    Nếu có `checkpoint` (PayrollCheckpoint chưa lưu), nó được ghi trong cùng
+    transaction. Transaction chỉ chứa lệnh ghi: với SQLite, đọc trước rồi mới
+    ghi trong cùng transaction sẽ bị "database is locked" khi nhiều tiến trình
+    cùng chạy.
+    """
+    with transaction.atomic():
+        if checkpoint is not None:
+            checkpoint.save()
+        for start in range(0, len(payslips), chunk_size):
+            Payslip.objects.bulk_create(
+                payslips[start:start + chunk_size],
+                update_conflicts=True,
+                unique_fields=['nhan_vien', 'thang', 'nam'],
+                update_fields=[
+                    'luong_co_ban', 'phu_cap', 'khau_tru', 'tien_lam_them', 'luong_thuc_nhan', 'can_tinh_lai',
+                ],
+            )
+    lam_moi_phien_ban(Payslip)
+
+
+def chay_tinh_luong(thang, nam, nhan_vien_qs=None, chunk_size=CHUNK_SIZE, shard=None):
+    """
+    Tính và ghi bảng lương tháng `thang`/`nam` cho các nhân viên trong
+    `nhan_vien_qs` (mặc định: tất cả). Nếu có `shard`, ghi kèm checkpoint.
+    Trả về KetQuaTinhLuong.
+    """
+    ket_qua = KetQuaTinhLuong(thang=thang, nam=nam, cong_chuan=so_ngay_cong_chuan(nam, thang))
+
+    # --- 1. ĐỌC: danh sách nhân viên + ngày công/giờ làm thêm (2 truy vấn) ---
+    t0 = time.perf_counter()
+    employees = list(
+        (nhan_vien_qs if nhan_vien_qs is not None else NhanVien.objects.all())
+        .order_by('id').values_list('id', 'ho_ten', 'chuc_vu_id', 'chuc_vu__luong_co_ban')
+    )
+    tong_hop = doc_tong_hop_thang(thang, nam, nhan_vien_qs)
+    t1 = time.perf_counter()
+
+    # --- 2. TÍNH trong bộ nhớ ---
+    payslips = []
+    for nv_id, ho_ten, chuc_vu_id, luong_co_ban in employees:
+        if chuc_vu_id is None:
+            ket_qua.bo_qua.append((ho_ten, 'Chưa có chức vụ.'))
+            continue
+        so_ngay, gio_lam_them = tong_hop.get(nv_id, (0, 0))
+        tien_lam_them = tinh_tien_lam_them(luong_co_ban, ket_qua.cong_chuan, gio_lam_them)
+        luong_thuc_nhan = tinh_luong(luong_co_ban, ket_qua.cong_chuan, so_ngay, tien_lam_them=tien_lam_them)
+        payslips.append(Payslip(
+            nhan_vien_id=nv_id,
+            thang=thang,
+            nam=nam,
+            luong_co_ban=luong_co_ban,
+            phu_cap=PHU_CAP_MAC_DINH,
+            khau_tru=KHAU_TRU_MAC_DINH,
+            tien_lam_them=tien_lam_them,
+            luong_thuc_nhan=luong_thuc_nhan,
+        ))
+    t2 = time.perf_counter()
+
+    # --- 3. GHI bằng bulk upsert ---
+    checkpoint = None
+    if shard is not None:
+        checkpoint = PayrollCheckpoint(thang=thang, nam=nam, shard=shard, so_bang_luong=len(payslips))
+    ghi_bang_luong(payslips, chunk_size=chunk_size, checkpoint=checkpoint)
+    t3 = time.perf_counter()
+
+    ket_qua.so_bang_luong = len(payslips)
+    ket_qua.thoi_gian_doc = t1 - t0
+    ket_qua.thoi_gian_tinh = t2 - t1
+    ket_qua.thoi_gian_ghi = t3 - t2
+    return ket_qua
+
+
+# ===============================================
+# Tính lại từng phần (dirty tracking)
+# ===============================================
+
+def danh_dau_can_tinh_lai(keys):
+    """
+    Đánh dấu cần tính lại các Payslip theo khóa (nhan_vien_id, nam, thang),
+    vd. sau khi chấm công của tháng đó thay đổi. Mỗi tháng một câu UPDATE
+    (theo chunk nhân viên); tháng chưa có bảng lương thì không làm gì.
+    """
+    theo_thang = defaultdict(set)
+    for nhan_vien_id, nam, thang in keys:
+        theo_thang[(nam, thang)].add(nhan_vien_id)
+    for (nam, thang), nhan_vien_ids in theo_thang.items():
+        nhan_vien_ids = sorted(nhan_vien_ids)
+        for start in range(0, len(nhan_vien_ids), CHUNK_SIZE):
+            Payslip.objects.filter(
+                nam=nam, thang=thang, nhan_vien_id__in=nhan_vien_ids[start:start + CHUNK_SIZE],
+                can_tinh_lai=False,
+            ).update(can_tinh_lai=True)
+
+
+def ky_luong_dang_mo(hom_nay=None):
+    """
+    (nam, thang) đầu tiên còn được tính lại khi chức vụ/lương cơ bản thay đổi:
+    tháng trước (kỳ mà calculate_payroll tính mặc định). Các tháng cũ hơn đã
+    chốt theo lương cơ bản tại thời điểm đó.
+    """
+    thang_truoc = (hom_nay or date.today()).replace(day=1) - timedelta(days=1)
+    return thang_truoc.year, thang_truoc.month
+
+
+def danh_dau_can_tinh_lai_nhan_vien(nhan_vien_qs):
+    """Đánh dấu cần tính lại bảng lương từ kỳ đang mở của các nhân viên (vd. đổi chức vụ)."""
+    nam, thang = ky_luong_dang_mo()
+    return Payslip.objects.filter(
+        Q(nam__gt=nam) | Q(nam=nam, thang__gte=thang),
+        nhan_vien__in=nhan_vien_qs, can_tinh_lai=False,
+    ).update(can_tinh_lai=True)
+
+
+def tinh_lai_bang_luong(thang=None, nam=None, tien_do=None):
+    """
+    Tính lại các Payslip đang đánh dấu `can_tinh_lai` (lọc theo tháng/năm nếu
+    có). Phụ cấp/khấu trừ của từng bảng lương được giữ nguyên (có thể đã được
+    sửa tay); lương cơ bản lấy theo chức vụ hiện tại, ngày công từ ChamCongThang.
+
+    Mỗi chunk CHUNK_SIZE bảng lương là một transaction, các dòng được khóa
+    (select_for_update) trong lúc tính: một thay đổi chấm công xảy ra đồng thời
+    sẽ đánh dấu lại SAU khi chunk commit nên không bị mất. `tien_do(da_xu_ly,
+    tong)` (tùy chọn) được gọi giữa các chunk, ngoài transaction; nếu nó ném
+    lỗi (vd. tác vụ bị hủy) thì các chunk đã xong vẫn được giữ. Trả về dict:
+    {'so_bang_luong', 'so_thay_doi', 'tong_chenh_lech', 'thay_doi': [...], 'bo_qua': [...]}
+    """
+    queryset = Payslip.objects.filter(can_tinh_lai=True)
+    if nam is not None:
+        queryset = queryset.filter(nam=nam)
+    if thang is not None:
+        queryset = queryset.filter(thang=thang)
+    ids = list(queryset.order_by('nam', 'thang', 'nhan_vien_id').values_list('id', flat=True))
+
+    thay_doi, bo_qua = [], []
+    so_bang_luong = 0
+    cong_chuan = {}
+    for start in range(0, len(ids), CHUNK_SIZE):
+        if tien_do is not None:
+            tien_do(start, len(ids))
+        cap_nhat = []
+        with transaction.atomic():
+            # Bảng lương đã được tính ở nơi khác từ lúc lấy danh sách thì bỏ qua
+            payslips = list(
+                Payslip.objects.filter(id__in=ids[start:start + CHUNK_SIZE], can_tinh_lai=True)
+                .select_for_update().order_by('nam', 'thang', 'nhan_vien_id')
+                .only('id', 'nhan_vien_id', 'thang', 'nam', 'luong_co_ban', 'phu_cap', 'khau_tru',
+                      'tien_lam_them', 'luong_thuc_nhan')
+            )
+            so_bang_luong += len(payslips)
+            theo_thang = defaultdict(list)
+            for payslip in payslips:
+                theo_thang[(payslip.nam, payslip.thang)].append(payslip)
+
+            for (nam_, thang_), chunk in theo_thang.items():
+                if (nam_, thang_) not in cong_chuan:
+                    cong_chuan[(nam_, thang_)] = so_ngay_cong_chuan(nam_, thang_)
+                cong_chuan_thang = cong_chuan[(nam_, thang_)]
+                nhan_vien_qs = NhanVien.objects.filter(id__in=[p.nhan_vien_id for p in chunk])
+                nhan_vien = {
+                    pk: (ma, luong) for pk, ma, luong in
+                    nhan_vien_qs.values_list('id', 'ma_nhan_vien', 'chuc_vu__luong_co_ban')
+                }
+                tong_hop = doc_tong_hop_thang(thang_, nam_, nhan_vien_qs)
+                for payslip in chunk:
+                    ma, luong_co_ban = nhan_vien[payslip.nhan_vien_id]
+                    if luong_co_ban is None:
+                        # Giữ đánh dấu để lần sau tính lại khi đã có chức vụ
+                        bo_qua.append({'payslip': payslip.id, 'ma_nhan_vien': ma, 'thang': thang_, 'nam': nam_,
+                                       'ly_do': 'Chưa có chức vụ.'})
+                        continue
+                    cu = (payslip.luong_co_ban, payslip.tien_lam_them, payslip.luong_thuc_nhan)
+                    so_ngay, gio_lam_them = tong_hop.get(payslip.nhan_vien_id, (0, 0))
+                    payslip.luong_co_ban = luong_co_ban
+                    payslip.tien_lam_them = tinh_tien_lam_them(luong_co_ban, cong_chuan_thang, gio_lam_them)
+                    payslip.luong_thuc_nhan = tinh_luong(
+                        luong_co_ban, cong_chuan_thang, so_ngay,
+                        phu_cap=payslip.phu_cap, khau_tru=payslip.khau_tru, tien_lam_them=payslip.tien_lam_them,
+                    )
+                    payslip.can_tinh_lai = False
+                    cap_nhat.append(payslip)
+                    if cu != (payslip.luong_co_ban, payslip.tien_lam_them, payslip.luong_thuc_nhan):
+                        thay_doi.append({
+                            'payslip': payslip.id, 'nhan_vien': payslip.nhan_vien_id, 'ma_nhan_vien': ma,
+                            'thang': thang_, 'nam': nam_,
+                            'luong_co_ban_cu': cu[0], 'luong_co_ban_moi': payslip.luong_co_ban,
+                            'tien_lam_them_cu': cu[1], 'tien_lam_them_moi': payslip.tien_lam_them,
+                            'luong_thuc_nhan_cu': cu[2], 'luong_thuc_nhan_moi': payslip.luong_thuc_nhan,
+                            'chenh_lech': payslip.luong_thuc_nhan - cu[2],
+                        })
+            Payslip.objects.bulk_update(
+                cap_nhat, ['luong_co_ban', 'tien_lam_them', 'luong_thuc_nhan', 'can_tinh_lai'], batch_size=CHUNK_SIZE
+            )
+            if cap_nhat:
+                lam_moi_phien_ban(Payslip)
+
+    return {
+        'so_bang_luong': so_bang_luong,
+        'so_thay_doi': len(thay_doi),
+        'tong_chenh_lech': sum((item['chenh_lech'] for item in thay_doi), Decimal('0.00')),
+        'thay_doi': thay_doi,
+        'bo_qua': bo_qua,
+    }
+
+
+# ===============================================
+# Chạy song song theo shard phòng ban
+# ===============================================
+
+def ma_shard(phong_ban_id):
+    return f'pb-{phong_ban_id}' if phong_ban_id is not None else 'pb-none'
+
+
+def danh_sach_shard(thang, nam):
+    """
+    Các phòng ban có nhân viên và CHƯA có checkpoint cho tháng này.
+    Trả về list phong_ban_id (None = nhân viên chưa có phòng ban).
+    """
+    da_xong = set(
+        PayrollCheckpoint.objects.filter(thang=thang, nam=nam).values_list('shard', flat=True)
+    )
+    phong_ban_ids = (
+        NhanVien.objects.order_by('phong_ban_id')
+        .values_list('phong_ban_id', flat=True).distinct()
+    )
+    return [pb_id for pb_id in phong_ban_ids if ma_shard(pb_id) not in da_xong]
+
+
+def chay_shard(thang, nam, phong_ban_id, chunk_size=CHUNK_SIZE):
+    """
+    Tính lương cho một phòng ban. Bảng lương và checkpoint được ghi trong
+    cùng một transaction: hoặc cả hai cùng có, hoặc không có gì.
+    """
+    nhan_vien_qs = NhanVien.objects.filter(phong_ban_id=phong_ban_id)
+    return chay_tinh_luong(thang, nam, nhan_vien_qs, chunk_size=chunk_size, shard=ma_shard(phong_ban_id))
+
+
+def _khoi_tao_worker():
+    # Với start method 'spawn' cần setup lại Django; với 'fork' thì không
+    # được dùng chung kết nối DB kế thừa từ tiến trình cha.
+    import django
+    django.setup()
+    connections.close_all()
+
+
+def _chay_shard_worker(thang, nam, phong_ban_id, chunk_size):
+    try:
+        return phong_ban_id, chay_shard(thang, nam, phong_ban_id, chunk_size)
+    finally:
+        connections.close_all()
+
+
+def chay_tinh_luong_song_song(thang, nam, workers=1, chunk_size=CHUNK_SIZE, khoi_dong_lai=False):
+    """
+    Tính lương tháng `thang`/`nam`, chia shard theo phòng ban trên `workers`
+    tiến trình. Các shard đã có checkpoint sẽ được bỏ qua (resume), trừ khi
+    `khoi_dong_lai=True`. Checkpoint chỉ để tiếp tục một lần chạy bị gián
+    đoạn: khi mọi shard đã xong chúng bị xóa, nên chạy lại tháng đã tính
+    sẽ tính lại cả tháng.
+
+    Là generator: yield (phong_ban_id, KetQuaTinhLuong) khi mỗi shard xong.
+    """
+    if khoi_dong_lai:
+        PayrollCheckpoint.objects.filter(thang=thang, nam=nam).delete()
+
+    shards = danh_sach_shard(thang, nam)
+    if workers <= 1:
+        for phong_ban_id in shards:
+            yield phong_ban_id, chay_shard(thang, nam, phong_ban_id, chunk_size)
+    else:
+        # Đóng kết nối trước khi fork để tiến trình con không dùng chung socket/file
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_khoi_tao_worker) as pool:
+            futures = [
+                pool.submit(_chay_shard_worker, thang, nam, phong_ban_id, chunk_size)
+                for phong_ban_id in shards
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+    # Chỉ tới đây khi mọi shard đã xong (lỗi hoặc dừng giữa chừng thì giữ checkpoint)
+    PayrollCheckpoint.objects.filter(thang=thang, nam=nam).delete()
@@ -0,0 +1,184 @@
+# Trong nhan_vien/payroll_preview.py
+"""
+Xem trước bảng lương một tháng (what-if) bằng NumPy, KHÔNG ghi gì xuống DB.
+
+- Đọc toàn bộ nhân viên có chức vụ và bảng tổng hợp ChamCongThang (2 truy
+  vấn), chuyển thành các mảng NumPy: ngày công, giờ làm thêm quy đổi, lương
+  cơ bản, phụ cấp, khấu trừ. Mọi phép tính sau đó là phép toán trên cả
+  mảng, không có vòng lặp Python theo nhân viên.
+- Cùng công thức với payroll.tinh_luong. Lương thực nhận được làm tròn tới
+  đồng xu (0.01) theo từng người rồi lưu dưới dạng số nguyên xu (int64), nên
+  các tổng cộng là chính xác; riêng từng người có thể lệch tối đa 0.01 so với
+  phép tính Decimal của engine ghi bảng lương.
+- Mỗi lần xem trước tính song song hai phương án: tham số mặc định (cơ sở)
+  và tham số ghi đè (kịch bản), trả về tổng, chênh lệch và chi tiết theo
+  phòng ban.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.conf import settings
+
+from .models import ChamCongThang, NhanVien, PhongBan
+from .payroll import KHAU_TRU_MAC_DINH, PHU_CAP_MAC_DINH, so_ngay_cong_chuan
+
+# Nhân viên chưa có phòng ban được gom vào nhóm này
+KHONG_PHONG_BAN = -1
+
+COT_TONG = ('luong_co_ban', 'luong_theo_cong', 'tien_lam_them', 'phu_cap', 'khau_tru', 'luong_thuc_nhan')
+
+
+class DuLieuLuong:
+    """Các cột dữ liệu lương của một tháng dưới dạng mảng NumPy (cùng thứ tự id)."""
+
+    def __init__(self, thang, nam, nhan_vien_qs=None):
+        self.thang = thang
+        self.nam = nam
+        qs = nhan_vien_qs if nhan_vien_qs is not None else NhanVien.objects.all()
+        rows = list(
+            qs.filter(chuc_vu__isnull=False).order_by('id')
+            .values_list('id', 'phong_ban_id', 'chuc_vu_id', 'chuc_vu__luong_co_ban')
+        )
+        self.so_bo_qua = qs.filter(chuc_vu__isnull=True).count()
+        n = len(rows)
+        ids, phong_ban, chuc_vu, luong = zip(*rows) if rows else ((), (), (), ())
+        self.id = np.fromiter(ids, dtype=np.int64, count=n)
+        self.phong_ban = np.fromiter(
+            (KHONG_PHONG_BAN if pb is None else pb for pb in phong_ban), dtype=np.int64, count=n
+        )
+        self.chuc_vu = np.fromiter(chuc_vu, dtype=np.int64, count=n)
+        self.luong_co_ban = np.fromiter(luong, dtype=np.float64, count=n)
+
+        # Ngày công, giờ làm thêm: ghép theo id bằng searchsorted (self.id đã sắp xếp)
+        self.ngay_cong = np.zeros(n, dtype=np.float64)
+        self.gio_lam_them = np.zeros(n, dtype=np.float64)
+        cham_cong = ChamCongThang.objects.filter(thang=thang, nam=nam)
+        if nhan_vien_qs is not None:
+            cham_cong = cham_cong.filter(nhan_vien__in=nhan_vien_qs.values('id'))
+        cc_rows = list(cham_cong.values_list('nhan_vien_id', 'so_ngay_cong', 'gio_lam_them_quy_doi'))
+        if cc_rows and n:
+            cc_id, cc_ngay, cc_gio = zip(*cc_rows)
+            cc_id = np.array(cc_id, dtype=np.int64)
+            vi_tri = np.searchsorted(self.id, cc_id).clip(max=n - 1)
+            khop = self.id[vi_tri] == cc_id
+            self.ngay_cong[vi_tri[khop]] = np.array(cc_ngay, dtype=np.float64)[khop]
+            self.gio_lam_them[vi_tri[khop]] = np.fromiter(cc_gio, dtype=np.float64, count=len(cc_gio))[khop]
+
+    def __len__(self):
+        return len(self.id)
+
+
+def _ghi_de_theo_khoa(mac_dinh, khoa, ghi_de):
+    """
+    Mảng giá trị theo từng nhân viên: `mac_dinh` (số hoặc mảng), trừ những
+    nhân viên có `khoa` (phòng ban / chức vụ) nằm trong dict `ghi_de`.
+    """
+    ket_qua = np.broadcast_to(np.asarray(mac_dinh, dtype=np.float64), khoa.shape).copy()
+    if not ghi_de:
+        return ket_qua
+    cac_khoa = np.fromiter(ghi_de.keys(), dtype=np.int64, count=len(ghi_de))
+    gia_tri = np.fromiter(ghi_de.values(), dtype=np.float64, count=len(ghi_de))
+    thu_tu = np.argsort(cac_khoa)
+    cac_khoa, gia_tri = cac_khoa[thu_tu], gia_tri[thu_tu]
+    vi_tri = np.searchsorted(cac_khoa, khoa).clip(max=len(cac_khoa) - 1)
+    khop = cac_khoa[vi_tri] == khoa
+    ket_qua[khop] = gia_tri[vi_tri[khop]]
+    return ket_qua
+
+
+def _xu(mang):
+    """Tiền (float) -> số nguyên xu, làm tròn half-even như Decimal.quantize."""
+    return np.rint(mang * 100).astype(np.int64)
+
+
+def tinh_phuong_an(du_lieu, cong_chuan, phu_cap=PHU_CAP_MAC_DINH, khau_tru=KHAU_TRU_MAC_DINH,
+                   he_so_luong_co_ban=1, luong_co_ban_theo_chuc_vu=None,
+                   phu_cap_theo_phong_ban=None, khau_tru_theo_phong_ban=None):
+    """
+    Tính lương của mọi nhân viên trong `du_lieu` theo một bộ tham số.
+    Trả về dict cột -> mảng int64 (đơn vị: xu).
+    """
+    luong_co_ban = _ghi_de_theo_khoa(du_lieu.luong_co_ban, du_lieu.chuc_vu, luong_co_ban_theo_chuc_vu)
+    luong_co_ban *= float(he_so_luong_co_ban)
+    if cong_chuan > 0:
+        luong_theo_cong = luong_co_ban / cong_chuan * du_lieu.ngay_cong
+        # Cùng công thức với payroll.tinh_tien_lam_them
+        tien_lam_them = luong_co_ban / (cong_chuan * settings.SO_GIO_LAM_CHUAN_MOT_NGAY) * du_lieu.gio_lam_them
+    else:
+        luong_theo_cong = np.zeros_like(luong_co_ban)
+        tien_lam_them = np.zeros_like(luong_co_ban)
+    mang_phu_cap = _ghi_de_theo_khoa(float(phu_cap), du_lieu.phong_ban, phu_cap_theo_phong_ban)
+    mang_khau_tru = _ghi_de_theo_khoa(float(khau_tru), du_lieu.phong_ban, khau_tru_theo_phong_ban)
+    return {
+        'luong_co_ban': _xu(luong_co_ban),
+        'luong_theo_cong': _xu(luong_theo_cong),
+        'tien_lam_them': _xu(tien_lam_them),
+        'phu_cap': _xu(mang_phu_cap),
+        'khau_tru': _xu(mang_khau_tru),
+        'luong_thuc_nhan': _xu(luong_theo_cong + tien_lam_them + mang_phu_cap - mang_khau_tru),
+    }
+
+
+def _tien(xu):
+    """Số nguyên xu -> chuỗi tiền 2 chữ số thập phân (giống DecimalField của DRF)."""
+    return str(Decimal(int(xu)).scaleb(-2))
+
+
+def _tong(cot, nhom=None, so_nhom=None):
+    if nhom is None:
+        return {ten: int(cot[ten].sum()) for ten in COT_TONG}
+    # bincount với weights trả về float64: cộng xu theo nhóm bằng np.add.at để giữ int64
+    ket_qua = {}
+    for ten in COT_TONG:
+        tong = np.zeros(so_nhom, dtype=np.int64)
+        np.add.at(tong, nhom, cot[ten])
+        ket_qua[ten] = tong
+    return ket_qua
+
+
+def xem_truoc_bang_luong(thang, nam, tham_so=None, nhan_vien_qs=None):
+    """
+    Xem trước bảng lương tháng `thang`/`nam` với `tham_so` ghi đè (xem
+    tinh_phuong_an; thêm 'cong_chuan' để đổi số ngày công chuẩn).
+    Không ghi DB. Trả về dict sẵn sàng để render JSON.
+    """
+    tham_so = dict(tham_so or {})
+    cong_chuan_goc = so_ngay_cong_chuan(nam, thang)
+    cong_chuan = tham_so.pop('cong_chuan', None) or cong_chuan_goc
+
+    du_lieu = DuLieuLuong(thang, nam, nhan_vien_qs)
+    co_so = tinh_phuong_an(du_lieu, cong_chuan_goc)
+    kich_ban = tinh_phuong_an(du_lieu, cong_chuan, **tham_so)
+
+    phong_ban_ids, nhom = np.unique(du_lieu.phong_ban, return_inverse=True)
+    so_nhom = len(phong_ban_ids)
+    so_nhan_vien = np.bincount(nhom, minlength=so_nhom)
+    tong_co_so = _tong(co_so, nhom, so_nhom)
+    tong_kich_ban = _tong(kich_ban, nhom, so_nhom)
+    ten_phong_ban = dict(PhongBan.objects.filter(
+        id__in=[int(pb) for pb in phong_ban_ids if pb != KHONG_PHONG_BAN]
+    ).values_list('id', 'ten_phong_ban'))
+
+    phong_ban = []
+    for i, pb in enumerate(phong_ban_ids.tolist()):
+        phong_ban.append({
+            'phong_ban': None if pb == KHONG_PHONG_BAN else pb,
+            'ten_phong_ban': ten_phong_ban.get(pb),
+            'so_nhan_vien': int(so_nhan_vien[i]),
+            **{ten: _tien(tong_kich_ban[ten][i]) for ten in COT_TONG},
+            'chenh_lech': _tien(tong_kich_ban['luong_thuc_nhan'][i] - tong_co_so['luong_thuc_nhan'][i]),
+        })
+
+    tong = _tong(kich_ban)
+    tong_goc = _tong(co_so)
+    return {
+        'thang': thang,
+        'nam': nam,
+        'cong_chuan': cong_chuan,
+        'so_nhan_vien': len(du_lieu),
+        'bo_qua_chua_co_chuc_vu': du_lieu.so_bo_qua,
+        'tong': {ten: _tien(tong[ten]) for ten in COT_TONG},
+        'tong_co_so': {ten: _tien(tong_goc[ten]) for ten in COT_TONG},
+        'chenh_lech': _tien(tong['luong_thuc_nhan'] - tong_goc['luong_thuc_nhan']),
+        'phong_ban': phong_ban,
+    }
@@ -1,6 +1,75 @@
 # Trong nhan_vien/permissions.py
+import hmac
+
+from django.conf import settings
 from rest_framework import permissions
-from .models import UserAccount 
+from .models import NhanVien, UserAccount
+
+QUAN_LY_ROLES = ('Manager', 'Admin', 'HR')
+
+
+def get_role(request):
+    """
+    Vai trò của user hiện tại.
+    - Request dùng JWT (HRTokenUser): đọc từ claim, KHÔNG truy vấn DB.
+    - Request dùng session (admin, browsable API): tra UserAccount một lần
+      và ghi nhớ trên request.
+    """
+    user = request.user
+    role = getattr(user, 'role', None)
+    if role is not None:
+        return role
+    if not hasattr(request, '_cached_role'):
+        try:
+            request._cached_role = UserAccount.objects.get(user=user).role
+        except UserAccount.DoesNotExist:
+            request._cached_role = 'Employee' # Mặc định
+    return request._cached_role
+
+
+def get_nhan_vien_id(request):
+    """Id hồ sơ NhanVien của user hiện tại (None nếu không có)."""
+    user = request.user
+    if hasattr(user, 'token'):
+        return user.nhan_vien_id
+    if not hasattr(request, '_cached_nhan_vien_id'):
+        request._cached_nhan_vien_id = (
+            NhanVien.objects.filter(user=user).values_list('id', flat=True).first()
+        )
+    return request._cached_nhan_vien_id
+
+
+def is_quan_ly(request):
+    return get_role(request) in QUAN_LY_ROLES
+
+class IsQuanLy(permissions.BasePermission):
+    """Chỉ cho phép 'Manager', 'Admin', 'HR' (kể cả với request đọc)."""
+
+    def has_permission(self, request, view):
+        return is_quan_ly(request)
+
+
+class IsAdmin(permissions.BasePermission):
+    """Chỉ cho phép 'Admin' (vd. xem số liệu vận hành)."""
+
+    def has_permission(self, request, view):
+        return get_role(request) == 'Admin'
+
+
+class IsMayChamCong(permissions.BasePermission):
+    """
+    Máy chấm công: header X-Terminal-Key khớp khóa của một máy trong
+    MAY_CHAM_CONG_KEYS. Máy không có tài khoản/JWT nên chỉ vào được các
+    endpoint khai báo rõ permission này (nhận lượt chấm).
+    """
+
+    def has_permission(self, request, view):
+        khoa = request.headers.get('X-Terminal-Key', '')
+        return bool(khoa) and any(
+            hmac.compare_digest(khoa.encode(), khoa_may.encode())
+            for khoa_may in settings.MAY_CHAM_CONG_KEYS.values()
+        )
+
 
 class IsManagerOrReadOnly(permissions.BasePermission):
     """
@@ -16,12 +85,8 @@ class IsManagerOrReadOnly(permissions.BasePermission):
             return True
 
         # Từ đây trở xuống là các method "không an toàn" (POST, PUT, etc.)
-        # Kiểm tra vai trò của người dùng
-        try:
-            user_account = UserAccount.objects.get(user=request.user)
-            return user_account.role in ['Manager', 'Admin', 'HR'] 
-        except UserAccount.DoesNotExist:
-            return False
+        # Kiểm tra vai trò của người dùng (đọc từ claim của token)
+        return is_quan_ly(request)
 
 
 class DonXinNghiPermission(permissions.BasePermission):
@@ -46,33 +111,22 @@ class DonXinNghiPermission(permissions.BasePermission):
 
         # 2. Đối với các method còn lại (PUT, PATCH, DELETE ở cấp độ list)
         # chỉ cho phép Manager/Admin/HR
-        try:
-            user_account = UserAccount.objects.get(user=request.user)
-            return user_account.role in ('Manager', 'Admin', 'HR')
-        except UserAccount.DoesNotExist:
-            return False
+        return is_quan_ly(request)
 
     def has_object_permission(self, request, view, obj):
         # (Hàm này được gọi cho /donxinnghi/{id}/)
 
-        # Lấy vai trò user
-        try:
-            user_account = UserAccount.objects.get(user=request.user)
-            role = user_account.role
-        except UserAccount.DoesNotExist:
-            role = 'Employee' # Mặc định
-
         # 1. Manager/Admin/HR có toàn quyền trên object
-        if role in ('Manager', 'Admin', 'HR'):
+        if is_quan_ly(request):
             return True
         
         # 2. Nhân viên (Employee)
         
-        # Kiểm tra xem có phải chủ đơn không
-        try:
-            is_owner = obj.nhan_vien.user == request.user
-        except AttributeError:
-            return False # Phòng trường hợp 'nhan_vien' hoặc 'user' là null
+        # Kiểm tra xem có phải chủ đơn không (so sánh id, không cần join)
+        nhan_vien_id = get_nhan_vien_id(request)
+        if nhan_vien_id is None:
+            return False # User không có hồ sơ nhân viên
+        is_owner = obj.nhan_vien_id == nhan_vien_id
 
         # Nếu là chủ đơn, cho phép GET (xem chi tiết)
         if request.method in permissions.SAFE_METHODS: # (GET)
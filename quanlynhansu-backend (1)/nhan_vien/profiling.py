@@ -0,0 +1,330 @@
+# Trong nhan_vien/profiling.py
+"""
+Đo đạc từng request: số truy vấn, thời gian SQL / serializer / view / render,
+và phát hiện N+1 (cùng một dạng câu SQL lặp lại nhiều lần trong một request).
+
+- Chỉ đo một phần request (PROFILING_SAMPLE_RATE); request không được chọn
+  chỉ tốn một lần gọi random().
+- Kết quả trả về qua header `Server-Timing` (xem được trong DevTools của
+  trình duyệt) và được cộng dồn thành histogram theo route, xem qua
+  GET /api/profiling/ (chỉ Admin). Header gửi cho mọi client nên N+1 chỉ
+  có số lượng; call site (file:dòng) chỉ nằm trong log và histogram.
+- `serializer` được đo ở ViewSet (DoSerializerMixin) và các đường dựng JSON
+  nhanh (do_serializer), không vá lại class của DRF.
+- Histogram nằm trong bộ nhớ của từng tiến trình (mỗi worker một bản).
+- `sql` là thời gian execute; việc đọc dòng (fetch) của queryset lớn diễn ra
+  khi duyệt kết quả nên được tính vào `serializer`/`view`.
+"""
+import contextvars
+import logging
+import random
+import re
+import threading
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+logger = logging.getLogger(__name__)
+
+# Mốc histogram (ms); mốc cuối cùng là "lớn hơn mọi mốc"
+MOC_HISTOGRAM = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+# Số call site N+1 giữ lại cho mỗi route
+SO_N_PLUS_ONE_GIU_LAI = 20
+
+_ho_so_hien_tai = contextvars.ContextVar('ho_so_request', default=None)
+
+# `IN (%s, %s, ...)` có số tham số khác nhau vẫn là cùng một dạng truy vấn
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_THU_MUC_DU_AN = str(Path(settings.BASE_DIR).resolve())
+_FILE_NAY = __file__
+
+
+def dang_truy_van(sql):
+    return _IN_LIST.sub('(...)', sql)
+
+
+def _call_site():
+    """
+    Frame gần nhất thuộc mã nguồn dự án (bỏ qua thư viện và file này).
+    """
+    for frame in reversed(traceback.extract_stack()):
+        if (
+            frame.filename.startswith(_THU_MUC_DU_AN)
+            and frame.filename != _FILE_NAY
+            and 'site-packages' not in frame.filename
+        ):
+            return f'{Path(frame.filename).relative_to(_THU_MUC_DU_AN)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+class HoSoRequest:
+    """Số liệu của một request đang được đo."""
+
+    def __init__(self):
+        self.so_truy_van = 0
+        self.sql_ms = 0.0
+        self.serializer_ms = 0.0
+        self.dang = Counter()
+        # dạng truy vấn -> call site (ghi lại khi vừa vượt ngưỡng N+1)
+        self.n_plus_one = {}
+        self._do_sau_serializer = 0
+        self._serializer_bat_dau = None
+
+    def ghi_truy_van(self, execute, sql, params, many, context):
+        bat_dau = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_ms += (time.perf_counter() - bat_dau) * 1000
+            self.so_truy_van += 1
+            dang = dang_truy_van(sql)
+            self.dang[dang] += 1
+            if self.dang[dang] == settings.PROFILING_N_PLUS_ONE_THRESHOLD:
+                # Chỉ lấy stack một lần cho mỗi dạng bị nghi N+1
+                self.n_plus_one[dang] = _call_site()
+
+
+def _ghi_truy_van(execute, sql, params, many, context):
+    """
+    Execute wrapper gắn cố định vào mọi kết nối. Đọc request đang đo từ
+    contextvar nên vẫn đúng khi ORM chạy trong thread của sync_to_async
+    (view async).
+    """
+    ho_so = _ho_so_hien_tai.get()
+    if ho_so is None:
+        return execute(sql, params, many, context)
+    return ho_so.ghi_truy_van(execute, sql, params, many, context)
+
+
+def _gan_wrapper(connection, **kwargs):
+    if _ghi_truy_van not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_ghi_truy_van)
+
+
+def cai_dat_do_truy_van():
+    """Gắn wrapper vào các kết nối đã mở và mọi kết nối mở sau này."""
+    connection_created.connect(_gan_wrapper, dispatch_uid='nhan_vien.profiling')
+    for conn in connections.all(initialized_only=True):
+        _gan_wrapper(conn)
+
+
+def bat_dau_do_serializer():
+    """
+    Mở khoảng đo serializer của request đang được đo. Trả về False nếu không
+    đo hoặc đã có khoảng đang mở (không đo lồng, không cộng hai lần).
+    """
+    ho_so = _ho_so_hien_tai.get()
+    if ho_so is None or ho_so._do_sau_serializer:
+        return False
+    ho_so._do_sau_serializer += 1
+    ho_so._serializer_bat_dau = (time.perf_counter(), ho_so.sql_ms)
+    return True
+
+
+def ket_thuc_do_serializer():
+    """
+    Đóng khoảng đo đang mở: cộng thời gian serialize (không tính SQL chạy bên
+    trong, vd. queryset lười được duyệt lúc serialize).
+    """
+    ho_so = _ho_so_hien_tai.get()
+    if ho_so is None or ho_so._serializer_bat_dau is None:
+        return
+    bat_dau, sql_truoc = ho_so._serializer_bat_dau
+    ho_so._serializer_bat_dau = None
+    ho_so._do_sau_serializer -= 1
+    tong = (time.perf_counter() - bat_dau) * 1000
+    ho_so.serializer_ms += tong - (ho_so.sql_ms - sql_truoc)
+
+
+@contextmanager
+def do_serializer():
+    """Đo một đoạn serialize (đường dựng JSON không qua serializer DRF)."""
+    da_mo = bat_dau_do_serializer()
+    try:
+        yield
+    finally:
+        if da_mo:
+            ket_thuc_do_serializer()
+
+
+class DoSerializerMixin:
+    """
+    Mixin cho ViewSet: thời gian serializer tính từ lần get_serializer() đầu
+    tiên có dữ liệu (instance hoặc data) tới finalize_response, trừ SQL chạy
+    trong khoảng đó. Sau get_serializer, action DRF chỉ còn validate/serialize.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        if args or 'instance' in kwargs or 'data' in kwargs:
+            bat_dau_do_serializer()
+        return super().get_serializer(*args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        ket_thuc_do_serializer()
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+# ===============================================
+# Histogram theo route
+# ===============================================
+
+class ThongKeRoute:
+    def __init__(self):
+        self.so_request = 0
+        self.histogram = [0] * (len(MOC_HISTOGRAM) + 1)
+        self.tong_ms = 0.0
+        self.tong_sql_ms = 0.0
+        self.tong_serializer_ms = 0.0
+        self.tong_truy_van = 0
+        self.truy_van_toi_da = 0
+        self.n_plus_one = Counter()  # (dạng, call site) -> số request mắc
+
+    def them(self, tong_ms, ho_so):
+        self.so_request += 1
+        self.histogram[next((i for i, moc in enumerate(MOC_HISTOGRAM) if tong_ms <= moc), len(MOC_HISTOGRAM))] += 1
+        self.tong_ms += tong_ms
+        self.tong_sql_ms += ho_so.sql_ms
+        self.tong_serializer_ms += ho_so.serializer_ms
+        self.tong_truy_van += ho_so.so_truy_van
+        self.truy_van_toi_da = max(self.truy_van_toi_da, ho_so.so_truy_van)
+        for dang, call_site in ho_so.n_plus_one.items():
+            self.n_plus_one[(dang, call_site)] += 1
+
+    def to_dict(self):
+        n = self.so_request
+        return {
+            'so_request': n,
+            'histogram_ms': {
+                **{f'<={moc}': so for moc, so in zip(MOC_HISTOGRAM, self.histogram)},
+                f'>{MOC_HISTOGRAM[-1]}': self.histogram[-1],
+            },
+            'trung_binh_ms': round(self.tong_ms / n, 2),
+            'trung_binh_sql_ms': round(self.tong_sql_ms / n, 2),
+            'trung_binh_serializer_ms': round(self.tong_serializer_ms / n, 2),
+            'truy_van_trung_binh': round(self.tong_truy_van / n, 2),
+            'truy_van_toi_da': self.truy_van_toi_da,
+            'n_plus_one': [
+                {'truy_van': dang, 'call_site': call_site, 'so_request': so}
+                for (dang, call_site), so in self.n_plus_one.most_common(SO_N_PLUS_ONE_GIU_LAI)
+            ],
+        }
+
+
+_khoa = threading.Lock()
+_thong_ke = {}
+
+
+def ghi_thong_ke(route, tong_ms, ho_so):
+    with _khoa:
+        _thong_ke.setdefault(route, ThongKeRoute()).them(tong_ms, ho_so)
+
+
+def lay_thong_ke():
+    with _khoa:
+        return {route: tk.to_dict() for route, tk in sorted(_thong_ke.items())}
+
+
+def xoa_thong_ke():
+    with _khoa:
+        _thong_ke.clear()
+
+
+# ===============================================
+# Middleware
+# ===============================================
+
+def _server_timing(ten, ms=None, mo_ta=None):
+    gia_tri = ten
+    if ms is not None:
+        gia_tri += f';dur={ms:.1f}'
+    if mo_ta:
+        gia_tri += ';desc="{}"'.format(mo_ta.replace('"', "'"))
+    return gia_tri
+
+
+class RequestProfilingMiddleware:
+    """
+    Đo một phần request theo PROFILING_SAMPLE_RATE và gắn header Server-Timing:
+    sql (kèm số truy vấn), serializer, view, render, total và n1 (số dạng truy
+    vấn bị nghi N+1) nếu có.
+    Hỗ trợ cả sync và async (không ép view async chạy trong thread).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        cai_dat_do_truy_van()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return self.get_response(request)
+        ho_so, token, bat_dau = self._bat_dau(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _ho_so_hien_tai.reset(token)
+        return self._ket_thuc(request, response, ho_so, bat_dau)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.PROFILING_SAMPLE_RATE:
+            return await self.get_response(request)
+        ho_so, token, bat_dau = self._bat_dau(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _ho_so_hien_tai.reset(token)
+        return self._ket_thuc(request, response, ho_so, bat_dau)
+
+    def _bat_dau(self, request):
+        ho_so = HoSoRequest()
+        request._ho_so_profiling = ho_so
+        return ho_so, _ho_so_hien_tai.set(ho_so), time.perf_counter()
+
+    def _ket_thuc(self, request, response, ho_so, bat_dau):
+        ket_thuc = time.perf_counter()
+        tong_ms = (ket_thuc - bat_dau) * 1000
+
+        # view bao gồm cả SQL và serializer chạy trong view
+        metrics = [
+            _server_timing('sql', ho_so.sql_ms, f'{ho_so.so_truy_van} queries'),
+            _server_timing('serializer', ho_so.serializer_ms),
+        ]
+        view_bat_dau = getattr(request, '_profiling_view_bat_dau', None)
+        view_ket_thuc = getattr(request, '_profiling_view_ket_thuc', None)
+        if view_bat_dau is not None and view_ket_thuc is not None:
+            metrics.append(_server_timing('view', (view_ket_thuc - view_bat_dau) * 1000))
+            metrics.append(_server_timing('render', (ket_thuc - view_ket_thuc) * 1000))
+        if ho_so.n_plus_one:
+            metrics.append(_server_timing('n1', mo_ta=f'{len(ho_so.n_plus_one)} patterns'))
+            for dang, call_site in ho_so.n_plus_one.items():
+                logger.warning('N+1 tại %s: %d lần `%s` (%s %s)',
+                               call_site, ho_so.dang[dang], dang, request.method, request.path)
+        metrics.append(_server_timing('total', tong_ms))
+        response['Server-Timing'] = ', '.join(metrics)
+
+        match = getattr(request, 'resolver_match', None)
+        route = f'{request.method} {match.view_name if match else "<không khớp URL>"}'
+        ghi_thong_ke(route, tong_ms, ho_so)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_ho_so_profiling'):
+            request._profiling_view_bat_dau = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Response của DRF được render SAU bước này
+        if hasattr(request, '_ho_so_profiling'):
+            request._profiling_view_ket_thuc = time.perf_counter()
+        return response
@@ -0,0 +1,165 @@
+# Trong nhan_vien/search.py
+"""
+Tìm kiếm nhân viên không phân biệt dấu bằng SQLite FTS5.
+
+- Bảng ảo `nhan_vien_nhanvien_fts` (tạo ở migration 0013) có rowid = id
+  nhân viên, các cột ma_nhan_vien, ho_ten, phong_ban, chuc_vu đã được
+  bỏ dấu và viết thường ("Nguyễn Văn Đức" -> "nguyen van duc"). Tokenizer
+  unicode61 không gộp đ/d nên việc bỏ dấu làm ở Python, cho cả dữ liệu lẫn
+  từ khóa tìm kiếm.
+- Mỗi từ khóa được tìm theo tiền tố ("ngu" khớp "nguyen") nhờ chỉ mục
+  prefix của FTS5; kết quả xếp theo bm25, mã và họ tên nặng ký hơn phòng
+  ban/chức vụ.
+- Đồng bộ qua signal khi lưu/xóa NhanVien, PhongBan, ChucVu. Đường ghi hàng
+  loạt (bulk_create) phải gọi dong_bo_chi_muc() hoặc rebuild_chi_muc().
+- Database khác SQLite: không có bảng FTS, tìm kiếm lùi về icontains.
+"""
+import re
+import unicodedata
+
+from django.db import connections, router, transaction
+from django.db.models import Q
+
+from .models import NhanVien
+
+BANG_FTS = 'nhan_vien_nhanvien_fts'
+CHUNK_SIZE = 2000
+# Trọng số bm25 theo thứ tự cột: ma_nhan_vien, ho_ten, phong_ban, chuc_vu
+TRONG_SO_BM25 = (10.0, 5.0, 1.0, 1.0)
+SO_TU_TOI_DA = 8
+
+_TU = re.compile(r'\w+')
+
+
+def bo_dau(text):
+    """Bỏ dấu tiếng Việt và viết thường (kể cả đ/Đ -> d)."""
+    text = unicodedata.normalize('NFD', text or '').replace('đ', 'd').replace('Đ', 'd')
+    return ''.join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def bieu_thuc_match(tu_khoa):
+    """
+    Từ khóa người dùng -> biểu thức MATCH của FTS5: mọi từ đều phải khớp
+    (AND), mỗi từ khớp theo tiền tố. Chỉ giữ ký tự chữ/số nên không thể
+    chèn cú pháp FTS5. Trả về '' nếu không còn từ nào.
+    """
+    return ' '.join(f'"{tu}"*' for tu in _TU.findall(bo_dau(tu_khoa))[:SO_TU_TOI_DA])
+
+
+def _ho_tro_fts(connection):
+    return connection.vendor == 'sqlite'
+
+
+def _dong_chi_muc(queryset):
+    rows = queryset.values_list(
+        'id', 'ma_nhan_vien', 'ho_ten', 'phong_ban__ten_phong_ban', 'chuc_vu__ten_chuc_vu'
+    ).iterator(chunk_size=CHUNK_SIZE)
+    for pk, ma, ho_ten, phong_ban, chuc_vu in rows:
+        yield pk, bo_dau(ma), bo_dau(ho_ten), bo_dau(phong_ban), bo_dau(chuc_vu)
+
+
+def _ghi(cursor, dong, xoa_cu):
+    if xoa_cu:
+        cursor.executemany(f'DELETE FROM {BANG_FTS} WHERE rowid = %s', [(d[0],) for d in dong])
+    cursor.executemany(
+        f'INSERT INTO {BANG_FTS} (rowid, ma_nhan_vien, ho_ten, phong_ban, chuc_vu) VALUES (%s, %s, %s, %s, %s)',
+        dong,
+    )
+
+
+def dong_bo_chi_muc(queryset, using='default', xoa_cu=True):
+    """
+    Ghi lại dòng chỉ mục của các nhân viên trong `queryset`. Trả về số dòng.
+    xoa_cu=False khi chắc chắn chưa có dòng cũ (bỏ được một DELETE mỗi dòng).
+    """
+    connection = connections[using]
+    if not _ho_tro_fts(connection):
+        return 0
+    so_dong = 0
+    batch = []
+    # Một transaction: autocommit sẽ commit (fsync) sau từng câu INSERT
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        for dong in _dong_chi_muc(queryset.using(using)):
+            batch.append(dong)
+            if len(batch) >= CHUNK_SIZE:
+                _ghi(cursor, batch, xoa_cu)
+                so_dong += len(batch)
+                batch = []
+        _ghi(cursor, batch, xoa_cu)
+    return so_dong + len(batch)
+
+
+def xoa_khoi_chi_muc(nhan_vien_ids, using='default'):
+    connection = connections[using]
+    if not _ho_tro_fts(connection):
+        return
+    with transaction.atomic(using=using), connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {BANG_FTS} WHERE rowid = %s', [(pk,) for pk in nhan_vien_ids])
+
+
+def rebuild_chi_muc(using='default'):
+    """Dựng lại toàn bộ chỉ mục (backfill / sau khi nhập hàng loạt). Trả về số dòng."""
+    connection = connections[using]
+    if not _ho_tro_fts(connection):
+        return 0
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {BANG_FTS}')
+        so_dong = dong_bo_chi_muc(NhanVien.objects.all(), using=using, xoa_cu=False)
+        with connection.cursor() as cursor:
+            # Gộp các segment để truy vấn nhanh nhất
+            cursor.execute(f"INSERT INTO {BANG_FTS} ({BANG_FTS}) VALUES ('optimize')")
+    return so_dong
+
+
+class KetQuaTimKiem:
+    """
+    Danh sách id nhân viên khớp từ khóa, xếp theo độ liên quan. Lười: chỉ
+    chạy truy vấn khi đếm (count) hoặc cắt trang (slice), nên dùng trực tiếp
+    được với Paginator của Django / PageNumberPagination của DRF.
+    """
+
+    def __init__(self, tu_khoa):
+        self.tu_khoa = tu_khoa
+        self.match = bieu_thuc_match(tu_khoa)
+        self.using = router.db_for_read(NhanVien)
+        self.fts = _ho_tro_fts(connections[self.using])
+
+    def _queryset_du_phong(self):
+        dieu_kien = Q()
+        for tu in _TU.findall(self.tu_khoa)[:SO_TU_TOI_DA]:
+            dieu_kien &= (
+                Q(ma_nhan_vien__icontains=tu) | Q(ho_ten__icontains=tu)
+                | Q(phong_ban__ten_phong_ban__icontains=tu) | Q(chuc_vu__ten_chuc_vu__icontains=tu)
+            )
+        return NhanVien.objects.using(self.using).filter(dieu_kien).order_by('ma_nhan_vien')
+
+    def count(self):
+        if not self.match:
+            return 0
+        if not self.fts:
+            return self._queryset_du_phong().count()
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {BANG_FTS} WHERE {BANG_FTS} MATCH %s', [self.match])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, khoang):
+        if not isinstance(khoang, slice):
+            raise TypeError('KetQuaTimKiem chỉ hỗ trợ cắt theo slice.')
+        bat_dau = khoang.start or 0
+        so_dong = khoang.stop - bat_dau
+        if not self.match or so_dong <= 0:
+            return []
+        if not self.fts:
+            return list(self._queryset_du_phong().values_list('id', flat=True)[bat_dau:khoang.stop])
+        trong_so = ', '.join(str(w) for w in TRONG_SO_BM25)
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {BANG_FTS} WHERE {BANG_FTS} MATCH %s '
+                f'ORDER BY bm25({BANG_FTS}, {trong_so}), rowid LIMIT %s OFFSET %s',
+                [self.match, so_dong, bat_dau],
+            )
+            return [row[0] for row in cursor.fetchall()]
@@ -2,28 +2,39 @@ from rest_framework import serializers
 from django.contrib.auth.models import User
 from django.db import transaction
 from .models import NhanVien, PhongBan, ChucVu, ChamCong, DonXinNghi
-from .models import Payslip
+from .models import Payslip, ChamCongThang, NgayLe, TacVu
+from .fieldsets import FieldsetSerializerMixin
+from .jobs import tham_so_cong_khai
+from .leave import SO_DON_TOI_DA_MOI_LAN
+from .payroll import ky_luong_dang_mo
+from .workdays import so_ngay_cong_chuan
 # ===============================================
 # Serializer cho các Model đơn giản
 # ===============================================
 
-class PhongBanSerializer(serializers.ModelSerializer):
+class PhongBanSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer cho model Phòng Ban."""
     class Meta:
         model = PhongBan
         fields = '__all__'
 
-class ChucVuSerializer(serializers.ModelSerializer):
+class ChucVuSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer cho model Chức Vụ."""
     class Meta:
         model = ChucVu
         fields = '__all__'
 
+class NgayLeSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    """Serializer cho ngày lễ / ngày làm bù của lịch làm việc."""
+    class Meta:
+        model = NgayLe
+        fields = '__all__'
+
 # ===============================================
 # Serializer chính cho Nhân Viên
 # ===============================================
 
-class NhanVienSerializer(serializers.ModelSerializer):
+class NhanVienSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """
     Serializer hoàn chỉnh cho Nhân Viên.
     - Xử lý quan hệ lồng nhau để hiển thị chi tiết.
@@ -70,7 +81,7 @@ class NhanVienSerializer(serializers.ModelSerializer):
         Nếu là cập nhật (instance tồn tại), đặt `ma_nhan_vien` thành chỉ đọc.
         """
         super().__init__(*args, **kwargs)
-        if self.instance:
+        if self.instance and 'ma_nhan_vien' in self.fields:
             self.fields['ma_nhan_vien'].read_only = True
             
     def create(self, validated_data):
@@ -115,25 +126,66 @@ class NhanVienSerializer(serializers.ModelSerializer):
         instance.save()
         return instance
 
+class NhanVienTomTatSerializer(serializers.ModelSerializer):
+    """Nhân viên dạng rút gọn, dùng cho ?expand=nhan_vien ở các API khác."""
+    class Meta:
+        model = NhanVien
+        fields = ['id', 'ma_nhan_vien', 'ho_ten', 'phong_ban']
+        read_only_fields = fields
+
 # ===============================================
 # Serializer cho các Model còn lại
 # ===============================================
 
-class ChamCongSerializer(serializers.ModelSerializer):
+class ChamCongSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer cho model Chấm Công."""
     class Meta:
         model = ChamCong
         fields = '__all__'
+        expandable_fields = {'nhan_vien': NhanVienTomTatSerializer}
+
+class ChamCongThangSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    """Serializer (chỉ đọc) cho bảng tổng hợp chấm công theo tháng."""
+    # Tra lịch làm việc (O(1), không truy vấn theo dòng)
+    so_ngay_cong_chuan = serializers.SerializerMethodField()
 
-class DonXinNghiSerializer(serializers.ModelSerializer):
-    """Serializer cho model Đơn Xin Nghỉ."""
+    class Meta:
+        model = ChamCongThang
+        fields = [
+            'id', 'nhan_vien', 'nam', 'thang', 'so_ngay_cong', 'so_ngay_cong_chuan', 'tong_gio',
+            'gio_lam_them', 'gio_lam_them_quy_doi', 'so_lan_thieu_gio_ra', 'so_lan_di_muon', 'phut_di_muon',
+            'cap_nhat_luc'
+        ]
+        read_only_fields = fields
+        expandable_fields = {'nhan_vien': NhanVienTomTatSerializer}
+        field_sources = {'so_ngay_cong_chuan': ('nam', 'thang')}
+
+    def get_so_ngay_cong_chuan(self, obj):
+        return so_ngay_cong_chuan(obj.nam, obj.thang)
+
+class DonXinNghiSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer cho model Đơn Xin Nghỉ.
+    (Kiểm tra trùng lịch cần biết nhân viên cuối cùng nên nằm ở ViewSet.)
+    """
     class Meta:
         model = DonXinNghi
         fields = '__all__'
+        # Chỉ đổi qua approve/ reject/ bulk-review/ (UPDATE có điều kiện trang_thai='pending')
+        read_only_fields = ['trang_thai']
+        expandable_fields = {'nhan_vien': NhanVienTomTatSerializer}
+
+    def validate(self, attrs):
+        instance = self.instance
+        bat_dau = attrs.get('ngay_bat_dau', getattr(instance, 'ngay_bat_dau', None))
+        ket_thuc = attrs.get('ngay_ket_thuc', getattr(instance, 'ngay_ket_thuc', None))
+        if bat_dau and ket_thuc and ket_thuc < bat_dau:
+            raise serializers.ValidationError({'ngay_ket_thuc': ['Ngày kết thúc phải sau hoặc bằng ngày bắt đầu.']})
+        return attrs
 
 # ⭐️⭐️⭐️ PHẦN SỬA LỖI 500 NẰM Ở ĐÂY ⭐️⭐️⭐️
 
-class PayslipSerializer(serializers.ModelSerializer):
+class PayslipSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
     """Serializer cho model Bảng Lương."""
     
     # 1. Dùng để HIỂN THỊ tên nhân viên (GET)
@@ -151,10 +203,205 @@ class PayslipSerializer(serializers.ModelSerializer):
         model = Payslip
         # 3. Cập nhật 'fields' để bao gồm cả hai
         fields = [
-            'id', 'thang', 'nam', 'luong_co_ban', 'phu_cap', 'khau_tru', 
-            'luong_thuc_nhan', 
+            'id', 'thang', 'nam', 'luong_co_ban', 'phu_cap', 'khau_tru', 'tien_lam_them',
+            'luong_thuc_nhan', 'can_tinh_lai',
             'nhan_vien',    # Trường đọc
             'nhan_vien_id'  # Trường ghi
         ]
         # 4. Đặt luong_thuc_nhan là read_only, vì nó được tự động tính
-        read_only_fields = ['luong_thuc_nhan']
\ No newline at end of file
+        read_only_fields = ['luong_thuc_nhan', 'can_tinh_lai']
+        # ?expand=nhan_vien: object thay cho chuỗi "mã - họ tên"
+        expandable_fields = {'nhan_vien': NhanVienTomTatSerializer}
+
+class DuyetDonSerializer(serializers.Serializer):
+    """Body của API duyệt/từ chối nhiều đơn xin nghỉ."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=SO_DON_TOI_DA_MOI_LAN
+    )
+    hanh_dong = serializers.ChoiceField(choices=['approve', 'reject'])
+
+
+class PayrollPreviewSerializer(serializers.Serializer):
+    """Tham số của API xem trước bảng lương (không gắn với model nào)."""
+    thang = serializers.IntegerField(min_value=1, max_value=12)
+    nam = serializers.IntegerField(min_value=2000, max_value=2100)
+    cong_chuan = serializers.IntegerField(min_value=1, max_value=31, required=False)
+    phu_cap = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0, required=False)
+    khau_tru = serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0, required=False)
+    he_so_luong_co_ban = serializers.DecimalField(
+        max_digits=5, decimal_places=3, min_value=0, max_value=10, required=False
+    )
+    # {id chức vụ: lương cơ bản mới}, {id phòng ban: phụ cấp / khấu trừ riêng}
+    luong_co_ban_theo_chuc_vu = serializers.DictField(
+        child=serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0), required=False
+    )
+    phu_cap_theo_phong_ban = serializers.DictField(
+        child=serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0), required=False
+    )
+    khau_tru_theo_phong_ban = serializers.DictField(
+        child=serializers.DecimalField(max_digits=15, decimal_places=2, min_value=0), required=False
+    )
+
+    def validate(self, attrs):
+        for field in ('luong_co_ban_theo_chuc_vu', 'phu_cap_theo_phong_ban', 'khau_tru_theo_phong_ban'):
+            if field in attrs:
+                try:
+                    attrs[field] = {int(k): v for k, v in attrs[field].items()}
+                except ValueError:
+                    raise serializers.ValidationError({field: ['Khóa phải là id (số nguyên).']})
+        return attrs
+
+# ===============================================
+# Tác vụ nền (nhan_vien.jobs)
+# ===============================================
+
+class TacVuSerializer(FieldsetSerializerMixin, serializers.ModelSerializer):
+    """Trạng thái / tiến độ / kết quả một tác vụ nền (chỉ đọc)."""
+    tham_so = serializers.SerializerMethodField()
+    co_tep_ket_qua = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TacVu
+        fields = [
+            'id', 'loai', 'trang_thai', 'tien_do', 'thong_diep', 'tham_so', 'ket_qua', 'co_tep_ket_qua',
+            'loi', 'so_lan_thu', 'so_lan_thu_toi_da', 'yeu_cau_huy', 'nguoi_tao',
+            'tao_luc', 'chay_sau', 'bat_dau_luc', 'ket_thuc_luc', 'cap_nhat_luc',
+        ]
+        read_only_fields = fields
+        field_sources = {'tham_so': ('loai', 'tham_so'), 'co_tep_ket_qua': ('tep_ket_qua',)}
+
+    def get_tham_so(self, obj):
+        return tham_so_cong_khai(obj.loai, obj.tham_so)
+
+    def get_co_tep_ket_qua(self, obj):
+        return bool(obj.tep_ket_qua)
+
+
+class _KyLuongSerializer(serializers.Serializer):
+    thang = serializers.IntegerField(min_value=1, max_value=12, required=False)
+    nam = serializers.IntegerField(min_value=2000, max_value=2100, required=False)
+
+
+class ThamSoTinhLuongSerializer(_KyLuongSerializer):
+    """Mặc định: kỳ lương đang mở (tháng trước), như lệnh calculate_payroll."""
+    workers = serializers.IntegerField(min_value=1, max_value=32, default=1)
+    khoi_dong_lai = serializers.BooleanField(default=False)
+
+    def validate(self, attrs):
+        if 'thang' not in attrs or 'nam' not in attrs:
+            attrs['nam'], attrs['thang'] = ky_luong_dang_mo()
+        return attrs
+
+
+class ThamSoTinhLaiLuongSerializer(_KyLuongSerializer):
+    pass
+
+
+class ThamSoXuatBangLuongSerializer(_KyLuongSerializer):
+    dinh_dang = serializers.ChoiceField(choices=['csv', 'xlsx'], default='csv')
+
+
+class ThamSoXuatChamCongSerializer(serializers.Serializer):
+    nhan_vien = serializers.IntegerField(required=False)
+    phong_ban = serializers.IntegerField(required=False)
+    tu_ngay = serializers.DateField(required=False)
+    den_ngay = serializers.DateField(required=False)
+    dinh_dang = serializers.ChoiceField(choices=['csv', 'xlsx'], default='csv')
+
+
+class ThamSoNhapNhanVienSerializer(serializers.Serializer):
+    """Cùng định dạng dòng với NhanVienViewSet.bulk_import."""
+    rows = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+
+THAM_SO_TAC_VU = {
+    'tinh_luong': ThamSoTinhLuongSerializer,
+    'tinh_lai_luong': ThamSoTinhLaiLuongSerializer,
+    'xuat_bang_luong': ThamSoXuatBangLuongSerializer,
+    'xuat_cham_cong': ThamSoXuatChamCongSerializer,
+    'nhap_nhan_vien': ThamSoNhapNhanVienSerializer,
+}
+
+
+class TaoTacVuSerializer(serializers.Serializer):
+    """Body của POST /api/tacvu/: {"loai": ..., "tham_so": {...}}."""
+    loai = serializers.ChoiceField(choices=TacVu.LOAI_CHOICES)
+    tham_so = serializers.DictField(default=dict)
+
+    def validate(self, attrs):
+        tham_so = THAM_SO_TAC_VU[attrs['loai']](data=attrs['tham_so'])
+        if not tham_so.is_valid():
+            raise serializers.ValidationError({'tham_so': tham_so.errors})
+        attrs['tham_so'] = dict(tham_so.validated_data)
+        return attrs
+
+# ===============================================
+# Đường đọc nhanh cho các action `list`
+# ===============================================
+# Dựng dict trực tiếp từ `.values()` (tên liên quan được JOIN trong cùng truy
+# vấn) thay vì khởi tạo field DRF cho từng dòng. Kết quả JSON phải giống hệt
+# NhanVienSerializer / PayslipSerializer — test so sánh từng byte.
+
+# Dùng đúng to_representation của DRF để định dạng số tiền giống hệt
+_tien = serializers.DecimalField(max_digits=15, decimal_places=2).to_representation
+
+
+def _ngay(value):
+    return value.isoformat() if value is not None else None
+
+
+NHAN_VIEN_LIST_FIELDS = (
+    'id', 'ma_nhan_vien', 'ho_ten', 'ngay_sinh', 'ngay_vao_lam',
+    'phong_ban_id', 'phong_ban__ten_phong_ban',
+    'chuc_vu_id', 'chuc_vu__ten_chuc_vu', 'chuc_vu__luong_co_ban',
+    'user__username',
+)
+
+
+def nhan_vien_list_data(queryset):
+    """Danh sách nhân viên cùng định dạng với NhanVienSerializer(many=True).data."""
+    data = []
+    append = data.append
+    for (pk, ma, ho_ten, ngay_sinh, ngay_vao_lam, pb_id, ten_pb,
+         cv_id, ten_cv, luong_cv, username) in queryset.values_list(*NHAN_VIEN_LIST_FIELDS):
+        append({
+            'id': pk,
+            'ma_nhan_vien': ma,
+            'ho_ten': ho_ten,
+            'ngay_sinh': _ngay(ngay_sinh),
+            'ngay_vao_lam': _ngay(ngay_vao_lam),
+            'phong_ban': None if pb_id is None else {'id': pb_id, 'ten_phong_ban': ten_pb},
+            'chuc_vu': None if cv_id is None else {
+                'id': cv_id, 'ten_chuc_vu': ten_cv, 'luong_co_ban': _tien(luong_cv),
+            },
+            'username': username,
+        })
+    return data
+
+
+PAYSLIP_LIST_FIELDS = (
+    'id', 'thang', 'nam', 'luong_co_ban', 'phu_cap', 'khau_tru', 'tien_lam_them', 'luong_thuc_nhan', 'can_tinh_lai',
+    'nhan_vien__ma_nhan_vien', 'nhan_vien__ho_ten',
+)
+
+
+def payslip_list_data(queryset):
+    """Danh sách bảng lương cùng định dạng với PayslipSerializer(many=True).data."""
+    data = []
+    append = data.append
+    for (pk, thang, nam, co_ban, phu_cap, khau_tru, lam_them, thuc_nhan, can_tinh_lai,
+         ma, ho_ten) in queryset.values_list(*PAYSLIP_LIST_FIELDS):
+        append({
+            'id': pk,
+            'thang': thang,
+            'nam': nam,
+            'luong_co_ban': _tien(co_ban),
+            'phu_cap': _tien(phu_cap),
+            'khau_tru': _tien(khau_tru),
+            'tien_lam_them': _tien(lam_them),
+            'luong_thuc_nhan': _tien(thuc_nhan),
+            'can_tinh_lai': can_tinh_lai,
+            # Giống NhanVien.__str__
+            'nhan_vien': f'{ma} - {ho_ten}',
+        })
+    return data
@@ -0,0 +1,163 @@
+# Trong nhan_vien/signals.py
+"""
+Signal giữ các bảng dẫn xuất đồng bộ với dữ liệu gốc.
+(Được đăng ký trong NhanVienConfig.ready)
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .attendance import cap_nhat_tong_hop
+from .caching import callback_khi_commit, theo_doi_thay_doi
+from .models import ChamCong, ChucVu, DonXinNghi, NgayLe, NhanVien, Payslip, PhongBan
+from .payroll import danh_dau_can_tinh_lai_nhan_vien
+from .search import dong_bo_chi_muc, xoa_khoi_chi_muc
+from .workdays import xoa_cache as xoa_cache_lich
+
+# Bảng tra cứu được cache kèm ETag: đổi phiên bản khi có thay đổi
+theo_doi_thay_doi(PhongBan)
+theo_doi_thay_doi(ChucVu)
+# Nguồn của dashboard (nhan_vien.dashboard). Các đường ghi hàng loạt không
+# phát signal tự gọi lam_moi_phien_ban()
+theo_doi_thay_doi(NhanVien)
+theo_doi_thay_doi(ChamCong)
+theo_doi_thay_doi(DonXinNghi)
+theo_doi_thay_doi(Payslip)
+# Lịch làm việc (workdays): tiến trình khác nhận thay đổi qua phiên bản cache,
+# tiến trình hiện tại bỏ lịch đã dựng ngay lập tức
+theo_doi_thay_doi(NgayLe)
+post_save.connect(xoa_cache_lich, sender=NgayLe, dispatch_uid='workdays:save')
+post_delete.connect(xoa_cache_lich, sender=NgayLe, dispatch_uid='workdays:delete')
+
+
+def _khoa_thang(nhan_vien_id, ngay):
+    return (nhan_vien_id, ngay.year, ngay.month)
+
+
+@receiver(pre_save, sender=ChamCong)
+def ghi_nho_khoa_cham_cong_cu(sender, instance, raw=False, **kwargs):
+    # Khi sửa nhân viên/ngày của một dòng, tháng CŨ cũng phải tính lại
+    instance._khoa_cu = None
+    if raw or instance.pk is None:
+        return
+    cu = ChamCong.objects.filter(pk=instance.pk).values_list('nhan_vien_id', 'ngay').first()
+    if cu is not None:
+        instance._khoa_cu = _khoa_thang(*cu)
+
+
+class _TongHopKhiCommit:
+    """Callback on_commit: tính lại một lần cho mọi khóa tháng gom được."""
+
+    def __init__(self):
+        self.keys = set()
+        self.da_chay = False
+
+    def __call__(self):
+        self.da_chay = True
+        cap_nhat_tong_hop(self.keys)
+
+
+def _tinh_lai_khi_commit(keys, using):
+    """
+    Gom khóa (nhan_vien_id, nam, thang) của transaction hiện tại và tính lại
+    một lần khi commit: sửa/xóa hàng loạt (xóa nhân viên, bulk delete trong
+    admin) không tính lại tổng hợp theo từng dòng. Ngoài transaction thì
+    chạy ngay.
+    """
+    if transaction.get_connection(using).in_atomic_block:
+        callback_khi_commit(_TongHopKhiCommit, using).keys.update(keys)
+    else:
+        cap_nhat_tong_hop(keys)
+
+
+@receiver(post_save, sender=ChamCong)
+def cap_nhat_tong_hop_khi_luu(sender, instance, raw=False, using='default', **kwargs):
+    if raw:
+        return
+    keys = {_khoa_thang(instance.nhan_vien_id, instance.ngay)}
+    if getattr(instance, '_khoa_cu', None):
+        keys.add(instance._khoa_cu)
+    _tinh_lai_khi_commit(keys, using)
+
+
+@receiver(post_delete, sender=ChamCong)
+def cap_nhat_tong_hop_khi_xoa(sender, instance, using='default', **kwargs):
+    _tinh_lai_khi_commit({_khoa_thang(instance.nhan_vien_id, instance.ngay)}, using)
+
+
+# ===============================================
+# Bảng lương cần tính lại khi chức vụ / lương cơ bản đổi
+# (chấm công: xem attendance.cap_nhat_tong_hop)
+# ===============================================
+
+@receiver(pre_save, sender=NhanVien)
+def ghi_nho_chuc_vu_cu(sender, instance, raw=False, **kwargs):
+    instance._chuc_vu_cu = None
+    if raw or instance.pk is None:
+        return
+    instance._chuc_vu_cu = NhanVien.objects.filter(pk=instance.pk).values_list('chuc_vu_id', flat=True).first()
+
+
+@receiver(post_save, sender=NhanVien)
+def danh_dau_luong_khi_doi_chuc_vu(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    if getattr(instance, '_chuc_vu_cu', None) != instance.chuc_vu_id:
+        danh_dau_can_tinh_lai_nhan_vien([instance.pk])
+
+
+@receiver(pre_save, sender=ChucVu)
+def ghi_nho_luong_co_ban_cu(sender, instance, raw=False, **kwargs):
+    instance._luong_co_ban_cu = None
+    if raw or instance.pk is None:
+        return
+    instance._luong_co_ban_cu = ChucVu.objects.filter(pk=instance.pk).values_list('luong_co_ban', flat=True).first()
+
+
+@receiver(post_save, sender=ChucVu)
+def danh_dau_luong_khi_doi_luong_co_ban(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    if getattr(instance, '_luong_co_ban_cu', None) != instance.luong_co_ban:
+        danh_dau_can_tinh_lai_nhan_vien(NhanVien.objects.filter(chuc_vu=instance).values('id'))
+
+
+# ===============================================
+# Chỉ mục tìm kiếm nhân viên (nhan_vien.search)
+# ===============================================
+
+@receiver(post_save, sender=NhanVien)
+def dong_bo_tim_kiem_nhan_vien(sender, instance, using='default', **kwargs):
+    dong_bo_chi_muc(NhanVien.objects.filter(pk=instance.pk), using=using)
+
+
+@receiver(post_delete, sender=NhanVien)
+def xoa_tim_kiem_nhan_vien(sender, instance, using='default', **kwargs):
+    xoa_khoi_chi_muc([instance.pk], using=using)
+
+
+@receiver(post_save, sender=PhongBan)
+@receiver(post_save, sender=ChucVu)
+def dong_bo_tim_kiem_danh_muc(sender, instance, created=False, using='default', **kwargs):
+    # Đổi tên phòng ban/chức vụ: cập nhật dòng chỉ mục của các nhân viên thuộc về nó
+    if created:
+        return
+    field = 'phong_ban' if sender is PhongBan else 'chuc_vu'
+    dong_bo_chi_muc(NhanVien.objects.filter(**{field: instance}), using=using)
+
+
+@receiver(pre_delete, sender=PhongBan)
+@receiver(pre_delete, sender=ChucVu)
+def ghi_nho_nhan_vien_cua_danh_muc(sender, instance, **kwargs):
+    # SET_NULL được thực hiện bằng UPDATE hàng loạt (không có signal), nên
+    # ghi nhớ danh sách nhân viên trước khi xóa để đồng bộ lại sau đó
+    field = 'phong_ban' if sender is PhongBan else 'chuc_vu'
+    instance._nhan_vien_ids = list(NhanVien.objects.filter(**{field: instance}).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=PhongBan)
+@receiver(post_delete, sender=ChucVu)
+def dong_bo_tim_kiem_khi_xoa_danh_muc(sender, instance, using='default', **kwargs):
+    nhan_vien_ids = getattr(instance, '_nhan_vien_ids', None)
+    if nhan_vien_ids:
+        dong_bo_chi_muc(NhanVien.objects.filter(id__in=nhan_vien_ids), using=using)
@@ -1,3 +1,1721 @@
-from django.test import TestCase
+from datetime import date, datetime, time
+from decimal import Decimal
+from functools import lru_cache
+import zipfile
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from .attendance import chi_so_dong, rebuild_tong_hop
+from .models import (
+    NhanVien, PhongBan, ChucVu, ChamCong, ChamCongThang, DonXinNghi, UserAccount, Payslip,
+    PayrollCheckpoint, NgayLe, TacVu
+)
+from .dashboard import lay_dashboard, tinh_dashboard
+from .export import COT_CHAM_CONG, du_lieu_xuat
+from .jobs import XU_LY, chay_cac_tac_vu_dang_cho, danh_dau_worker_song, tao_tac_vu
+from .db_router import ReadReplicaMiddleware, ReadReplicaRouter
+from .leave import lich_vang_mat
+from .onboarding import ghi_chunk, nhap_nhan_vien
+from .profiling import HoSoRequest, xoa_thong_ke
+from .search import KetQuaTimKiem, bieu_thuc_match, bo_dau, rebuild_chi_muc
+from .serializers import NhanVienSerializer, PayslipSerializer
+from .signals import _TongHopKhiCommit
+from .workdays import la_ngay_lam_viec, so_ngay_lam_viec, xoa_cache as xoa_cache_lich
+from .payroll import (
+    chay_tinh_luong, doc_tong_hop_thang, tinh_luong, so_ngay_cong_chuan, chay_shard, chay_tinh_luong_song_song
+)
+
+
+@lru_cache
+def mat_khau_hash():
+    # Băm một lần cho cả bộ test (PBKDF2 rất chậm)
+    return make_password('matkhau123')
+
+
+def tao_nhan_vien(ma, phong_ban=None, chuc_vu=None, **kwargs):
+    """Tạo nhanh một User + NhanVien cho test."""
+    user = User.objects.create(username=f'user_{ma}', password=mat_khau_hash())
+    return NhanVien.objects.create(
+        user=user, ma_nhan_vien=ma, ho_ten=kwargs.pop('ho_ten', f'Nhân viên {ma}'),
+        ngay_sinh=date(1990, 1, 1), ngay_vao_lam=date(2020, 1, 1),
+        phong_ban=phong_ban, chuc_vu=chuc_vu, **kwargs
+    )
+
+
+class PayrollEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phong_ban = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+        cls.chuc_vu = ChucVu.objects.create(ten_chuc_vu='Kỹ sư', luong_co_ban=Decimal('26000000'))
+        cls.nhan_viens = [tao_nhan_vien(f'NV{i:03d}', cls.phong_ban, cls.chuc_vu) for i in range(5)]
+        cls.khong_chuc_vu = tao_nhan_vien('NV999', cls.phong_ban)
+        # Bảng tổng hợp tháng được tính khi transaction commit
+        with cls.captureOnCommitCallbacks(execute=True):
+            for nv in cls.nhan_viens[:3]:
+                for day in (1, 2, 3):
+                    ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, day), gio_vao=time(8, 0))
+
+    def test_query_count_does_not_scale_with_employees(self):
+        # Lịch làm việc của năm được dựng một lần cho mỗi tiến trình
+        so_ngay_cong_chuan(2025, 9)
+        # 2 truy vấn đọc + SAVEPOINT/RELEASE + 1 câu upsert
+        with self.assertNumQueries(5):
+            ket_qua = chay_tinh_luong(9, 2025)
+        self.assertEqual(ket_qua.so_bang_luong, 5)
+        self.assertEqual(len(ket_qua.bo_qua), 1)
+
+    def test_upsert_updates_existing_payslip(self):
+        chay_tinh_luong(9, 2025)
+        with self.captureOnCommitCallbacks(execute=True):
+            ChamCong.objects.create(nhan_vien=self.nhan_viens[4], ngay=date(2025, 9, 4), gio_vao=time(8, 0))
+        chay_tinh_luong(9, 2025)
+
+        self.assertEqual(Payslip.objects.filter(thang=9, nam=2025).count(), 5)
+        payslip = Payslip.objects.get(nhan_vien=self.nhan_viens[4], thang=9, nam=2025)
+        expected = tinh_luong(Decimal('26000000'), so_ngay_cong_chuan(2025, 9), 1)
+        self.assertEqual(payslip.luong_thuc_nhan, expected)
+
+    def test_save_matches_engine(self):
+        # Lưu qua API/admin (Payslip.save) ra cùng lương thực nhận với engine
+        chay_tinh_luong(9, 2025)
+        payslip = Payslip.objects.get(nhan_vien=self.nhan_viens[0], thang=9, nam=2025)
+        engine = payslip.luong_thuc_nhan
+        payslip.luong_thuc_nhan = 0
+        payslip.save()
+        self.assertEqual(payslip.luong_thuc_nhan, engine)
+
+    def test_save_without_attendance_keeps_baseline_formula(self):
+        # Bảng lương nhập tay cho tháng chưa có chấm công: không trả lương âm
+        payslip = Payslip.objects.create(
+            nhan_vien=self.nhan_viens[0], thang=12, nam=2025, luong_co_ban=Decimal('10000000'),
+            phu_cap=Decimal('500000'), khau_tru=Decimal('1000000'),
+        )
+        self.assertEqual(payslip.luong_thuc_nhan, Decimal('9500000'))
+
+
+class PayrollShardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        chuc_vu = ChucVu.objects.create(ten_chuc_vu='Kỹ sư', luong_co_ban=Decimal('26000000'))
+        cls.phong_bans = [PhongBan.objects.create(ten_phong_ban=f'Phòng {i}') for i in range(3)]
+        for i, phong_ban in enumerate(cls.phong_bans):
+            tao_nhan_vien(f'NV{i:03d}', phong_ban, chuc_vu)
+        tao_nhan_vien('NV100', None, chuc_vu)
+
+    def test_resume_skips_checkpointed_shards(self):
+        # Giả lập lần chạy trước đã xong phòng ban đầu tiên
+        chay_shard(9, 2025, self.phong_bans[0].id)
+
+        shards = [pb_id for pb_id, _ in chay_tinh_luong_song_song(9, 2025)]
+
+        self.assertCountEqual(shards, [self.phong_bans[1].id, self.phong_bans[2].id, None])
+        self.assertEqual(Payslip.objects.filter(thang=9, nam=2025).count(), 4)
+        # Lần chạy đã xong trọn vẹn: checkpoint bị xóa, chạy lại thì tính lại cả tháng
+        self.assertFalse(PayrollCheckpoint.objects.filter(thang=9, nam=2025).exists())
+        self.assertEqual(len(list(chay_tinh_luong_song_song(9, 2025))), 4)
+
+    def test_interrupted_run_keeps_checkpoints(self):
+        lan_chay = chay_tinh_luong_song_song(9, 2025)
+        next(lan_chay)
+        lan_chay.close()
+        self.assertEqual(PayrollCheckpoint.objects.filter(thang=9, nam=2025).count(), 1)
+        self.assertEqual(len(list(chay_tinh_luong_song_song(9, 2025))), 3)
+
+    def test_command_month_year_options(self):
+        call_command('calculate_payroll', month=2, year=2024, stdout=StringIO(), stderr=StringIO())
+        self.assertFalse(PayrollCheckpoint.objects.filter(thang=2, nam=2024).exists())
+        self.assertEqual(Payslip.objects.filter(thang=2, nam=2024).count(), 4)
+
+
+def dang_nhap(client, nhan_vien):
+    """Lấy access token qua /api/token/ và gắn vào client."""
+    res = client.post('/api/token/', {'username': nhan_vien.user.username, 'password': 'matkhau123'})
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+    return res.data
+
+
+class TokenRoleClaimTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.quan_ly = tao_nhan_vien('QL001')
+        cls.quan_ly_account = UserAccount.objects.create(user=cls.quan_ly.user, employee=cls.quan_ly, role='Manager')
+        cls.nhan_vien = tao_nhan_vien('NV001')
+        cls.don = DonXinNghi.objects.create(
+            nhan_vien=cls.nhan_vien, ngay_bat_dau=date(2025, 9, 1),
+            ngay_ket_thuc=date(2025, 9, 2), ly_do='Việc riêng'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_permission_checks_run_no_role_queries(self):
+        dang_nhap(self.client, self.quan_ly)
+        # Chỉ còn: get_object + UPDATE, không tra User/UserAccount
+        with self.assertNumQueries(2):
+            res = self.client.post(f'/api/donxinnghi/{self.don.id}/approve/')
+        self.assertEqual(res.status_code, 200)
+
+    def test_employee_sees_only_own_requests(self):
+        dang_nhap(self.client, self.nhan_vien)
+        res = self.client.get('/api/donxinnghi/')
+        self.assertEqual([d['id'] for d in res.data], [self.don.id])
+        res = self.client.post(f'/api/donxinnghi/{self.don.id}/approve/')
+        self.assertEqual(res.status_code, 403)
+
+    def test_role_change_invalidates_old_access_token(self):
+        tokens = dang_nhap(self.client, self.quan_ly)
+        self.quan_ly_account.role = 'Employee'
+        self.quan_ly_account.save()
+
+        res = self.client.get('/api/donxinnghi/')
+        self.assertEqual(res.status_code, 401)
+
+        res = self.client.post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {res.data['access']}")
+        # Token mới mang role Employee: không còn thấy đơn của người khác
+        res = self.client.post(f'/api/donxinnghi/{self.don.id}/approve/')
+        self.assertEqual(res.status_code, 404)
+
+
+class ChamCongKeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phong_ban = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+        cls.nv1 = tao_nhan_vien('NV001', cls.phong_ban)
+        cls.nv2 = tao_nhan_vien('NV002')
+        for day in range(1, 8):
+            for nv in (cls.nv1, cls.nv2):
+                ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, day), gio_vao=time(8, 0))
+
+    def setUp(self):
+        self.client = APIClient()
+        dang_nhap(self.client, self.nv1)
+
+    def test_walk_all_pages_forward_and_back(self):
+        seen = []
+        url = '/api/chamcong/?page_size=4'
+        pages = []
+        while url:
+            res = self.client.get(url)
+            pages.append(res.data)
+            seen.extend(r['id'] for r in res.data['results'])
+            url = res.data['next']
+        expected = list(ChamCong.objects.order_by('-ngay', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertIsNone(pages[0]['previous'])
+
+        res = self.client.get(pages[-1]['previous'])
+        self.assertEqual(res.data['results'], pages[-2]['results'])
+
+    def test_server_side_filters(self):
+        res = self.client.get('/api/chamcong/', {
+            'phong_ban': self.phong_ban.id, 'tu_ngay': '2025-09-03', 'den_ngay': '2025-09-05'
+        })
+        self.assertEqual([r['ngay'] for r in res.data['results']], ['2025-09-05', '2025-09-04', '2025-09-03'])
+        self.assertTrue(all(r['nhan_vien'] == self.nv1.id for r in res.data['results']))
+
+        res = self.client.get('/api/chamcong/', {'tu_ngay': 'hôm qua'})
+        self.assertEqual(res.status_code, 400)
+
+
+class ChamCongBulkIngestTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.quan_ly = tao_nhan_vien('QL001')
+        UserAccount.objects.create(user=cls.quan_ly.user, role='HR')
+        cls.nv1 = tao_nhan_vien('NV001')
+        cls.nv2 = tao_nhan_vien('NV002')
+        ChamCong.objects.create(nhan_vien=cls.nv2, ngay=date(2025, 9, 1), gio_vao=time(7, 55))
+
+    def setUp(self):
+        self.client = APIClient()
+        dang_nhap(self.client, self.quan_ly)
+
+    def ingest(self, body, content_type, key='lo-1'):
+        return self.client.post(
+            '/api/chamcong/bulk-ingest/', body, content_type=content_type, HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    @override_settings(MAY_CHAM_CONG_KEYS={'cong-chinh': 'khoa-may-1'})
+    def test_terminal_key_only_opens_ingest(self):
+        may = APIClient()
+        body = '{"ma_nhan_vien": "NV001", "thoi_diem": "2025-09-02T08:00:00", "loai": "in"}'
+        res = may.post('/api/chamcong/bulk-ingest/', body, content_type='application/x-ndjson',
+                       HTTP_IDEMPOTENCY_KEY='lo-may', HTTP_X_TERMINAL_KEY='khoa-may-1')
+        self.assertEqual((res.status_code, res.data['tao_moi']), (201, 1))
+        # Khóa sai, hoặc khóa máy ở endpoint khác: không có quyền
+        res = may.post('/api/chamcong/bulk-ingest/', body, content_type='application/x-ndjson',
+                       HTTP_IDEMPOTENCY_KEY='lo-sai', HTTP_X_TERMINAL_KEY='khoa-khac')
+        self.assertEqual(res.status_code, 401)
+        self.assertEqual(may.get('/api/chamcong/', HTTP_X_TERMINAL_KEY='khoa-may-1').status_code, 401)
+        # Nhân viên thường không nhập lô được
+        dang_nhap(may, self.nv1)
+        self.assertEqual(may.post('/api/chamcong/bulk-ingest/', body, content_type='application/x-ndjson',
+                                  HTTP_IDEMPOTENCY_KEY='lo-nv').status_code, 403)
+
+    def test_ndjson_pairs_punches_and_is_idempotent(self):
+        body = '\n'.join([
+            '{"ma_nhan_vien": "NV001", "thoi_diem": "2025-09-01T08:05:00", "loai": "in"}',
+            '{"ma_nhan_vien": "NV001", "thoi_diem": "2025-09-01T08:01:00", "loai": "in"}',
+            '{"ma_nhan_vien": "NV001", "thoi_diem": "2025-09-01T17:30:00", "loai": "out"}',
+            '{"ma_nhan_vien": "NV002", "thoi_diem": "2025-09-01T17:00:00", "loai": "out"}',
+            '{"ma_nhan_vien": "NV404", "thoi_diem": "2025-09-01T08:00:00", "loai": "in"}',
+            'không phải json',
+        ])
+        res = self.ingest(body, 'application/x-ndjson')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual((res.data['tao_moi'], res.data['cap_nhat']), (1, 1))
+        self.assertEqual([e['dong'] for e in res.data['loi']], [5, 6])
+
+        row = ChamCong.objects.get(nhan_vien=self.nv1, ngay=date(2025, 9, 1))
+        self.assertEqual((row.gio_vao, row.gio_ra), (time(8, 1), time(17, 30)))
+        row = ChamCong.objects.get(nhan_vien=self.nv2, ngay=date(2025, 9, 1))
+        self.assertEqual((row.gio_vao, row.gio_ra), (time(7, 55), time(17, 0)))
+
+        res = self.ingest(body, 'application/x-ndjson')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Idempotent-Replayed'], 'true')
+        self.assertEqual(ChamCong.objects.count(), 2)
+
+    def test_csv_batch(self):
+        body = 'ma_nhan_vien,thoi_diem,loai\nNV001,2025-09-02T08:00:00+07:00,in\nNV001,2025-09-02T10:00:00Z,out\n'
+        res = self.ingest(body, 'text/csv', key='lo-csv')
+        self.assertEqual(res.status_code, 201)
+        row = ChamCong.objects.get(nhan_vien=self.nv1, ngay=date(2025, 9, 2))
+        self.assertEqual((row.gio_vao, row.gio_ra), (time(8, 0), time(17, 0)))
+
+    def test_requires_idempotency_key(self):
+        res = self.client.post('/api/chamcong/bulk-ingest/', '', content_type='text/csv')
+        self.assertEqual(res.status_code, 400)
+
+    def test_non_object_rows_are_reported(self):
+        res = self.ingest([1, 2], 'application/json', key='lo-so')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual([e['dong'] for e in res.data['loi']], [1, 2])
+
+    def test_overnight_out_closes_previous_day(self):
+        ChamCong.objects.create(nhan_vien=self.nv1, ngay=date(2025, 9, 3), gio_vao=time(22, 0))
+        body = '\n'.join([
+            '{"ma_nhan_vien": "NV001", "thoi_diem": "2025-09-04T02:00:00", "loai": "out"}',
+            '{"ma_nhan_vien": "NV001", "thoi_diem": "2025-09-04T22:05:00", "loai": "in"}',
+            '{"ma_nhan_vien": "NV001", "thoi_diem": "2025-09-05T06:00:00", "loai": "out"}',
+            '{"ma_nhan_vien": "NV002", "thoi_diem": "2025-09-04T02:00:00", "loai": "out"}',
+        ])
+        res = self.ingest(body, 'application/x-ndjson', key='lo-dem')
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual((res.data['tao_moi'], res.data['cap_nhat']), (1, 1))
+        self.assertEqual([(e['nhan_vien'], e['ngay']) for e in res.data['loi']], [(self.nv2.id, '2025-09-04')])
+        self.assertEqual(
+            list(ChamCong.objects.filter(nhan_vien=self.nv1, ngay__gte=date(2025, 9, 3))
+                 .order_by('ngay').values_list('ngay', 'gio_vao', 'gio_ra')),
+            [(date(2025, 9, 3), time(22, 0), time(2, 0)), (date(2025, 9, 4), time(22, 5), time(6, 0))],
+        )
+
+
+class ChamCongThangRollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.nv = tao_nhan_vien('NV001')
+
+    def tong_hop(self, thang=9):
+        return ChamCongThang.objects.get(nhan_vien=self.nv, nam=2025, thang=thang)
+
+    def test_rollup_follows_create_update_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ChamCong.objects.create(nhan_vien=self.nv, ngay=date(2025, 9, 1), gio_vao=time(8, 0), gio_ra=time(17, 0))
+            # Đi muộn + ca qua đêm (22:00 -> 06:30)
+            ChamCong.objects.create(nhan_vien=self.nv, ngay=date(2025, 9, 2), gio_vao=time(22, 0), gio_ra=time(6, 30))
+            thieu_ra = ChamCong.objects.create(nhan_vien=self.nv, ngay=date(2025, 9, 3), gio_vao=time(7, 50))
+
+        tong_hop = self.tong_hop()
+        self.assertEqual(tong_hop.so_ngay_cong, 3)
+        # 8 giờ (trừ 1 giờ nghỉ trưa) + 8.5 giờ qua đêm
+        self.assertEqual(tong_hop.tong_gio, Decimal('16.50'))
+        self.assertEqual(tong_hop.so_lan_thieu_gio_ra, 1)
+        self.assertEqual(tong_hop.so_lan_di_muon, 1)
+
+        # Chuyển dòng sang tháng 10: cả tháng cũ và tháng mới được tính lại
+        thieu_ra.ngay = date(2025, 10, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            thieu_ra.save()
+        self.assertEqual(self.tong_hop().so_ngay_cong, 2)
+        self.assertEqual(self.tong_hop(10).so_ngay_cong, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            thieu_ra.delete()
+        self.assertFalse(ChamCongThang.objects.filter(thang=10).exists())
+
+    def test_cascade_delete_recomputes_once_per_transaction(self):
+        nv = tao_nhan_vien('NV002')
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in range(1, 31):
+                ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, day), gio_vao=time(8, 0))
+                ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 10, day), gio_vao=time(8, 0))
+        self.assertEqual(ChamCongThang.objects.filter(nhan_vien=nv).count(), 2)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as truy_van:
+                nv.user.delete()
+        # Số truy vấn xóa không tăng theo số dòng chấm công; tổng hợp dồn về một
+        # callback (cùng một callback đổi phiên bản cache)
+        self.assertLess(len(truy_van), 30)
+        tong_hop = [c for c in callbacks if isinstance(c, _TongHopKhiCommit)]
+        self.assertEqual((len(tong_hop), len(callbacks)), (1, 2))
+        with CaptureQueriesContext(connection) as truy_van:
+            tong_hop[0]()
+        self.assertLess(len(truy_van), 15)
+        self.assertFalse(ChamCongThang.objects.filter(nhan_vien_id=nv.id).exists())
+
+    def test_rebuild_matches_incremental(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for day in range(1, 6):
+                ChamCong.objects.create(nhan_vien=self.nv, ngay=date(2025, 9, day), gio_vao=time(8, 30), gio_ra=time(17, 0))
+        truoc = list(ChamCongThang.objects.values('nhan_vien_id', 'nam', 'thang', 'so_ngay_cong', 'tong_gio', 'so_lan_di_muon'))
+
+        self.assertEqual(rebuild_tong_hop(), 1)
+        sau = list(ChamCongThang.objects.values('nhan_vien_id', 'nam', 'thang', 'so_ngay_cong', 'tong_gio', 'so_lan_di_muon'))
+        self.assertEqual(truoc, sau)
+        self.assertEqual(sau[0]['tong_gio'], Decimal('37.50'))
+
+    def test_backfill_migration_matches_rebuild(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        self.addCleanup(xoa_cache_lich)
+        NgayLe.objects.create(ngay=date(2025, 9, 14), ten='Làm bù', la_ngay_lam=True)
+        NgayLe.objects.create(ngay=date(2025, 10, 6), ten='Nghỉ bù', la_ngay_lam=False)
+        for ngay, gio_vao, gio_ra in (
+            (date(2025, 9, 1), time(8, 0), time(19, 30)), (date(2025, 9, 2), time(8, 30), time(13, 30)),
+            (date(2025, 9, 3), time(8, 5), None), (date(2025, 9, 7), time(22, 0), time(2, 0)),
+            (date(2025, 9, 14), time(10, 0), time(1, 0)), (date(2025, 10, 6), time(7, 45), time(17, 0)),
+        ):
+            ChamCong.objects.create(nhan_vien=self.nv, ngay=ngay, gio_vao=gio_vao, gio_ra=gio_ra)
+        cot = ('nhan_vien_id', 'nam', 'thang', 'so_ngay_cong', 'tong_gio', 'so_lan_thieu_gio_ra',
+               'so_lan_di_muon', 'phut_di_muon', 'gio_lam_them', 'gio_lam_them_quy_doi')
+        rebuild_tong_hop()
+        mong_doi = list(ChamCongThang.objects.order_by('thang').values(*cot))
+        self.assertEqual([dong['gio_lam_them_quy_doi'] for dong in mong_doi], [Decimal('32.75'), Decimal('24.75')])
+
+        import_module('nhan_vien.migrations.0019_backfill_chamcongthang').dien_tong_hop(apps, connection.schema_editor())
+        self.assertEqual(list(ChamCongThang.objects.order_by('thang').values(*cot)), mong_doi)
+
+
+class StreamingExportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        phong_ban = PhongBan.objects.create(ten_phong_ban='Kế toán')
+        chuc_vu = ChucVu.objects.create(ten_chuc_vu='Kế toán viên', luong_co_ban=Decimal('15000000'))
+        cls.quan_ly = tao_nhan_vien('QL001')
+        UserAccount.objects.create(user=cls.quan_ly.user, role='HR')
+        for i in range(3):
+            nv = tao_nhan_vien(f'NV{i:03d}', phong_ban, chuc_vu, ho_ten=f'Nguyễn Văn {i}')
+            ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, 1), gio_vao=time(8, 0))
+        chay_tinh_luong(9, 2025)
+
+    def setUp(self):
+        self.client = APIClient()
+        dang_nhap(self.client, self.quan_ly)
+
+    def test_payslip_csv_streams_joined_columns_in_one_query(self):
+        with self.assertNumQueries(1):
+            res = self.client.get('/api/payslips/export/', {'nam': 2025, 'thang': 9, 'format': 'csv'})
+            body = b''.join(res.streaming_content).decode('utf-8-sig')
+        lines = body.strip().splitlines()
+        self.assertTrue(res.streaming)
+        self.assertEqual(len(lines), 4)
+        self.assertIn('Kế toán,Kế toán viên,9,2025,15000000.00', lines[1])
+
+    def test_attendance_xlsx_is_valid_zip(self):
+        res = self.client.get('/api/chamcong/export/', {'format': 'xlsx', 'tu_ngay': '2025-09-01'})
+        self.assertEqual(res.status_code, 200)
+        archive = zipfile.ZipFile(BytesIO(b''.join(res.streaming_content)))
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 4)
+        self.assertIn('Nguyễn Văn 0', sheet)
+
+    def test_export_requires_manager_role(self):
+        client = APIClient()
+        dang_nhap(client, NhanVien.objects.get(ma_nhan_vien='NV000'))
+        res = client.get('/api/payslips/export/', {'format': 'csv'})
+        self.assertEqual(res.status_code, 403)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertIn('detail', res.json())
+
+    def test_export_errors_render_as_json(self):
+        res = self.client.get('/api/chamcong/export/', {'format': 'csv', 'nhan_vien': 'abc'})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(res['Content-Type'], 'application/json')
+        self.assertIn('nhan_vien', res.json())
+
+
+class LookupETagCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.nv = tao_nhan_vien('NV001')
+        PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        dang_nhap(self.client, self.nv)
+
+    def test_conditional_get_returns_304_without_queries(self):
+        res = self.client.get('/api/phongban/')
+        etag = res['ETag']
+        self.assertEqual(len(res.data), 1)
+
+        with self.assertNumQueries(0):
+            res = self.client.get('/api/phongban/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+        # Lần đọc sau (không có ETag) cũng lấy từ cache
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get('/api/phongban/').data), 1)
+
+    def test_write_invalidates_etag(self):
+        etag = self.client.get('/api/chucvu/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            ChucVu.objects.create(ten_chuc_vu='Trưởng phòng')
+            # Chưa commit: phiên bản giữ nguyên để GET đồng thời không cache dữ liệu cũ dưới phiên bản mới
+            self.assertEqual(self.client.get('/api/chucvu/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        res = self.client.get('/api/chucvu/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res['ETag'], etag)
+        self.assertEqual(len(res.data), 1)
+
+    def test_writes_in_one_transaction_bump_once_after_rolled_back_savepoint(self):
+        etag = self.client.get('/api/chucvu/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(ValueError), transaction.atomic():
+                ChucVu.objects.create(ten_chuc_vu='Bị hủy')
+                raise ValueError
+            ChucVu.objects.create(ten_chuc_vu='Trưởng phòng')
+            PhongBan.objects.create(ten_phong_ban='Kế toán')
+        # Callback của savepoint bị rollback không được dùng lại; hai model chung một callback
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(callbacks[0].labels, {'nhan_vien.chucvu', 'nhan_vien.phongban'})
+        self.assertNotEqual(self.client.get('/api/chucvu/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class FastListSerializerTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        phong_ban = PhongBan.objects.create(ten_phong_ban='Kế toán')
+        chuc_vu = ChucVu.objects.create(ten_chuc_vu='Nhân viên', luong_co_ban=Decimal('12345678.5'))
+        cls.nv = tao_nhan_vien('NV001', phong_ban, chuc_vu)
+        # Nhân viên không có phòng ban/chức vụ
+        nv2 = tao_nhan_vien('NV002')
+        for nhan_vien in (cls.nv, nv2):
+            Payslip.objects.create(
+                nhan_vien=nhan_vien, thang=9, nam=2025,
+                luong_co_ban=Decimal('1000000'), phu_cap=Decimal('0.5'), khau_tru=0,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        dang_nhap(self.client, self.nv)
+
+    def _json_drf(self, serializer_class, queryset):
+        return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+    def test_nhan_vien_list_is_byte_identical(self):
+        with self.assertNumQueries(1):
+            res = self.client.get('/api/nhanvien/')
+        queryset = NhanVien.objects.select_related('user', 'phong_ban', 'chuc_vu')
+        self.assertEqual(res.content, self._json_drf(NhanVienSerializer, queryset))
+
+    def test_payslip_list_is_byte_identical(self):
+        with self.assertNumQueries(1):
+            res = self.client.get('/api/payslips/')
+        queryset = Payslip.objects.select_related('nhan_vien').order_by('-nam', '-thang')
+        self.assertEqual(res.content, self._json_drf(PayslipSerializer, queryset))
+
+
+class SeedHRCommandTests(TestCase):
+    def test_seed_small_volume(self):
+        call_command(
+            'seed_hr', nhan_vien=30, cham_cong=200, don_xin_nghi=15, nam_luong=1,
+            phong_ban=3, chuc_vu=2, stdout=StringIO(),
+        )
+        self.assertEqual(NhanVien.objects.filter(ma_nhan_vien__startswith='SD').count(), 30)
+        self.assertEqual(ChamCong.objects.count(), 200)
+        self.assertEqual(DonXinNghi.objects.count(), 15)
+        # Đơn của cùng nhân viên không chồng lấn
+        for don in DonXinNghi.objects.all():
+            self.assertFalse(DonXinNghi.objects.filter(
+                nhan_vien_id=don.nhan_vien_id, ngay_bat_dau__lte=don.ngay_ket_thuc,
+                ngay_ket_thuc__gte=don.ngay_bat_dau,
+            ).exclude(pk=don.pk).exists())
+        self.assertEqual(Payslip.objects.count(), 30 * 12)
+        # Tổng hợp tháng khớp dữ liệu gốc
+        self.assertEqual(sum(ChamCongThang.objects.values_list('so_ngay_cong', flat=True)), 200)
+        self.assertEqual(UserAccount.objects.get(user__username='seed_sd000001').role, 'Admin')
+        # Mật khẩu chung đăng nhập được
+        res = APIClient().post('/api/token/', {'username': 'seed_sd000002', 'password': 'matkhau123'})
+        self.assertEqual(res.status_code, 200)
+
+        # Chạy lại với cùng tiền tố bị từ chối thay vì sinh trùng
+        with self.assertRaises(CommandError):
+            call_command('seed_hr', nhan_vien=1, stdout=StringIO())
+
+
+@override_settings(PROFILING_SAMPLE_RATE=1.0, PROFILING_N_PLUS_ONE_THRESHOLD=3)
+class RequestProfilingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = tao_nhan_vien('AD001')
+        UserAccount.objects.create(user=cls.admin.user, employee=cls.admin, role='Admin')
+        cls.nv = tao_nhan_vien('NV001')
+
+    def setUp(self):
+        xoa_thong_ke()
+        self.client = APIClient()
+        dang_nhap(self.client, self.admin)
+
+    def test_server_timing_header_reports_query_count(self):
+        res = self.client.get('/api/nhanvien/')
+        timing = res['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        for metric in ('serializer;dur=', 'view;dur=', 'render;dur=', 'total;dur='):
+            self.assertIn(metric, timing)
+        self.assertNotIn('n1', timing)
+
+    @override_settings(PROFILING_N_PLUS_ONE_THRESHOLD=1)
+    def test_n_plus_one_call_sites_stay_out_of_header(self):
+        with self.assertLogs('nhan_vien.profiling', 'WARNING') as logs:
+            timing = self.client.get('/api/nhanvien/')['Server-Timing']
+        self.assertRegex(timing, r'n1;desc="\d+ patterns"')
+        self.assertNotIn('.py', timing)
+        self.assertIn('.py:', ''.join(logs.output))
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_unsampled_request_has_no_header(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/nhanvien/'))
+
+    def test_detects_repeated_query_shape_with_call_site(self):
+        ho_so = HoSoRequest()
+        with connection.execute_wrapper(ho_so.ghi_truy_van):
+            for nhan_vien_id in (self.admin.id, self.nv.id, self.admin.id):
+                NhanVien.objects.get(id=nhan_vien_id)
+            # IN (...) với số tham số khác nhau vẫn là cùng một dạng
+            list(NhanVien.objects.filter(id__in=[1]))
+            list(NhanVien.objects.filter(id__in=[1, 2]))
+        self.assertEqual(ho_so.so_truy_van, 5)
+        self.assertEqual(len(ho_so.n_plus_one), 1)
+        call_site = next(iter(ho_so.n_plus_one.values()))
+        self.assertIn('nhan_vien/tests.py', call_site)
+        self.assertIn('test_detects_repeated_query_shape_with_call_site', call_site)
+
+    def test_histogram_endpoint_is_admin_only(self):
+        self.client.get('/api/nhanvien/')
+        self.client.get('/api/nhanvien/')
+        res = self.client.get('/api/profiling/')
+        self.assertEqual(res.status_code, 200)
+        route = res.data['routes']['GET nhanvien-list']
+        self.assertEqual(route['so_request'], 2)
+        self.assertEqual(sum(route['histogram_ms'].values()), 2)
+        self.assertEqual(route['truy_van_toi_da'], 1)
+
+        employee = APIClient()
+        dang_nhap(employee, self.nv)
+        self.assertEqual(employee.get('/api/profiling/').status_code, 403)
+
+
+class ReadReplicaRouterTests(SimpleTestCase):
+    # SimpleTestCase: không bọc test trong transaction của 'default'
+    def _dinh_tuyen(self, method):
+        """(db đọc, db ghi, db đọc trong transaction) khi xử lý request `method`."""
+        router = ReadReplicaRouter()
+
+        def get_response(request):
+            with mock.patch.object(connection, 'in_atomic_block', True):
+                trong_transaction = router.db_for_read(NhanVien)
+            return router.db_for_read(NhanVien), router.db_for_write(NhanVien), trong_transaction
+
+        return ReadReplicaMiddleware(get_response)(RequestFactory().generic(method, '/api/nhanvien/'))
+
+    def test_safe_methods_read_from_replica(self):
+        with mock.patch('nhan_vien.db_router._replica_kha_dung', return_value=True):
+            self.assertEqual(self._dinh_tuyen('GET'), ('replica', 'default', 'default'))
+            self.assertEqual(self._dinh_tuyen('POST'), ('default', 'default', 'default'))
+        # Ngoài request (management command, shell): luôn đọc từ default
+        self.assertEqual(ReadReplicaRouter().db_for_read(NhanVien), 'default')
+
+    def test_test_mirror_falls_back_to_default(self):
+        # Trong test, 'replica' là mirror của 'default' (cùng NAME)
+        self.assertEqual(self._dinh_tuyen('GET')[0], 'default')
+
+    def test_streaming_export_pins_replica(self):
+        # Dữ liệu xuất được đọc sau khi middleware trả về: kết nối phải được chốt trước
+        with mock.patch('nhan_vien.db_router._replica_kha_dung', return_value=True), \
+                mock.patch.object(QuerySet, 'values_list', autospec=True) as values_list:
+            ReadReplicaMiddleware(lambda request: du_lieu_xuat(ChamCong.objects.all(), COT_CHAM_CONG))(
+                RequestFactory().get('/api/chamcong/export/')
+            )
+        self.assertEqual(values_list.call_args[0][0].db, 'replica')
+
+
+class AsyncCheckInOutTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.nv = tao_nhan_vien('NV001')
+
+    def setUp(self):
+        token = dang_nhap(APIClient(), self.nv)['access']
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def _luc(self, ngay, gio):
+        return mock.patch(
+            'nhan_vien.async_views.timezone.localtime',
+            return_value=timezone.make_aware(datetime.combine(ngay, gio)),
+        )
+
+    async def test_check_in_then_check_out(self):
+        with self._luc(date(2025, 9, 1), time(8, 5)):
+            res = await self.async_client.post('/api/chamcong/check-in/', headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json()['ngay'], '2025-09-01')
+        self.assertFalse(res.json()['da_check_in'])
+        # Check-in lần hai giữ giờ vào sớm nhất và trả về giờ đã lưu
+        with self._luc(date(2025, 9, 1), time(8, 30)):
+            res = await self.async_client.post('/api/chamcong/check-in/', headers=self.headers)
+        self.assertEqual((res.json()['thoi_diem'], res.json()['da_check_in']), ('08:05:00', True))
+        with self._luc(date(2025, 9, 1), time(17, 15)):
+            res = await self.async_client.post('/api/chamcong/check-out/', headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+
+        cham_cong = await ChamCong.objects.aget(nhan_vien=self.nv)
+        self.assertEqual((cham_cong.gio_vao, cham_cong.gio_ra), (time(8, 5), time(17, 15)))
+        tong_hop = await ChamCongThang.objects.aget(nhan_vien=self.nv, nam=2025, thang=9)
+        self.assertEqual((tong_hop.so_ngay_cong, tong_hop.tong_gio, tong_hop.so_lan_di_muon), (1, Decimal('8.17'), 1))
+
+    async def test_check_out_closes_overnight_shift(self):
+        with self._luc(date(2025, 9, 1), time(22, 0)):
+            await self.async_client.post('/api/chamcong/check-in/', headers=self.headers)
+        with self._luc(date(2025, 9, 2), time(6, 0)):
+            res = await self.async_client.post('/api/chamcong/check-out/', headers=self.headers)
+        self.assertEqual(res.json()['ngay'], '2025-09-01')
+        self.assertEqual((await ChamCong.objects.aget(nhan_vien=self.nv)).gio_ra, time(6, 0))
+
+    def test_rollup_updated_under_wsgi(self):
+        # Client thường (WSGI, như runserver): tổng hợp tháng và dirty tracking
+        # bảng lương xong ngay trong request
+        Payslip.objects.bulk_create([Payslip(nhan_vien=self.nv, thang=9, nam=2025, luong_co_ban=0, luong_thuc_nhan=0)])
+        with self._luc(date(2025, 9, 1), time(8, 0)):
+            res = self.client.post('/api/chamcong/check-in/', headers=self.headers)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(ChamCongThang.objects.get(nhan_vien=self.nv, nam=2025, thang=9).so_ngay_cong, 1)
+        self.assertTrue(Payslip.objects.get(nhan_vien=self.nv, thang=9, nam=2025).can_tinh_lai)
+
+    async def test_errors(self):
+        res = await self.async_client.post('/api/chamcong/check-in/')
+        self.assertEqual(res.status_code, 401)
+        res = await self.async_client.post('/api/chamcong/check-out/', headers=self.headers)
+        self.assertEqual(res.status_code, 409)
+        res = await self.async_client.get('/api/chamcong/check-in/', headers=self.headers)
+        self.assertEqual(res.status_code, 405)
+
+
+class LeaveEngineTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phong_ban = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+        cls.quan_ly = tao_nhan_vien('QL001')
+        UserAccount.objects.create(user=cls.quan_ly.user, employee=cls.quan_ly, role='Manager')
+        cls.nv1 = tao_nhan_vien('NV001', cls.phong_ban)
+        cls.nv2 = tao_nhan_vien('NV002', cls.phong_ban)
+        cls.nv3 = tao_nhan_vien('NV003')
+        # 2025-09-01 là Thứ 2
+        cls.don = DonXinNghi.objects.create(
+            nhan_vien=cls.nv1, ngay_bat_dau=date(2025, 9, 1), ngay_ket_thuc=date(2025, 9, 3),
+            ly_do='Việc riêng', trang_thai='approved'
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _tao_don(self, nhan_vien, bat_dau, ket_thuc):
+        return self.client.post('/api/donxinnghi/', {
+            'nhan_vien': nhan_vien.id, 'ly_do': 'Nghỉ phép',
+            'ngay_bat_dau': bat_dau, 'ngay_ket_thuc': ket_thuc,
+        })
+
+    def test_so_ngay_lam_viec_bo_chu_nhat_va_ngay_le(self):
+        ngay_le = {date(2025, 9, 2), date(2026, 1, 1)}
+        for tu, den in ((date(2025, 9, 1), date(2025, 9, 30)), (date(2025, 9, 7), date(2025, 9, 7)),
+                        (date(2025, 12, 27), date(2026, 1, 5)), (date(2025, 9, 2), date(2025, 9, 1))):
+            mong_doi = sum(
+                1 for i in range((den - tu).days + 1)
+                if date.fromordinal(tu.toordinal() + i).weekday() != 6
+                and date.fromordinal(tu.toordinal() + i) not in ngay_le
+            )
+            self.assertEqual(so_ngay_lam_viec(tu, den), mong_doi)
+
+    def test_overlapping_request_rejected_on_create_and_update(self):
+        dang_nhap(self.client, self.nv1)
+        res = self._tao_don(self.nv1, '2025-09-03', '2025-09-05')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn(f'#{self.don.id}', res.data['ngay_bat_dau'][0])
+
+        res = self._tao_don(self.nv1, '2025-09-04', '2025-09-05')
+        self.assertEqual(res.status_code, 201)
+        dang_nhap(self.client, self.quan_ly)
+        # Sửa đơn của chính nó không bị coi là trùng, nhưng kéo sang đơn khác thì bị chặn
+        res = self.client.patch(f'/api/donxinnghi/{res.data["id"]}/', {'ngay_ket_thuc': '2025-09-06'})
+        self.assertEqual(res.status_code, 200)
+        res = self.client.patch(f'/api/donxinnghi/{res.data["id"]}/', {'ngay_bat_dau': '2025-09-02'})
+        self.assertEqual(res.status_code, 400)
+
+        dang_nhap(self.client, self.nv1)
+        res = self._tao_don(self.nv1, '2025-09-10', '2025-09-08')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('ngay_ket_thuc', res.data)
+
+    def test_rejected_request_does_not_block(self):
+        self.don.trang_thai = 'rejected'
+        self.don.save()
+        dang_nhap(self.client, self.nv1)
+        self.assertEqual(self._tao_don(self.nv1, '2025-09-02', '2025-09-02').status_code, 201)
+
+    def test_balance(self):
+        DonXinNghi.objects.create(
+            nhan_vien=self.nv1, ngay_bat_dau=date(2025, 12, 29), ngay_ket_thuc=date(2026, 1, 2),
+            ly_do='Tết', trang_thai='pending'
+        )
+        dang_nhap(self.client, self.nv1)
+        res = self.client.get('/api/donxinnghi/so-du/?nam=2025')
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(
+            {k: res.data[0][k] for k in ('nhan_vien', 'da_nghi', 'cho_duyet', 'con_lai')},
+            # 2/9 là ngày lễ nên đơn 1/9-3/9 chỉ trừ 2 ngày phép
+            {'nhan_vien': self.nv1.id, 'da_nghi': 2, 'cho_duyet': 3, 'con_lai': 10},
+        )
+
+        dang_nhap(self.client, self.quan_ly)
+        res = self.client.get(f'/api/donxinnghi/so-du/?nam=2025&phong_ban={self.phong_ban.id}')
+        self.assertEqual([d['nhan_vien'] for d in res.data], [self.nv1.id, self.nv2.id])
+
+    def test_absence_calendar_sweep(self):
+        DonXinNghi.objects.bulk_create([
+            DonXinNghi(nhan_vien=self.nv2, ngay_bat_dau=date(2025, 8, 30), ngay_ket_thuc=date(2025, 9, 2),
+                       ly_do='x', trang_thai='approved'),
+            DonXinNghi(nhan_vien=self.nv3, ngay_bat_dau=date(2025, 9, 3), ngay_ket_thuc=date(2025, 9, 3),
+                       ly_do='x', trang_thai='approved'),
+            DonXinNghi(nhan_vien=self.nv3, ngay_bat_dau=date(2025, 9, 10), ngay_ket_thuc=date(2025, 9, 10),
+                       ly_do='x', trang_thai='pending'),
+        ])
+        with self.assertNumQueries(1):
+            lich = lich_vang_mat(date(2025, 9, 1), date(2025, 9, 30))
+        self.assertEqual(
+            [(pb['phong_ban'], pb['ngay']) for pb in lich['phong_ban']],
+            [
+                (self.phong_ban.id, {
+                    '2025-09-01': [self.nv1.id, self.nv2.id],
+                    '2025-09-02': [self.nv1.id, self.nv2.id],
+                    '2025-09-03': [self.nv1.id],
+                }),
+                (None, {'2025-09-03': [self.nv3.id]}),
+            ],
+        )
+        self.assertEqual(lich['nhan_vien'][self.nv3.id]['ma_nhan_vien'], 'NV003')
+
+        dang_nhap(self.client, self.nv1)
+        self.assertEqual(self.client.get('/api/donxinnghi/lich-vang-mat/').status_code, 403)
+        dang_nhap(self.client, self.quan_ly)
+        res = self.client.get(f'/api/donxinnghi/lich-vang-mat/?tu_ngay=2025-09-01&den_ngay=2025-09-30'
+                              f'&phong_ban={self.phong_ban.id}&gom_cho_duyet=1')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data['phong_ban']), 1)
+        for nam in ('0', '10000'):
+            self.assertEqual(self.client.get(f'/api/donxinnghi/lich-vang-mat/?nam={nam}').status_code, 400)
+            self.assertEqual(self.client.get(f'/api/donxinnghi/so-du/?nam={nam}').status_code, 400)
+
+
+class EmployeeSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phong_ban = PhongBan.objects.create(ten_phong_ban='Kế toán')
+        cls.chuc_vu = ChucVu.objects.create(ten_chuc_vu='Trưởng phòng')
+        cls.duc = tao_nhan_vien('NV001', ho_ten='Nguyễn Văn Đức')
+        cls.nguyet = tao_nhan_vien('NV002', cls.phong_ban, cls.chuc_vu, ho_ten='Trần Thị Nguyệt')
+        cls.an = tao_nhan_vien('KT003', cls.phong_ban, ho_ten='Lê An')
+
+    def setUp(self):
+        self.client = APIClient()
+        dang_nhap(self.client, self.duc)
+
+    def _tim(self, q, **params):
+        res = self.client.get('/api/nhanvien/search/', {'q': q, **params})
+        self.assertEqual(res.status_code, 200)
+        return res.data
+
+    def test_bo_dau_va_bieu_thuc_match(self):
+        self.assertEqual(bo_dau('Nguyễn Văn ĐỨC'), 'nguyen van duc')
+        self.assertEqual(bieu_thuc_match('Đức "OR* nv-1'), '"duc"* "or"* "nv"* "1"*')
+
+    def test_accent_insensitive_prefix_and_ranking(self):
+        self.assertEqual([r['id'] for r in self._tim('nguyen duc')['results']], [self.duc.id])
+        self.assertEqual([r['id'] for r in self._tim('ĐỨC')['results']], [self.duc.id])
+        # Tiền tố: "ngu" khớp cả Nguyễn và Nguyệt
+        self.assertEqual({r['id'] for r in self._tim('ngu')['results']}, {self.duc.id, self.nguyet.id})
+        # Theo phòng ban; mã nhân viên xếp trên
+        data = self._tim('ke toan')
+        self.assertEqual(data['count'], 2)
+        self.assertEqual(data['results'][0]['phong_ban']['ten_phong_ban'], 'Kế toán')
+        self.assertEqual([r['id'] for r in self._tim('kt')['results']][0], self.an.id)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.nguyet.ho_ten = 'Trần Thị Hằng'
+        self.nguyet.save()
+        self.assertEqual(self._tim('nguyet')['count'], 0)
+        self.assertEqual(self._tim('hang')['count'], 1)
+
+        self.phong_ban.ten_phong_ban = 'Tài chính'
+        self.phong_ban.save()
+        self.assertEqual(self._tim('tai chinh')['count'], 2)
+        self.phong_ban.delete()
+        self.assertEqual(self._tim('tai chinh')['count'], 0)
+
+        self.an.user.delete()
+        self.assertEqual(self._tim('an')['count'], 0)
+        self.assertEqual(rebuild_chi_muc(), 2)
+
+    def test_pagination_and_validation(self):
+        data = self._tim('nv', page_size=1)
+        self.assertEqual((data['count'], len(data['results'])), (2, 1))
+        self.assertIsNotNone(data['next'])
+        self.assertEqual(self.client.get('/api/nhanvien/search/').status_code, 400)
+
+
+class LeaveBulkReviewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.quan_ly = tao_nhan_vien('QL001')
+        UserAccount.objects.create(user=cls.quan_ly.user, employee=cls.quan_ly, role='Manager')
+        cls.nhan_vien = tao_nhan_vien('NV001')
+
+    def setUp(self):
+        self.client = APIClient()
+        dang_nhap(self.client, self.quan_ly)
+        self.dons = DonXinNghi.objects.bulk_create([
+            DonXinNghi(nhan_vien=nv, ngay_bat_dau=date(2025, 9, d), ngay_ket_thuc=date(2025, 9, d),
+                       ly_do='x', trang_thai=tt)
+            for nv, d, tt in (
+                (self.nhan_vien, 1, 'pending'), (self.nhan_vien, 2, 'pending'),
+                (self.nhan_vien, 3, 'rejected'), (self.quan_ly, 4, 'pending'),
+            )
+        ])
+
+    def test_bulk_outcomes_in_one_update(self):
+        ids = [d.id for d in self.dons] + [999999]
+        # SAVEPOINT + SELECT + UPDATE + RELEASE
+        with self.assertNumQueries(4):
+            res = self.client.post('/api/donxinnghi/bulk-review/', {'ids': ids, 'hanh_dong': 'approve'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['ket_qua'], {
+            ids[0]: 'applied', ids[1]: 'applied', ids[2]: 'already_processed',
+            ids[3]: 'forbidden', 999999: 'not_found',
+        })
+        self.assertEqual(res.data['tong_hop']['applied'], 2)
+        self.assertEqual(
+            list(DonXinNghi.objects.order_by('id').values_list('trang_thai', flat=True)),
+            ['approved', 'approved', 'rejected', 'pending'],
+        )
+        # Gửi lại: không đơn nào bị xử lý hai lần
+        res = self.client.post('/api/donxinnghi/bulk-review/', {'ids': ids[:2], 'hanh_dong': 'reject'}, format='json')
+        self.assertEqual(set(res.data['ket_qua'].values()), {'already_processed'})
+
+    def test_single_actions_share_conditional_update(self):
+        don = self.dons[0]
+        self.assertEqual(self.client.post(f'/api/donxinnghi/{don.id}/reject/').data['trang_thai'], 'rejected')
+        self.assertEqual(self.client.post(f'/api/donxinnghi/{don.id}/approve/').status_code, 400)
+        self.assertEqual(self.client.post(f'/api/donxinnghi/{self.dons[3].id}/approve/').status_code, 403)
+
+        # Người khác xử lý xen giữa lúc đọc và lúc ghi: UPDATE không đổi dòng nào
+        don = self.dons[1]
+        with mock.patch('nhan_vien.leave._cap_nhat_don_cho_duyet', return_value=0):
+            res = self.client.post(f'/api/donxinnghi/{don.id}/approve/')
+        self.assertEqual(res.status_code, 400)
+
+    def test_validation_and_permission(self):
+        res = self.client.post('/api/donxinnghi/bulk-review/', {'ids': [1], 'hanh_dong': 'xoa'}, format='json')
+        self.assertEqual(res.status_code, 400)
+        res = self.client.post('/api/donxinnghi/bulk-review/', {'ids': ['a'], 'hanh_dong': 'approve'}, format='json')
+        self.assertEqual(res.status_code, 400)
+        res = self.client.post('/api/donxinnghi/bulk-review/', [1, 2], format='json')
+        self.assertEqual(res.status_code, 400)
+        # Sửa đơn không đổi được trạng thái (chỉ qua approve/reject/bulk-review)
+        res = self.client.patch(f'/api/donxinnghi/{self.dons[0].id}/', {'trang_thai': 'approved'}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(DonXinNghi.objects.get(pk=self.dons[0].id).trang_thai, 'pending')
+        dang_nhap(self.client, self.nhan_vien)
+        res = self.client.post('/api/donxinnghi/bulk-review/', {'ids': [self.dons[0].id], 'hanh_dong': 'approve'}, format='json')
+        self.assertEqual(res.status_code, 403)
+
+
+class BulkOnboardingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phong_ban = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+        cls.hr = tao_nhan_vien('HR001')
+        UserAccount.objects.create(user=cls.hr.user, employee=cls.hr, role='HR')
+
+    def setUp(self):
+        import tempfile
+        cache.clear()
+        danh_dau_worker_song()
+        # Tệp dòng lỗi của tác vụ nhập không ghi vào media/ thật
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.client = APIClient()
+        dang_nhap(self.client, self.hr)
+
+    def _dong(self, i, **kwargs):
+        return {
+            'ma_nhan_vien': f'MN{i:03d}', 'ho_ten': f'Nhân viên mới {i}', 'ngay_sinh': '1995-05-05',
+            'ngay_vao_lam': '2025-10-01', 'new_username': f'moi{i}', 'password': 'matkhau123',
+            'phong_ban_id': self.phong_ban.id, **kwargs,
+        }
+
+    def test_api_creates_valid_rows_and_reports_errors(self):
+        rows = [
+            self._dong(1),
+            self._dong(2, role='Manager'),
+            self._dong(3, new_username='user_HR001'),   # trùng tài khoản đã có
+            self._dong(4, ma_nhan_vien='MN001'),        # trùng dòng 1
+            self._dong(5, ngay_sinh='05/05/1995'),
+            self._dong(6, phong_ban_id=999999),
+            self._dong(7, role='Admin'),                # HR không được tạo Admin
+        ]
+        res = self.client.post('/api/nhanvien/bulk-import/', rows, format='json')
+        # Chạy trong tác vụ nền, không trong request
+        self.assertEqual((res.status_code, res.data['loai'], res.data['trang_thai']), (202, 'nhap_nhan_vien', 'pending'))
+        self.assertFalse(NhanVien.objects.filter(ma_nhan_vien='MN001').exists())
+        ket_qua = self._chay_tac_vu(res.data['id'])
+        self.assertEqual(ket_qua['tao_moi'], 2)
+        self.assertEqual([loi['dong'] for loi in ket_qua['loi']], [3, 4, 5, 6, 7])
+
+        nv = NhanVien.objects.select_related('user', 'useraccount').get(ma_nhan_vien='MN002')
+        self.assertTrue(nv.user.check_password('matkhau123'))
+        self.assertEqual(nv.useraccount.role, 'Manager')
+        self.assertEqual(nv.phong_ban_id, self.phong_ban.id)
+        self.assertEqual(
+            sorted(KetQuaTimKiem('nhan vien moi')[0:10]),
+            sorted(NhanVien.objects.filter(ma_nhan_vien__in=['MN001', 'MN002']).values_list('id', flat=True)),
+        )
+
+        # Nhập lại cùng file: không tạo gì, mọi dòng đều báo lỗi
+        res = self.client.post('/api/nhanvien/bulk-import/', rows[:2], format='json')
+        ket_qua = self._chay_tac_vu(res.data['id'])
+        self.assertEqual((ket_qua['tao_moi'], ket_qua['so_loi']), (0, 2))
+
+        self.assertEqual(self.client.post('/api/nhanvien/bulk-import/', [], format='json').status_code, 400)
+
+    def _chay_tac_vu(self, pk):
+        chay_cac_tac_vu_dang_cho('test')
+        tac_vu = TacVu.objects.get(pk=pk)
+        self.assertEqual(tac_vu.trang_thai, 'succeeded')
+        return tac_vu.ket_qua
+
+    def test_conflicting_write_retries_without_the_conflicting_rows(self):
+        def ghi_sau_khi_bi_chen(chunk, mat_khau):
+            # Một request khác tạo 'moi2' giữa lúc kiểm tra trùng và lúc ghi
+            if not User.objects.filter(username='moi2').exists():
+                User.objects.create(username='moi2')
+            return ghi_chunk(chunk, mat_khau)
+
+        with mock.patch('nhan_vien.onboarding.ghi_chunk', side_effect=ghi_sau_khi_bi_chen):
+            ket_qua = nhap_nhan_vien([self._dong(i) for i in range(1, 4)], workers=1)
+        self.assertEqual([nv['dong'] for nv in ket_qua['nhan_vien']], [1, 3])
+        self.assertEqual([loi['dong'] for loi in ket_qua['loi']], [2])
+
+    def test_command_csv_with_process_pool(self):
+        import csv
+        import tempfile
+        rows = [self._dong(i) for i in range(1, 9)]
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8', newline='', delete=False) as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+            writer.writeheader()
+            writer.writerows(rows)
+        out = StringIO()
+        call_command('import_employees', f.name, '--workers', '2', '--chunk-size', '5', stdout=out, stderr=StringIO())
+        self.assertIn('Tạo 8/8', out.getvalue())
+        self.assertTrue(User.objects.get(username='moi8').check_password('matkhau123'))
+
+
+class PayrollPreviewTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ky_thuat = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+        cls.kinh_doanh = PhongBan.objects.create(ten_phong_ban='Kinh doanh')
+        cls.ky_su = ChucVu.objects.create(ten_chuc_vu='Kỹ sư', luong_co_ban=Decimal('26000000'))
+        cls.nhan_vien_ban_hang = ChucVu.objects.create(ten_chuc_vu='Bán hàng', luong_co_ban=Decimal('15500000'))
+        cls.nhan_viens = (
+            [tao_nhan_vien(f'KT{i}', cls.ky_thuat, cls.ky_su) for i in range(3)]
+            + [tao_nhan_vien(f'KD{i}', cls.kinh_doanh, cls.nhan_vien_ban_hang) for i in range(2)]
+            + [tao_nhan_vien('KPB', None, cls.ky_su)]
+        )
+        tao_nhan_vien('KCV', cls.ky_thuat)
+        with cls.captureOnCommitCallbacks(execute=True):
+            for i, nv in enumerate(cls.nhan_viens):
+                for day in range(1, i + 2):
+                    ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, day), gio_vao=time(8, 0))
+        cls.hr = tao_nhan_vien('HR001')
+        UserAccount.objects.create(user=cls.hr.user, employee=cls.hr, role='HR')
+
+    def setUp(self):
+        self.client = APIClient()
+        dang_nhap(self.client, self.hr)
+
+    def test_default_parameters_match_payroll_engine_without_writing(self):
+        res = self.client.post('/api/payslips/preview/', {'thang': 9, 'nam': 2025}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertFalse(Payslip.objects.exists())
+
+        chay_tinh_luong(9, 2025)
+        payslips = Payslip.objects.filter(thang=9, nam=2025)
+        self.assertEqual(res.data['so_nhan_vien'], payslips.count())
+        self.assertEqual(res.data['bo_qua_chua_co_chuc_vu'], 2)
+        self.assertEqual(res.data['chenh_lech'], '0.00')
+        tong = sum(p.luong_thuc_nhan for p in payslips)
+        self.assertAlmostEqual(Decimal(res.data['tong']['luong_thuc_nhan']), tong, delta=Decimal('0.01') * len(payslips))
+
+        theo_phong_ban = {pb['phong_ban']: pb for pb in res.data['phong_ban']}
+        self.assertEqual(set(theo_phong_ban), {self.ky_thuat.id, self.kinh_doanh.id, None})
+        self.assertEqual(theo_phong_ban[self.kinh_doanh.id]['ten_phong_ban'], 'Kinh doanh')
+        self.assertEqual(theo_phong_ban[self.ky_thuat.id]['so_nhan_vien'], 3)
+
+    def test_overrides_change_only_targeted_groups(self):
+        res = self.client.post('/api/payslips/preview/', {
+            'thang': 9, 'nam': 2025,
+            'phu_cap_theo_phong_ban': {str(self.kinh_doanh.id): '2000000'},
+            'luong_co_ban_theo_chuc_vu': {str(self.ky_su.id): '30000000'},
+        }, format='json')
+        self.assertEqual(res.status_code, 200)
+        theo_phong_ban = {pb['phong_ban']: pb for pb in res.data['phong_ban']}
+        # Kinh doanh: chỉ phụ cấp tăng 1.000.000 mỗi người
+        self.assertEqual(theo_phong_ban[self.kinh_doanh.id]['chenh_lech'], '2000000.00')
+        self.assertEqual(theo_phong_ban[self.kinh_doanh.id]['phu_cap'], '4000000.00')
+        # Kỹ sư không phòng ban (6 ngày công): +4.000.000 / công chuẩn * 6
+        cong_chuan = so_ngay_cong_chuan(2025, 9)
+        ky_vong = (Decimal('4000000') / cong_chuan * 6).quantize(Decimal('0.01'))
+        self.assertEqual(Decimal(theo_phong_ban[None]['chenh_lech']), ky_vong)
+
+    def test_validation_and_permission(self):
+        res = self.client.post('/api/payslips/preview/', {'thang': 13, 'nam': 2025}, format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('thang', res.data)
+
+        client = APIClient()
+        dang_nhap(client, self.nhan_viens[0])
+        res = client.post('/api/payslips/preview/', {'thang': 9, 'nam': 2025}, format='json')
+        self.assertEqual(res.status_code, 403)
+
+
+class PayrollRecalculationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ky_su = ChucVu.objects.create(ten_chuc_vu='Kỹ sư', luong_co_ban=Decimal('26000000'))
+        cls.nhan_viens = [tao_nhan_vien(f'NV{i:03d}', None, cls.ky_su) for i in range(3)]
+        with cls.captureOnCommitCallbacks(execute=True):
+            for nv in cls.nhan_viens:
+                ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, 1), gio_vao=time(8, 0))
+        chay_tinh_luong(8, 2025)
+        chay_tinh_luong(9, 2025)
+        cls.hr = tao_nhan_vien('HR001')
+        UserAccount.objects.create(user=cls.hr.user, employee=cls.hr, role='HR')
+
+    def _can_tinh_lai(self):
+        return set(Payslip.objects.filter(can_tinh_lai=True).values_list('nhan_vien__ma_nhan_vien', 'thang'))
+
+    def test_attendance_change_marks_only_affected_payslip(self):
+        self.assertEqual(self._can_tinh_lai(), set())
+        with self.captureOnCommitCallbacks(execute=True):
+            ChamCong.objects.create(nhan_vien=self.nhan_viens[0], ngay=date(2025, 9, 2), gio_vao=time(8, 0))
+        self.assertEqual(self._can_tinh_lai(), {('NV000', 9)})
+
+        # Chạy lại toàn bộ cũng xóa đánh dấu
+        chay_tinh_luong(9, 2025)
+        self.assertEqual(self._can_tinh_lai(), set())
+
+    def test_recalculate_endpoint_reports_changes_and_keeps_manual_allowance(self):
+        Payslip.objects.filter(nhan_vien=self.nhan_viens[1], thang=9).update(phu_cap=Decimal('3000000'))
+        with self.captureOnCommitCallbacks(execute=True):
+            for nv in self.nhan_viens[:2]:
+                ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, 2), gio_vao=time(8, 0))
+        ChamCong.objects.filter(nhan_vien=self.nhan_viens[2], ngay=date(2025, 9, 1)).update(gio_ra=time(16, 0))
+        rebuild_tong_hop(2025, 9)
+        Payslip.objects.filter(nhan_vien=self.nhan_viens[2], thang=9).update(can_tinh_lai=True)
+
+        client = APIClient()
+        dang_nhap(client, self.hr)
+        res = client.post('/api/payslips/recalculate/', {'nam': 2025}, format='json')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual((res.data['so_bang_luong'], res.data['so_thay_doi']), (3, 2))
+
+        cong_chuan = so_ngay_cong_chuan(2025, 9)
+        thay_doi = {item['ma_nhan_vien']: item for item in res.data['thay_doi']}
+        moi = tinh_luong(Decimal('26000000'), cong_chuan, 2, phu_cap=Decimal('3000000'))
+        self.assertEqual(thay_doi['NV001']['luong_thuc_nhan_moi'], str(moi))
+        self.assertEqual(Payslip.objects.get(nhan_vien=self.nhan_viens[1], thang=9).luong_thuc_nhan, moi)
+        self.assertEqual(self._can_tinh_lai(), set())
+
+        res = client.post('/api/payslips/recalculate/', {}, format='json')
+        self.assertEqual(res.data['so_bang_luong'], 0)
+
+    def test_position_change_marks_open_period_only(self):
+        with mock.patch('nhan_vien.payroll.ky_luong_dang_mo', return_value=(2025, 9)):
+            self.ky_su.luong_co_ban = Decimal('28000000')
+            self.ky_su.save()
+            self.assertEqual(self._can_tinh_lai(), {('NV000', 9), ('NV001', 9), ('NV002', 9)})
+
+            Payslip.objects.update(can_tinh_lai=False)
+            nv = self.nhan_viens[0]
+            nv.chuc_vu = ChucVu.objects.create(ten_chuc_vu='Trưởng nhóm', luong_co_ban=Decimal('35000000'))
+            nv.save()
+            self.assertEqual(self._can_tinh_lai(), {('NV000', 9)})
+
+        out = StringIO()
+        call_command('recalculate_payroll', '--month', '9', '--year', '2025', stdout=out, stderr=StringIO())
+        self.assertIn('Tính lại 1 bảng lương, 1 thay đổi', out.getvalue())
+        self.assertEqual(
+            Payslip.objects.get(nhan_vien=self.nhan_viens[0], thang=9).luong_co_ban, Decimal('35000000')
+        )
+
+
+class WorkCalendarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.hr = tao_nhan_vien('HR001')
+        UserAccount.objects.create(user=cls.hr.user, employee=cls.hr, role='HR')
+
+    def setUp(self):
+        # role_version do test khác ghi vào cache có thể trùng user id
+        cache.clear()
+        self.client = APIClient()
+        dang_nhap(self.client, self.hr)
+
+    def tearDown(self):
+        # Dữ liệu NgayLe bị rollback sau mỗi test nhưng cache thì không
+        cache.clear()
+        xoa_cache_lich()
+
+    def test_holidays_and_make_up_days_change_standard_days(self):
+        # 9/2025: 30 ngày, 4 Chủ Nhật, Quốc khánh 2/9 -> 25 ngày công
+        self.assertEqual(so_ngay_cong_chuan(2025, 9), 25)
+        self.assertFalse(la_ngay_lam_viec(date(2025, 9, 2)))
+
+        res = self.client.post('/api/ngayle/', {'ngay': '2025-09-01', 'ten': 'Nghỉ bù Quốc khánh'})
+        self.assertEqual(res.status_code, 201)
+        res = self.client.post('/api/ngayle/', {'ngay': '2025-09-07', 'ten': 'Làm bù', 'la_ngay_lam': True})
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(so_ngay_cong_chuan(2025, 9), 25)
+        self.assertTrue(la_ngay_lam_viec(date(2025, 9, 7)))
+
+        NgayLe.objects.get(ngay=date(2025, 9, 7)).delete()
+        self.assertEqual(so_ngay_cong_chuan(2025, 9), 24)
+
+    def test_lookups_hit_no_database_once_built(self):
+        so_ngay_lam_viec(date(2024, 1, 1), date(2026, 12, 31))
+        with self.assertNumQueries(0):
+            self.assertEqual(so_ngay_lam_viec(date(2025, 1, 1), date(2025, 12, 31)), 313 - 4)
+            for thang in range(1, 13):
+                so_ngay_cong_chuan(2025, thang)
+
+    def test_calendar_endpoint(self):
+        NgayLe.objects.create(ngay=date(2025, 1, 29), ten='Tết Nguyên đán')
+        res = self.client.get('/api/ngayle/lich/?nam=2025&tu_ngay=2025-01-27&den_ngay=2025-02-02')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['theo_thang'][0], {'thang': 1, 'so_ngay_lam_viec': 25})
+        self.assertEqual(res.data['so_ngay_lam_viec'], sum(t['so_ngay_lam_viec'] for t in res.data['theo_thang']))
+        self.assertEqual([d['ten'] for d in res.data['ngay_dac_biet']][:2], ['Tết Dương lịch', 'Tết Nguyên đán'])
+        self.assertEqual(res.data['khoang']['so_ngay_lam_viec'], 5)
+
+
+class OvertimeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.ky_su = ChucVu.objects.create(ten_chuc_vu='Kỹ sư', luong_co_ban=Decimal('26000000'))
+        cls.nv = tao_nhan_vien('NV001', None, cls.ky_su)
+        for ngay, gio_vao, gio_ra in (
+            (1, time(8, 0), time(19, 30)),   # Thứ 2: 2.5 giờ OT x 150% (trừ 1 giờ nghỉ trưa)
+            (2, time(8, 30), time(13, 30)),  # Quốc khánh: 4 giờ OT x 300%, muộn 30 phút
+            (3, time(8, 5), None),           # Thiếu giờ ra: không có OT, muộn 5 phút
+            (7, time(22, 0), time(2, 0)),    # Chủ Nhật, qua đêm: 4 giờ OT x 200%
+        ):
+            with cls.captureOnCommitCallbacks(execute=True):
+                ChamCong.objects.create(nhan_vien=cls.nv, ngay=date(2025, 9, ngay), gio_vao=gio_vao, gio_ra=gio_ra)
+
+    def setUp(self):
+        cache.clear()
+
+    def tearDown(self):
+        cache.clear()
+        xoa_cache_lich()
+
+    def test_rollup_overtime_by_day_type(self):
+        tong_hop = ChamCongThang.objects.get(nhan_vien=self.nv, nam=2025, thang=9)
+        self.assertEqual(tong_hop.gio_lam_them, Decimal('10.50'))
+        self.assertEqual(tong_hop.gio_lam_them_quy_doi, Decimal('23.75'))
+        self.assertEqual(tong_hop.phut_di_muon, 30 + 5 + 14 * 60)
+
+        # Ngày làm bù (Chủ Nhật 14/9) tính OT như ngày thường
+        NgayLe.objects.create(ngay=date(2025, 9, 14), ten='Làm bù', la_ngay_lam=True)
+        with self.captureOnCommitCallbacks(execute=True):
+            ChamCong.objects.create(nhan_vien=self.nv, ngay=date(2025, 9, 14), gio_vao=time(8, 0), gio_ra=time(18, 0))
+        tong_hop.refresh_from_db()
+        self.assertEqual((tong_hop.gio_lam_them, tong_hop.gio_lam_them_quy_doi), (Decimal('11.50'), Decimal('25.25')))
+
+        rebuild_tong_hop(2025, 9)
+        self.assertEqual(
+            ChamCongThang.objects.get(nhan_vien=self.nv, nam=2025, thang=9).gio_lam_them_quy_doi, Decimal('25.25')
+        )
+
+    def test_standard_shift_has_no_overtime(self):
+        # 08:00 -> 17:00 trừ 1 giờ nghỉ trưa = đúng 8 giờ chuẩn; ca chiều không trừ
+        with self.captureOnCommitCallbacks(execute=True):
+            ChamCong.objects.create(nhan_vien=self.nv, ngay=date(2025, 9, 8), gio_vao=time(8, 0), gio_ra=time(17, 0))
+            ChamCong.objects.create(nhan_vien=self.nv, ngay=date(2025, 9, 9), gio_vao=time(13, 0), gio_ra=time(17, 0))
+        tong_hop = ChamCongThang.objects.get(nhan_vien=self.nv, nam=2025, thang=9)
+        self.assertEqual(tong_hop.gio_lam_them, Decimal('10.50'))
+        gio_lam = {
+            cc.ngay.day: (cc.giay_lam, cc.giay_lam_them)
+            for cc in ChamCong.objects.filter(ngay__day__in=[8, 9]).annotate(**chi_so_dong())
+        }
+        self.assertEqual(gio_lam, {8: (8 * 3600, 0), 9: (4 * 3600, 0)})
+
+        # Không trừ nghỉ trưa: thêm 1 giờ OT cho mỗi ca qua 12:00-13:00 (ngày 1, 2, 8)
+        with override_settings(GIO_NGHI_TRUA=None):
+            rebuild_tong_hop(2025, 9)
+        self.assertEqual(ChamCongThang.objects.get(nhan_vien=self.nv, nam=2025, thang=9).gio_lam_them, Decimal('13.50'))
+
+    def test_payroll_pays_overtime(self):
+        chay_tinh_luong(9, 2025)
+        payslip = Payslip.objects.get(nhan_vien=self.nv, thang=9, nam=2025)
+        # Đơn giá giờ: 26.000.000 / (25 ngày x 8 giờ) = 130.000
+        self.assertEqual(payslip.tien_lam_them, Decimal('3087500.00'))
+        self.assertEqual(
+            payslip.luong_thuc_nhan,
+            tinh_luong(Decimal('26000000'), 25, 4, tien_lam_them=Decimal('3087500')),
+        )
+        self.assertEqual(PayslipSerializer(payslip).data['tien_lam_them'], '3087500.00')
+
+    def test_hours_endpoint(self):
+        client = APIClient()
+        dang_nhap(client, self.nv)
+        res = client.get('/api/chamcong/gio-lam/', {'nhan_vien': self.nv.id})
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(set(res.data), {'tu_ngay', 'den_ngay'})
+
+        res = client.get('/api/chamcong/gio-lam/', {
+            'nhan_vien': self.nv.id, 'tu_ngay': '2025-09-01', 'den_ngay': '2025-09-30',
+        })
+        self.assertEqual(res.status_code, 200)
+        theo_ngay = {row['ngay']: row for row in res.data['results']}
+        self.assertEqual(list(theo_ngay), ['2025-09-07', '2025-09-03', '2025-09-02', '2025-09-01'])
+        qua_dem = theo_ngay['2025-09-07']
+        self.assertEqual(
+            (qua_dem['gio_lam'], qua_dem['gio_lam_them'], qua_dem['he_so_lam_them'], qua_dem['qua_dem']),
+            ('4.00', '4.00', 200, True),
+        )
+        self.assertEqual(theo_ngay['2025-09-02']['he_so_lam_them'], 300)
+        self.assertEqual(theo_ngay['2025-09-03']['gio_lam'], '0.00')
+        self.assertTrue(theo_ngay['2025-09-03']['thieu_gio_ra'])
+        self.assertEqual((theo_ngay['2025-09-01']['gio_lam_them'], theo_ngay['2025-09-01']['phut_di_muon']), ('2.50', 0))
+
+
+class DashboardTests(TestCase):
+    hom_nay = date(2025, 9, 3)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.phong_ky_thuat = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+        PhongBan.objects.create(ten_phong_ban='Kế toán')
+        ky_su = ChucVu.objects.create(ten_chuc_vu='Kỹ sư', luong_co_ban=Decimal('25000000'))
+        cls.nhan_viens = [tao_nhan_vien(f'NV{i:03d}', cls.phong_ky_thuat, ky_su) for i in range(3)]
+        cls.hr = tao_nhan_vien('HR001')
+        UserAccount.objects.create(user=cls.hr.user, employee=cls.hr, role='HR')
+        with cls.captureOnCommitCallbacks(execute=True):
+            for nv, gio_vao in zip(cls.nhan_viens[:2], (time(7, 55), time(8, 20))):
+                ChamCong.objects.create(nhan_vien=nv, ngay=cls.hom_nay, gio_vao=gio_vao)
+        DonXinNghi.objects.create(nhan_vien=cls.nhan_viens[2], ngay_bat_dau=date(2025, 9, 3),
+                                  ngay_ket_thuc=date(2025, 9, 4), ly_do='x', trang_thai='approved')
+        DonXinNghi.objects.create(nhan_vien=cls.nhan_viens[0], ngay_bat_dau=date(2025, 9, 10),
+                                  ngay_ket_thuc=date(2025, 9, 10), ly_do='x')
+
+    def setUp(self):
+        cache.clear()
+        # Lịch làm việc đã dựng sẵn: chỉ đếm truy vấn của dashboard
+        so_ngay_cong_chuan(2025, 9)
+
+    def test_aggregates(self):
+        with self.assertNumQueries(7):
+            data = tinh_dashboard(self.hom_nay)
+        nhan_su = data['nhan_su']
+        self.assertEqual((nhan_su['so_nhan_vien'], nhan_su['chua_co_phong_ban'], nhan_su['chua_co_chuc_vu']), (4, 1, 1))
+        self.assertEqual(
+            [(pb['ten_phong_ban'], pb['so_nhan_vien']) for pb in nhan_su['theo_phong_ban']],
+            [('Kế toán', 0), ('Kỹ thuật', 3)],
+        )
+        cham_cong = data['cham_cong_hom_nay']
+        self.assertEqual((cham_cong['da_cham_cong'], cham_cong['di_muon'], cham_cong['ty_le']), (2, 1, 50.0))
+        self.assertEqual(data['nghi_phep'], {'cho_duyet': 1, 'dang_nghi': 1})
+        # 2 ngày công / 25 ngày công chuẩn x 25.000.000
+        self.assertEqual(data['bang_luong']['tam_tinh_den_hom_nay'], '2000000.00')
+        self.assertEqual(data['bang_luong']['so_bang_luong'], 0)
+
+    def test_cache_invalidated_on_writes(self):
+        self.assertEqual(lay_dashboard(self.hom_nay)['nghi_phep']['cho_duyet'], 1)
+        with self.assertNumQueries(0):
+            lay_dashboard(self.hom_nay)
+
+        # Phiên bản cache đổi khi commit
+        with self.captureOnCommitCallbacks(execute=True):
+            DonXinNghi.objects.create(nhan_vien=self.nhan_viens[1], ngay_bat_dau=date(2025, 9, 11),
+                                      ngay_ket_thuc=date(2025, 9, 11), ly_do='x')
+        self.assertEqual(lay_dashboard(self.hom_nay)['nghi_phep']['cho_duyet'], 2)
+
+        # Ghi hàng loạt không qua signal: bảng lương, duyệt đơn
+        with self.captureOnCommitCallbacks(execute=True):
+            chay_tinh_luong(9, 2025)
+        self.assertEqual(lay_dashboard(self.hom_nay)['bang_luong']['so_bang_luong'], 3)
+        client = APIClient()
+        dang_nhap(client, self.hr)
+        with self.captureOnCommitCallbacks(execute=True):
+            client.post('/api/donxinnghi/bulk-review/', {
+                'ids': list(DonXinNghi.objects.filter(trang_thai='pending').values_list('id', flat=True)),
+                'hanh_dong': 'approve',
+            }, format='json')
+        self.assertEqual(lay_dashboard(self.hom_nay)['nghi_phep']['cho_duyet'], 0)
+
+    def test_endpoint_requires_manager(self):
+        client = APIClient()
+        dang_nhap(client, self.nhan_viens[0])
+        self.assertEqual(client.get('/api/dashboard/').status_code, 403)
+        dang_nhap(client, self.hr)
+        res = client.get('/api/dashboard/')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['nhan_su']['so_nhan_vien'], 4)
+
+
+class BackgroundJobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phong_ban = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+        ky_su = ChucVu.objects.create(ten_chuc_vu='Kỹ sư', luong_co_ban=Decimal('20000000'))
+        cls.nhan_viens = [tao_nhan_vien(f'NV{i:03d}', cls.phong_ban, ky_su) for i in range(2)]
+        for nv in cls.nhan_viens:
+            ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 8, 4), gio_vao=time(8, 0), gio_ra=time(16, 0))
+        cls.hr = tao_nhan_vien('HR001')
+        UserAccount.objects.create(user=cls.hr.user, employee=cls.hr, role='HR')
+
+    def setUp(self):
+        import tempfile
+        cache.clear()
+        danh_dau_worker_song()
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
+        self.client = APIClient()
+        dang_nhap(self.client, self.hr)
+
+    def test_export_job_via_api(self):
+        res = self.client.post('/api/tacvu/', {
+            'loai': 'xuat_cham_cong', 'tham_so': {'tu_ngay': '2025-08-01', 'den_ngay': '2025-08-31'},
+        }, format='json')
+        self.assertEqual((res.status_code, res.data['trang_thai']), (202, 'pending'))
+        pk = res.data['id']
+        self.assertEqual(self.client.get(f'/api/tacvu/{pk}/download/').status_code, 404)
+
+        self.assertEqual(chay_cac_tac_vu_dang_cho('test'), 1)
+        res = self.client.get(f'/api/tacvu/{pk}/')
+        self.assertEqual((res.data['trang_thai'], res.data['tien_do'], res.data['ket_qua']['so_dong']), ('succeeded', 100, 2))
+        self.assertTrue(res.data['co_tep_ket_qua'])
+        res = self.client.get(f'/api/tacvu/{pk}/download/')
+        noi_dung = b''.join(res.streaming_content).decode('utf-8-sig')
+        self.assertEqual(noi_dung.splitlines()[0], 'ID,Mã NV,Họ tên,Phòng ban,Chức vụ,Ngày,Giờ vào,Giờ ra')
+        self.assertIn('NV001', noi_dung)
+        self.assertEqual(self.client.get('/api/tacvu/?trang_thai=succeeded').data['count'], 1)
+
+    def test_payroll_job(self):
+        tac_vu = tao_tac_vu('tinh_luong', {'thang': 8, 'nam': 2025, 'workers': 1, 'khoi_dong_lai': False})
+        chay_cac_tac_vu_dang_cho('test')
+        tac_vu.refresh_from_db()
+        self.assertEqual(tac_vu.trang_thai, 'succeeded')
+        # 2 shard: phòng Kỹ thuật và nhóm chưa có phòng ban (HR001, bị bỏ qua vì chưa có chức vụ)
+        self.assertEqual((tac_vu.ket_qua['so_phong_ban'], tac_vu.ket_qua['so_bang_luong']), (2, 2))
+        self.assertEqual(len(tac_vu.ket_qua['bo_qua']), 1)
+        self.assertEqual(Payslip.objects.filter(thang=8, nam=2025).count(), 2)
+
+        # Không còn phòng ban nào cần tính (vd. checkpoint của lần chạy khác): thất bại rõ ràng
+        with mock.patch('nhan_vien.jobs.danh_sach_shard', return_value=[]), self.assertLogs('nhan_vien.jobs', 'ERROR'):
+            tac_vu = tao_tac_vu('tinh_luong', {'thang': 8, 'nam': 2025, 'workers': 1, 'khoi_dong_lai': False})
+            chay_cac_tac_vu_dang_cho('test')
+        tac_vu.refresh_from_db()
+        self.assertEqual((tac_vu.trang_thai, tac_vu.so_lan_thu), ('failed', 1))
+        self.assertIn('khoi_dong_lai', tac_vu.loi)
+
+    @override_settings(TAC_VU_CHO_THU_LAI=30, TAC_VU_SO_LAN_THU_TOI_DA=2)
+    def test_retry_with_backoff_then_fail(self):
+        tac_vu = tao_tac_vu('xuat_bang_luong', {})
+        loi = mock.Mock(side_effect=RuntimeError('hỏng'))
+        with mock.patch.dict(XU_LY, {'xuat_bang_luong': loi}), self.assertLogs('nhan_vien.jobs', 'ERROR'):
+            truoc = timezone.now()
+            chay_cac_tac_vu_dang_cho('test')
+            tac_vu.refresh_from_db()
+            self.assertEqual((tac_vu.trang_thai, tac_vu.so_lan_thu), ('pending', 1))
+            self.assertIn('RuntimeError: hỏng', tac_vu.loi)
+            self.assertGreaterEqual(tac_vu.chay_sau, truoc + timezone.timedelta(seconds=30))
+            # Chưa tới hạn thử lại
+            self.assertEqual(chay_cac_tac_vu_dang_cho('test'), 0)
+
+            TacVu.objects.filter(pk=tac_vu.pk).update(chay_sau=timezone.now())
+            chay_cac_tac_vu_dang_cho('test')
+        tac_vu.refresh_from_db()
+        self.assertEqual((tac_vu.trang_thai, tac_vu.so_lan_thu, loi.call_count), ('failed', 2, 2))
+
+        res = self.client.post(f'/api/tacvu/{tac_vu.pk}/retry/')
+        self.assertEqual((res.status_code, res.data['trang_thai'], res.data['so_lan_thu']), (202, 'pending', 0))
+
+    def test_create_without_worker_returns_503(self):
+        cache.clear()
+        res = self.client.post('/api/tacvu/', {'loai': 'xuat_bang_luong'}, format='json')
+        self.assertEqual(res.status_code, 503)
+        self.assertIn('run_jobs', res.data['error'])
+        res = self.client.post('/api/nhanvien/bulk-import/', [{'ma_nhan_vien': 'MN001'}], format='json')
+        self.assertEqual(res.status_code, 503)
+        self.assertFalse(TacVu.objects.exists())
+
+        danh_dau_worker_song()
+        with override_settings(TAC_VU_WORKER_HET_HAN=0):
+            # Nhịp tim quá cũ cũng coi như không có worker
+            self.assertEqual(self.client.post('/api/tacvu/', {'loai': 'xuat_bang_luong'}, format='json').status_code, 503)
+        self.assertEqual(self.client.post('/api/tacvu/', {'loai': 'xuat_bang_luong'}, format='json').status_code, 202)
+
+    def test_cancel(self):
+        pk = self.client.post('/api/tacvu/', {'loai': 'xuat_bang_luong'}, format='json').data['id']
+        res = self.client.post(f'/api/tacvu/{pk}/cancel/')
+        self.assertEqual((res.status_code, res.data['trang_thai']), (200, 'cancelled'))
+        self.assertEqual(chay_cac_tac_vu_dang_cho('test'), 0)
+        self.assertEqual(self.client.post(f'/api/tacvu/{pk}/cancel/').status_code, 409)
+
+    def test_recalculation_job_reports_progress_and_stops_on_cancel(self):
+        payslips = [
+            Payslip.objects.create(nhan_vien=nv, thang=8, nam=2025, luong_co_ban=0, can_tinh_lai=True)
+            for nv in self.nhan_viens
+        ]
+        tac_vu = tao_tac_vu('tinh_lai_luong', {'thang': 8, 'nam': 2025})
+
+        def huy_sau_chunk_dau(*args, **kwargs):
+            TacVu.objects.filter(pk=tac_vu.pk).update(yeu_cau_huy=True)
+            return doc_tong_hop_thang(*args, **kwargs)
+
+        with mock.patch('nhan_vien.payroll.CHUNK_SIZE', 1), mock.patch('nhan_vien.jobs.KHOANG_BAO_CAO', 0), \
+                mock.patch('nhan_vien.payroll.doc_tong_hop_thang', side_effect=huy_sau_chunk_dau):
+            chay_cac_tac_vu_dang_cho('test')
+        tac_vu.refresh_from_db()
+        self.assertEqual((tac_vu.trang_thai, tac_vu.tien_do), ('cancelled', 50))
+        # Chunk đã xong được giữ, chunk sau chưa tính
+        self.assertEqual(
+            [Payslip.objects.get(pk=p.pk).can_tinh_lai for p in payslips], [False, True]
+        )
+
+    def test_stale_job_with_cancel_request_is_cancelled(self):
+        tac_vu = tao_tac_vu('xuat_bang_luong', {})
+        TacVu.objects.filter(pk=tac_vu.pk).update(
+            trang_thai='running', yeu_cau_huy=True, so_lan_thu=1,
+            cap_nhat_luc=timezone.now() - timezone.timedelta(days=1),
+        )
+        self.assertEqual(chay_cac_tac_vu_dang_cho('test'), 0)
+        tac_vu.refresh_from_db()
+        self.assertEqual(tac_vu.trang_thai, 'cancelled')
+        self.assertIsNotNone(tac_vu.ket_thuc_luc)
+
+    def test_import_job_scrubs_rows(self):
+        dong = {
+            'ma_nhan_vien': 'MN001', 'ho_ten': 'Nhân viên mới', 'ngay_sinh': '1995-05-05',
+            'ngay_vao_lam': '2025-10-01', 'new_username': 'moi1', 'password': 'matkhau123', 'role': 'Admin',
+        }
+        res = self.client.post('/api/tacvu/', {
+            'loai': 'nhap_nhan_vien', 'tham_so': {'rows': [dong, {**dong, 'ma_nhan_vien': 'MN002', 'new_username': 'moi2', 'role': 'Employee'}]},
+        }, format='json')
+        self.assertEqual(res.data['tham_so']['rows'], '<2 dòng>')
+        chay_cac_tac_vu_dang_cho('test')
+        tac_vu = TacVu.objects.get(pk=res.data['id'])
+        self.assertEqual((tac_vu.trang_thai, tac_vu.ket_qua['tao_moi'], tac_vu.ket_qua['so_loi']), ('succeeded', 1, 1))
+        # Mật khẩu không còn nằm trong DB; HR không được tạo tài khoản Admin
+        self.assertEqual(tac_vu.tham_so['rows'], '<2 dòng>')
+        self.assertTrue(User.objects.get(username='moi2').check_password('matkhau123'))
+        self.assertTrue(tac_vu.tep_ket_qua)
+
+    def test_requires_quan_ly(self):
+        client = APIClient()
+        dang_nhap(client, self.nhan_viens[0])
+        self.assertEqual(client.get('/api/tacvu/').status_code, 403)
+
+
+class SparseFieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.phong_ban = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+        ky_su = ChucVu.objects.create(ten_chuc_vu='Kỹ sư', luong_co_ban=Decimal('20000000'))
+        cls.nhan_viens = [tao_nhan_vien(f'NV{i:03d}', cls.phong_ban, ky_su) for i in range(3)]
+        for i, nv in enumerate(cls.nhan_viens):
+            ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, 1 + i), gio_vao=time(8, 0))
+            Payslip.objects.create(nhan_vien=nv, thang=8, nam=2025, luong_co_ban=Decimal('20000000'),
+                                   luong_thuc_nhan=Decimal('20000000'))
+        cls.hr = tao_nhan_vien('HR001')
+        UserAccount.objects.create(user=cls.hr.user, employee=cls.hr, role='HR')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        dang_nhap(self.client, self.hr)
+
+    def _get(self, url, bang):
+        """GET `url`, trả về (response, các câu SQL đọc bảng `bang`)."""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        return res, [q['sql'] for q in ctx.captured_queries if f'FROM "{bang}"' in q['sql']]
+
+    def test_search_honours_fields(self):
+        res, sql = self._get('/api/nhanvien/search/?q=NV001&fields=id', 'nhan_vien_nhanvien')
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data['results'], [{'id': self.nhan_viens[1].id}])
+        self.assertTrue(sql)
+        self.assertNotIn('JOIN', sql[-1])
+
+    def test_fields_on_unsupported_action_is_rejected(self):
+        res = self.client.get('/api/donxinnghi/so-du/?fields=id')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('fields', res.data)
+        res = self.client.post('/api/phongban/?expand=nhan_vien', {'ten_phong_ban': 'Mới'}, format='json')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('expand', res.data)
+        self.assertFalse(PhongBan.objects.filter(ten_phong_ban='Mới').exists())
+
+    def test_fields_shrink_response_and_sql(self):
+        res, sql = self._get('/api/nhanvien/?fields=id,ho_ten', 'nhan_vien_nhanvien')
+        self.assertEqual(res.data[0], {'id': self.nhan_viens[0].id, 'ho_ten': 'Nhân viên NV000'})
+        self.assertEqual(len(sql), 1)
+        self.assertNotIn('JOIN', sql[0])
+        self.assertNotIn('ngay_sinh', sql[0])
+
+        # Giữ nguyên định dạng đầy đủ khi không chọn trường
+        res = self.client.get('/api/nhanvien/')
+        self.assertEqual(res.data[0]['phong_ban'], {'id': self.phong_ban.id, 'ten_phong_ban': 'Kỹ thuật'})
+
+        # Trường lồng nhau: chỉ JOIN đúng quan hệ được chọn
+        res, sql = self._get(f'/api/nhanvien/{self.nhan_viens[0].id}/?fields=ho_ten,phong_ban', 'nhan_vien_nhanvien')
+        self.assertEqual(res.data, {'ho_ten': 'Nhân viên NV000', 'phong_ban': {'id': self.phong_ban.id, 'ten_phong_ban': 'Kỹ thuật'}})
+        self.assertIn('nhan_vien_phongban', sql[0])
+        self.assertNotIn('nhan_vien_chucvu', sql[0])
+
+    def test_expand_in_single_query(self):
+        res, sql = self._get('/api/chamcong/?fields=id,ngay&expand=nhan_vien', 'nhan_vien_chamcong')
+        self.assertEqual(len(sql), 1)
+        self.assertEqual(set(res.data['results'][0]), {'id', 'ngay', 'nhan_vien'})
+        self.assertEqual(res.data['results'][-1]['nhan_vien'], {
+            'id': self.nhan_viens[0].id, 'ma_nhan_vien': 'NV000', 'ho_ten': 'Nhân viên NV000',
+            'phong_ban': self.phong_ban.id,
+        })
+        # Trang sau vẫn giữ tham số chọn trường
+        res = self.client.get('/api/chamcong/?fields=id&page_size=2')
+        self.assertEqual(self.client.get(res.data['next']).data['results'], [{'id': ChamCong.objects.order_by('ngay').first().id}])
+
+        res = self.client.get('/api/payslips/?fields=id&expand=nhan_vien')
+        self.assertEqual(res.data[0]['nhan_vien']['ma_nhan_vien'][:2], 'NV')
+        self.assertEqual(self.client.get('/api/payslips/?fields=luong_thuc_nhan').data[0], {'luong_thuc_nhan': '20000000.00'})
+
+    def test_invalid_names(self):
+        res = self.client.get('/api/chamcong/?fields=id,mat_khau')
+        self.assertEqual(res.status_code, 400)
+        self.assertIn('mat_khau', str(res.data['fields']))
+        res = self.client.get('/api/nhanvien/?expand=phong_ban')
+        self.assertEqual(res.status_code, 400)
+        # Trường chỉ ghi không được chọn
+        self.assertEqual(self.client.get('/api/nhanvien/?fields=password').status_code, 400)
+
+    def test_cached_lookup_lists(self):
+        self.assertIn('ten_phong_ban', self.client.get('/api/phongban/').data[0])
+        self.assertEqual(self.client.get('/api/phongban/?fields=id').data, [{'id': self.phong_ban.id}])
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('quan_tri', password='matkhau123')
+        cls.phong_ban = PhongBan.objects.create(ten_phong_ban='Kỹ thuật')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.admin)
+
+    def _them_du_lieu(self, tu, den):
+        for i in range(tu, den):
+            nv = tao_nhan_vien(f'AD{i:03d}', self.phong_ban)
+            UserAccount.objects.create(user=nv.user, employee=nv)
+            ChamCong.objects.create(nhan_vien=nv, ngay=date(2025, 9, 1 + i), gio_vao=time(8, 0))
+            DonXinNghi.objects.create(nhan_vien=nv, ngay_bat_dau=date(2025, 10, 1 + i),
+                                      ngay_ket_thuc=date(2025, 10, 1 + i), ly_do='x')
+            Payslip.objects.create(nhan_vien=nv, thang=9, nam=2025, luong_co_ban=Decimal('1000'))
+
+    def _so_truy_van(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return len(ctx)
+
+    def test_changelist_query_count_independent_of_rows(self):
+        urls = [f'/admin/nhan_vien/{model}/' for model in
+                ('chamcong', 'donxinnghi', 'payslip', 'useraccount', 'nhanvien', 'tacvu')]
+        urls += ['/admin/nhan_vien/chamcong/?ngay__year=2025&ngay__month=9',
+                 '/admin/nhan_vien/payslip/?nam=2025&thang=9']
+        self._them_du_lieu(0, 2)
+        truoc = {url: self._so_truy_van(url) for url in urls}
+        self._them_du_lieu(2, 8)
+        self.assertEqual({url: self._so_truy_van(url) for url in urls}, truoc)
+
+    def test_change_form_uses_autocomplete(self):
+        self._them_du_lieu(0, 3)
+        res = self.client.get('/admin/nhan_vien/chamcong/add/')
+        self.assertContains(res, 'admin-autocomplete')
+        self.assertNotContains(res, 'AD001 - ')
+        res = self.client.get('/admin/autocomplete/', {
+            'term': 'ad001', 'app_label': 'nhan_vien', 'model_name': 'chamcong', 'field_name': 'nhan_vien',
+        })
+        self.assertEqual([r['text'] for r in res.json()['results']], ['AD001 - Nhân viên AD001'])
+
+    def test_date_hierarchy_probe_matches_distinct(self):
+        from .admin import DoMocNgayQuerySet
+        self._them_du_lieu(0, 3)
+        ChamCong.objects.create(nhan_vien=NhanVien.objects.first(), ngay=date(2023, 2, 28), gio_vao=time(8, 0))
+        qs = DoMocNgayQuerySet(model=ChamCong)
+        for kind, loc in (('year', {}), ('month', {'ngay__year': 2025}), ('day', {'ngay__year': 2025, 'ngay__month': 9})):
+            self.assertEqual(list(qs.filter(**loc).dates('ngay', kind)), list(ChamCong.objects.filter(**loc).dates('ngay', kind)))
+
+    def test_estimated_count(self):
+        from .admin import UocLuongPaginator
+        self._them_du_lieu(0, 3)
+        with mock.patch('nhan_vien.admin.GIOI_HAN_DEM', 2):
+            # Không lọc: ước lượng (MAX(rowid)), không COUNT(*)
+            with CaptureQueriesContext(connection) as ctx:
+                self.assertEqual(UocLuongPaginator(ChamCong.objects.order_by('id'), 100).count,
+                                 ChamCong.objects.order_by('-id').first().id)
+            self.assertNotIn('COUNT', ctx.captured_queries[-1]['sql'])
+            # Có lọc: đếm tối đa GIOI_HAN_DEM dòng
+            self.assertEqual(UocLuongPaginator(ChamCong.objects.filter(gio_vao=time(8, 0)).order_by('id'), 100).count, 2)
@@ -2,13 +2,19 @@
 
 from django.urls import path
 from rest_framework.routers import DefaultRouter
+from .async_views import check_in, check_out
 from .views import PayslipViewSet
 from .views import (
     PhongBanViewSet, 
     ChucVuViewSet, 
     NhanVienViewSet, 
     ChamCongViewSet, 
-    DonXinNghiViewSet
+    ChamCongThangViewSet,
+    DonXinNghiViewSet,
+    NgayLeViewSet,
+    TacVuViewSet,
+    DashboardView,
+    ProfilingView
 )
 
 router = DefaultRouter()
@@ -17,7 +23,17 @@ router.register(r'phongban', PhongBanViewSet)
 router.register(r'chucvu', ChucVuViewSet)
 router.register(r'nhanvien', NhanVienViewSet, basename='nhanvien')
 router.register(r'chamcong', ChamCongViewSet)
+router.register(r'chamcongthang', ChamCongThangViewSet)
 router.register('donxinnghi', DonXinNghiViewSet, basename='donxinnghi')
+router.register(r'ngayle', NgayLeViewSet)
+router.register(r'tacvu', TacVuViewSet)
 
 router.register(r'payslips', PayslipViewSet)
-urlpatterns = router.urls
\ No newline at end of file
+urlpatterns = [
+    # Đặt trước router để không bị route chamcong/<pk>/ bắt mất
+    path('chamcong/check-in/', check_in, name='chamcong-check-in'),
+    path('chamcong/check-out/', check_out, name='chamcong-check-out'),
+] + router.urls + [
+    path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('profiling/', ProfilingView.as_view(), name='profiling'),
+]
\ No newline at end of file
@@ -1,40 +1,136 @@
 # Trong nhan_vien/views.py
+from datetime import date
+
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.permissions import AllowAny
 from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.views import APIView
 from .models import Payslip # Thêm Payslip
 from .serializers import PayslipSerializer # Thêm PayslipSerializer
+from .serializers import PayrollPreviewSerializer, nhan_vien_list_data, payslip_list_data
 # Import các permission, model và serializer
-from .permissions import IsManagerOrReadOnly, DonXinNghiPermission
+from .caching import CachedListMixin
+from .dashboard import lay_dashboard
+from .fieldsets import FieldsetViewMixin
+from .export import (
+    COT_BANG_LUONG, COT_CHAM_CONG, CSVExportRenderer, LoiJSONMixin, XLSXExportRenderer, du_lieu_xuat,
+    streaming_export_response,
+)
+from .attendance import chi_so_dong, doi_ra_gio
+from .ingest import nhap_lo_cham_cong
+from .onboarding import VAI_TRO_HOP_LE
+from .leave import (
+    DA_AP_DUNG, DA_XU_LY_TRUOC, KHONG_CO_QUYEN, KHONG_TON_TAI, TRANG_THAI_CHIEM_CHO,
+    kiem_tra_trung_lich, lich_vang_mat, so_du_phep, xu_ly_don, xu_ly_mot_don
+)
+from .payroll import tinh_lai_bang_luong
+from .payroll_preview import xem_truoc_bang_luong
+from .jobs import TRANG_THAI_KET_THUC, co_worker_song, huy_tac_vu, tao_tac_vu, thu_lai_tac_vu
+from .pagination import KeysetPagination, SearchPagination, TacVuPagination
+from .profiling import DoSerializerMixin, do_serializer, lay_thong_ke, xoa_thong_ke
+from .search import KetQuaTimKiem
+from .parsers import NDJSONParser, CSVParser
+from .permissions import (
+    IsManagerOrReadOnly, IsMayChamCong, IsQuanLy, IsAdmin, DonXinNghiPermission, is_quan_ly, get_nhan_vien_id,
+    get_role,
+)
 from .models import (
-    NhanVien, PhongBan, ChucVu, ChamCong, DonXinNghi, UserAccount
+    NhanVien, PhongBan, ChucVu, ChamCong, ChamCongThang, DonXinNghi, NgayLe, TacVu
 )
 from .serializers import (
     NhanVienSerializer, PhongBanSerializer, ChucVuSerializer, 
-    ChamCongSerializer, DonXinNghiSerializer
+    ChamCongSerializer, ChamCongThangSerializer, DonXinNghiSerializer, NgayLeSerializer,
+    TacVuSerializer, TaoTacVuSerializer, DuyetDonSerializer
 )
+from .workdays import lich_nam, ngay_le_va_lam_bu, ngay_nghi_dac_biet, so_ngay_lam_viec
+
+
+def vai_tro_duoc_tao(request):
+    """Các vai trò người gọi được gán khi nhập nhân viên: chỉ Admin được tạo Admin."""
+    if get_role(request) == 'Admin':
+        return list(VAI_TRO_HOP_LE)
+    return [role for role in VAI_TRO_HOP_LE if role != 'Admin']
+
 
+def khong_co_worker():
+    """Không tạo tác vụ khi không có worker: tác vụ sẽ nằm 'pending' mãi mà không ai biết."""
+    return Response(
+        {'error': 'Không có worker tác vụ nền đang chạy (python manage.py run_jobs); thử lại sau.'},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
 
-class PhongBanViewSet(viewsets.ModelViewSet):
-    """API endpoint cho phép quản lý các phòng ban."""
+
+class PhongBanViewSet(CachedListMixin, DoSerializerMixin, FieldsetViewMixin, viewsets.ModelViewSet):
+    """
+    API endpoint cho phép quản lý các phòng ban.
+    Danh sách được cache và hỗ trợ ETag / 304 Not Modified.
+    """
     queryset = PhongBan.objects.all()
     serializer_class = PhongBanSerializer
     # Bảo mật: Chỉ Manager/HR mới được Sửa/Xóa
     permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
 
 
-class ChucVuViewSet(viewsets.ModelViewSet):
-    """API endpoint cho phép quản lý các chức vụ."""
+class ChucVuViewSet(CachedListMixin, DoSerializerMixin, FieldsetViewMixin, viewsets.ModelViewSet):
+    """
+    API endpoint cho phép quản lý các chức vụ.
+    Danh sách được cache và hỗ trợ ETag / 304 Not Modified.
+    """
     queryset = ChucVu.objects.all()
     serializer_class = ChucVuSerializer
     # Bảo mật: Chỉ Manager/HR mới được Sửa/Xóa
     permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
 
 
-class NhanVienViewSet(viewsets.ModelViewSet):
+class NgayLeViewSet(CachedListMixin, DoSerializerMixin, FieldsetViewMixin, viewsets.ModelViewSet):
+    """
+    API endpoint quản lý ngày lễ / ngày làm bù của lịch làm việc.
+    Danh sách được cache và hỗ trợ ETag / 304 Not Modified.
+    """
+    queryset = NgayLe.objects.all()
+    serializer_class = NgayLeSerializer
+    permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
+
+    @action(detail=False, methods=['get'], url_path='lich')
+    def lich(self, request):
+        """
+        Lịch làm việc: ?nam=YYYY -> số ngày làm việc từng tháng và các ngày lễ/làm bù;
+        thêm ?tu_ngay=&den_ngay= (YYYY-MM-DD) để đếm số ngày làm việc trong khoảng.
+        """
+        params = request.query_params
+        try:
+            nam = int(params.get('nam') or date.today().year)
+        except ValueError:
+            raise ValidationError({'nam': ['Giá trị phải là số nguyên.']})
+        if not 1900 <= nam <= 2100:
+            raise ValidationError({'nam': ['Năm không hợp lệ.']})
+        theo_thang = lich_nam(nam)
+        data = {
+            'nam': nam,
+            'so_ngay_lam_viec': sum(theo_thang),
+            'theo_thang': [{'thang': i, 'so_ngay_lam_viec': so} for i, so in enumerate(theo_thang, start=1)],
+            'ngay_dac_biet': ngay_nghi_dac_biet(nam),
+        }
+        if params.get('tu_ngay') or params.get('den_ngay'):
+            khoang = {}
+            for param in ('tu_ngay', 'den_ngay'):
+                try:
+                    khoang[param] = date.fromisoformat(params.get(param) or '')
+                except ValueError:
+                    raise ValidationError({param: ['Ngày không hợp lệ (định dạng YYYY-MM-DD).']})
+            data['khoang'] = {**khoang, 'so_ngay_lam_viec': so_ngay_lam_viec(khoang['tu_ngay'], khoang['den_ngay'])}
+        return Response(data)
+
+
+class NhanVienViewSet(DoSerializerMixin, FieldsetViewMixin, viewsets.ModelViewSet):
     """API endpoint cho phép quản lý hồ sơ Nhân Viên."""
     queryset = NhanVien.objects.all().select_related('user', 'phong_ban', 'chuc_vu')
     serializer_class = NhanVienSerializer
@@ -42,20 +138,206 @@ class NhanVienViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated, IsManagerOrReadOnly] 
     # (Bạn có thể tạo permission phức tạp hơn để nhân viên tự sửa hồ sơ của mình)
 
+    def list(self, request, *args, **kwargs):
+        """
+        Đường đọc nhanh: dựng JSON từ .values(), cùng định dạng với NhanVienSerializer.
+        Có ?fields= / ?expand= thì đi đường serializer (truy vấn đã co theo trường).
+        """
+        if self.dung_chon_truong():
+            return super().list(request, *args, **kwargs)
+        with do_serializer():
+            data = nhan_vien_list_data(self.filter_queryset(self.get_queryset()))
+        return Response(data)
+
+    @action(detail=False, methods=['get'], url_path='search')
+    def search(self, request):
+        """
+        Tìm nhân viên theo mã, họ tên, phòng ban, chức vụ — không phân biệt
+        dấu, khớp tiền tố từng từ (gõ tới đâu tìm tới đó).
+        ?q=<từ khóa>&page=&page_size= ; kết quả xếp theo độ liên quan.
+        Nhận ?fields= / ?expand= như list.
+        """
+        tu_khoa = request.query_params.get('q', '').strip()
+        if not tu_khoa:
+            raise ValidationError({'q': ['Vui lòng nhập từ khóa tìm kiếm.']})
+        paginator = SearchPagination()
+        ids = paginator.paginate_queryset(KetQuaTimKiem(tu_khoa), request, view=self)
+        if self.dung_chon_truong():
+            theo_id = {nv.pk: nv for nv in self.co_truy_van(self.get_queryset().filter(id__in=ids))}
+            serializer = self.get_serializer([theo_id[pk] for pk in ids if pk in theo_id], many=True)
+            return paginator.get_paginated_response(serializer.data)
+        with do_serializer():
+            theo_id = {nv['id']: nv for nv in nhan_vien_list_data(self.get_queryset().filter(id__in=ids))}
+        return paginator.get_paginated_response([theo_id[pk] for pk in ids if pk in theo_id])
+
+    @action(
+        detail=False, methods=['post'], url_path='bulk-import',
+        parser_classes=[JSONParser, CSVParser, NDJSONParser],
+        permission_classes=[IsAuthenticated, IsQuanLy],
+    )
+    def bulk_import(self, request):
+        """
+        Nhập nhân viên hàng loạt (CSV, NDJSON hoặc JSON array), mỗi dòng:
+        ma_nhan_vien, ho_ten, ngay_sinh, ngay_vao_lam, new_username, password,
+        phong_ban_id, chuc_vu_id, role. Chỉ Admin được nhập tài khoản Admin.
+        Băm mật khẩu rất chậm nên không chạy trong request: tạo tác vụ nền
+        'nhap_nhan_vien' và trả về 202 kèm tác vụ; theo dõi ở /api/tacvu/<id>/
+        (dòng lỗi được báo theo số dòng, các dòng hợp lệ vẫn được tạo).
+        Trả về 503 khi không có worker `manage.py run_jobs` nào đang chạy.
+        """
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError({'error': 'Dữ liệu phải là danh sách nhân viên.'})
+        if not rows:
+            raise ValidationError({'error': 'Danh sách nhân viên trống.'})
+        if not co_worker_song():
+            return khong_co_worker()
+        tac_vu = tao_tac_vu(
+            'nhap_nhan_vien', {'rows': rows, 'vai_tro_cho_phep': vai_tro_duoc_tao(request)},
+            nguoi_tao_id=request.user.id,
+        )
+        return Response(TacVuSerializer(tac_vu).data, status=status.HTTP_202_ACCEPTED)
+
 
-class ChamCongViewSet(viewsets.ModelViewSet):
-    """API endpoint cho phép quản lý việc Chấm Công."""
-    queryset = ChamCong.objects.all().select_related('nhan_vien').order_by('-ngay')
+class ChamCongViewSet(LoiJSONMixin, DoSerializerMixin, FieldsetViewMixin, viewsets.ModelViewSet):
+    """
+    API endpoint cho phép quản lý việc Chấm Công.
+    - Danh sách được phân trang keyset theo (ngay, id) giảm dần.
+    - Lọc phía server: ?nhan_vien=<id>&phong_ban=<id>&tu_ngay=YYYY-MM-DD&den_ngay=YYYY-MM-DD
+    - gio-lam/: giờ làm, giờ làm thêm, phút đi muộn của từng dòng (tính trong SQL).
+    """
+    queryset = ChamCong.objects.all().order_by('-ngay', '-id')
     serializer_class = ChamCongSerializer
+    pagination_class = KeysetPagination
     # Bảo mật: Chỉ Manager/HR mới được Sửa/Xóa
     permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
 
+    @action(
+        detail=False, methods=['post'], url_path='bulk-ingest',
+        parser_classes=[NDJSONParser, CSVParser, JSONParser],
+        permission_classes=[IsMayChamCong | (IsAuthenticated & IsQuanLy)],
+    )
+    def bulk_ingest(self, request):
+        """
+        Nhập lô lượt chấm từ máy chấm công (NDJSON, CSV hoặc JSON array).
+        Máy chấm công xác thực bằng header X-Terminal-Key (MAY_CHAM_CONG_KEYS),
+        quản lý dùng JWT như thường.
+        Header bắt buộc: Idempotency-Key — gửi lại cùng khóa sẽ không ghi lại.
+        Mỗi dòng: ma_nhan_vien, thoi_diem (ISO 8601), loai ('in' | 'out').
+        """
+        idempotency_key = request.headers.get('Idempotency-Key', '').strip()
+        if not idempotency_key:
+            raise ValidationError({'Idempotency-Key': ['Header này là bắt buộc.']})
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError({'error': 'Dữ liệu phải là danh sách các lượt chấm.'})
+
+        ket_qua, da_xu_ly_truoc = nhap_lo_cham_cong(idempotency_key, rows)
+        response = Response(ket_qua, status=status.HTTP_200_OK if da_xu_ly_truoc else status.HTTP_201_CREATED)
+        response['Idempotent-Replayed'] = 'true' if da_xu_ly_truoc else 'false'
+        return response
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'export', 'gio_lam'):
+            return queryset
+
+        params = self.request.query_params
+        for param, lookup in (('nhan_vien', 'nhan_vien_id'), ('phong_ban', 'nhan_vien__phong_ban_id')):
+            value = params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: int(value)})
+                except ValueError:
+                    raise ValidationError({param: ['Giá trị phải là số nguyên.']})
+        for param, lookup in (('tu_ngay', 'ngay__gte'), ('den_ngay', 'ngay__lte')):
+            value = params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: date.fromisoformat(value)})
+                except ValueError:
+                    raise ValidationError({param: ['Ngày không hợp lệ (định dạng YYYY-MM-DD).']})
+        return queryset
 
-class DonXinNghiViewSet(viewsets.ModelViewSet):
+    @action(
+        detail=False, methods=['get'], url_path='export',
+        renderer_classes=[CSVExportRenderer, XLSXExportRenderer],
+        permission_classes=[IsAuthenticated, IsQuanLy],
+    )
+    def export(self, request):
+        """
+        Xuất chấm công dạng luồng: ?format=csv|xlsx cùng các bộ lọc của
+        danh sách (nhan_vien, phong_ban, tu_ngay, den_ngay).
+        """
+        header, rows = du_lieu_xuat(self.get_queryset(), COT_CHAM_CONG)
+        return streaming_export_response(header, rows, 'cham_cong', request.accepted_renderer.format)
+
+    @action(detail=False, methods=['get'], url_path='gio-lam')
+    def gio_lam(self, request):
+        """
+        Giờ làm / làm thêm theo từng dòng chấm công, cùng bộ lọc và phân trang
+        keyset của danh sách. Bắt buộc tu_ngay, den_ngay (để tra ngày lễ một lần).
+        """
+        thieu = [param for param in ('tu_ngay', 'den_ngay') if not request.query_params.get(param)]
+        if thieu:
+            raise ValidationError({param: ['Tham số này là bắt buộc.'] for param in thieu})
+        queryset = self.get_queryset()
+        tu_ngay = date.fromisoformat(request.query_params['tu_ngay'])
+        den_ngay = date.fromisoformat(request.query_params['den_ngay'])
+        queryset = queryset.only('id', 'nhan_vien_id', 'ngay', 'gio_vao', 'gio_ra').annotate(
+            **chi_so_dong(*ngay_le_va_lam_bu(tu_ngay, den_ngay))
+        )
+        page = self.paginate_queryset(queryset)
+        data = [{
+            'id': cc.id,
+            'nhan_vien': cc.nhan_vien_id,
+            'ngay': cc.ngay.isoformat(),
+            'gio_vao': cc.gio_vao.isoformat(),
+            'gio_ra': cc.gio_ra.isoformat() if cc.gio_ra is not None else None,
+            'gio_lam': str(doi_ra_gio(cc.giay_lam)),
+            'gio_lam_them': str(doi_ra_gio(cc.giay_lam_them)),
+            'he_so_lam_them': cc.he_so_lam_them,
+            'phut_di_muon': cc.phut_di_muon,
+            'thieu_gio_ra': cc.gio_ra is None,
+            'qua_dem': cc.gio_ra is not None and cc.gio_ra < cc.gio_vao,
+        } for cc in page]
+        return self.get_paginated_response(data)
+
+
+class ChamCongThangViewSet(DoSerializerMixin, FieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    API (chỉ đọc) cho bảng tổng hợp chấm công theo tháng.
+    Lọc: ?nam=&thang=&nhan_vien=&phong_ban= — mỗi nhân viên-tháng một dòng,
+    không phải quét lại dữ liệu chấm công gốc.
+    """
+    queryset = ChamCongThang.objects.all().order_by('-nam', '-thang', 'nhan_vien_id')
+    serializer_class = ChamCongThangSerializer
+    permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        for param, lookup in (
+            ('nam', 'nam'), ('thang', 'thang'),
+            ('nhan_vien', 'nhan_vien_id'), ('phong_ban', 'nhan_vien__phong_ban_id'),
+        ):
+            value = params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{lookup: int(value)})
+                except ValueError:
+                    raise ValidationError({param: ['Giá trị phải là số nguyên.']})
+        return queryset
+
+
+class DonXinNghiViewSet(DoSerializerMixin, FieldsetViewMixin, viewsets.ModelViewSet):
     """
     API endpoint cho phép quản lý Đơn Xin Nghỉ.
     - Nhân viên: Chỉ xem/tạo/sửa/xóa đơn của mình (khi pending).
     - Manager/HR: Xem/sửa/xóa/duyệt tất cả đơn.
+    - Đơn giao với một đơn chờ duyệt/đã duyệt khác của cùng nhân viên bị từ chối (400).
+    - so-du/: số dư phép năm; lich-vang-mat/: ai nghỉ ngày nào theo phòng ban.
+    - bulk-review/: duyệt/từ chối nhiều đơn một lần.
     """
     serializer_class = DonXinNghiSerializer
     # Áp dụng permission mới
@@ -67,40 +349,128 @@ class DonXinNghiViewSet(viewsets.ModelViewSet):
         - Manager/Admin/HR thấy tất cả đơn.
         - Nhân viên thường (Employee) chỉ thấy đơn của chính họ.
         """
-        user = self.request.user
-
-        # 1. Kiểm tra vai trò của user
-        try:
-            user_account = UserAccount.objects.get(user=user)
-            role = user_account.role
-        except UserAccount.DoesNotExist:
-            role = 'Employee' # Mặc định là Employee nếu không có vai trò
+        # 1. Nếu là Manager/Admin/HR, cho xem tất cả (vai trò đọc từ token)
+        if is_quan_ly(self.request):
+            return DonXinNghi.objects.all().order_by('-ngay_bat_dau')
 
-        # 2. Nếu là Manager/Admin/HR, cho xem tất cả
-        if role in ['Manager', 'Admin', 'HR']:
-            return DonXinNghi.objects.all().select_related('nhan_vien').order_by('-ngay_bat_dau')
-
-        # 3. Nếu là nhân viên thường, lọc theo 'nhan_vien' của user đó
-        try:
-            # Tìm hồ sơ NhanVien của user đang đăng nhập
-            nhan_vien_cua_user = NhanVien.objects.get(user=user)
-            return DonXinNghi.objects.filter(nhan_vien=nhan_vien_cua_user).select_related('nhan_vien').order_by('-ngay_bat_dau')
-        except NhanVien.DoesNotExist:
+        # 2. Nếu là nhân viên thường, lọc theo 'nhan_vien' của user đó
+        nhan_vien_id = get_nhan_vien_id(self.request)
+        if nhan_vien_id is None:
             # Nếu user này không có hồ sơ NhanVien, không cho xem đơn nào
             return DonXinNghi.objects.none()
+        return DonXinNghi.objects.filter(nhan_vien_id=nhan_vien_id).order_by('-ngay_bat_dau')
 
     def perform_create(self, serializer):
         """
         Tùy chỉnh khi tạo mới (POST):
         Tự động gán nhân viên tạo đơn là user đang đăng nhập.
         """
-        try:
-            nhan_vien = NhanVien.objects.get(user=self.request.user)
-            # Lưu đơn nghỉ và gán 'nhan_vien'
-            serializer.save(nhan_vien=nhan_vien, trang_thai='pending')
-        except NhanVien.DoesNotExist:
+        nhan_vien_id = get_nhan_vien_id(self.request)
+        if nhan_vien_id is None:
             # Xử lý lỗi nếu user không có hồ sơ nhân viên
             raise ValidationError("Người dùng này không có hồ sơ nhân viên. Không thể tạo đơn.")
+        data = serializer.validated_data
+        # Kiểm tra và ghi trong cùng transaction (BEGIN IMMEDIATE giữ khóa ghi)
+        # để hai request song song không cùng lọt qua kiểm tra trùng lịch
+        with transaction.atomic():
+            kiem_tra_trung_lich(nhan_vien_id, data['ngay_bat_dau'], data['ngay_ket_thuc'])
+            # Lưu đơn nghỉ và gán 'nhan_vien'
+            serializer.save(nhan_vien_id=nhan_vien_id, trang_thai='pending')
+
+    def perform_update(self, serializer):
+        # trang_thai chỉ đọc ở serializer: đổi trạng thái đi qua approve/reject/bulk-review
+        instance, data = serializer.instance, serializer.validated_data
+        with transaction.atomic():
+            if instance.trang_thai in TRANG_THAI_CHIEM_CHO:
+                nhan_vien = data.get('nhan_vien')
+                kiem_tra_trung_lich(
+                    nhan_vien.pk if nhan_vien else instance.nhan_vien_id,
+                    data.get('ngay_bat_dau', instance.ngay_bat_dau),
+                    data.get('ngay_ket_thuc', instance.ngay_ket_thuc),
+                    bo_qua_id=instance.pk,
+                )
+            serializer.save()
+
+    def _so_nguyen(self, param, mac_dinh=None):
+        value = self.request.query_params.get(param)
+        if not value:
+            return mac_dinh
+        try:
+            return int(value)
+        except ValueError:
+            raise ValidationError({param: ['Giá trị phải là số nguyên.']})
+
+    def _nam(self):
+        """?nam= (mặc định năm nay), cùng khoảng hợp lệ với /api/ngayle/lich/."""
+        nam = self._so_nguyen('nam', date.today().year)
+        if not 1900 <= nam <= 2100:
+            raise ValidationError({'nam': ['Năm không hợp lệ.']})
+        return nam
+
+    @action(detail=False, methods=['get'], url_path='so-du')
+    def so_du(self, request):
+        """
+        Số dư phép năm: ?nam=YYYY (mặc định năm nay).
+        Nhân viên chỉ xem của mình; Manager/HR lọc được ?nhan_vien=&phong_ban=.
+        """
+        nam = self._nam()
+        if is_quan_ly(request):
+            nhan_vien_qs = NhanVien.objects.all()
+            for param, lookup in (('nhan_vien', 'id'), ('phong_ban', 'phong_ban_id')):
+                value = self._so_nguyen(param)
+                if value is not None:
+                    nhan_vien_qs = nhan_vien_qs.filter(**{lookup: value})
+        else:
+            nhan_vien_qs = NhanVien.objects.filter(id=get_nhan_vien_id(request))
+        return Response(so_du_phep(nam, nhan_vien_qs))
+
+    @action(
+        detail=False, methods=['get'], url_path='lich-vang-mat',
+        permission_classes=[IsAuthenticated, IsQuanLy],
+    )
+    def lich(self, request):
+        """
+        Lịch vắng mặt theo phòng ban/ngày (chỉ Manager/HR/Admin).
+        ?nam=YYYY hoặc ?tu_ngay=&den_ngay= (YYYY-MM-DD), ?phong_ban=<id>,
+        ?gom_cho_duyet=1 để tính cả đơn đang chờ duyệt.
+        """
+        params = request.query_params
+        nam = self._nam()
+        khoang = {}
+        for param, mac_dinh in (('tu_ngay', date(nam, 1, 1)), ('den_ngay', date(nam, 12, 31))):
+            value = params.get(param)
+            try:
+                khoang[param] = date.fromisoformat(value) if value else mac_dinh
+            except ValueError:
+                raise ValidationError({param: ['Ngày không hợp lệ (định dạng YYYY-MM-DD).']})
+        if khoang['den_ngay'] < khoang['tu_ngay']:
+            raise ValidationError({'den_ngay': ['Phải sau hoặc bằng tu_ngay.']})
+        if (khoang['den_ngay'] - khoang['tu_ngay']).days > 366:
+            raise ValidationError({'den_ngay': ['Chỉ xem tối đa một năm mỗi lần.']})
+
+        trang_thai = TRANG_THAI_CHIEM_CHO if params.get('gom_cho_duyet') in ('1', 'true') else ('approved',)
+        with do_serializer():
+            data = lich_vang_mat(
+                khoang['tu_ngay'], khoang['den_ngay'],
+                phong_ban_id=self._so_nguyen('phong_ban'), trang_thai=trang_thai,
+            )
+        return Response(data)
+
+    # Mã lỗi HTTP cho action duyệt/từ chối một đơn
+    _HTTP_KET_QUA = {
+        DA_XU_LY_TRUOC: (status.HTTP_400_BAD_REQUEST, 'Đơn này đã được xử lý.'),
+        KHONG_CO_QUYEN: (status.HTTP_403_FORBIDDEN, 'Không thể tự duyệt đơn của chính mình.'),
+    }
+
+    def _xu_ly_mot_don(self, trang_thai_moi):
+        # Dùng chung đường UPDATE có điều kiện với bulk-review
+        don_xin_nghi = self.get_object()
+        ket_qua = xu_ly_mot_don(don_xin_nghi, trang_thai_moi, get_nhan_vien_id(self.request))
+        if ket_qua != DA_AP_DUNG:
+            ma_loi, thong_bao = self._HTTP_KET_QUA[ket_qua]
+            return Response({'error': thong_bao}, status=ma_loi)
+        serializer = self.get_serializer(don_xin_nghi)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], url_path='approve')
     def approve(self, request, pk=None):
@@ -108,20 +478,7 @@ class DonXinNghiViewSet(viewsets.ModelViewSet):
         Hành động để phê duyệt một đơn xin nghỉ.
         (Permission sẽ tự động chặn Employee gọi action này)
         """
-        don_xin_nghi = self.get_object() 
-        
-        if don_xin_nghi.trang_thai != 'pending':
-            return Response(
-                {'error': 'Đơn này đã được xử lý.'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        
-        don_xin_nghi.trang_thai = 'approved' # Sửa thành 'approved'
-        # don_xin_nghi.nguoi_duyet = request.user 
-        don_xin_nghi.save()
-        
-        serializer = self.get_serializer(don_xin_nghi)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        return self._xu_ly_mot_don('approved')
 
     @action(detail=True, methods=['post'], url_path='reject')
     def reject(self, request, pk=None):
@@ -129,22 +486,29 @@ class DonXinNghiViewSet(viewsets.ModelViewSet):
         Hành động để từ chối một đơn xin nghỉ.
         (Permission sẽ tự động chặn Employee gọi action này)
         """
-        don_xin_nghi = self.get_object()
-        
-        if don_xin_nghi.trang_thai != 'pending':
-            return Response(
-                {'error': 'Đơn này đã được xử lý.'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        return self._xu_ly_mot_don('rejected')
 
-        don_xin_nghi.trang_thai = 'rejected' # Sửa thành 'rejected'
-        # don_xin_nghi.ly_do_tu_choi = request.data.get('ly_do', '')
-        don_xin_nghi.save()
+    @action(
+        detail=False, methods=['post'], url_path='bulk-review',
+        permission_classes=[IsAuthenticated, IsQuanLy],
+    )
+    def bulk_review(self, request):
+        """
+        Duyệt/từ chối nhiều đơn trong một câu UPDATE.
+        Body: {"ids": [1, 2, ...], "hanh_dong": "approve" | "reject"}
+        Trả về kết quả từng đơn: applied / already_processed / forbidden / not_found.
+        """
+        body = DuyetDonSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        trang_thai_moi = {'approve': 'approved', 'reject': 'rejected'}[body.validated_data['hanh_dong']]
 
-        serializer = self.get_serializer(don_xin_nghi)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        ket_qua = xu_ly_don(body.validated_data['ids'], trang_thai_moi, get_nhan_vien_id(request))
+        tong_hop = {k: 0 for k in (DA_AP_DUNG, DA_XU_LY_TRUOC, KHONG_CO_QUYEN, KHONG_TON_TAI)}
+        for gia_tri in ket_qua.values():
+            tong_hop[gia_tri] += 1
+        return Response({'ket_qua': ket_qua, 'tong_hop': tong_hop}, status=status.HTTP_200_OK)
 
-class PayslipViewSet(viewsets.ModelViewSet): # SỬA 1: Đổi từ ReadOnlyModelViewSet sang ModelViewSet
+class PayslipViewSet(LoiJSONMixin, DoSerializerMixin, FieldsetViewMixin, viewsets.ModelViewSet): # SỬA 1: Đổi từ ReadOnlyModelViewSet sang ModelViewSet
     """
     API endpoint cho phép quản lý Bảng Lương (GET, POST, PUT, DELETE).
     """
@@ -153,4 +517,179 @@ class PayslipViewSet(viewsets.ModelViewSet): # SỬA 1: Đổi từ ReadOnlyMode
     
     # SỬA 2: Thay AllowAny bằng permission bảo mật.
     # Chỉ Manager/HR mới được phép tạo, sửa, xóa bảng lương.
-    permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
\ No newline at end of file
+    permission_classes = [IsAuthenticated, IsManagerOrReadOnly]
+
+    def list(self, request, *args, **kwargs):
+        """
+        Đường đọc nhanh: dựng JSON từ .values(), cùng định dạng với PayslipSerializer.
+        Có ?fields= / ?expand= thì đi đường serializer (truy vấn đã co theo trường).
+        """
+        if self.dung_chon_truong():
+            return super().list(request, *args, **kwargs)
+        with do_serializer():
+            data = payslip_list_data(self.filter_queryset(self.get_queryset()))
+        return Response(data)
+
+    @action(
+        detail=False, methods=['get'], url_path='export',
+        renderer_classes=[CSVExportRenderer, XLSXExportRenderer],
+        permission_classes=[IsAuthenticated, IsQuanLy],
+    )
+    def export(self, request):
+        """
+        Xuất bảng lương dạng luồng: ?nam=&thang=&format=csv|xlsx
+        Phòng ban/chức vụ được join trong cùng truy vấn, không truy vấn theo dòng.
+        """
+        queryset = Payslip.objects.order_by('-nam', '-thang', 'nhan_vien_id')
+        for param in ('nam', 'thang'):
+            value = request.query_params.get(param)
+            if value:
+                try:
+                    queryset = queryset.filter(**{param: int(value)})
+                except ValueError:
+                    raise ValidationError({param: ['Giá trị phải là số nguyên.']})
+
+        header, rows = du_lieu_xuat(queryset, COT_BANG_LUONG)
+        return streaming_export_response(header, rows, 'bang_luong', request.accepted_renderer.format)
+
+    @action(
+        detail=False, methods=['post'], url_path='preview',
+        permission_classes=[IsAuthenticated, IsQuanLy],
+    )
+    def preview(self, request):
+        """
+        Xem trước bảng lương cả công ty cho một tháng, KHÔNG ghi DB.
+        Body: {"thang", "nam", và tùy chọn "phu_cap", "khau_tru", "cong_chuan",
+        "he_so_luong_co_ban", "luong_co_ban_theo_chuc_vu": {id: số tiền},
+        "phu_cap_theo_phong_ban": {id: số tiền}, "khau_tru_theo_phong_ban": {id: số tiền}}.
+        Trả về tổng, tổng theo tham số hiện hành, chênh lệch và chi tiết theo phòng ban.
+        """
+        serializer = PayrollPreviewSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        tham_so = dict(serializer.validated_data)
+        thang, nam = tham_so.pop('thang'), tham_so.pop('nam')
+        with do_serializer():
+            data = xem_truoc_bang_luong(thang, nam, tham_so)
+        return Response(data)
+
+    @action(
+        detail=False, methods=['post'], url_path='recalculate',
+        permission_classes=[IsAuthenticated, IsQuanLy],
+    )
+    def recalculate(self, request):
+        """
+        Chỉ tính lại các bảng lương đang đánh dấu can_tinh_lai.
+        Body (tùy chọn): {"thang": 9, "nam": 2025}.
+        Trả về số bảng lương đã tính, từng thay đổi (cũ/mới/chênh lệch) và các dòng bị bỏ qua.
+        """
+        ky = {}
+        for param in ('thang', 'nam'):
+            value = request.data.get(param)
+            if value not in (None, ''):
+                try:
+                    ky[param] = int(value)
+                except (TypeError, ValueError):
+                    raise ValidationError({param: ['Giá trị phải là số nguyên.']})
+        ket_qua = tinh_lai_bang_luong(**ky)
+        for item in ket_qua['thay_doi']:
+            for key in ('luong_co_ban_cu', 'luong_co_ban_moi', 'tien_lam_them_cu', 'tien_lam_them_moi',
+                        'luong_thuc_nhan_cu', 'luong_thuc_nhan_moi', 'chenh_lech'):
+                item[key] = f'{item[key]:.2f}'
+        ket_qua['tong_chenh_lech'] = f'{ket_qua["tong_chenh_lech"]:.2f}'
+        return Response(ket_qua)
+
+class TacVuViewSet(DoSerializerMixin, FieldsetViewMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Tác vụ nền cho các thao tác dài (tính lương, xuất file, nhập nhân viên).
+    - POST: tạo tác vụ {"loai", "tham_so"}, trả về 202 ngay; worker
+      `manage.py run_jobs` sẽ chạy (503 nếu không có worker nào đang chạy).
+    - GET: theo dõi trạng thái/tiến độ. Lọc: ?trang_thai=&loai=
+    - cancel/, retry/, download/ (tệp kết quả).
+    """
+    queryset = TacVu.objects.all().order_by('-id')
+    serializer_class = TacVuSerializer
+    pagination_class = TacVuPagination
+    permission_classes = [IsAuthenticated, IsQuanLy]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        params = self.request.query_params
+        if params.get('trang_thai'):
+            queryset = queryset.filter(trang_thai=params['trang_thai'])
+        if params.get('loai'):
+            queryset = queryset.filter(loai=params['loai'])
+        return queryset
+
+    def create(self, request):
+        serializer = TaoTacVuSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        loai, tham_so = serializer.validated_data['loai'], serializer.validated_data['tham_so']
+        if loai == 'nhap_nhan_vien':
+            # Quyền tạo tài khoản được chốt theo người tạo tác vụ, như bulk_import
+            tham_so['vai_tro_cho_phep'] = vai_tro_duoc_tao(request)
+        if not co_worker_song():
+            return khong_co_worker()
+        tac_vu = tao_tac_vu(loai, tham_so, nguoi_tao_id=request.user.id)
+        return Response(TacVuSerializer(tac_vu).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['post'])
+    def cancel(self, request, pk=None):
+        tac_vu = self.get_object()
+        if not huy_tac_vu(tac_vu):
+            return Response({'error': 'Tác vụ đã kết thúc, không thể hủy.'}, status=status.HTTP_409_CONFLICT)
+        tac_vu.refresh_from_db()
+        return Response(TacVuSerializer(tac_vu).data)
+
+    @action(detail=True, methods=['post'])
+    def retry(self, request, pk=None):
+        tac_vu = self.get_object()
+        if not co_worker_song():
+            return khong_co_worker()
+        if not thu_lai_tac_vu(tac_vu):
+            return Response(
+                {'error': 'Chỉ chạy lại được tác vụ lỗi/đã hủy (tác vụ nhập dữ liệu phải tạo mới).'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        tac_vu.refresh_from_db()
+        return Response(TacVuSerializer(tac_vu).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        tac_vu = self.get_object()
+        if tac_vu.trang_thai not in TRANG_THAI_KET_THUC or not tac_vu.tep_ket_qua:
+            return Response({'error': 'Tác vụ chưa có tệp kết quả.'}, status=status.HTTP_404_NOT_FOUND)
+        return FileResponse(
+            tac_vu.tep_ket_qua.open('rb'), as_attachment=True,
+            filename=tac_vu.tep_ket_qua.name.rsplit('/', 1)[-1],
+        )
+
+
+class DashboardView(APIView):
+    """
+    Số liệu tổng quan: nhân sự theo phòng ban/chức vụ, chấm công hôm nay,
+    đơn nghỉ chờ duyệt, lương tháng hiện tại. Vài truy vấn aggregate, có cache.
+    """
+    permission_classes = [IsAuthenticated, IsQuanLy]
+
+    def get(self, request):
+        return Response(lay_dashboard(), headers={'Cache-Control': 'private, no-cache'})
+
+
+class ProfilingView(APIView):
+    """
+    Số liệu hiệu năng theo route (từ các request được lấy mẫu) của tiến trình này:
+    histogram thời gian, SQL, serializer, số truy vấn và các điểm N+1.
+    - GET: xem số liệu
+    - DELETE: xóa số liệu để đo lại từ đầu
+    """
+    permission_classes = [IsAuthenticated, IsAdmin]
+
+    def get(self, request):
+        return Response({
+            'sample_rate': settings.PROFILING_SAMPLE_RATE,
+            'routes': lay_thong_ke(),
+        })
+
+    def delete(self, request):
+        xoa_thong_ke()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,138 @@
+# Trong nhan_vien/workdays.py
+"""
+Lịch làm việc của công ty, dùng chung cho bảng lương (công chuẩn), nghỉ phép
+(số ngày nghỉ) và báo cáo chấm công.
+
+- Ngày nghỉ: rơi vào NGAY_NGHI_HANG_TUAN hoặc NGAY_LE_CO_DINH (settings).
+  Bảng NgayLe ghi đè cả hai: Tết âm lịch, Giỗ Tổ, nghỉ bù, làm bù...
+- Mỗi năm được dựng MỘT lần thành mảng cộng dồn (prefix sum):
+  tich_luy[i] = số ngày làm việc trong i ngày đầu năm. Số ngày làm việc của
+  một khoảng bất kỳ là hiệu hai phần tử (mỗi năm mà khoảng đi qua một
+  phép trừ) — không lặp theo ngày, không truy vấn DB.
+- Cache nằm trong bộ nhớ tiến trình. Lưu/xóa NgayLe xóa cache của tiến
+  trình hiện tại ngay (signal) và đổi phiên bản cache của NgayLe
+  (caching.phien_ban); các tiến trình khác đối chiếu phiên bản tối đa mỗi
+  KHOANG_KIEM_TRA_PHIEN_BAN giây rồi dựng lại. Đổi settings cần khởi động lại
+  tiến trình.
+"""
+import calendar
+import time
+from datetime import date
+from itertools import accumulate
+
+from django.conf import settings
+
+from .caching import phien_ban
+from .models import NgayLe
+
+# Tra phiên bản trong Django cache tốn hơn cả phép tính: chỉ làm định kỳ
+KHOANG_KIEM_TRA_PHIEN_BAN = 5.0
+
+# nam -> tich_luy, dựng theo phiên bản NgayLe `_phien_ban['gia_tri']`
+_cache = {}
+_phien_ban = {'gia_tri': None, 'kiem_tra_luc': float('-inf')}
+
+
+def _dung_nam(nam):
+    """Mảng cộng dồn số ngày làm việc của năm `nam` (một truy vấn NgayLe)."""
+    dau_nam = date(nam, 1, 1)
+    so_ngay = (date(nam + 1, 1, 1) - dau_nam).days
+    nghi_tuan = set(settings.NGAY_NGHI_HANG_TUAN)
+    thu_dau_nam = dau_nam.weekday()
+    lam = [(thu_dau_nam + i) % 7 not in nghi_tuan for i in range(so_ngay)]
+    for thang, ngay, _ in settings.NGAY_LE_CO_DINH:
+        lam[(date(nam, thang, ngay) - dau_nam).days] = False
+    for ngay, la_ngay_lam in NgayLe.objects.filter(
+        ngay__range=(dau_nam, date(nam, 12, 31))
+    ).values_list('ngay', 'la_ngay_lam'):
+        lam[(ngay - dau_nam).days] = la_ngay_lam
+    return [0, *accumulate(lam)]
+
+
+def _tich_luy(nam):
+    bay_gio = time.monotonic()
+    if bay_gio - _phien_ban['kiem_tra_luc'] >= KHOANG_KIEM_TRA_PHIEN_BAN:
+        version = phien_ban(NgayLe)
+        if version != _phien_ban['gia_tri']:
+            _cache.clear()
+            _phien_ban['gia_tri'] = version
+        _phien_ban['kiem_tra_luc'] = bay_gio
+    tich_luy = _cache.get(nam)
+    if tich_luy is None:
+        tich_luy = _cache[nam] = _dung_nam(nam)
+    return tich_luy
+
+
+def xoa_cache(**kwargs):
+    """Bỏ toàn bộ lịch đã dựng trong tiến trình này (cũng là receiver của signal NgayLe)."""
+    _cache.clear()
+    _phien_ban['kiem_tra_luc'] = float('-inf')
+
+
+def _thu_tu_trong_nam(ngay):
+    """Ngày thứ mấy trong năm (1 = 1/1)."""
+    return ngay.toordinal() - date(ngay.year, 1, 1).toordinal() + 1
+
+
+def la_ngay_lam_viec(ngay):
+    tich_luy = _tich_luy(ngay.year)
+    i = _thu_tu_trong_nam(ngay)
+    return tich_luy[i] > tich_luy[i - 1]
+
+
+def so_ngay_lam_viec(tu_ngay, den_ngay):
+    """Số ngày làm việc trong [tu_ngay, den_ngay] (0 nếu khoảng rỗng)."""
+    if den_ngay < tu_ngay:
+        return 0
+    tong = 0
+    for nam in range(tu_ngay.year, den_ngay.year + 1):
+        tich_luy = _tich_luy(nam)
+        dau = _thu_tu_trong_nam(tu_ngay) if nam == tu_ngay.year else 1
+        cuoi = _thu_tu_trong_nam(den_ngay) if nam == den_ngay.year else len(tich_luy) - 1
+        tong += tich_luy[cuoi] - tich_luy[dau - 1]
+    return tong
+
+
+def so_ngay_cong_chuan(nam, thang):
+    """Số ngày làm việc chuẩn trong tháng (trừ ngày nghỉ tuần và ngày lễ)."""
+    return so_ngay_lam_viec(date(nam, thang, 1), date(nam, thang, calendar.monthrange(nam, thang)[1]))
+
+
+def ngay_nghi_dac_biet(nam):
+    """
+    Các ngày nghỉ lễ và ngày làm bù của năm, sắp theo ngày:
+    list dict {ngay, ten, la_ngay_lam}. Ngày nghỉ hằng tuần không được liệt kê.
+    """
+    ngay = {
+        date(nam, thang, ngay_): {'ngay': date(nam, thang, ngay_), 'ten': ten, 'la_ngay_lam': False}
+        for thang, ngay_, ten in settings.NGAY_LE_CO_DINH
+    }
+    for dong in NgayLe.objects.filter(
+        ngay__range=(date(nam, 1, 1), date(nam, 12, 31))
+    ).values('ngay', 'ten', 'la_ngay_lam'):
+        ngay[dong['ngay']] = dong
+    return [ngay[key] for key in sorted(ngay)]
+
+
+def lich_nam(nam):
+    """Số ngày làm việc theo từng tháng của năm: list 12 số nguyên (tra cứu O(1) mỗi tháng)."""
+    tich_luy = _tich_luy(nam)
+    ket_qua = []
+    for thang in range(1, 13):
+        dau = _thu_tu_trong_nam(date(nam, thang, 1))
+        cuoi = dau + calendar.monthrange(nam, thang)[1] - 1
+        ket_qua.append(tich_luy[cuoi] - tich_luy[dau - 1])
+    return ket_qua
+
+
+def ngay_le_va_lam_bu(tu_ngay, den_ngay):
+    """
+    (ngày lễ, ngày làm bù) nằm trong [tu_ngay, den_ngay], dạng list ngày —
+    dùng làm tham số `IN (...)` cho các biểu thức SQL theo loại ngày.
+    """
+    ngay_le, ngay_lam_bu = [], []
+    for nam in range(tu_ngay.year, den_ngay.year + 1):
+        for dong in ngay_nghi_dac_biet(nam):
+            if tu_ngay <= dong['ngay'] <= den_ngay:
+                (ngay_lam_bu if dong['la_ngay_lam'] else ngay_le).append(dong['ngay'])
+    return ngay_le, ngay_lam_bu
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Chạy với ASGI server để các endpoint async (check-in / check-out chấm công)
+phục vụ giờ cao điểm bằng vài worker:
+    uvicorn quanlynhansu.asgi:application --workers 4
 """
 
 import os
@@ -4,7 +4,7 @@ Generated by 'django-admin startproject' using Django 5.2.7.
 """
 
 from pathlib import Path
-from datetime import timedelta  # <-- ĐÃ THÊM
+from datetime import time, timedelta  # <-- ĐÃ THÊM
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,6 +34,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Đặt đầu tiên để đo trọn thời gian xử lý request
+    'nhan_vien.profiling.RequestProfilingMiddleware',
+    # Request an toàn (GET/HEAD/OPTIONS) đọc từ kết nối chỉ đọc
+    'nhan_vien.db_router.ReadReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -65,10 +69,62 @@ WSGI_APPLICATION = 'quanlynhansu.wsgi.application'
 
 
 # Database
+# - 'default': kết nối đọc/ghi, chế độ WAL để người đọc không chặn người ghi.
+#   transaction_mode IMMEDIATE: transaction lấy khóa ghi ngay từ đầu, tránh lỗi
+#   "database is locked" khi nâng khóa đọc -> ghi giữa chừng.
+# - 'replica': kết nối CHỈ ĐỌC (mode=ro) tới cùng file; request GET/HEAD/OPTIONS
+#   đọc qua kết nối này (xem nhan_vien/db_router.py).
+# - timeout: số giây chờ khi DB đang bị khóa (busy timeout).
+# - CONN_MAX_AGE: giữ kết nối giữa các request thay vì mở lại mỗi lần.
+# - journal_mode=WAL được lưu trong header của file. db.sqlite3 (dữ liệu mẫu)
+#   được commit sẵn ở chế độ WAL và đã migrate nên chạy lệnh/test không sửa
+#   file; khi thêm migration, migrate rồi chạy `PRAGMA wal_checkpoint(TRUNCATE)`
+#   trước khi commit lại. Các file db.sqlite3-wal / db.sqlite3-shm đã được .gitignore.
+DB_FILE = BASE_DIR / 'db.sqlite3'
+SQLITE_PRAGMAS = (
+    'PRAGMA synchronous=NORMAL;'     # an toàn với WAL, ít fsync hơn FULL
+    'PRAGMA cache_size=-20000;'      # ~20 MB page cache mỗi kết nối
+    'PRAGMA temp_store=MEMORY;'
+    'PRAGMA mmap_size=268435456;'    # 256 MB memory-mapped I/O
+)
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': DB_FILE,
+        'OPTIONS': {
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': 'PRAGMA journal_mode=WAL;' + SQLITE_PRAGMAS,
+        },
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': DB_FILE.as_uri() + '?mode=ro',
+        'OPTIONS': {
+            'timeout': 20,
+            'init_command': SQLITE_PRAGMAS,
+        },
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        # Khi chạy test, 'replica' dùng chung database test với 'default'
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['nhan_vien.db_router.ReadReplicaRouter']
+
+
+# Cache
+# Dùng cho: phiên bản vai trò trong JWT, danh sách tra cứu (phòng ban, chức vụ),
+# dashboard... Các phiên bản cache này phải được mọi worker nhìn thấy (chạy
+# `uvicorn ... --workers 4` hay gunicorn nhiều tiến trình), nên không dùng
+# locmem (riêng từng tiến trình). FileBasedCache dùng chung thư mục trên cùng
+# máy; chạy nhiều máy thì đổi sang Redis/Memcached.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / '.cache',
     }
 }
 
@@ -91,6 +147,10 @@ USE_TZ = True
 
 # Static files (CSS, JavaScript, Images)
 STATIC_URL = 'static/'
+
+# File do server tạo ra (kết quả tác vụ nền: file xuất, file lỗi nhập...)
+MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_URL = 'media/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # CORS
@@ -105,8 +165,9 @@ CORS_ALLOWED_ORIGINS = [
 # CẤU HÌNH CHO DJANGO REST FRAMEWORK
 REST_FRAMEWORK = {
     # Báo cho DRF biết cách đọc "Bearer Token" (JWT)
+    # Vai trò được đọc từ claim trong token, không tải User từ DB mỗi request
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'nhan_vien.authentication.HRJWTAuthentication',
     ],
     
     # Cấu hình permission mặc định (bắt buộc đăng nhập cho tất cả API)
@@ -115,6 +176,11 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Khóa của từng máy chấm công (tên máy -> khóa), gửi trong header X-Terminal-Key
+# tới /api/chamcong/bulk-ingest/. Máy chỉ gọi được endpoint đó, không cần
+# tài khoản quản lý. Đặt khóa dài, ngẫu nhiên, riêng cho mỗi máy.
+MAY_CHAM_CONG_KEYS = {}
+
 # CẤU HÌNH CHO SIMPLE JWT (ĐỂ REFRESH TOKEN HOẠT ĐỘNG)
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=5),  # Token truy cập hết hạn sau 5 phút
@@ -141,7 +207,7 @@ SIMPLE_JWT = {
 
     "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
     "TOKEN_TYPE_CLAIM": "token_type",
-    "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
+    "TOKEN_USER_CLASS": "nhan_vien.authentication.HRTokenUser",
 
     "JTI_CLAIM": "jti",
 
@@ -149,10 +215,64 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
-    "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "nhan_vien.authentication.HRTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "nhan_vien.authentication.HRTokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
     "SLIDING_TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer",
     "SLIDING_TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSlidingSerializer",
-}
\ No newline at end of file
+}
+
+# ==============================================================
+# ===== CẤU HÌNH NGHIỆP VỤ CHẤM CÔNG =====
+# ==============================================================
+
+# Giờ bắt đầu ca làm: chấm công vào sau giờ này được tính là đi muộn
+GIO_BAT_DAU_LAM = time(8, 0)
+# Số giờ làm chuẩn một ngày: phần vượt quá được tính là làm thêm (OT)
+SO_GIO_LAM_CHUAN_MOT_NGAY = 8
+# Giờ nghỉ trưa (bắt đầu, kết thúc): phần ca làm trùng khoảng này không tính
+# là giờ làm. None: không trừ giờ nghỉ
+GIO_NGHI_TRUA = (time(12, 0), time(13, 0))
+# Hệ số lương làm thêm giờ (%) theo loại ngày (Bộ luật Lao động 2019, Điều 98)
+HE_SO_LAM_THEM = {'ngay_thuong': 150, 'ngay_nghi': 200, 'ngay_le': 300}
+
+# Thời gian cache số liệu dashboard (giây). Cache cũng bị bỏ ngay khi dữ
+# liệu nguồn thay đổi; TTL chỉ giới hạn độ trễ của các thay đổi ngoài ORM.
+DASHBOARD_CACHE_TIMEOUT = 60
+
+# Tác vụ nền (nhan_vien.jobs, worker: manage.py run_jobs)
+# Số lần chạy tối đa của một tác vụ (kể cả lần đầu)
+TAC_VU_SO_LAN_THU_TOI_DA = 3
+# Chờ trước lần thử lại đầu tiên (giây), gấp đôi sau mỗi lần lỗi
+TAC_VU_CHO_THU_LAI = 30
+# Tác vụ 'running' không báo tiến độ quá lâu (giây) coi như worker đã chết
+TAC_VU_HET_HAN = 30 * 60
+# Không có nhịp tim worker (run_jobs) trong chừng này giây: API từ chối tạo tác vụ (503)
+TAC_VU_WORKER_HET_HAN = 5 * 60
+
+# Số ngày phép năm được hưởng của mỗi nhân viên (nhan_vien.leave)
+SO_NGAY_PHEP_NAM = 12
+
+# Lịch làm việc (nhan_vien.workdays)
+# Ngày nghỉ hằng tuần theo weekday(): 0=Thứ 2, ..., 6=Chủ Nhật
+NGAY_NGHI_HANG_TUAN = (6,)
+# Ngày lễ dương lịch cố định mỗi năm: (tháng, ngày, tên). Tết Nguyên đán,
+# Giỗ Tổ và các ngày nghỉ/làm bù thay đổi theo năm được nhập vào bảng NgayLe.
+NGAY_LE_CO_DINH = (
+    (1, 1, 'Tết Dương lịch'),
+    (4, 30, 'Ngày Giải phóng miền Nam'),
+    (5, 1, 'Quốc tế Lao động'),
+    (9, 2, 'Quốc khánh'),
+)
+
+
+# ==============================================================
+# ===== ĐO ĐẠC HIỆU NĂNG REQUEST (nhan_vien.profiling) =====
+# ==============================================================
+
+# Tỉ lệ request được đo (0..1). Request được đo có header Server-Timing và
+# được cộng vào histogram tại GET /api/profiling/
+PROFILING_SAMPLE_RATE = 1.0 if DEBUG else 0.05
+# Một dạng câu SQL lặp lại từ chừng này lần trong một request bị coi là N+1
+PROFILING_N_PLUS_ONE_THRESHOLD = 5
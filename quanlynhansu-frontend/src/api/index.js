@@ -103,7 +103,11 @@ export const createPosition = (data) => axiosInstance.post('/chucvu/', data);
 export const updatePosition = (id, data) => axiosInstance.put(`/chucvu/${id}/`, data);
 export const deletePosition = (id) => axiosInstance.delete(`/chucvu/${id}/`);
 
-export const getChamCong = () => axiosInstance.get('/chamcong/');
+// Chấm công được phân trang keyset phía server:
+// params = { nhan_vien, phong_ban, tu_ngay, den_ngay, page_size }
+// Trang tiếp theo: gọi lại với URL đầy đủ trong `next` của response.
+export const getChamCong = (params) => axiosInstance.get('/chamcong/', { params });
+export const getChamCongPage = (url) => axiosInstance.get(url);
 export const createChamCong = (data) => axiosInstance.post('/chamcong/', data);
 export const updateChamCong = (id, data) => axiosInstance.put(`/chamcong/${id}/`, data);
 export const deleteChamCong = (id) => axiosInstance.delete(`/chamcong/${id}/`);
@@ -113,6 +117,15 @@ export const createDonXinNghi = (data) => axiosInstance.post('/donxinnghi/', dat
 export const updateDonXinNghi = (id, data) => axiosInstance.put(`/donxinnghi/${id}/`, data);
 export const deleteDonXinNghi = (id) => axiosInstance.delete(`/donxinnghi/${id}/`);
 
+// Số liệu tổng quan (đếm sẵn phía server, chỉ Manager/HR/Admin)
+export const getDashboard = () => axiosInstance.get('/dashboard/');
+
+// Tác vụ nền (tính lương, xuất file, nhập nhân viên): tạo rồi hỏi trạng thái định kỳ
+export const createJob = (loai, tham_so = {}) => axiosInstance.post('/tacvu/', { loai, tham_so });
+export const getJob = (id) => axiosInstance.get(`/tacvu/${id}/`);
+export const cancelJob = (id) => axiosInstance.post(`/tacvu/${id}/cancel/`);
+export const downloadJobResult = (id) => axiosInstance.get(`/tacvu/${id}/download/`, { responseType: 'blob' });
+
 export const approveLeaveRequest = (id) => axiosInstance.post(`/donxinnghi/${id}/approve/`);
 export const rejectLeaveRequest = (id) => axiosInstance.post(`/donxinnghi/${id}/reject/`);
 
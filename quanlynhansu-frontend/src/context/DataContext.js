@@ -8,8 +8,8 @@ import {
     getEmployees, 
     getDepartments, 
     getPositions, 
-    getChamCong, 
-    getDonXinNghi 
+    getDonXinNghi,
+    getDashboard
 } from '../api';
 
 // Tạo Context
@@ -21,8 +21,9 @@ export const DataProvider = ({ children }) => {
     const [employees, setEmployees] = useState([]);
     const [departments, setDepartments] = useState([]);
     const [positions, setPositions] = useState([]);
-    const [chamCong, setChamCong] = useState([]);
     const [donXinNghi, setDonXinNghi] = useState([]);
+    // Số liệu đếm sẵn từ /api/dashboard/ (null nếu không có quyền xem)
+    const [dashboard, setDashboard] = useState(null);
     const [loading, setLoading] = useState(false);
 
     // *** SỬA LẠI HOÀN TOÀN HÀM fetchData ***
@@ -56,12 +57,8 @@ export const DataProvider = ({ children }) => {
             console.error("Lỗi khi tải Chức Vụ:", error);
         }
         
-        try {
-            const chamCongRes = await getChamCong();
-            setChamCong(chamCongRes.data);
-        } catch (error) {
-            console.error("Lỗi khi tải Chấm Công:", error);
-        }
+        // Chấm Công KHÔNG tải ở đây nữa: bảng rất lớn, AttendanceList
+        // tự tải từng trang (phân trang + lọc phía server).
 
         try {
             const donXinNghiRes = await getDonXinNghi();
@@ -73,6 +70,14 @@ export const DataProvider = ({ children }) => {
             // để các trang khác vẫn chạy.
         }
 
+        try {
+            const dashboardRes = await getDashboard();
+            setDashboard(dashboardRes.data);
+        } catch (error) {
+            // Nhân viên thường không có quyền (403): các trang tự đếm từ danh sách
+            setDashboard(null);
+        }
+
         setLoading(false); // Đặt ở cuối cùng, sau khi tất cả đã xong
     }, []);
 
@@ -81,8 +86,8 @@ export const DataProvider = ({ children }) => {
         employees,
         departments,
         positions,
-        chamCong,
         donXinNghi,
+        dashboard,
         loading,
         fetchData
     };
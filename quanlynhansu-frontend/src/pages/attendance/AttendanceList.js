@@ -1,6 +1,6 @@
 // src/pages/attendance/AttendanceList.js
 
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useCallback } from 'react';
 import { 
     Table, Button, Space, Typography, Modal, Form, 
     Input, message, Popconfirm, Select, DatePicker, Tag 
@@ -9,23 +9,59 @@ import { PlusOutlined, DeleteOutlined, EditOutlined } from '@ant-design/icons';
 import moment from 'moment';
 
 import { useData } from '../../context/DataContext';
-import { createChamCong, updateChamCong, deleteChamCong } from '../../api';
+import {
+    getChamCong, getChamCongPage, createChamCong, updateChamCong, deleteChamCong
+} from '../../api';
 
 const { Title } = Typography;
 const { Option } = Select;
+const { RangePicker } = DatePicker;
+
+const PAGE_SIZE = 50;
 
 const AttendanceList = () => {
-    const { chamCong, employees, loading, fetchData } = useData(); 
+    const { employees, departments } = useData(); 
     const [form] = Form.useForm();
     const [isModalVisible, setIsModalVisible] = useState(false);
     const [editingRecord, setEditingRecord] = useState(null);
 
-    // 1. Thêm state cho tìm kiếm
-    const [searchTerm, setSearchTerm] = useState('');
+    // 1. Dữ liệu chấm công được tải theo trang từ server (keyset pagination)
+    const [chamCong, setChamCong] = useState([]);
+    const [nextUrl, setNextUrl] = useState(null);
+    const [loading, setLoading] = useState(false);
+
+    // 2. Bộ lọc phía server
+    const [filters, setFilters] = useState({});
+
+    const loadFirstPage = useCallback(async () => {
+        setLoading(true);
+        try {
+            const res = await getChamCong({ ...filters, page_size: PAGE_SIZE });
+            setChamCong(res.data.results);
+            setNextUrl(res.data.next);
+        } catch (error) {
+            console.error("Lỗi khi tải Chấm Công:", error);
+            message.error('Lỗi khi tải dữ liệu chấm công!');
+        }
+        setLoading(false);
+    }, [filters]);
+
+    const loadMore = async () => {
+        if (!nextUrl) return;
+        setLoading(true);
+        try {
+            const res = await getChamCongPage(nextUrl);
+            setChamCong(prev => [...prev, ...res.data.results]);
+            setNextUrl(res.data.next);
+        } catch (error) {
+            message.error('Lỗi khi tải thêm chấm công!');
+        }
+        setLoading(false);
+    };
 
     useEffect(() => {
-        // fetchData đã có sẵn, không cần fetch riêng
-    }, [fetchData]);
+        loadFirstPage();
+    }, [loadFirstPage]);
 
     // ... (Giữ nguyên các hàm handleShowModal, handleCancel, handleOk, handleDelete) ...
     const handleShowModal = (record = null) => {
@@ -64,7 +100,7 @@ const AttendanceList = () => {
                 await createChamCong(payload);
                 message.success('Thêm chấm công thành công!');
             }
-            fetchData();
+            loadFirstPage();
             handleCancel();
         } catch (error) {
             console.error("Lỗi khi lưu chấm công:", error.response?.data || error.message);
@@ -77,29 +113,37 @@ const AttendanceList = () => {
         try {
             await deleteChamCong(id);
             message.success('Xóa chấm công thành công!');
-            fetchData();
+            setChamCong(prev => prev.filter(record => record.id !== id));
         } catch (error) {
             message.error('Lỗi khi xóa chấm công!');
         }
     };
 
-    // 2. Hàm xử lý tìm kiếm
-    const handleSearch = (e) => {
-        setSearchTerm(e.target.value);
+    // 3. Cập nhật bộ lọc -> tải lại trang đầu từ server
+    const handleFilterChange = (key, value) => {
+        setFilters(prev => {
+            const next = { ...prev };
+            if (value === undefined || value === null || value === '') {
+                delete next[key];
+            } else {
+                next[key] = value;
+            }
+            return next;
+        });
     };
 
-    // 3. Lọc dữ liệu (tìm theo Tên, Ngày, Trạng thái)
-    const filteredChamCong = chamCong.filter(record => {
-        const employee = employees.find(emp => emp.id === record.nhan_vien);
-        const employeeName = employee ? employee.ho_ten : '';
-        const search = searchTerm.toLowerCase();
-
-        return (
-            employeeName.toLowerCase().includes(search) ||
-            (record.ngay && record.ngay.toLowerCase().includes(search)) ||
-            (record.trang_thai && record.trang_thai.toLowerCase().includes(search))
-        );
-    });
+    const handleDateRangeChange = (range) => {
+        setFilters(prev => {
+            const next = { ...prev };
+            delete next.tu_ngay;
+            delete next.den_ngay;
+            if (range && range[0] && range[1]) {
+                next.tu_ngay = range[0].format('YYYY-MM-DD');
+                next.den_ngay = range[1].format('YYYY-MM-DD');
+            }
+            return next;
+        });
+    };
 
     const columns = [
         // ... (Giữ nguyên định nghĩa columns) ...
@@ -116,8 +160,6 @@ const AttendanceList = () => {
             title: 'Ngày',
             dataIndex: 'ngay',
             key: 'ngay',
-            sorter: (a, b) => moment(a.ngay).unix() - moment(b.ngay).unix(),
-            defaultSortOrder: 'descend',
         },
         {
             title: 'Trạng thái',
@@ -170,17 +212,42 @@ const AttendanceList = () => {
                 </Button>
             </div>
             
-            {/* 4. Thêm ô tìm kiếm */}
-            <Input.Search
-                placeholder="Tìm theo tên nhân viên, ngày, trạng thái..."
-                value={searchTerm}
-                onChange={handleSearch}
-                style={{ marginBottom: 16, width: '40%' }}
-                allowClear
-            />
+            {/* 4. Bộ lọc phía server */}
+            <Space style={{ marginBottom: 16 }} wrap>
+                <Select
+                    placeholder="Lọc theo nhân viên"
+                    style={{ width: 240 }}
+                    allowClear
+                    showSearch
+                    filterOption={(input, option) =>
+                        option.children.toLowerCase().indexOf(input.toLowerCase()) >= 0
+                    }
+                    onChange={(value) => handleFilterChange('nhan_vien', value)}
+                >
+                    {employees.map(emp => (
+                        <Option key={emp.id} value={emp.id}>{`${emp.ho_ten} (${emp.ma_nhan_vien})`}</Option>
+                    ))}
+                </Select>
+                <Select
+                    placeholder="Lọc theo phòng ban"
+                    style={{ width: 200 }}
+                    allowClear
+                    onChange={(value) => handleFilterChange('phong_ban', value)}
+                >
+                    {departments.map(dept => (
+                        <Option key={dept.id} value={dept.id}>{dept.ten_phong_ban}</Option>
+                    ))}
+                </Select>
+                <RangePicker format="DD/MM/YYYY" onChange={handleDateRangeChange} />
+            </Space>
             
-            {/* 5. Dùng dữ liệu đã lọc */}
-            <Table columns={columns} dataSource={filteredChamCong} rowKey="id" loading={loading} bordered />
+            {/* 5. Dữ liệu đã được server lọc và sắp xếp (mới nhất trước) */}
+            <Table columns={columns} dataSource={chamCong} rowKey="id" loading={loading} bordered pagination={false} />
+            {nextUrl && (
+                <div style={{ textAlign: 'center', marginTop: 16 }}>
+                    <Button onClick={loadMore} loading={loading}>Tải thêm</Button>
+                </div>
+            )}
             
             <Modal
                 title={editingRecord ? 'Chỉnh sửa Chấm Công' : 'Thêm Chấm Công mới'}
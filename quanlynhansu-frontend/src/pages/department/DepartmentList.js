@@ -10,7 +10,7 @@ import DepartmentDetailModal from './DepartmentDetailModal';
 const { Title } = Typography;
 
 const DepartmentList = () => {
-    const { departments, employees, loading, fetchData } = useData(); 
+    const { departments, employees, dashboard, loading, fetchData } = useData(); 
     const [form] = Form.useForm();
     const [isFormModalVisible, setIsFormModalVisible] = useState(false);
     const [editingDepartment, setEditingDepartment] = useState(null);
@@ -94,6 +94,11 @@ const DepartmentList = () => {
             align: 'center',
             width: '15%',
             render: (_, record) => {
+                // Ưu tiên số đếm sẵn của server, không phải lọc cả danh sách nhân viên
+                const dem = dashboard?.nhan_su?.theo_phong_ban?.find(pb => pb.id === record.id);
+                if (dem) {
+                    return dem.so_nhan_vien;
+                }
                 return employees.filter(emp => emp.phong_ban?.id === record.id).length;
             }
         },
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import api from '../../api'; // Đảm bảo dùng 'api', không phải 'axios'
+import api, { cancelJob, createJob, getJob } from '../../api'; // Đảm bảo dùng 'api', không phải 'axios'
 
 // Thêm một chút CSS nội tuyến để bảng biểu dễ nhìn hơn
 const styles = `
@@ -85,6 +85,12 @@ const styles = `
   .form-submit-btn:hover {
     background: #2980b9;
   }
+  .job-status {
+    background: #eef6fc;
+    padding: 10px;
+    border-radius: 4px;
+    margin-bottom: 20px;
+  }
   .error-message {
     color: red;
     background: #ffe0e0;
@@ -115,17 +121,62 @@ function PayslipManagement() {
     khau_tru: 0,
   });
 
+  // Tác vụ tính lương cả tháng đang theo dõi (chạy nền trên server)
+  const [job, setJob] = useState(null);
+  // Bỏ checkpoint của lần chạy trước (bị gián đoạn) và tính lại cả tháng
+  const [khoiDongLai, setKhoiDongLai] = useState(false);
+
   // 1. Tải dữ liệu khi component được mount
   useEffect(() => {
     fetchData();
   }, []);
 
+  // Hỏi trạng thái tác vụ mỗi 2 giây tới khi kết thúc
+  useEffect(() => {
+    if (!job || !['pending', 'running'].includes(job.trang_thai)) return undefined;
+    const timer = setTimeout(async () => {
+      try {
+        const res = await getJob(job.id);
+        setJob(res.data);
+        if (res.data.trang_thai === 'succeeded') fetchData();
+      } catch (err) {
+        console.error(err);
+      }
+    }, 2000);
+    return () => clearTimeout(timer);
+  }, [job]);
+
+  const handleRunPayroll = async () => {
+    if (!window.confirm(`Tính lương cho toàn bộ nhân viên tháng ${formData.thang}/${formData.nam}?`)) return;
+    try {
+      const res = await createJob('tinh_luong', {
+        thang: Number(formData.thang),
+        nam: Number(formData.nam),
+        khoi_dong_lai: khoiDongLai,
+      });
+      setJob(res.data);
+    } catch (err) {
+      setError('Không thể bắt đầu tính lương.');
+      console.error(err);
+    }
+  };
+
+  const handleCancelJob = async () => {
+    try {
+      const res = await cancelJob(job.id);
+      setJob(res.data);
+    } catch (err) {
+      console.error(err);
+    }
+  };
+
   const fetchData = async () => {
     setLoading(true);
     setError(null);
     try {
       const [nhanVienRes, payslipsRes] = await Promise.all([
-        api.get('nhanvien/'), 
+        // Dropdown chỉ cần mã + họ tên
+        api.get('nhanvien/', { params: { fields: 'id,ma_nhan_vien,ho_ten' } }),
         api.get('payslips/'),
       ]);
       
@@ -226,6 +277,17 @@ function PayslipManagement() {
 
         {error && <div className="error-message">{error}</div>}
 
+        {job && (
+          <div className="job-status">
+            Tính lương tháng {job.tham_so.thang}/{job.tham_so.nam}: {job.trang_thai} ({job.tien_do}%)
+            {job.thong_diep && ` - ${job.thong_diep}`}
+            {job.loi && ` - ${job.loi}`}
+            {['pending', 'running'].includes(job.trang_thai) && (
+              <button type="button" onClick={handleCancelJob} style={{ marginLeft: 10 }}>Hủy</button>
+            )}
+          </div>
+        )}
+
         {/* === FORM TẠO MỚI === */}
         <form onSubmit={handleSubmit} className="payslip-form">
           <h2>Tạo Bảng Lương Mới</h2>
@@ -311,6 +373,23 @@ function PayslipManagement() {
             </div>
           </div>
           <button type="submit" className="form-submit-btn">Tạo Bảng Lương</button>
+          <button
+            type="button"
+            className="form-submit-btn"
+            onClick={handleRunPayroll}
+            disabled={job && ['pending', 'running'].includes(job.trang_thai)}
+            style={{ marginLeft: 10 }}
+          >
+            Tính Lương Cả Tháng
+          </button>
+          <label style={{ display: 'inline', marginLeft: 10 }}>
+            <input
+              type="checkbox"
+              checked={khoiDongLai}
+              onChange={e => setKhoiDongLai(e.target.checked)}
+            />
+            {' '}Tính lại từ đầu
+          </label>
         </form>
 
         {/* === BẢNG DANH SÁCH === */}